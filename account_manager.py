@@ -5,6 +5,16 @@ from pocketbase.utils import ClientResponseError
 from dotenv import load_dotenv
 import random
 import string
+import threading
+from datetime import datetime
+from typing import Any
+
+from services.shared_state import enabled as shared_state_enabled, shared_state
+from utils.cache import TTLCache
+from utils.logger import get_logger
+from utils.tracing import tracer
+
+logger = get_logger(__name__)
 
 load_dotenv()
 AGENT_CONFIG_ID = os.getenv("DEFAULT_AGENT_CONFIG_ID")
@@ -14,54 +24,140 @@ POCKETBASE_URL = os.getenv("POCKETBASE_URL")
 ADMIN_EMAIL = os.getenv("POCKETBASE_ADMIN_EMAIL")
 ADMIN_PASSWORD = os.getenv("POCKETBASE_ADMIN_PASSWORD")
 
-# --- Initialize PocketBase Client ---
-try:
-    client = PocketBase(POCKETBASE_URL)
-    client.admins.auth_with_password(ADMIN_EMAIL, ADMIN_PASSWORD)
-    print("INFO: Successfully authenticated with PocketBase admin credentials.")
-except Exception as e:
-    print(f"FATAL: Could not connect or authenticate with PocketBase. Please check your .env settings and that the account is a true admin. Error: {e}")
-    client = None
+# Lookup caches: positive hits live a little longer, misses expire quickly so a
+# record created outside this service shows up within a few seconds.
+LOOKUP_CACHE_TTL = float(os.getenv("PB_LOOKUP_CACHE_TTL", "60"))
+NEGATIVE_CACHE_TTL = float(os.getenv("PB_NEGATIVE_CACHE_TTL", "5"))
+
+tenant_cache = TTLCache("pb_tenants", maxsize=4096, ttl=LOOKUP_CACHE_TTL, negative_ttl=NEGATIVE_CACHE_TTL)
+user_cache = TTLCache("pb_users", maxsize=4096, ttl=LOOKUP_CACHE_TTL, negative_ttl=NEGATIVE_CACHE_TTL)
+
+# --- PocketBase Client ---
+# Authenticating is a network round trip, so it happens on first use (or in the
+# app's startup hook) instead of at import. With several workers the admin
+# token is shared, so the pool logs in once rather than once per process.
+_client = None
+_client_lock = threading.Lock()
+ADMIN_TOKEN_TTL = float(os.getenv("PB_ADMIN_TOKEN_TTL", "3600"))
+
+def _admin_login(pb: PocketBase) -> dict:
+    pb.admins.auth_with_password(ADMIN_EMAIL, ADMIN_PASSWORD)
+    logger.info("Authenticated with PocketBase admin credentials")
+    return {"token": pb.auth_store.token}
+
+def get_client() -> PocketBase | None:
+    global _client
+    if _client is not None:
+        return _client
+    with _client_lock:
+        if _client is None:
+            try:
+                pb = PocketBase(POCKETBASE_URL)
+                if shared_state_enabled():
+                    session = shared_state.get_or_compute(
+                        "pocketbase", "admin_session", lambda: _admin_login(pb), ttl=ADMIN_TOKEN_TTL
+                    )
+                    if pb.auth_store.token != session["token"]:
+                        pb.auth_store.save(session["token"], None)
+                else:
+                    _admin_login(pb)
+                _client = pb
+            except Exception as e:
+                logger.critical("Could not connect or authenticate with PocketBase; check the .env settings and that the account is a true admin", extra={"error": str(e)})
+    return _client
 
 def generate_temp_password(length=12):
     characters = string.ascii_letters + string.digits + string.punctuation
     return ''.join(random.choice(characters) for _ in range(length))
 
+def pb_filter(expr: str, **params: Any) -> str:
+    """
+    Build a PocketBase filter with `{:name}` placeholders bound to params,
+    e.g. pb_filter("email = {:email}", email=email). String values are
+    quoted and escaped so user input can't change the expression.
+    """
+    for name, value in params.items():
+        if isinstance(value, bool):
+            literal = "true" if value else "false"
+        elif value is None:
+            literal = "null"
+        elif isinstance(value, (int, float)):
+            literal = str(value)
+        else:
+            if isinstance(value, datetime):
+                value = value.strftime("%Y-%m-%d %H:%M:%S")
+            escaped = str(value).replace("'", "\\'")
+            literal = f"'{escaped}'"
+        expr = expr.replace("{:" + name + "}", literal)
+    return expr
+
+def _cache_key(email: str) -> str:
+    return email.strip().lower()
+
+def _find_id(collection: str, email: str) -> str | None:
+    with tracer.span("pocketbase.find", collection=collection) as span:
+        items = get_client().collection(collection).get_list(1, 1, {"filter": pb_filter("email = {:email}", email=email)}).items
+        span.set(found=bool(items))
+    return items[0].id if items else None
+
+def find_tenant_id(email: str) -> str | None:
+    """Cached tenant-by-email lookup. Returns the tenant id or None."""
+    return tenant_cache.get_or_load(_cache_key(email), lambda: _find_id("tenants", email))
+
 def create_or_get_tenant(email: str, password: str, password_confirm: str) -> str | None:
+    client = get_client()
     if not client:
         return None
     try:
-        existing = client.collection("tenants").get_list(1, 1, {"filter": f"email = '{email}'"}).items
-        if existing:
-            print(f"INFO: Found existing tenant for '{email}'")
-            return existing[0].id
-
-        print(f"INFO: Creating new tenant for '{email}'...")
-        tenant = client.collection("tenants").create({
-            "email": email,
-            "password": password,
-            "passwordConfirm": password_confirm,
-            "default_agent_config": AGENT_CONFIG_ID
-        })
+        existing_id = find_tenant_id(email)
+        if existing_id:
+            logger.info("Found existing tenant", extra={"tenant_email": email})
+            return existing_id
+
+        logger.info("Creating tenant", extra={"tenant_email": email})
+        with tracer.span("pocketbase.create", collection="tenants"):
+            tenant = client.collection("tenants").create({
+                "email": email,
+                "password": password,
+                "passwordConfirm": password_confirm,
+                "default_agent_config": AGENT_CONFIG_ID
+            })
+        tenant_cache.set(_cache_key(email), tenant.id)
         return tenant.id
     except ClientResponseError as e:
-        print(f"PocketBase error while creating tenant: {e.data}")
+        # A failed create may still have raced with another writer.
+        tenant_cache.invalidate(_cache_key(email))
+        logger.error("PocketBase error while creating tenant", extra={"error": e.data})
         return None
     except Exception as e:
-        print(f"Unexpected error creating tenant: {e}")
+        logger.exception("Unexpected error creating tenant")
         return None
 
 def user_exists(email: str) -> bool:
     try:
-        users = client.collection("users").get_list(1, 1, {"filter": f"email = '{email}'"}).items
-        return len(users) > 0
+        return user_cache.get_or_load(_cache_key(email), lambda: _find_id("users", email)) is not None
     except ClientResponseError as e:
         if e.status == 404:
             return False
-        print(f"Error checking user: {e}")
+        logger.error("Error checking user", extra={"error": str(e)})
         return True  # Assume true to avoid duplicate
 
+def send_password_reset(email: str) -> bool:
+    """Ask PocketBase to email a password-setup (reset) link, e.g. to users created with a temp password."""
+    client = get_client()
+    if not client:
+        return False
+    try:
+        with tracer.span("pocketbase.password_reset", collection="users"):
+            client.collection("users").request_password_reset(email)
+        logger.info("Password reset email requested", extra={"user_email": email})
+        return True
+    except Exception as e:
+        logger.error("Could not request a password reset", extra={"user_email": email, "error": str(e)})
+        return False
+
 def create_account(org_email: str, user_name: str, user_email: str, user_role: str, password: str, password_confirm: str) -> tuple[bool, str]:
+    client = get_client()
     if not client:
         return False, "Account system unavailable."
 
@@ -82,19 +178,22 @@ def create_account(org_email: str, user_name: str, user_email: str, user_role: s
 
     # ✅ Step 4: Create user
     try:
-        new_user = client.collection("users").create({
-            "email": user_email,
-            "password": password,
-            "passwordConfirm": password_confirm,
-            "name": user_name,
-            "role": user_role,
-            "tenant": tenant_id,
-            "emailVisibility": True,
-        })
-        print(f"User '{new_user.id}' created and linked to tenant '{tenant_id}'.")
-        # For now, just print instead of sending email
-        print(f"Welcome email would be sent to {user_email} with password: {password}")
+        with tracer.span("pocketbase.create", collection="users"):
+            new_user = client.collection("users").create({
+                "email": user_email,
+                "password": password,
+                "passwordConfirm": password_confirm,
+                "name": user_name,
+                "role": user_role,
+                "tenant": tenant_id,
+                "emailVisibility": True,
+            })
+        user_cache.set(_cache_key(user_email), new_user.id)
+        logger.info("User created", extra={"user_id": new_user.id, "tenant_id": tenant_id})
+        # Welcome emails aren't sent yet; never log the password itself
+        logger.info("Welcome email pending", extra={"user_email": user_email})
         return True, f"Welcome, {user_name}! Your TestZeus account is ready. Check your email: {user_email}."
     except Exception as e:
-        print(f"ERROR during account creation: {e}")
+        user_cache.invalidate(_cache_key(user_email))
+        logger.exception("Account creation failed")
         return False, "Unexpected error occurred. Our team will follow up."
\ No newline at end of file
@@ -0,0 +1,98 @@
+# backend/benchmarks/bench_admission.py
+"""
+Benchmark: chat latency under overload, with and without admission control.
+
+    python -m benchmarks.bench_admission [--rate 60] [--seconds 10] [--deadline 10]
+
+Simulates an upstream LLM that serves `capacity` calls at a time (the rest
+queue inside it, as they would behind a rate limit) and offers it more
+requests per second than it can serve. Without admission every request is
+let through; with it they go through an AdmissionPool sized to the upstream.
+Goodput counts requests answered within their deadline.
+"""
+
+import argparse
+import asyncio
+import random
+import statistics
+import time
+from typing import List, Optional
+
+from services.admission import AdmissionPool, AdmissionRejected
+
+
+class Upstream:
+    def __init__(self, base: float, capacity: int):
+        self.base = base
+        self.slots = asyncio.Semaphore(capacity)
+
+    async def call(self) -> None:
+        async with self.slots:
+            await asyncio.sleep(self.base * random.uniform(0.8, 1.2))
+
+
+async def run(pool: Optional[AdmissionPool], rate: float, seconds: float, deadline: float,
+              tenants: int, base: float, capacity: int) -> dict:
+    upstream = Upstream(base, capacity)
+    latencies: List[float] = []
+    shed = late = 0
+
+    async def one() -> None:
+        nonlocal shed, late
+        start = time.monotonic()
+        tenant = f"tenant-{random.randrange(tenants)}"
+        try:
+            if pool is None:
+                await upstream.call()
+            else:
+                async with pool.admit(tenant, start + deadline):
+                    await upstream.call()
+        except AdmissionRejected:
+            shed += 1
+            return
+        elapsed = time.monotonic() - start
+        latencies.append(elapsed)
+        if elapsed > deadline:
+            late += 1
+
+    tasks = []
+    end = time.monotonic() + seconds
+    while time.monotonic() < end:
+        tasks.append(asyncio.ensure_future(one()))
+        await asyncio.sleep(random.expovariate(rate))
+    await asyncio.gather(*tasks)
+
+    latencies.sort()
+    q = statistics.quantiles(latencies, n=100) if len(latencies) > 1 else [0.0] * 99
+    return {
+        "offered": len(tasks),
+        "goodput": len(latencies) - late,
+        "late": late,
+        "shed": shed,
+        "p50_s": q[49],
+        "p99_s": q[98],
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--rate", type=float, default=60, help="offered requests per second")
+    parser.add_argument("--seconds", type=float, default=10)
+    parser.add_argument("--deadline", type=float, default=10, help="client timeout in seconds")
+    parser.add_argument("--tenants", type=int, default=20)
+    parser.add_argument("--base-latency", type=float, default=1.0)
+    parser.add_argument("--capacity", type=int, default=16, help="calls the upstream serves at once")
+    args = parser.parse_args()
+
+    pool = AdmissionPool("bench", limit=args.capacity, tenant_limit=4, queue_size=2 * args.capacity,
+                         max_wait=args.deadline, initial_service_time=args.base_latency)
+    print(f"{'mode':<10} {'offered':>7} {'goodput':>7} {'late':>5} {'shed':>5} {'p50 s':>7} {'p99 s':>7}")
+    for mode, admission in (("none", None), ("admission", pool)):
+        result = asyncio.run(run(admission, args.rate, args.seconds, args.deadline,
+                                 args.tenants, args.base_latency, args.capacity))
+        print(f"{mode:<10} {result['offered']:>7} {result['goodput']:>7} {result['late']:>5} "
+              f"{result['shed']:>5} {result['p50_s']:>7.2f} {result['p99_s']:>7.2f}")
+
+
+if __name__ == "__main__":
+    main()
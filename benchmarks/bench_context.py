@@ -0,0 +1,52 @@
+# backend/benchmarks/bench_context.py
+"""
+Benchmark: knowledge-tool context size, whole blurbs vs. assembled context.
+
+    python -m benchmarks.bench_context [--budget 300] [--repeat 200]
+
+For every user turn in benchmarks/data/sessions.jsonl, compares the tokens
+of the previous knowledge context (every matched area's blurb, joined) with
+services/context_assembler under the given budget, and times assembly.
+"""
+
+import argparse
+import json
+import statistics
+import time
+
+from benchmarks.loadtest import DEFAULT_SESSIONS
+from services.context_assembler import ContextAssembler, estimate_tokens
+from services.rag_service import RAGService
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--budget", type=int, default=300)
+    parser.add_argument("--repeat", type=int, default=200)
+    args = parser.parse_args()
+
+    with open(DEFAULT_SESSIONS, "r", encoding="utf-8") as f:
+        queries = [turn for line in f if line.strip() for turn in json.loads(line)["turns"]]
+
+    rag = RAGService()
+    assembler = ContextAssembler(budget=args.budget)
+    before, after, timings = [], [], []
+    for query in queries:
+        before.append(estimate_tokens("\n\n".join(rag.retrieve(query))))
+        chunks = rag.retrieve_chunks(query)
+        start = time.perf_counter()
+        for _ in range(args.repeat):
+            context = assembler.assemble(chunks)
+        timings.append((time.perf_counter() - start) / args.repeat)
+        after.append(context.tokens)
+
+    print(f"queries: {len(queries)}, budget: {args.budget} tokens")
+    print(f"{'':<12} {'mean':>7} {'max':>7} {'total':>8}")
+    print(f"{'whole':<12} {statistics.mean(before):>7.0f} {max(before):>7} {sum(before):>8}")
+    print(f"{'assembled':<12} {statistics.mean(after):>7.0f} {max(after):>7} {sum(after):>8}")
+    print(f"saved: {1 - sum(after) / sum(before):.0%} of context tokens; "
+          f"assemble: {statistics.mean(timings) * 1e6:.0f} µs mean")
+
+
+if __name__ == "__main__":
+    main()
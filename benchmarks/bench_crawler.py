@@ -0,0 +1,179 @@
+# backend/benchmarks/bench_crawler.py
+"""
+Benchmark: crawl mode against a local static site.
+
+    python -m benchmarks.bench_crawler [--products 20] [--capture-ms 400] [--generate-ms 800]
+
+Writes a small app to a temp directory and serves it with http.server:
+login, signup, contact, cart, checkout, a dashboard, blog pages,
+--products product pages sharing one template, robots.txt (with an
+/admin/ Disallow and a Sitemap line) and a sitemap listing a page that
+nothing links to. Some links carry tracking parameters or point at
+index.html, which should collapse into pages already seen, and one page
+repeats the login page in different markup.
+
+The browser and models are stand-ins: capture fetches the HTML and draws
+its text into a PNG after --capture-ms, OCR takes 100 ms, and generation
+takes --generate-ms. The crawl runs once with everything serial and once
+with the default concurrency, and reports pages per minute and what was
+deduplicated.
+"""
+
+import argparse
+import asyncio
+import functools
+import os
+import tempfile
+import threading
+import time
+from http.server import SimpleHTTPRequestHandler, ThreadingHTTPServer
+
+import httpx
+from PIL import Image, ImageDraw
+
+from services.site_crawler import SiteCrawler, _PageParser
+
+PAGE = """<!doctype html><html><head><title>{title}</title></head><body>
+<nav><a href="/">Home</a> <a href="/login.html">Log in</a> <a href="/products/">Shop</a>
+<a href="/blog/">Blog</a> <a href="/contact.html?utm_source=nav">Contact</a> <a href="/admin/">Admin</a></nav>
+<main class="{kind}"><h1>{title}</h1>{body}</main>
+<footer><a href="/index.html">Acme</a> <a href="/pricing.html#plans">Pricing</a></footer></body></html>"""
+
+
+def form(*fields: str) -> str:
+    inputs = "".join(f'<label>{f}<input name="{f}" type="{"password" if f == "password" else "text"}"></label>'
+                     for f in fields)
+    return f"<form>{inputs}<button>Submit</button></form>"
+
+
+def write_site(root: str, products: int) -> int:
+    """The site's files; returns the number of distinct pages"""
+    pages = {
+        "index.html": ("Acme Cloud", "<p>Ship faster with Acme.</p>" + "".join(
+            f'<a href="/{p}">{p}</a>' for p in ("signup.html", "signin.html", "cart.html", "dashboard/", "about.html")
+        )),
+        "login.html": ("Log in", form("email", "password")),
+        # Same page, different markup: only the screenshot can tell
+        "signin.html": ("Log in", "<div><form>" + "".join(
+            f'<div class="field"><span>{f}</span><input name="{f}" type="{t}"></div>'
+            for f, t in (("email", "text"), ("password", "password"))
+        ) + "<button>Submit</button></form></div>"),
+        "signup.html": ("Sign up", form("name", "email", "company", "password")),
+        "contact.html": ("Contact sales", form("name", "email", "message", "phone")),
+        "cart.html": ("Your cart", '<table><tr><td>Widget</td><td>2</td></tr></table><a href="/checkout.html">Checkout</a>'),
+        "checkout.html": ("Checkout", form("address", "city", "card", "expiry")),
+        "dashboard/index.html": ("Dashboard", "<section>Usage chart</section><section>Recent runs</section>"),
+        "about.html": ("About us", "<p>We build testing tools for teams everywhere since 2019.</p>"),
+        "pricing.html": ("Pricing", "<ul><li>Starter</li><li>Team</li><li>Enterprise</li></ul>"),
+        "faq.html": ("Frequently asked questions", "<dl><dt>Is there a trial?</dt><dd>Yes, 14 days.</dd></dl>"),
+        "admin/index.html": ("Admin", "<p>Internal</p>"),
+        "blog/index.html": ("Blog", "".join(f'<a href="/blog/post{i}.html">Post {i}</a>' for i in range(1, 6))),
+        "products/index.html": ("Products", "".join(
+            f'<a href="/products/item{i}.html?ref=grid">Item {i}</a>' for i in range(1, products + 1)
+        )),
+    }
+    for i in range(1, 6):
+        topic = ["billing", "reporting", "integrations", "security", "mobile"][i - 1]
+        pages[f"blog/post{i}.html"] = (f"Release notes: {topic}", f"<article><p>New {topic} features {'and fixes ' * i}</p></article>")
+    for i in range(1, products + 1):
+        pages[f"products/item{i}.html"] = (
+            "Product", f'<div class="product"><h2>Item {i}</h2><p>Price</p><button>Add to cart</button></div>'
+        )
+    for name, (title, body) in pages.items():
+        path = os.path.join(root, name)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        kind = name.split("/")[0].split(".")[0]
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(PAGE.format(title=title, body=body, kind=kind))
+    with open(os.path.join(root, "sitemap.xml"), "w") as f:
+        urls = "".join(f"<url><loc>/{name}</loc></url>" for name in ("index.html", "pricing.html", "faq.html"))
+        f.write(f'<?xml version="1.0"?><urlset xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">{urls}</urlset>')
+    with open(os.path.join(root, "robots.txt"), "w") as f:
+        f.write("User-agent: *\nDisallow: /admin/\nSitemap: /sitemap.xml\n")
+    return len(pages) - 1  # admin is disallowed
+
+
+class QuietHandler(SimpleHTTPRequestHandler):
+    def log_message(self, *args):
+        pass
+
+    def end_headers(self):
+        time.sleep(0.02)  # a little server latency
+        super().end_headers()
+
+
+def stand_in_stages(shots: str, capture_ms: float, generate_ms: float):
+    async def capture(url: str) -> dict:
+        html = (await asyncio.to_thread(httpx.get, url)).text
+        parser = _PageParser()
+        parser.feed(html)
+        words = [w for w in parser.features if "." not in w and ">" not in w]
+        image = Image.new("RGB", (1280, 800), "white")
+        draw = ImageDraw.Draw(image)
+        draw.rectangle((0, 0, 1280, 80), fill=(30, 60, 120))  # the nav bar every page shares
+        for n, word in enumerate(words[:24]):
+            draw.text((40 + 300 * (n % 4), 120 + 70 * (n // 4)), word, fill="black", font_size=44)
+        for n in range(parser.inputs):
+            draw.rectangle((40, 560 + 60 * n, 700, 600 + 60 * n), fill=(200, 200, 200), outline="gray", width=3)
+        path = os.path.join(shots, f"{abs(hash(url))}.png")
+        image.save(path)
+        await asyncio.sleep(capture_ms / 1000)
+        return {"path": path, "image_url": ""}
+
+    async def ocr(path: str) -> str:
+        await asyncio.sleep(0.1)
+        return ""
+
+    async def generate(path: str, prompt_type: str) -> dict:
+        await asyncio.sleep(generate_ms / 1000)
+        return {"scenarios": 5, "validation": "5 scenario(s) validated"}
+
+    return capture, ocr, generate
+
+
+async def run(base_url: str, shots: str, args, **limits) -> dict:
+    capture, ocr, generate = stand_in_stages(shots, args.capture_ms, args.generate_ms)
+    crawler = SiteCrawler(capture, generate, ocr, max_pages=100, delay_ms=args.delay_ms, **limits)
+    events = []
+    async for event in crawler.crawl(base_url):
+        events.append(event)
+    return {"done": events[-1], "events": events}
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--products", type=int, default=20)
+    parser.add_argument("--capture-ms", type=float, default=400)
+    parser.add_argument("--generate-ms", type=float, default=800)
+    parser.add_argument("--delay-ms", type=float, default=50)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        site, shots = os.path.join(tmp, "site"), os.path.join(tmp, "shots")
+        os.makedirs(shots)
+        distinct = write_site(site, args.products)
+        server = ThreadingHTTPServer(("127.0.0.1", 0), functools.partial(QuietHandler, directory=site))
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        base_url = f"http://127.0.0.1:{server.server_address[1]}/"
+        try:
+            print(f"site: {distinct} crawlable pages ({args.products} product pages on one template), "
+                  f"capture {args.capture_ms:.0f} ms, generation {args.generate_ms:.0f} ms")
+            for label, limits in (
+                ("serial", dict(fetch_concurrency=1, capture_concurrency=1, per_host=1)),
+                ("pipelined", {}),
+            ):
+                result = asyncio.run(run(base_url, shots, args, **limits))
+                done = result["done"]
+                urls = {e["url"] for e in result["events"] if e["event"] == "page"}
+                print(f"{label:10s} {done['pages_per_minute']:6.1f} pages/min, {done['seconds']:5.1f} s: "
+                      f"{done['fetched']} fetched, {done['generated']} generated, "
+                      f"{done['duplicate_dom']} DOM + {done['duplicate_visual']} visual duplicates, "
+                      f"{done['failed']} failed")
+                assert not any("/admin/" in url for url in urls), "robots.txt Disallow ignored"
+                assert any(url.endswith("/faq.html") for url in urls), "sitemap-only page missed"
+        finally:
+            server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,81 @@
+# backend/benchmarks/bench_gherkin.py
+"""
+Benchmark: local Gherkin validation vs. the vision round trip it replaces.
+
+    python -m benchmarks.bench_gherkin [--scenarios 12] [--docs 500] [--broken 0.2]
+
+Generates model-style answers (chat preamble, code fences, markdown
+headings and numbering, duplicates, a share of broken scenarios) and times
+services/gherkin.parse(). Regeneration is stubbed to count what would be
+sent back: only the broken scenarios' text, not a screenshot.
+"""
+
+import argparse
+import random
+import statistics
+import time
+
+from services import gherkin
+
+PAGES = ["login", "dashboard", "checkout", "settings", "search", "profile", "cart", "signup"]
+ACTIONS = ["click the submit button", "enter a valid email", "select the first result", "open the menu",
+           "fill in the form", "upload a file", "toggle dark mode", "apply a filter"]
+OUTCOMES = ["I see a confirmation", "the page title changes", "an error message is shown",
+            "the list is updated", "I am redirected to the dashboard", "the total is recalculated"]
+
+
+def model_answer(rng: random.Random, scenarios: int, broken: float) -> str:
+    lines = ["Sure! Here are the test cases for the page:", "", "```gherkin", "Feature: Generated page checks", ""]
+    for i in range(scenarios):
+        page, action, outcome = rng.choice(PAGES), rng.choice(ACTIONS), rng.choice(OUTCOMES)
+        heading = rng.choice(["Scenario:", "## Scenario:", "**Scenario:**", "scenario:"])
+        lines.append(f"  {heading} {action} on {page} {i}")
+        steps = [f"Given I am on the {page} page", f"When I {action}", f"Then {outcome}"]
+        if rng.random() < broken:
+            steps = steps[:2] + ["the model rambles here instead of asserting"]
+        for n, step in enumerate(steps, 1):
+            lines.append(f"    {n}. {step}" if rng.random() < 0.3 else f"    {step}")
+        lines.append("")
+        if rng.random() < 0.1:  # near-duplicate
+            lines.append(f"  Scenario: {action} on {page} again")
+            lines.extend(f"    {step}" for step in steps)
+            lines.append("")
+    lines += ["```", "", "Let me know if you need more!"]
+    return "\n".join(lines)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--scenarios", type=int, default=12)
+    parser.add_argument("--docs", type=int, default=500)
+    parser.add_argument("--broken", type=float, default=0.2)
+    args = parser.parse_args()
+
+    rng = random.Random(9)
+    docs = [model_answer(rng, args.scenarios, args.broken) for _ in range(args.docs)]
+    timings, totals = [], {"scenarios": 0, "repaired": 0, "broken": 0, "duplicates": 0}
+    sent_chars, doc_chars = 0, 0
+    for doc in docs:
+        start = time.perf_counter()
+        feature = gherkin.parse(doc)
+        timings.append(time.perf_counter() - start)
+        totals["scenarios"] += len(feature.scenarios)
+        totals["repaired"] += feature.repaired
+        totals["broken"] += len(feature.broken)
+        totals["duplicates"] += len(feature.duplicates)
+        prompts = []
+        gherkin.regenerate_broken(feature, regenerate=lambda prompt: prompts.append(prompt) or "", limit=100)
+        sent_chars += sum(len(p) for p in prompts)
+        doc_chars += len(doc)
+
+    print(f"parse: p50 {statistics.median(timings) * 1e6:.0f} µs, max {max(timings) * 1e6:.0f} µs "
+          f"per {args.scenarios}-scenario answer")
+    print(f"per answer: {totals['scenarios'] / args.docs:.1f} scenarios kept, {totals['repaired'] / args.docs:.1f} "
+          f"auto-repaired, {totals['duplicates'] / args.docs:.1f} duplicates dropped, "
+          f"{totals['broken'] / args.docs:.1f} broken")
+    print(f"regeneration prompts: {sent_chars / args.docs:.0f} chars per answer "
+          f"({sent_chars / doc_chars:.0%} of the answer), and no screenshot")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,113 @@
+# backend/benchmarks/bench_ingestion.py
+"""
+Benchmark: knowledge ingestion throughput on a synthetic corpus.
+
+    python -m benchmarks.bench_ingestion [--mb 50] [--files 200] [--big-file-mb 20]
+
+Writes a corpus of .txt, .md and .html docs (plus one large file) to a temp
+directory and ingests it into a fresh index with services/ingestion:
+
+- cold: every file streams through the pipeline;
+- warm: nothing changed, the manifest skips everything;
+- one edit: a single file changes and only it is re-indexed.
+
+Peak RSS growth during the cold run shows memory stays bounded by the
+stage buffers, not by file or corpus size.
+"""
+
+import argparse
+import os
+import random
+import resource
+import tempfile
+import time
+
+from services.ingestion import KnowledgeIndex, ingest
+
+WORDS = (
+    "test case scenario run parallel tag browser login dashboard salesforce account user team plan "
+    "pricing report failure assertion step given when then agent data environment release pipeline "
+    "regression coverage flaky retry schedule notification video playback locator element form"
+).split()
+
+
+def paragraph(rng: random.Random, words: int) -> str:
+    text = " ".join(rng.choice(WORDS) for _ in range(words))
+    return text[0].upper() + text[1:] + "."
+
+
+def write_doc(path: str, target_bytes: int, rng: random.Random) -> None:
+    ext = os.path.splitext(path)[1]
+    written = 0
+    with open(path, "w", encoding="utf-8") as f:
+        if ext == ".html":
+            f.write("<html><head><style>p{margin:0}</style></head><body>\n")
+        section = 0
+        while written < target_bytes:
+            section += 1
+            title = f"Section {section}: {rng.choice(WORDS)} {rng.choice(WORDS)}"
+            body = [paragraph(rng, rng.randint(20, 80)) for _ in range(rng.randint(1, 4))]
+            if ext == ".md":
+                block = f"## {title}\n\n" + "\n\n".join(f"- **{p}**" if i % 2 else p for i, p in enumerate(body)) + "\n\n"
+            elif ext == ".html":
+                block = f"<h2>{title}</h2>\n" + "".join(f"<p>{p}</p>\n" for p in body)
+            else:
+                block = f"{title}\n\n" + "\n\n".join(body) + "\n\n"
+            f.write(block)
+            written += len(block)
+        if ext == ".html":
+            f.write("</body></html>\n")
+
+
+def build_corpus(root: str, total_mb: float, files: int, big_file_mb: float, seed: int = 7) -> int:
+    rng = random.Random(seed)
+    per_file = int((total_mb - big_file_mb) * 1e6 / files)
+    for i in range(files):
+        write_doc(os.path.join(root, f"doc_{i:04d}{('.txt', '.md', '.html')[i % 3]}"), per_file, rng)
+    if big_file_mb:
+        write_doc(os.path.join(root, "big.txt"), int(big_file_mb * 1e6), rng)
+    return sum(os.path.getsize(os.path.join(root, name)) for name in os.listdir(root))
+
+
+def peak_rss_mb() -> float:
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--mb", type=float, default=50)
+    parser.add_argument("--files", type=int, default=200)
+    parser.add_argument("--big-file-mb", type=float, default=20)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        docs = os.path.join(tmp, "docs")
+        os.makedirs(docs)
+        start = time.perf_counter()
+        size = build_corpus(docs, args.mb, args.files, args.big_file_mb)
+        print(f"corpus: {size / 1e6:.1f} MB in {len(os.listdir(docs))} files "
+              f"(generated in {time.perf_counter() - start:.1f}s)")
+
+        index = KnowledgeIndex(os.path.join(tmp, "knowledge.db"))
+        rss_before = peak_rss_mb()
+        cold = ingest(docs, index)
+        rss_growth = peak_rss_mb() - rss_before
+        print(f"cold:     {cold.ingested} files, {cold.chunks} chunks, {cold.seconds:.2f}s, "
+              f"{cold.mb_per_s:.1f} MB/s, peak RSS +{rss_growth:.0f} MB")
+
+        warm = ingest(docs, index)
+        print(f"warm:     {warm.unchanged} unchanged, {warm.ingested} ingested, {warm.seconds * 1000:.1f} ms")
+
+        edited = os.path.join(docs, "doc_0000.txt")
+        with open(edited, "a", encoding="utf-8") as f:
+            f.write("\n\nAppendix\n\nA new paragraph about flaky locator retries.\n")
+        one = ingest(docs, index)
+        print(f"one edit: {one.ingested} ingested, {one.unchanged} unchanged, {one.seconds * 1000:.1f} ms")
+
+        start = time.perf_counter()
+        hits = index.search("flaky locator retries", limit=5)
+        print(f"search:   {(time.perf_counter() - start) * 1000:.1f} ms, top hit {hits[0].source if hits else None}")
+
+
+if __name__ == "__main__":
+    main()
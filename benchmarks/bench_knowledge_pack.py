@@ -0,0 +1,86 @@
+# backend/benchmarks/bench_knowledge_pack.py
+"""
+Benchmark: knowledge pack build, load and search vs. the SQLite index.
+
+    python -m benchmarks.bench_knowledge_pack [--synthetic-mb 0] [--queries 500]
+
+Uses testzeus_docs by default, or a synthetic corpus of the given size
+(benchmarks/bench_ingestion). Also rebuilds the pack while a thread keeps
+searching through the PackHandle, to check the swap is atomic.
+"""
+
+import argparse
+import os
+import random
+import statistics
+import tempfile
+import threading
+import time
+
+from benchmarks.bench_ingestion import WORDS, build_corpus
+from services import knowledge_pack as kp
+from services.ingestion import DEFAULT_DOCS_PATH, KnowledgeIndex, ingest
+
+
+def timed(fn, n: int) -> float:
+    samples = []
+    for _ in range(n):
+        start = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - start)
+    return statistics.median(samples) * 1e6
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--synthetic-mb", type=float, default=0)
+    parser.add_argument("--queries", type=int, default=500)
+    args = parser.parse_args()
+
+    rng = random.Random(3)
+    queries = [" ".join(rng.sample(WORDS, 4)) for _ in range(args.queries)]
+    with tempfile.TemporaryDirectory() as tmp:
+        docs = DEFAULT_DOCS_PATH
+        if args.synthetic_mb:
+            docs = os.path.join(tmp, "docs")
+            os.makedirs(docs)
+            build_corpus(docs, args.synthetic_mb, 50, 0)
+        index = KnowledgeIndex(os.path.join(tmp, "knowledge.db"))
+        ingest(docs, index)
+        pack_path = os.path.join(tmp, "knowledge.pack")
+
+        start = time.perf_counter()
+        meta = kp.build_pack(pack_path, index)
+        print(f"build: {time.perf_counter() - start:.2f}s, {os.path.getsize(pack_path) / 1e6:.2f} MB, "
+              f"{meta['chunks']} chunks, {meta['terms']} terms, {meta['postings']} postings")
+        print(f"load:  {timed(lambda: kp.KnowledgePack(pack_path), 20):.0f} µs")
+
+        pack = kp.KnowledgePack(pack_path)
+        it = iter(queries * 1000)
+        print(f"search (median µs): pack {timed(lambda: pack.search(next(it), 5), len(queries)):.0f}, "
+              f"sqlite {timed(lambda: index.search(next(it), 5), len(queries)):.0f}")
+
+        handle = kp.PackHandle(pack_path)
+        errors, searches, stop = [], [0], threading.Event()
+
+        def reader() -> None:
+            while not stop.is_set():
+                try:
+                    handle._checked = 0.0
+                    handle.get().search(next(it), 5)
+                    searches[0] += 1
+                except Exception as e:
+                    errors.append(e)
+
+        thread = threading.Thread(target=reader)
+        thread.start()
+        versions = set()
+        for _ in range(5):
+            versions.add(kp.build_pack(pack_path, index)["built_at"])
+        stop.set()
+        thread.join()
+        print(f"swap:  {len(versions)} rebuilds during {searches[0]} searches, {len(errors)} errors")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,91 @@
+# backend/benchmarks/bench_model_router.py
+"""
+Benchmark: model cascade vs. sending every classification to the large model.
+
+    python -m benchmarks.bench_model_router [--emails 200] [--large-ms 900] [--small-ms 200]
+                                            [--unsure-rate 0.1]
+
+Runs the signup email checks (business email, competitor) for a mix of
+addresses against benchmarks/fake_openai, whose latency depends on the
+model. "large only" sends every question to OPENAI_MODEL. "cascade" is
+services/model_router as the validators use it: local rules first, then the
+small model, then the large one when the small model answers UNSURE.
+"""
+
+import argparse
+import os
+import random
+import statistics
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from benchmarks import fake_openai
+
+DOMAINS = [
+    "tricentis.com", "eu.katalon.com", "qodo.ai", "katalon-fans.io", "mablworks.dev",
+    "acme.io", "northwind.co.uk", "globex.de", "initech.ai", "umbrella.co",
+    "tempinbox.net", "trashmail.org", "x9z.xyz", "mail-4-u.info", "startup.app",
+]
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--emails", type=int, default=200)
+    parser.add_argument("--large-ms", type=float, default=900)
+    parser.add_argument("--small-ms", type=float, default=200)
+    parser.add_argument("--unsure-rate", type=float, default=0.1)
+    parser.add_argument("--concurrency", type=int, default=16)
+    args = parser.parse_args()
+
+    os.environ.setdefault("OPENAI_MODEL", "gpt-5")
+    os.environ.setdefault("MODEL_ROUTER_SMALL_MODEL", "gpt-5-nano")
+    server, _ = fake_openai.start(latency_ms=args.large_ms, jitter_ms=args.large_ms / 5, unsure_rate=args.unsure_rate,
+                                  model_latency_ms={"gpt-5-nano": args.small_ms, "gpt-5-mini": args.small_ms * 1.5})
+    os.environ["OPENAI_BASE_URL"] = f"http://127.0.0.1:{server.server_port}/v1"
+    os.environ.setdefault("OPENAI_API_KEY", "sk-fake")
+
+    from services.email_validator import email_validator
+    from services.model_router import ModelRouter
+    from tools.validation import COMPETITOR_PROMPT, COMPETITOR_ROWS, local_competitor_check
+
+    rng = random.Random(5)
+    emails = [f"user{i}@{rng.choice(DOMAINS)}" for i in range(args.emails)]
+
+    def questions(email: str):
+        domain = email.split("@")[1]
+        yield ("email_validator", f"Is '{email}' a valid business/work email address?",
+               lambda: email_validator.local_validate_email(email))
+        yield ("competitor_check", COMPETITOR_PROMPT.format(rows=COMPETITOR_ROWS, email=email),
+               lambda: local_competitor_check(domain))
+
+    large_only = ModelRouter(routes={"email_validator": "", "competitor_check": ""})
+    cascade = ModelRouter()
+
+    def run(router: ModelRouter, use_local: bool):
+        def one(email: str):
+            answers, latencies = [], []
+            for route, question, local in questions(email):
+                start = time.perf_counter()
+                answers.append(router.classify(route, question, local if use_local else None).answer)
+                latencies.append(time.perf_counter() - start)
+            return answers, latencies
+
+        start = time.perf_counter()
+        with ThreadPoolExecutor(args.concurrency) as pool:
+            results = list(pool.map(one, emails))
+        return results, time.perf_counter() - start
+
+    for name, router, use_local in (("large only", large_only, False), ("cascade", cascade, True)):
+        results, wall = run(router, use_local)
+        latencies = sorted(t for _, ts in results for t in ts)
+        print(f"{name}: {len(latencies)} checks in {wall:.1f}s, p50 {statistics.median(latencies) * 1000:.0f} ms, "
+              f"p99 {latencies[int(len(latencies) * 0.99)] * 1000:.0f} ms")
+        for route, stats in router.stats().items():
+            print(f"  {route:17s} local {stats['local']:4d}  small {stats['small']:4d}  large {stats['large']:4d}  "
+                  f"escalated {stats['escalations']:3d}  spent ${stats['cost_usd']:.4f}  "
+                  f"saved {stats['latency_saved_seconds']:.1f}s / ${stats['cost_saved_usd']:.4f}")
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
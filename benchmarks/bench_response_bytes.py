@@ -0,0 +1,83 @@
+# backend/benchmarks/bench_response_bytes.py
+"""
+Benchmark: /v1/chat body size and render cost, markdown vs. "format": "json".
+
+    python -m benchmarks.bench_response_bytes [--repeat N]
+
+Bodies are serialized the way the endpoint sends them (compact JSON, UTF-8),
+for one representative payload of each tool response kind.
+"""
+
+import argparse
+import json
+import time
+
+from services import responses
+
+SAMPLES = [
+    responses.payload("email_valid", email="jane.doe@acme.com"),
+    responses.payload(
+        "account_created",
+        account_id="ACC_0042",
+        admin_email="jane.doe@acme.com",
+        plan="PRO",
+        teammates=["sam@acme.com", "lee@acme.com"],
+        team_size=3,
+        status="active",
+        created_at="2026-10-19T09:30:00",
+    ),
+    responses.payload(
+        "screenshot_captured",
+        url="https://www.acme.com",
+        domain="www.acme.com",
+        company="Acme",
+        filename="acme_20261019_093000.png",
+        path="screenshots/acme_20261019_093000.png",
+    ),
+    responses.payload(
+        "gherkin_generated",
+        prompt_type="login",
+        tokens_used=1830,
+        response_time=7.412,
+        gherkin="Feature: Login\n  Scenario: Valid credentials\n    Given I am on the login page\n"
+                "    When I enter a valid email and password\n    Then I see the dashboard",
+    ),
+    responses.payload(
+        "ocr_extracted",
+        tokens_used=912,
+        image_size="1920x1080",
+        text="Sign in\nEmail\nPassword\nForgot password?\nCreate account",
+    ),
+    responses.canned("product_overview"),
+]
+
+
+def body_bytes(fmt: str, payload: dict) -> int:
+    body = responses.reply(payload, fmt, session_id="s-123", placeholder="Ask me anything")
+    return len(json.dumps(body, ensure_ascii=False, separators=(",", ":")).encode("utf-8"))
+
+
+def render_us(payload: dict, repeat: int) -> float:
+    start = time.perf_counter()
+    for _ in range(repeat):
+        responses.render(payload)
+    return (time.perf_counter() - start) / repeat * 1e6
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--repeat", type=int, default=20000)
+    args = parser.parse_args()
+
+    print(f"{'kind':<20} {'markdown B':>10} {'json B':>8} {'saved':>7} {'render us':>10}")
+    total_md = total_json = 0
+    for payload in SAMPLES:
+        md, js = body_bytes("markdown", payload), body_bytes("json", payload)
+        total_md += md
+        total_json += js
+        print(f"{payload['kind']:<20} {md:>10} {js:>8} {1 - js / md:>6.0%} {render_us(payload, args.repeat):>10.2f}")
+    print(f"{'total':<20} {total_md:>10} {total_json:>8} {1 - total_json / total_md:>6.0%}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,51 @@
+# backend/benchmarks/bench_scaling.py
+"""
+Benchmark: throughput vs. number of workers (python -m utils.serve --workers N).
+
+    python -m benchmarks.bench_scaling [--workers 1,2,4,8] [--users-per-worker 16]
+                                       [--passes-per-worker 4] [--openai-latency-ms 20]
+
+Runs benchmarks/loadtest.py once per worker count. Load grows with the
+pool (users and passes per worker), and the fake OpenAI latency is kept low
+so the app's own CPU time is the bottleneck. Efficiency is throughput over
+N times the single-worker throughput; near 1.0 means linear scaling.
+Scaling can only be near-linear up to the number of free CPU cores.
+"""
+
+import argparse
+import os
+
+from benchmarks import fake_openai
+from benchmarks.loadtest import DEFAULT_SESSIONS, load_sessions, run_loadtest
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--workers", default="1,2,4,8")
+    parser.add_argument("--users-per-worker", type=int, default=16)
+    parser.add_argument("--passes-per-worker", type=int, default=4)
+    parser.add_argument("--openai-latency-ms", type=float, default=20)
+    parser.add_argument("--sessions", default=DEFAULT_SESSIONS)
+    args = parser.parse_args()
+
+    sessions = load_sessions(args.sessions)
+    tool_rules = fake_openai.load_tool_rules(fake_openai.DEFAULT_TOOL_SCRIPT)
+    counts = [int(w) for w in args.workers.split(",")]
+    print(f"cpu cores: {os.cpu_count()}")
+    print(f"{'workers':>7} {'req/s':>8} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'errors':>6} {'efficiency':>10}")
+    single = None
+    for workers in counts:
+        report = run_loadtest(
+            sessions, workers=workers, concurrency=args.users_per_worker * workers,
+            passes=args.passes_per_worker * workers, openai_latency_ms=args.openai_latency_ms,
+            openai_jitter_ms=args.openai_latency_ms / 4, tool_rules=tool_rules,
+        )
+        rps = report["throughput_rps"]
+        if single is None:
+            single = rps / workers
+        print(f"{workers:>7} {rps:>8.1f} {report['p50_ms']:>8.1f} {report['p95_ms']:>8.1f} "
+              f"{report['p99_ms']:>8.1f} {report['errors']:>6} {rps / (single * workers):>10.2f}")
+
+
+if __name__ == "__main__":
+    main()
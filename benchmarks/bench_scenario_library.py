@@ -0,0 +1,95 @@
+# backend/benchmarks/bench_scenario_library.py
+"""
+Benchmark: scenario library lookup speed, reuse rate and tokens saved.
+
+    python -m benchmarks.bench_scenario_library [--pages 2000] [--sites 300]
+
+Simulates Gherkin generations for login, checkout and dashboard pages across
+many sites. Each page shows most of its type's UI labels plus a few of its
+own; its OCR text goes to note_screenshot(). A stand-in vision model
+"writes" one scenario per label it sees and, when seeded, reuses the seed
+scenarios whose labels are on the page and writes only the rest. Tokens
+are counted as prompt (text / 4, plus a fixed image cost) + output.
+"""
+
+import argparse
+import os
+import random
+import statistics
+import tempfile
+import time
+
+from services import gherkin
+from services.scenario_library import ScenarioLibrary
+
+IMAGE_TOKENS = 1100
+# A prompt_map prompt is a page of instructions and examples
+BASE_PROMPT_TOKENS = 900
+
+LABELS = {
+    "login": "email password remember forgot signin signup sso google microsoft captcha username reset".split(),
+    "ecommerce": "cart checkout coupon shipping billing quantity subtotal wishlist payment address promo total".split(),
+    "dashboard": "filter chart export widget daterange refresh report metrics sidebar notifications search".split(),
+}
+
+
+def scenario_for(label: str) -> str:
+    return (f"Scenario: Use the {label} control\n  Given I am on the page\n"
+            f"  When I use the \"{label}\" control\n  Then the \"{label}\" control responds")
+
+
+def fake_generation(labels, seeds):
+    """(reply text, tokens used) for a page showing labels"""
+    if seeds:
+        reuse = [i for i, seed in enumerate(seeds, 1) if any(f'"{l}"' in seed.text for l in labels)]
+        covered = {l for i in reuse for l in labels if f'"{l}"' in seeds[i - 1].text}
+        new = [l for l in labels if l not in covered]
+        prompt_tokens = sum(len(s.text) for s in seeds) // 4 + 120
+        reply = f"REUSE: {', '.join(map(str, reuse)) or 'none'}\nFeature: Page\n" + "\n".join(map(scenario_for, new))
+    else:
+        prompt_tokens = BASE_PROMPT_TOKENS
+        reply = "Feature: Page\n" + "\n".join(map(scenario_for, labels))
+    output_tokens = len(reply) // 4
+    return reply, IMAGE_TOKENS + prompt_tokens + output_tokens
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--pages", type=int, default=2000)
+    parser.add_argument("--sites", type=int, default=300)
+    args = parser.parse_args()
+
+    rng = random.Random(4)
+    with tempfile.TemporaryDirectory() as tmp:
+        library = ScenarioLibrary(os.path.join(tmp, "library.db"))
+        lookups, tokens = [], {"seeded": [], "unseeded": []}
+        for i in range(args.pages):
+            prompt_type = rng.choice(list(LABELS))
+            domain = f"site{rng.randrange(args.sites)}.com"
+            labels = rng.sample(LABELS[prompt_type], 7) + [f"custom{rng.randrange(50)}"]
+            path = f"/shots/{i}.png"
+            library.note_screenshot(path, domain=domain)
+            library.note_screenshot(path, ocr_text=" ".join(label.title() for label in labels))
+
+            page = library.page(path)
+            start = time.perf_counter()
+            seeds = library.seeds(prompt_type, page)
+            lookups.append(time.perf_counter() - start)
+
+            reply, used = fake_generation(labels, seeds)
+            text, reused = library.merge(reply, seeds) if seeds else (reply, 0)
+            library.add(prompt_type, page, gherkin.parse(text), used, bool(seeds), reused)
+            tokens["seeded" if seeds else "unseeded"].append(used)
+
+        stats = library.metrics()
+        print(f"library: {stats['pages']} pages, {stats['scenarios']} scenarios")
+        print(f"lookup: p50 {statistics.median(lookups) * 1000:.2f} ms, max {max(lookups) * 1000:.1f} ms")
+        print(f"reuse rate {stats['reuse_rate']:.0%}, {stats['scenarios_reused']} scenarios reused")
+        for kind, values in tokens.items():
+            if values:
+                print(f"{kind:9s} generations: {len(values):5d}, mean {statistics.mean(values):.0f} tokens")
+        print(f"tokens saved: {stats['tokens_saved']}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,101 @@
+# backend/benchmarks/bench_screenshots.py
+"""
+Benchmark: screenshot variant sizes, transcode time and serving.
+
+    python -m benchmarks.bench_screenshots [--shots 10] [--height 4000] [--requests 200]
+
+Draws full-page-like PNGs (text blocks, buttons, a few photos), registers
+them with a ScreenshotStore in a temp directory, waits for the background
+transcodes and reports bytes per tier/format against the PNG. Then serves
+them through /v1/screenshots/{id} with an in-process client: full bodies,
+If-None-Match revalidations (304, no body) and small Range requests.
+"""
+
+import argparse
+import os
+import random
+import statistics
+import tempfile
+import time
+
+from PIL import Image, ImageDraw
+
+
+def draw_page(rng: random.Random, width: int, height: int) -> Image.Image:
+    image = Image.new("RGB", (width, height), "white")
+    draw = ImageDraw.Draw(image)
+    y = 0
+    while y < height:
+        kind = rng.random()
+        if kind < 0.6:  # paragraph
+            for line in range(rng.randrange(2, 8)):
+                draw.text((40, y + line * 18), " ".join("lorem" for _ in range(rng.randrange(8, 20))), fill=(40, 40, 40))
+            y += 160
+        elif kind < 0.85:  # buttons
+            for x in range(40, width - 200, 220):
+                color = tuple(rng.randrange(256) for _ in range(3))
+                draw.rounded_rectangle((x, y, x + 180, y + 44), radius=8, fill=color)
+                draw.text((x + 20, y + 14), "Continue", fill="white")
+            y += 80
+        else:  # photo: noise compresses badly, like real images do
+            photo = Image.effect_noise((rng.randrange(300, 600), 240), 60).convert("RGB")
+            image.paste(photo, (40, y))
+            y += 260
+    return image
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--shots", type=int, default=10)
+    parser.add_argument("--height", type=int, default=4000)
+    parser.add_argument("--requests", type=int, default=200)
+    args = parser.parse_args()
+
+    rng = random.Random(3)
+    with tempfile.TemporaryDirectory() as tmp:
+        os.environ["SCREENSHOT_STORE_PATH"] = os.path.join(tmp, "store")
+        os.environ["SCREENSHOT_INDEX_PATH"] = os.path.join(tmp, "screenshots.db")
+        os.environ["SCREENSHOT_KEEP_ORIGINAL_HOURS"] = "-1"
+        from fastapi.testclient import TestClient
+
+        from main import app
+        from services.screenshot_store import screenshot_store
+
+        ids = []
+        for i in range(args.shots):
+            path = os.path.join(tmp, f"shot{i}.png")
+            draw_page(rng, 1280, args.height).save(path)
+            ids.append(screenshot_store.register(path))
+        start = time.perf_counter()
+        while screenshot_store.metrics()["by_status"].get("ready", 0) < args.shots:
+            time.sleep(0.05)
+        elapsed = time.perf_counter() - start
+
+        stats = screenshot_store.metrics()
+        png = stats["bytes_captured"]
+        print(f"{args.shots} screenshots, 1280x{args.height}: {png / args.shots / 1024:.0f} KiB PNG each, "
+              f"transcoded in {elapsed / args.shots:.2f} s each ({', '.join(stats['formats'])})")
+        for name, size in sorted(stats["bytes_stored"].items()):
+            if name != "original":
+                print(f"  {name:11s} {size / args.shots / 1024:7.1f} KiB  {size / png:6.1%} of PNG")
+
+        client = TestClient(app)
+        accept = {"accept": "image/avif,image/webp,*/*"}
+        timings = {"200": [], "304": [], "206": []}
+        for n in range(args.requests):
+            url = f"/v1/screenshots/{ids[n % len(ids)]}"
+            t = time.perf_counter()
+            response = client.get(url, headers=accept)
+            timings["200"].append(time.perf_counter() - t)
+            t = time.perf_counter()
+            assert client.get(url, headers={**accept, "if-none-match": response.headers["etag"]}).status_code == 304
+            timings["304"].append(time.perf_counter() - t)
+            t = time.perf_counter()
+            assert client.get(url, headers={**accept, "range": "bytes=0-65535"}).status_code == 206
+            timings["206"].append(time.perf_counter() - t)
+        for status, values in timings.items():
+            print(f"GET {status}: p50 {statistics.median(values) * 1000:.2f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,85 @@
+# backend/benchmarks/bench_speculation.py
+"""
+Benchmark: speculative knowledge retrieval vs. retrieving after the tool call.
+
+    python -m benchmarks.bench_speculation [--llm-ms 900] [--rounds 20]
+
+Replays pairs of (user message, query the model passed to
+testzeus_knowledge) through services/speculation with the real retrieval
+path (rag_service + context assembler). The first completion is simulated
+with a sleep. "serial" waits for it, then retrieves; "speculative" starts
+retrieval with the message and reuses it when the query matches.
+"""
+
+import argparse
+import asyncio
+import statistics
+import time
+
+from services import speculation
+from services.knowledge_pack import knowledge_pack
+
+# (message, model's tool query); None: the model answered without the tool
+TURNS = [
+    ("How much does TestZeus cost for a team of 5?", "TestZeus pricing for 5 users"),
+    ("what are the pricing plans", "pricing plans"),
+    ("How does TestZeus create test cases?", "how TestZeus creates test cases"),
+    ("Can I test Salesforce apps with you?", "Salesforce testing support"),
+    ("What are the benefits of using TestZeus over Selenium?", "benefits of TestZeus vs Selenium"),
+    ("how do I get started, is there onboarding help", "onboarding getting started"),
+    ("Do you support running tests in parallel across browsers?", "parallel cross-browser test runs"),
+    ("tell me about pricing and also how the agents write tests", "enterprise plan pricing"),
+    ("Is there a free plan?", "free open source plan pricing"),
+    ("What does TestZeus do?", None),
+]
+
+
+def retrieve(text: str) -> str:
+    from routers.chatbot import tool_testzeus_knowledge
+    return tool_testzeus_knowledge(text)
+
+
+async def turn(message: str, query, llm_seconds: float, speculative: bool) -> float:
+    start = time.perf_counter()
+    spec = speculation.speculate(message, True, retrieve) if speculative else None
+    await asyncio.sleep(llm_seconds)  # first completion
+    if query is None:
+        if spec:
+            spec.discard()
+        return time.perf_counter() - start
+    result = await spec.result_for(query) if spec else None
+    if result is None:
+        retrieve(query)
+    return time.perf_counter() - start
+
+
+async def run(args) -> None:
+    knowledge_pack.ensure_current()
+    for _, query in TURNS:
+        retrieve(query or "warm up")
+    samples = {"serial": [], "speculative": []}
+    for _ in range(args.rounds):
+        for message, query in TURNS:
+            for mode in samples:
+                samples[mode].append(await turn(message, query, args.llm_ms / 1000, mode == "speculative"))
+    await asyncio.sleep(0.1)  # let discarded speculations finish
+
+    for mode, values in samples.items():
+        print(f"{mode:12s} p50 {statistics.median(values) * 1000:7.1f} ms  mean {statistics.mean(values) * 1000:7.1f} ms")
+    counts = {s[1]["outcome"]: s[2] for s in speculation.SPECULATIONS.samples()}
+    total = sum(counts.values()) or 1
+    saved = next(iter(speculation.SAVED_SECONDS.samples()))[2]
+    wasted = next(iter(speculation.WASTED_SECONDS.samples()))[2]
+    print(f"outcomes: {counts}, hit rate {counts.get('hit', 0) / total:.0%}")
+    print(f"retrieval saved {saved * 1000:.0f} ms, wasted {wasted * 1000:.0f} ms over {total} speculations")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--llm-ms", type=float, default=900)
+    parser.add_argument("--rounds", type=int, default=20)
+    asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
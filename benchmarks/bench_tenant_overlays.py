@@ -0,0 +1,86 @@
+# backend/benchmarks/bench_tenant_overlays.py
+"""
+Benchmark: per-tenant knowledge overlays under a memory cap.
+
+    python -m benchmarks.bench_tenant_overlays [--tenants 200] [--kb 40] [--cap-mb 2] [--queries 2000]
+
+Gives each tenant a small synthetic corpus (benchmarks/bench_ingestion) in a
+temp TENANT_KNOWLEDGE_ROOT, then queries random tenants with a skewed
+(Zipf-like) popularity through services/tenant_knowledge:
+
+- first query: ingest, build and map the tenant's pack;
+- reload: the pack exists but was evicted, so it is only re-mapped;
+- hit: the overlay is already mapped;
+- merged search: base pack plus overlay, as rag_service does.
+
+The mapped bytes never exceed the cap, however many tenants there are.
+"""
+
+import argparse
+import os
+import random
+import statistics
+import tempfile
+import time
+
+from benchmarks.bench_ingestion import WORDS, build_corpus
+from services.tenant_knowledge import TenantOverlays
+
+
+def ms(samples) -> str:
+    if not samples:
+        return "-"
+    samples = sorted(samples)
+    return f"p50 {statistics.median(samples) * 1000:.2f} ms, p99 {samples[int(len(samples) * 0.99)] * 1000:.2f} ms"
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--tenants", type=int, default=200)
+    parser.add_argument("--kb", type=float, default=40, help="docs per tenant")
+    parser.add_argument("--cap-mb", type=float, default=2)
+    parser.add_argument("--queries", type=int, default=2000)
+    args = parser.parse_args()
+
+    rng = random.Random(11)
+    with tempfile.TemporaryDirectory() as root:
+        tenants = [f"tenant-{i:05d}" for i in range(args.tenants)]
+        start = time.perf_counter()
+        for i, tenant in enumerate(tenants):
+            docs = os.path.join(root, tenant, "docs")
+            os.makedirs(docs)
+            build_corpus(docs, args.kb / 1000, 3, 0, seed=i)
+        print(f"corpus: {args.tenants} tenants x {args.kb:.0f} KB (generated in {time.perf_counter() - start:.1f}s)")
+
+        overlays = TenantOverlays(root, memory_cap_mb=args.cap_mb)
+        weights = [1 / (rank + 1) for rank in range(len(tenants))]
+        timings = {"first": [], "reload": [], "hit": []}
+        searches, seen, peak = [], set(), 0
+        for _ in range(args.queries):
+            tenant = rng.choices(tenants, weights)[0]
+            before = overlays.stats["loads"]
+            start = time.perf_counter()
+            overlays.get(tenant)
+            elapsed = time.perf_counter() - start
+            if overlays.stats["loads"] == before:
+                timings["hit"].append(elapsed)
+            else:
+                timings["reload" if tenant in seen else "first"].append(elapsed)
+            seen.add(tenant)
+
+            query = " ".join(rng.sample(WORDS, 3))
+            start = time.perf_counter()
+            overlays.search(tenant, query, 5)
+            searches.append(time.perf_counter() - start)
+            peak = max(peak, overlays.metrics()["mapped_bytes"])
+
+        stats = overlays.metrics()
+        for kind, samples in timings.items():
+            print(f"{kind + ':':8s}{len(samples):6d} lookups, {ms(samples)}")
+        print(f"search: {ms(searches)} (base + overlay, merged)")
+        print(f"memory: peak {peak / 1e6:.2f} MB mapped, cap {stats['memory_cap_bytes'] / 1e6:.2f} MB, "
+              f"{stats['loaded']} loaded, {stats['evictions']} evictions")
+
+
+if __name__ == "__main__":
+    main()
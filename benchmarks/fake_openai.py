@@ -0,0 +1,239 @@
+# backend/benchmarks/fake_openai.py
+"""
+Local stand-in for the OpenAI API, for load tests and offline development.
+
+    python -m benchmarks.fake_openai [--port 8790] [--latency-ms 400] [--jitter-ms 150]
+                                     [--model-latency-ms '{"gpt-5-nano": 150}']
+                                     [--unsure-rate 0.1]
+                                     [--tool-script FILE]
+                                     [--rate-limit-every N]
+
+Serves POST /v1/chat/completions and POST /v1/responses. Replies are
+plain text unless the last user message matches a rule in the tool script,
+in which case the model "calls" that tool. A reply that follows a tool
+result is plain text, so tool round trips behave like the real API.
+Requests with "stream": true get server-sent event chunks.
+--rate-limit-every N answers every Nth request with 429 + Retry-After.
+--model-latency-ms overrides the latency per model; --unsure-rate is the
+share of YES/NO/UNSURE classifications answered UNSURE.
+
+Set OPENAI_BASE_URL=http://127.0.0.1:<port>/v1 for the app under test.
+"""
+
+import argparse
+import itertools
+import json
+import os
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, List, Optional
+
+DEFAULT_TOOL_SCRIPT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "tool_scripts.json")
+
+
+class FakeOpenAI:
+    def __init__(self, latency_ms: float = 400, jitter_ms: float = 150, tool_rules: Optional[List[dict]] = None,
+                 rate_limit_every: int = 0, seed: int = 0, model_latency_ms: Optional[Dict[str, float]] = None,
+                 unsure_rate: float = 0.0):
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.model_latency_ms = model_latency_ms or {}
+        self.unsure_rate = unsure_rate
+        self.tool_rules = tool_rules or []
+        self.rate_limit_every = rate_limit_every
+        self._rng = random.Random(seed)
+        self._counter = itertools.count(1)
+        self._lock = threading.Lock()
+        self.stats = {"requests": 0, "tool_calls": 0, "rate_limited": 0, "streamed": 0}
+
+    def delay(self, model: str = "") -> float:
+        with self._lock:
+            jitter = self._rng.uniform(-self.jitter_ms, self.jitter_ms)
+        return max(0.0, self.model_latency_ms.get(model, self.latency_ms) + jitter) / 1000.0
+
+    def unsure(self) -> bool:
+        with self._lock:
+            return self._rng.random() < self.unsure_rate
+
+    def next_request(self) -> int:
+        with self._lock:
+            self.stats["requests"] += 1
+            return next(self._counter)
+
+    def tool_call_for(self, messages: List[dict]) -> Optional[dict]:
+        if not messages or messages[-1].get("role") != "user":
+            return None  # after a tool result the model answers in text
+        text = messages[-1].get("content") or ""
+        text = text.lower() if isinstance(text, str) else ""
+        for rule in self.tool_rules:
+            if rule["match"].lower() in text:
+                return rule
+        return None
+
+
+def _usage(prompt_chars: int, completion: str) -> Dict[str, int]:
+    prompt_tokens = max(1, prompt_chars // 4)
+    completion_tokens = max(1, len(completion) // 4)
+    return {"prompt_tokens": prompt_tokens, "completion_tokens": completion_tokens,
+            "total_tokens": prompt_tokens + completion_tokens}
+
+
+def _prompt_chars(body: dict) -> int:
+    chars = 0
+    for message in body.get("messages") or []:
+        content = message.get("content")
+        if isinstance(content, str):
+            chars += len(content)
+    if isinstance(body.get("input"), str):
+        chars += len(body["input"])
+    return chars
+
+
+def _reply_text(body: dict, fake: FakeOpenAI) -> str:
+    messages = body.get("messages") or []
+    last = messages[-1].get("content") if messages else body.get("input", "")
+    last = last if isinstance(last, str) else ""
+    prompt = " ".join(m.get("content") for m in messages if isinstance(m.get("content"), str)) or last
+    # Validator prompts want YES/NO: addresses are valid and never competitors
+    if "answer only yes, no or unsure" in prompt.lower() and fake.unsure():
+        return "UNSURE"
+    if "answer only yes" in prompt.lower():
+        return "NO" if "competitor" in prompt.lower() else "YES"
+    return ("Happy to help with that. TestZeus lets you describe tests in plain English and runs them "
+            f"across browsers for you. (re: {last[:60]!r})")
+
+
+def make_handler(fake: FakeOpenAI):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def log_message(self, *args: Any) -> None:
+            pass
+
+        def _json(self, status: int, payload: dict, headers: Optional[Dict[str, str]] = None) -> None:
+            data = json.dumps(payload).encode()
+            self.send_response(status)
+            self.send_header("content-type", "application/json")
+            self.send_header("content-length", str(len(data)))
+            for key, value in (headers or {}).items():
+                self.send_header(key, value)
+            self.end_headers()
+            self.wfile.write(data)
+
+        def do_POST(self) -> None:
+            body = json.loads(self.rfile.read(int(self.headers.get("content-length", 0))) or b"{}")
+            n = fake.next_request()
+            if fake.rate_limit_every and n % fake.rate_limit_every == 0:
+                fake.stats["rate_limited"] += 1
+                self._json(429, {"error": {"message": "Rate limit reached", "type": "requests"}}, {"retry-after": "0.2"})
+                return
+            time.sleep(fake.delay(body.get("model", "")))
+            if self.path.rstrip("/").endswith("/chat/completions"):
+                self._chat(body)
+            elif self.path.rstrip("/").endswith("/responses"):
+                self._responses(body)
+            else:
+                self._json(404, {"error": {"message": f"Unknown path {self.path}"}})
+
+        def _chat(self, body: dict) -> None:
+            model = body.get("model", "gpt-5")
+            rule = fake.tool_call_for(body.get("messages") or []) if body.get("tools") else None
+            if rule is not None:
+                fake.stats["tool_calls"] += 1
+                message = {"role": "assistant", "content": None, "tool_calls": [{
+                    "id": f"call_{fake.stats['tool_calls']}",
+                    "type": "function",
+                    "function": {"name": rule["tool"], "arguments": json.dumps(rule.get("arguments", {}))},
+                }]}
+                finish_reason, text = "tool_calls", json.dumps(rule.get("arguments", {}))
+            else:
+                text = _reply_text(body, fake)
+                message, finish_reason = {"role": "assistant", "content": text}, "stop"
+
+            if body.get("stream"):
+                self._stream(model, message, finish_reason)
+                return
+            self._json(200, {
+                "id": "chatcmpl-fake", "object": "chat.completion", "created": int(time.time()), "model": model,
+                "choices": [{"index": 0, "finish_reason": finish_reason, "message": message}],
+                "usage": _usage(_prompt_chars(body), text),
+            })
+
+        def _stream(self, model: str, message: dict, finish_reason: str) -> None:
+            fake.stats["streamed"] += 1
+            self.send_response(200)
+            self.send_header("content-type", "text/event-stream")
+            self.send_header("transfer-encoding", "chunked")
+            self.end_headers()
+
+            def send(payload: str) -> None:
+                data = f"data: {payload}\n\n".encode()
+                self.wfile.write(f"{len(data):x}\r\n".encode() + data + b"\r\n")
+
+            base = {"id": "chatcmpl-fake", "object": "chat.completion.chunk", "created": int(time.time()), "model": model}
+            if message.get("tool_calls"):
+                deltas = [{"role": "assistant", "tool_calls": [{"index": 0, **message["tool_calls"][0]}]}]
+            else:
+                words = message["content"].split(" ")
+                deltas = [{"role": "assistant", "content": ""}] + [{"content": w + " "} for w in words]
+            for delta in deltas:
+                send(json.dumps({**base, "choices": [{"index": 0, "delta": delta, "finish_reason": None}]}))
+            send(json.dumps({**base, "choices": [{"index": 0, "delta": {}, "finish_reason": finish_reason}]}))
+            send("[DONE]")
+            self.wfile.write(b"0\r\n\r\n")
+
+        def _responses(self, body: dict) -> None:
+            text = _reply_text(body, fake)
+            usage = _usage(_prompt_chars(body), text)
+            self._json(200, {
+                "id": "resp-fake", "object": "response", "created_at": int(time.time()), "status": "completed",
+                "model": body.get("model", "gpt-5"),
+                "output": [{"type": "message", "id": "msg-fake", "role": "assistant", "status": "completed",
+                            "content": [{"type": "output_text", "text": text, "annotations": []}]}],
+                "usage": {"input_tokens": usage["prompt_tokens"], "output_tokens": usage["completion_tokens"],
+                          "total_tokens": usage["total_tokens"]},
+            })
+
+    return Handler
+
+
+def load_tool_rules(path: Optional[str]) -> List[dict]:
+    if not path:
+        return []
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def start(port: int = 0, **kwargs: Any):
+    """Start in a background thread; returns (server, fake). port=0 picks a free port."""
+    fake = FakeOpenAI(**kwargs)
+    server = ThreadingHTTPServer(("127.0.0.1", port), make_handler(fake))
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name="fake-openai", daemon=True).start()
+    return server, fake
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--port", type=int, default=8790)
+    parser.add_argument("--latency-ms", type=float, default=400)
+    parser.add_argument("--jitter-ms", type=float, default=150)
+    parser.add_argument("--tool-script", default=DEFAULT_TOOL_SCRIPT)
+    parser.add_argument("--rate-limit-every", type=int, default=0)
+    parser.add_argument("--model-latency-ms", type=json.loads, default={})
+    parser.add_argument("--unsure-rate", type=float, default=0.0)
+    args = parser.parse_args()
+    server, _ = start(args.port, latency_ms=args.latency_ms, jitter_ms=args.jitter_ms,
+                      tool_rules=load_tool_rules(args.tool_script), rate_limit_every=args.rate_limit_every,
+                      model_latency_ms=args.model_latency_ms, unsure_rate=args.unsure_rate)
+    print(f"fake OpenAI listening on http://127.0.0.1:{server.server_port}/v1")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,149 @@
+# backend/benchmarks/fake_pocketbase.py
+"""
+Local stand-in for the PocketBase API used by account_manager.
+
+    python -m benchmarks.fake_pocketbase [--port 8791] [--latency-ms 15]
+
+Supports admin/superuser password auth, record list with `field = 'value'` filters
+and record create, kept in memory. Set POCKETBASE_URL=http://127.0.0.1:<port>
+for the app under test; any admin email/password is accepted.
+"""
+
+import argparse
+import itertools
+import json
+import re
+import threading
+import time
+from datetime import datetime, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, List, Optional
+from urllib.parse import parse_qs, urlparse
+
+_RECORDS_PATH = re.compile(r"^/api/collections/([^/]+)/records/?$")
+_FILTER = re.compile(r"^\s*(\w+)\s*=\s*'((?:[^'\\]|\\.)*)'\s*$")
+
+
+class FakePocketBase:
+    def __init__(self, latency_ms: float = 15):
+        self.latency_ms = latency_ms
+        self.collections: Dict[str, List[dict]] = {}
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+        self.stats = {"auth": 0, "list": 0, "create": 0}
+
+    def list(self, collection: str, filter_expr: str, page: int, per_page: int) -> dict:
+        with self._lock:
+            records = list(self.collections.get(collection, []))
+        match = _FILTER.match(filter_expr or "")
+        if match:
+            field, value = match.group(1), match.group(2).replace("\\'", "'")
+            records = [r for r in records if str(r.get(field, "")) == value]
+        start = (page - 1) * per_page
+        return {
+            "page": page,
+            "perPage": per_page,
+            "totalItems": len(records),
+            "totalPages": (len(records) + per_page - 1) // per_page,
+            "items": records[start:start + per_page],
+        }
+
+    def create(self, collection: str, fields: dict) -> dict:
+        now = datetime.now(timezone.utc).strftime("%Y-%m-%d %H:%M:%S.000Z")
+        with self._lock:
+            record = {
+                "id": f"{next(self._ids):015d}",
+                "collectionId": collection,
+                "collectionName": collection,
+                "created": now,
+                "updated": now,
+                **{k: v for k, v in fields.items() if k not in ("password", "passwordConfirm")},
+            }
+            self.collections.setdefault(collection, []).append(record)
+        return record
+
+
+def make_handler(fake: FakePocketBase):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def log_message(self, *args: Any) -> None:
+            pass
+
+        def _json(self, status: int, payload: dict) -> None:
+            data = json.dumps(payload).encode()
+            self.send_response(status)
+            self.send_header("content-type", "application/json")
+            self.send_header("content-length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def _body(self) -> dict:
+            length = int(self.headers.get("content-length", 0))
+            return json.loads(self.rfile.read(length) or b"{}") if length else {}
+
+        def do_GET(self) -> None:
+            time.sleep(fake.latency_ms / 1000.0)
+            url = urlparse(self.path)
+            match = _RECORDS_PATH.match(url.path)
+            if url.path == "/api/health":
+                self._json(200, {"code": 200, "message": "API is healthy."})
+            elif match:
+                query = parse_qs(url.query)
+                fake.stats["list"] += 1
+                self._json(200, fake.list(
+                    match.group(1),
+                    query.get("filter", [""])[0],
+                    int(query.get("page", ["1"])[0]),
+                    int(query.get("perPage", ["30"])[0]),
+                ))
+            else:
+                self._json(404, {"code": 404, "message": "The requested resource wasn't found.", "data": {}})
+
+        def do_POST(self) -> None:
+            time.sleep(fake.latency_ms / 1000.0)
+            path = urlparse(self.path).path
+            body = self._body()
+            match = _RECORDS_PATH.match(path)
+            if path.endswith("/auth-with-password"):
+                # /api/admins/... (PocketBase < 0.23) or /api/collections/_superusers/...
+                fake.stats["auth"] += 1
+                admin = {
+                    "id": "admin000000001", "email": body.get("identity", ""), "avatar": 0,
+                    "collectionId": "_superusers", "collectionName": "_superusers",
+                    "created": "2024-01-01 00:00:00.000Z", "updated": "2024-01-01 00:00:00.000Z",
+                }
+                self._json(200, {"token": "fake-admin-token", "admin": admin, "record": admin})
+            elif match:
+                fake.stats["create"] += 1
+                self._json(200, fake.create(match.group(1), body))
+            else:
+                self._json(404, {"code": 404, "message": "The requested resource wasn't found.", "data": {}})
+
+    return Handler
+
+
+def start(port: int = 0, latency_ms: float = 15):
+    """Start in a background thread; returns (server, fake). port=0 picks a free port."""
+    fake = FakePocketBase(latency_ms)
+    server = ThreadingHTTPServer(("127.0.0.1", port), make_handler(fake))
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name="fake-pocketbase", daemon=True).start()
+    return server, fake
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--port", type=int, default=8791)
+    parser.add_argument("--latency-ms", type=float, default=15)
+    args = parser.parse_args()
+    server, _ = start(args.port, args.latency_ms)
+    print(f"fake PocketBase listening on http://127.0.0.1:{server.server_port}")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,307 @@
+# backend/benchmarks/loadtest.py
+"""
+Load test: replay recorded chat sessions against the app, fully offline.
+
+    python -m benchmarks.loadtest [--concurrency 8] [--passes 3] [--workers 1]
+                                  [--openai-latency-ms 400] [--pocketbase-latency-ms 15]
+                                  [--baseline benchmarks/baseline.json] [--save-baseline]
+                                  [--max-regression 0.15] [--json-out FILE]
+
+Starts the fake OpenAI and PocketBase servers (benchmarks/fake_openai.py,
+benchmarks/fake_pocketbase.py), launches the app with the production launcher
+(utils/serve.py) pointed at them, and replays benchmarks/data/sessions.jsonl with N concurrent virtual
+users; each user plays a session's turns in order.
+
+Reports throughput, p50/p95/p99 latency, error rate, and CPU and RSS per
+server process. With --baseline it compares p95, p99 and throughput with
+the saved run and exits 1 when any regresses by more than --max-regression
+(or when requests fail), so it can gate CI. Baselines are machine-specific:
+record one with --save-baseline on the machine that runs the gate.
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import signal
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Any, Dict, List, Optional
+
+import httpx
+
+from benchmarks import fake_openai, fake_pocketbase
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+BACKEND_DIR = os.path.dirname(BENCH_DIR)
+DEFAULT_SESSIONS = os.path.join(BENCH_DIR, "data", "sessions.jsonl")
+DEFAULT_BASELINE = os.path.join(BENCH_DIR, "baseline.json")
+CLK_TCK = os.sysconf("SC_CLK_TCK") if hasattr(os, "sysconf") else 100
+
+
+def load_sessions(path: str) -> List[dict]:
+    with open(path, "r", encoding="utf-8") as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def percentile(sorted_values: List[float], pct: float) -> float:
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, max(0, round(pct / 100 * len(sorted_values) + 0.5) - 1))
+    return sorted_values[index]
+
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+# --- per-process resource usage (Linux /proc; None elsewhere) ---
+
+def _descendants(pid: int) -> List[int]:
+    children: Dict[int, List[int]] = {}
+    try:
+        for entry in os.listdir("/proc"):
+            if entry.isdigit():
+                try:
+                    with open(f"/proc/{entry}/stat") as f:
+                        ppid = int(f.read().rsplit(")", 1)[1].split()[1])
+                except (OSError, IndexError, ValueError):
+                    continue
+                children.setdefault(ppid, []).append(int(entry))
+    except OSError:
+        return [pid]
+    result, stack = [], [pid]
+    while stack:
+        current = stack.pop()
+        result.append(current)
+        stack.extend(children.get(current, []))
+    return result
+
+
+def _proc_usage(pid: int) -> Optional[Dict[str, float]]:
+    try:
+        with open(f"/proc/{pid}/stat") as f:
+            fields = f.read().rsplit(")", 1)[1].split()
+        with open(f"/proc/{pid}/status") as f:
+            rss_kb = next((int(line.split()[1]) for line in f if line.startswith("VmRSS:")), 0)
+        with open(f"/proc/{pid}/cmdline", "rb") as f:
+            cmdline = f.read().replace(b"\0", b" ").decode(errors="replace").strip()
+    except (OSError, IndexError, ValueError):
+        return None
+    return {"cpu_seconds": (int(fields[11]) + int(fields[12])) / CLK_TCK, "rss_mb": rss_kb / 1024, "cmd": cmdline}
+
+
+def snapshot(pid: int) -> Dict[int, Dict[str, float]]:
+    usage = {}
+    for child in _descendants(pid):
+        stats = _proc_usage(child)
+        if stats is not None:
+            usage[child] = stats
+    return usage
+
+
+# --- load generation ---
+
+async def _virtual_user(client: httpx.AsyncClient, queue: "asyncio.Queue[dict]", results: List[dict]) -> None:
+    while True:
+        try:
+            session = queue.get_nowait()
+        except asyncio.QueueEmpty:
+            return
+        for turn in session["turns"]:
+            start = time.perf_counter()
+            try:
+                response = await client.post("/v1/chat", json={"message": turn, "session_id": session["session_id"]})
+                ok = response.status_code == 200
+                status = response.status_code
+            except httpx.HTTPError as e:
+                ok, status = False, type(e).__name__
+            results.append({"latency": time.perf_counter() - start, "ok": ok, "status": status})
+
+
+async def replay(base_url: str, sessions: List[dict], concurrency: int, passes: int) -> Dict[str, Any]:
+    queue: "asyncio.Queue[dict]" = asyncio.Queue()
+    for _ in range(passes):
+        for session in sessions:
+            queue.put_nowait(session)
+    results: List[dict] = []
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    async with httpx.AsyncClient(base_url=base_url, timeout=120, limits=limits) as client:
+        start = time.perf_counter()
+        await asyncio.gather(*(_virtual_user(client, queue, results) for _ in range(concurrency)))
+        elapsed = time.perf_counter() - start
+    latencies = sorted(r["latency"] for r in results)
+    errors = [r for r in results if not r["ok"]]
+    return {
+        "requests": len(results),
+        "errors": len(errors),
+        "error_statuses": sorted({str(r["status"]) for r in errors}),
+        "elapsed_s": round(elapsed, 3),
+        "throughput_rps": round(len(results) / elapsed, 2) if elapsed else 0.0,
+        "p50_ms": round(percentile(latencies, 50) * 1000, 1),
+        "p95_ms": round(percentile(latencies, 95) * 1000, 1),
+        "p99_ms": round(percentile(latencies, 99) * 1000, 1),
+    }
+
+
+# --- server under test ---
+
+def start_server(port: int, workers: int, env: Dict[str, str]) -> subprocess.Popen:
+    cmd = [sys.executable, "-m", "utils.serve", "--host", "127.0.0.1", "--port", str(port),
+           "--workers", str(workers), "--log-level", "warning"]
+    # stderr goes to a file: a pipe nobody drains could fill up and stall the server
+    stderr = tempfile.TemporaryFile()
+    return subprocess.Popen(cmd, cwd=BACKEND_DIR, env=env, stdout=subprocess.DEVNULL, stderr=stderr,
+                            start_new_session=True)
+
+
+def wait_healthy(base_url: str, proc: subprocess.Popen, timeout: float = 60.0) -> None:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if proc.poll() is not None:
+            raise SystemExit("server exited during startup (run `python -m utils.serve` directly to see why)")
+        try:
+            if httpx.get(f"{base_url}/health", timeout=1).status_code == 200:
+                return
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.2)
+    raise SystemExit("server did not become healthy in time")
+
+
+def stop_server(proc: subprocess.Popen) -> None:
+    try:
+        os.killpg(proc.pid, signal.SIGINT)
+        proc.wait(timeout=15)
+    except (ProcessLookupError, subprocess.TimeoutExpired):
+        os.killpg(proc.pid, signal.SIGKILL)
+
+
+# --- regression gate ---
+
+def compare(report: Dict[str, Any], baseline: Dict[str, Any], tolerance: float) -> List[str]:
+    failures = []
+    for key in ("p95_ms", "p99_ms"):
+        if baseline.get(key) and report[key] > baseline[key] * (1 + tolerance):
+            failures.append(f"{key} {report[key]} > baseline {baseline[key]} (+{tolerance:.0%})")
+    if baseline.get("throughput_rps") and report["throughput_rps"] < baseline["throughput_rps"] * (1 - tolerance):
+        failures.append(f"throughput_rps {report['throughput_rps']} < baseline {baseline['throughput_rps']} (-{tolerance:.0%})")
+    if report["errors"]:
+        failures.append(f"{report['errors']} failed requests ({', '.join(report['error_statuses'])})")
+    return failures
+
+
+def run_loadtest(sessions: List[dict], workers: int = 1, concurrency: int = 8, passes: int = 3,
+                 openai_latency_ms: float = 400, openai_jitter_ms: float = 150, openai_rate_limit_every: int = 0,
+                 pocketbase_latency_ms: float = 15, tool_rules: Optional[List[dict]] = None) -> Dict[str, Any]:
+    """Start the fakes and the server, replay the sessions and return the report."""
+    oai_server, oai = fake_openai.start(
+        latency_ms=openai_latency_ms, jitter_ms=openai_jitter_ms,
+        tool_rules=tool_rules, rate_limit_every=openai_rate_limit_every,
+    )
+    pb_server, pb = fake_pocketbase.start(latency_ms=pocketbase_latency_ms)
+
+    port = free_port()
+    base_url = f"http://127.0.0.1:{port}"
+    data_dir = tempfile.mkdtemp(prefix="loadtest-")
+    env = {
+        **os.environ,
+        "OPENAI_API_KEY": "sk-loadtest",
+        "OPENAI_BASE_URL": f"http://127.0.0.1:{oai_server.server_port}/v1",
+        "POCKETBASE_URL": f"http://127.0.0.1:{pb_server.server_port}",
+        "POCKETBASE_ADMIN_EMAIL": "admin@loadtest.local",
+        "POCKETBASE_ADMIN_PASSWORD": "loadtest",
+        "ACCOUNT_STORE_PATH": os.path.join(data_dir, "accounts.db"),
+        "SHARED_STATE_PATH": os.path.join(data_dir, "shared.db"),
+        "LOG_LEVEL": os.getenv("LOG_LEVEL", "WARNING"),
+    }
+    proc = start_server(port, workers, env)
+    try:
+        wait_healthy(base_url, proc)
+        before = snapshot(proc.pid)
+        report = asyncio.run(replay(base_url, sessions, concurrency, passes))
+        after = snapshot(proc.pid)
+    finally:
+        stop_server(proc)
+        oai_server.shutdown()
+        pb_server.shutdown()
+
+    elapsed = report["elapsed_s"] or 1.0
+    report["processes"] = [
+        {
+            "pid": pid,
+            "cmd": stats["cmd"][-60:],
+            "cpu_pct": round((stats["cpu_seconds"] - before.get(pid, {}).get("cpu_seconds", 0.0)) / elapsed * 100, 1),
+            "rss_mb": round(stats["rss_mb"], 1),
+        }
+        for pid, stats in sorted(after.items())
+    ]
+    report["config"] = {
+        "concurrency": concurrency, "passes": passes, "workers": workers, "openai_latency_ms": openai_latency_ms,
+        "openai_jitter_ms": openai_jitter_ms, "pocketbase_latency_ms": pocketbase_latency_ms,
+    }
+    report["fakes"] = {"openai": oai.stats, "pocketbase": pb.stats}
+    return report
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--sessions", default=DEFAULT_SESSIONS)
+    parser.add_argument("--tool-script", default=fake_openai.DEFAULT_TOOL_SCRIPT)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--passes", type=int, default=3, help="times each session is replayed")
+    parser.add_argument("--workers", type=int, default=1)
+    parser.add_argument("--openai-latency-ms", type=float, default=400)
+    parser.add_argument("--openai-jitter-ms", type=float, default=150)
+    parser.add_argument("--openai-rate-limit-every", type=int, default=0)
+    parser.add_argument("--pocketbase-latency-ms", type=float, default=15)
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE)
+    parser.add_argument("--save-baseline", action="store_true")
+    parser.add_argument("--max-regression", type=float, default=0.15)
+    parser.add_argument("--json-out")
+    args = parser.parse_args()
+
+    report = run_loadtest(
+        load_sessions(args.sessions), args.workers, args.concurrency, args.passes,
+        args.openai_latency_ms, args.openai_jitter_ms, args.openai_rate_limit_every,
+        args.pocketbase_latency_ms, fake_openai.load_tool_rules(args.tool_script),
+    )
+
+    print(f"requests      : {report['requests']} ({report['errors']} errors) in {report['elapsed_s']}s")
+    print(f"throughput    : {report['throughput_rps']} req/s")
+    print(f"latency       : p50 {report['p50_ms']} ms | p95 {report['p95_ms']} ms | p99 {report['p99_ms']} ms")
+    for p in report["processes"]:
+        print(f"process {p['pid']:>7}: cpu {p['cpu_pct']:6.1f}% | rss {p['rss_mb']:7.1f} MB | {p['cmd']}")
+    print(f"fake openai   : {report['fakes']['openai']}")
+
+    if args.json_out:
+        with open(args.json_out, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+
+    if args.save_baseline:
+        with open(args.baseline, "w", encoding="utf-8") as f:
+            json.dump({k: report[k] for k in ("throughput_rps", "p50_ms", "p95_ms", "p99_ms", "config")}, f, indent=2)
+        print(f"baseline saved to {args.baseline}")
+        return
+
+    if os.path.exists(args.baseline):
+        with open(args.baseline, "r", encoding="utf-8") as f:
+            baseline = json.load(f)
+        if baseline.get("config") != report["config"]:
+            print("warning: baseline was recorded with a different configuration")
+        failures = compare(report, baseline, args.max_regression)
+        if failures:
+            print("REGRESSION:\n  " + "\n  ".join(failures))
+            raise SystemExit(1)
+        print(f"within {args.max_regression:.0%} of baseline")
+    elif report["errors"]:
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
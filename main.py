@@ -1,18 +1,57 @@
 # backend/main.py
+import asyncio
+from contextlib import asynccontextmanager
+
 from fastapi import FastAPI
+from fastapi.responses import PlainTextResponse
 from fastapi.middleware.cors import CORSMiddleware
 from dotenv import load_dotenv
+from starlette.datastructures import MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
 
 # Load environment variables from .env
 load_dotenv()
+from utils.logger import get_logger, setup_logging
+
+# JSON logs via a background queue listener; set up before the routers import
+setup_logging()
 from routers import chatbot
+from utils.metrics import gauge, histogram, monitor_event_loop, registry
+from utils.tracing import tracer
 import os
+import time
+
+logger = get_logger(__name__)
+
+REQUEST_SECONDS = histogram("http_request_duration_seconds", "Request latency by route", ["method", "route", "status"])
+REQUESTS_IN_FLIGHT = gauge("http_requests_in_flight", "Requests currently being handled")
+
+
+def _log_warm_up_failure(future: asyncio.Future) -> None:
+    # Nobody awaits the warm-up; without this a failure would go unreported
+    if not future.cancelled() and future.exception() is not None:
+        logger.error("Warm-up failed; dependencies will load on first use",
+                     exc_info=future.exception())
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Heavy clients are lazy; warm them in the background so /health answers
+    # immediately and the first chat request doesn't pay for them.
+    # Startup timings: python -m utils.startup
+    if os.getenv("WARMUP_ON_STARTUP", "1") == "1":
+        warm_up = asyncio.get_running_loop().run_in_executor(None, chatbot.warm_up)
+        warm_up.add_done_callback(_log_warm_up_failure)
+    monitor = asyncio.create_task(monitor_event_loop())
+    yield
+    monitor.cancel()
 
 
 app = FastAPI(
     title="TestZeus Onboarding Agent",
     description="AI-powered onboarding with GPT-5 and free-form tool calling",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan,
 )
 
 # CORS - allow frontend
@@ -24,6 +63,48 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+class TraceRequests:
+    """One trace per request; spans opened underneath report into it.
+
+    Plain ASGI rather than @app.middleware("http"): BaseHTTPMiddleware hands
+    its own streaming response the request's receive channel, which then
+    races endpoints that read the body while streaming (/v1/tenants/import).
+    Slow traces: GET /v1/debug/traces
+    """
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        status = 500
+        start = time.perf_counter()
+
+        async def send_with_timing(message: Message) -> None:
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                trace.root.set(status_code=status)
+                MutableHeaders(scope=message).append("Server-Timing", trace.server_timing())
+            await send(message)
+
+        REQUESTS_IN_FLIGHT.inc()
+        try:
+            with tracer.trace(f"{scope['method']} {scope['path']}") as trace:
+                await self.app(scope, receive, send_with_timing)
+        finally:
+            REQUESTS_IN_FLIGHT.dec()
+            # Label by route template, not raw path, to keep cardinality bounded
+            route = scope.get("route")
+            REQUEST_SECONDS.labels(scope["method"], route.path if route else "unmatched", status).observe(
+                time.perf_counter() - start
+            )
+
+
+app.add_middleware(TraceRequests)
+
 # Include chatbot router
 app.include_router(chatbot.router)
 
@@ -31,6 +112,11 @@ app.include_router(chatbot.router)
 def health():
     return {"status": "ok", "model": os.getenv("OPENAI_MODEL", "gpt-5")}
 
+@app.get("/metrics", response_class=PlainTextResponse)
+def metrics():
+    """Prometheus text exposition format"""
+    return PlainTextResponse(registry.render(), media_type="text/plain; version=0.0.4")
+
 # Optional: mount frontend (if using static files)
 # from fastapi.staticfiles import StaticFiles
 # app.mount("/frontend", StaticFiles(directory="frontend"), name="frontend")
\ No newline at end of file
@@ -1,15 +1,18 @@
 # backend/routers/chatbot.py
 from fastapi import APIRouter, Request
-from openai import OpenAI
+import logging
 import os
 import random
-import traceback
 import json
 import asyncio
+import importlib.util
 from datetime import datetime
+from functools import lru_cache
+from types import SimpleNamespace
 from typing import Optional, List, Dict, Tuple
-import openai
 from fastapi import APIRouter, HTTPException
+from fastapi.responses import JSONResponse, StreamingResponse
+from starlette.background import BackgroundTask
 from pydantic import BaseModel
 import sys
 from pathlib import Path
@@ -17,26 +20,45 @@ from pathlib import Path
 # Add the new modules to the path
 sys.path.append(str(Path(__file__).parent.parent.parent))
 
-# Import the new modules
-try:
+from utils.logger import get_logger
+from utils.file_response import file_response
+from utils.tracing import traced, tracer
+
+logger = get_logger(__name__)
+
+# The vision stack (screenshot browser, OCR and Gherkin model classes) is heavy,
+# so at import we only check that it is installed; it is loaded on first use.
+NEW_FEATURES_AVAILABLE = importlib.util.find_spec("modules") is not None
+if not NEW_FEATURES_AVAILABLE:
+    logger.warning("New features not available: no module named 'modules'")
+
+@lru_cache(maxsize=None)
+def vision_stack() -> SimpleNamespace:
     from modules.screenshot import capture_screenshot_sync
     from modules.gpt5_gherkin import GPT5GherkinGenerator
     from modules.ocr_utils import Qwen2VLOCR
     from modules.prompts import (
-        GHERKIN_PROMPT, 
-        LOGIN_GHERKIN_PROMPT, 
+        GHERKIN_PROMPT,
+        LOGIN_GHERKIN_PROMPT,
         DASHBOARD_GHERKIN_PROMPT,
         FORM_GHERKIN_PROMPT,
         ECOMMERCE_GHERKIN_PROMPT
     )
-    NEW_FEATURES_AVAILABLE = True
-except ImportError as e:
-    print(f"Warning: New features not available: {e}")
-    NEW_FEATURES_AVAILABLE = False
+    return SimpleNamespace(
+        capture_screenshot_sync=capture_screenshot_sync,
+        GPT5GherkinGenerator=GPT5GherkinGenerator,
+        Qwen2VLOCR=Qwen2VLOCR,
+        prompt_map={
+            "general": GHERKIN_PROMPT,
+            "login": LOGIN_GHERKIN_PROMPT,
+            "dashboard": DASHBOARD_GHERKIN_PROMPT,
+            "form": FORM_GHERKIN_PROMPT,
+            "ecommerce": ECOMMERCE_GHERKIN_PROMPT
+        },
+    )
 
 # Add URL validation imports
 import re
-import requests
 from urllib.parse import urlparse, urljoin
 
 def validate_and_extract_url_info(url: str, company_name: str) -> Tuple[bool, str, str, str]:
@@ -63,8 +85,11 @@ def validate_and_extract_url_info(url: str, company_name: str) -> Tuple[bool, st
             return False, "", "", "Invalid URL format"
         
         # Check if site exists
+        import requests
         try:
-            response = requests.head(url, timeout=10, allow_redirects=True)
+            with tracer.span("http.head", domain=domain) as span:
+                response = requests.head(url, timeout=10, allow_redirects=True)
+                span.set(status_code=response.status_code)
             if response.status_code >= 400:
                 return False, "", "", f"Site returned error {response.status_code}"
         except requests.RequestException as e:
@@ -82,16 +107,33 @@ def validate_and_extract_url_info(url: str, company_name: str) -> Tuple[bool, st
 
 router = APIRouter(prefix="/v1", tags=["chat"])
 
-# Simple in-memory storage for demo accounts
-DEMO_ACCOUNTS = []
-
-# Initialize OpenAI client with fallback
-api_key = os.getenv("OPENAI_API_KEY")
-if not api_key:
-    print("⚠️ WARNING: OPENAI_API_KEY not set. Chat functionality will be limited.")
-    client = None
-else:
-    client = OpenAI(api_key=api_key)
+# Persistent account storage shared by all workers
+from services.account_store import account_store
+from services.admission import AdmissionRejected, chat_admission, crawl_admission, deadline_from, vision_admission
+from services.context_assembler import context_assembler
+from services.knowledge_pack import knowledge_pack
+from services.idempotency import idempotency_key, provisioning_runner
+from services.llm_gateway import Lane, LLMOverloaded, llm_gateway
+from services.model_router import model_router
+from services.response_cache import response_cache
+from services.scenario_library import scenario_library
+from services.screenshot_store import SIZES as SCREENSHOT_SIZES, screenshot_store
+from services.site_crawler import CAPTURE_WAIT_MS, MAX_PAGES as CRAWL_MAX_PAGES, MAX_PAGES_CAP, SiteCrawler
+from services.speculation import speculate
+from services.tenant_import import run_import, upload_rows, valid_import_id
+from services.tenant_knowledge import tenant_overlays
+from services.tenant_tokens import tenant_tokens
+from services.intent_router import intent_router
+from services import gherkin, responses
+
+def warm_up() -> None:
+    """Initialize lazy dependencies ahead of the first request (run off the event loop)."""
+    if not llm_gateway.available():
+        logger.warning("OPENAI_API_KEY not set; chat functionality will be limited")
+    llm_gateway.warm_up()
+    knowledge_pack.ensure_current()
+    if NEW_FEATURES_AVAILABLE and os.getenv("WARMUP_VISION", "0") == "1":
+        vision_stack()
 
 # --- Dynamic Conversation Starters ---
 CONVERSATION_STARTERS = [
@@ -105,6 +147,20 @@ CONVERSATION_STARTERS = [
     "🌐 Cross-browser testing headaches? I know the feeling"
 ]
 
+# --- Offline replies, selected by the intent router (services/intents.json) ---
+OFFLINE_RESPONSES = {
+    "testing": "I can help with testing challenges! While my AI is offline, here are some quick tips:\n\n• Use TestZeus for automated test creation\n• Implement CI/CD pipelines for faster feedback\n• Focus on test maintenance and flakiness reduction\n\nWhat specific testing issue are you facing?",
+    "email": "I can validate emails! Just send me an email address and I'll check if it's valid.",
+    "account": "Ready to get started with TestZeus? I can help you create an account and set up your team. Just let me know your admin email and plan preference (OSS or Enterprise).",
+    None: "Hey! I'm Hermes, your QA testing buddy. While my AI is offline, I can still help with:\n\n• TestZeus knowledge and features\n• Email validation\n• Account creation and team setup\n\nWhat would you like to know?",
+}
+
+# Placeholders shown with the canned answers (texts live in services/templates/canned)
+CANNED_PLACEHOLDERS = {
+    "precursive_salesforce": "🚀 Ready to automate your Salesforce testing? Let's get started!",
+    "product_overview": "🚀 Ready to see TestZeus in action? Let's dive deeper!",
+}
+
 # --- GPT-5 Tools (Free-Form) ---
 TOOLS = [
     {
@@ -189,6 +245,36 @@ if NEW_FEATURES_AVAILABLE:
                 }
             }
         },
+        {
+            "type": "function",
+            "function": {
+                "name": "crawl_website",
+                "description": "Crawl a website from one start URL, capture its distinct pages and generate Gherkin test cases for each",
+                "parameters": {
+                    "type": "object",
+                    "properties": {
+                        "url": {
+                            "type": "string",
+                            "description": "The URL to start crawling from (usually the home page)"
+                        },
+                        "company_name": {
+                            "type": "string",
+                            "description": "Company name for organizing screenshots"
+                        },
+                        "max_pages": {
+                            "type": "integer",
+                            "description": "Maximum number of distinct pages to process (default: 10)",
+                            "default": 10
+                        },
+                        "company_context": {
+                            "type": "string",
+                            "description": "Additional context about the company or application"
+                        }
+                    },
+                    "required": ["url", "company_name"]
+                }
+            }
+        },
         {
             "type": "function",
             "function": {
@@ -238,33 +324,51 @@ if NEW_FEATURES_AVAILABLE:
         }
     ])
 
+# Tools whose answers depend only on the question (no side effects, no user data).
+# Only these are cached, never free-form model replies.
+CACHEABLE_TOOLS = {"testzeus_knowledge"}
+
 # --- Tool Implementations ---
-def tool_testzeus_knowledge(query: str) -> str:
+# Tools return payloads from services/responses; chat_endpoint renders them.
+@traced("tool.testzeus_knowledge")
+def tool_testzeus_knowledge(query: str, tenant: Optional[str] = None) -> str:
     try:
         from services.rag_service import RAGService
         rag = RAGService()
-        results = rag.retrieve(query)
-        return "\n\n".join(results) if results else "I don't have detailed info on that."
+        # Most relevant, non-redundant sections within CONTEXT_TOKEN_BUDGET
+        with tracer.span("context.assemble") as span:
+            context = context_assembler.assemble(rag.retrieve_chunks(query, tenant))
+            span.set(tokens=context.tokens, budget=context.budget,
+                     chunks=len(context.chunks), candidates=context.candidates)
+        logger.debug("Assembled knowledge context", extra={
+            "tokens": context.tokens,
+            "budget": context.budget,
+            "chunks": len(context.chunks),
+            "candidates": context.candidates,
+        })
+        return context.text or "I don't have detailed info on that."
     except Exception as e:
         return f"ERROR: Failed to retrieve knowledge: {str(e)}"
 
-def tool_validate_email(input_text: str) -> str:
+@traced("tool.validate_email")
+def tool_validate_email(input_text: str) -> dict:
     try:
         import re
         from services.email_validator import email_validator
         email_match = re.search(r'\b[A-Za-z0-9._%+-]+@[A-Za-z0-9.-]+\.[A-Z|a-z]{2,}\b', input_text)
         if not email_match:
-            return "ERROR: no email found in input"
+            return responses.payload("error", error="no email found in input")
         email = email_match.group()
         validation = email_validator.validate_email(email)
         if validation["is_valid"]:
-            return f"VALID: {email}"
+            return responses.payload("email_valid", email=email)
         else:
-            return f"INVALID: {email} - {validation['reason']}"
+            return responses.payload("email_invalid", email=email, reason=validation["reason"])
     except Exception as e:
-        return f"ERROR: {str(e)}"
+        return responses.payload("error", error=str(e))
 
-def tool_create_tenant_and_team(input_text: str) -> str:
+@traced("tool.create_tenant_and_team")
+def tool_create_tenant_and_team(input_text: str) -> dict:
     try:
         # Parse the input text
         lines = [line.strip() for line in input_text.split("\n") if ":" in line]
@@ -279,373 +383,448 @@ def tool_create_tenant_and_team(input_text: str) -> str:
         teammate_emails = [e.strip() for e in params.get("teammate_emails", "").split(",") if e.strip()]
 
         if not admin_email:
-            return "ERROR: missing admin_email"
-
-        # For demo purposes, simulate account creation with detailed logging
-        print("=" * 50)
-        print("🔐 CREATING TESTZEUS ACCOUNT")
-        print("=" * 50)
-        print(f"📧 Admin Email: {admin_email}")
-        print(f"📋 Plan: {plan.upper()}")
-        print(f"👥 Teammates: {teammate_emails}")
-        print(f"⏰ Timestamp: {__import__('datetime').datetime.now()}")
-        print("=" * 50)
-        
-        # Actually store the account in our demo storage
-        account_data = {
-            "admin_email": admin_email,
-            "plan": plan.upper(),
-            "teammates": teammate_emails,
-            "created_at": str(__import__('datetime').datetime.now()),
-            "status": "Active",
-            "account_id": f"ACC_{len(DEMO_ACCOUNTS) + 1:04d}"
-        }
-        DEMO_ACCOUNTS.append(account_data)
-        
-        # Simulate success with detailed response
-        response = f"""✅ ACCOUNT CREATED SUCCESSFULLY!
-
-📊 Account Details:
-• Account ID: {account_data['account_id']}
-• Admin: {admin_email}
-• Plan: {plan.upper()}
-• Team Size: {len(teammate_emails) + 1} members
-• Status: Active
-• Created: {account_data['created_at']}
-
-🎯 Next Steps:
-1. Check your email for login credentials
-2. Complete your profile setup
-3. Start creating your first test cases
-
-🚀 Welcome to TestZeus! Your QA automation journey begins now."""
-        
-        print("✅ Account creation completed successfully!")
-        print(f"📊 Total accounts created: {len(DEMO_ACCOUNTS)}")
-        print("=" * 50)
-        
-        return response
-        
+            return responses.payload("error", error="missing admin_email")
+
+        # Duplicate calls for the same admin/plan/team share one provisioning run
+        key = idempotency_key(admin_email, plan, teammate_emails, namespace="chat")
+        return provisioning_runner.run(
+            key,
+            lambda: _provision_tenant_and_team(admin_email, plan, teammate_emails),
+            should_store=lambda result: result["kind"] != "error",
+        )
+
+    except Exception as e:
+        return responses.payload("error", error=str(e))
+
+def _provision_tenant_and_team(admin_email: str, plan: str, teammate_emails: List[str]) -> dict:
+    try:
+        with tracer.span("account_store.create"):
+            account_data = account_store.create(admin_email, plan, teammate_emails)
+        return responses.payload(
+            "account_created",
+            account_id=account_data["account_id"],
+            admin_email=admin_email,
+            plan=account_data["plan"],
+            teammates=teammate_emails,
+            team_size=len(teammate_emails) + 1,
+            status=account_data["status"],
+            created_at=account_data["created_at"],
+        )
     except Exception as e:
-        print(f"❌ Error in account creation: {str(e)}")
-        return f"ERROR: {str(e)}"
+        return responses.payload("error", error=str(e))
+
+def _capture_page(url: str, domain: str, company_name: str, wait_time: int) -> dict:
+    """Screenshot an already validated URL and register it for serving and the scenario library"""
+    with tracer.span("vision.screenshot", domain=domain):
+        screenshot_path, filename = vision_stack().capture_screenshot_sync(url, company_name, wait_time)
+    scenario_library.note_screenshot(screenshot_path, domain=domain)
+    # Fetchable by the frontend; WebP/AVIF variants are written in the background
+    screenshot_id = screenshot_store.register(screenshot_path)
+    image_url = f"/v1/screenshots/{screenshot_id}" if screenshot_id else ""
+    return dict(
+        url=url,
+        domain=domain,
+        company=company_name,
+        filename=filename,
+        path=screenshot_path,
+        screenshot_id=screenshot_id,
+        image_url=image_url,
+        thumbnail_url=f"{image_url}?size=thumb" if screenshot_id else "",
+    )
 
 # Add new tool implementations after the existing ones
-def tool_capture_website_screenshot(url: str, company_name: str, wait_time: int = 3000) -> str:
+@traced("tool.capture_website_screenshot")
+def tool_capture_website_screenshot(url: str, company_name: str, wait_time: int = 3000) -> dict:
     """Enhanced screenshot capture with URL validation"""
     try:
-        print(f"🔍 Validating URL: {url}")
-        print(f"🏢 Company: {company_name}")
-        
         # Validate URL and extract info
         is_valid, clean_url, domain, screenshot_name = validate_and_extract_url_info(url, company_name)
         
         if not is_valid:
-            error_msg = f"❌ **URL Validation Failed**\n\n**Issue**: {clean_url}\n\n**Please provide**:\n- A valid, accessible website URL\n- Correct company name\n\n**Examples of valid URLs**:\n- `https://example.com`\n- `https://app.company.com/login`\n- `https://dashboard.testcorp.com`"
-            print(error_msg)
-            return error_msg
+            # On failure the last field carries the reason
+            return responses.payload("url_invalid", url=url, issue=screenshot_name)
         
-        print(f"✅ URL validated successfully!")
-        print(f"🌐 Domain: {domain}")
-        print(f"📸 Screenshot name: {screenshot_name}")
-        print(f"⏱️ Wait time: {wait_time}ms")
-        
-        # Capture screenshot
-        screenshot_path, filename = capture_screenshot_sync(clean_url, company_name, wait_time)
-        
-        print(f"✅ Screenshot captured successfully!")
-        print(f"📁 Saved to: {screenshot_path}")
-        print(f"📄 Filename: {filename}")
-        
-        return f"""✅ **Screenshot Captured Successfully!**
-
-📸 **Screenshot Details:**
-- **URL**: {clean_url}
-- **Domain**: {domain}
-- **Company**: {company_name}
-- **File**: {filename}
-- **Path**: {screenshot_path}
-
-🚀 **Next Steps Available:**
-1. **Generate Gherkin test cases** from this screenshot
-2. **Extract text and UI elements** using OCR
-3. **Use for visual testing** and documentation
-
-💡 **Recommendation**: 
-I can now generate comprehensive test cases for this website. What type of functionality would you like me to focus on?
-
-**Prompt Types Available:**
-- `login` - Authentication and login flows
-- `dashboard` - Navigation and data display
-- `form` - Form validation and submission
-- `ecommerce` - Shopping and checkout flows
-- `general` - Overall website functionality
-
-**Example**: "Generate Gherkin test cases for the login functionality using the login prompt type"
-
-Would you like me to proceed with test case generation?"""
+        return responses.payload("screenshot_captured", **_capture_page(clean_url, domain, company_name, wait_time))
         
     except Exception as e:
-        error_msg = f"❌ **Screenshot Capture Failed**\n\n**Error**: {str(e)}\n\n**Troubleshooting**:\n- Check if the URL is accessible\n- Verify the company name is correct\n- Try a different wait time if the site loads slowly\n\n**Common Issues**:\n- Site requires authentication\n- Heavy JavaScript applications need longer wait times\n- Some sites block automated access"
-        print(error_msg)
-        return error_msg
+        return responses.payload("screenshot_failed", url=url, error=str(e))
 
-def tool_generate_gherkin_from_screenshot(screenshot_path: str, prompt_type: str, company_context: str = "") -> str:
+@traced("tool.generate_gherkin_from_screenshot")
+def tool_generate_gherkin_from_screenshot(screenshot_path: str, prompt_type: str, company_context: str = "") -> dict:
     """Generate Gherkin test cases from a screenshot"""
     try:
-        print(f"🤖 Generating Gherkin from screenshot: {screenshot_path}")
-        print(f"📝 Prompt type: {prompt_type}")
-        print(f"🏢 Company context: {company_context}")
-        
+        vision = vision_stack()
+
         # Initialize GPT-5 generator
-        generator = GPT5GherkinGenerator()
+        generator = vision.GPT5GherkinGenerator()
         
-        # Select appropriate prompt
-        prompt_map = {
-            "general": GHERKIN_PROMPT,
-            "login": LOGIN_GHERKIN_PROMPT,
-            "dashboard": DASHBOARD_GHERKIN_PROMPT,
-            "form": FORM_GHERKIN_PROMPT,
-            "ecommerce": ECOMMERCE_GHERKIN_PROMPT
-        }
-        
-        prompt = prompt_map.get(prompt_type, GHERKIN_PROMPT)
+        # Similar pages seen before seed a shorter prompt; otherwise the prompt_type's own
+        page = scenario_library.page(screenshot_path)
+        with tracer.span("scenario_library.seeds", prompt_type=prompt_type) as span:
+            seeds = scenario_library.seeds(prompt_type, page)
+            span.set(seeds=len(seeds))
+        if seeds:
+            prompt = scenario_library.seeded_prompt(prompt_type, seeds, company_context)
+        else:
+            prompt = vision.prompt_map.get(prompt_type, vision.prompt_map["general"])
         
         # Generate Gherkin
-        result = generator.generate_gherkin(screenshot_path, prompt, company_context)
+        with tracer.span("vision.gherkin", prompt_type=prompt_type, seeded=bool(seeds)) as span:
+            result = generator.generate_gherkin(screenshot_store.local_path(screenshot_path), prompt, company_context)
+            span.set(total_tokens=result.get("tokens_used", 0))
         
         if result.get("success"):
-            gherkin_content = result["gherkin"]
-            tokens_used = result.get("tokens_used", 0)
-            response_time = result.get("response_time", 0)
-            
-            print(f"✅ Gherkin generated successfully!")
-            print(f"🔢 Tokens used: {tokens_used}")
-            print(f"⏱️ Response time: {response_time:.2f}s")
-            
-            return f"""✅ Gherkin test cases generated successfully!
-
-🤖 **AI Generation Details:**
-- **Model**: GPT-5 Vision
-- **Prompt Type**: {prompt_type}
-- **Tokens Used**: {tokens_used}
-- **Response Time**: {response_time:.2f}s
-
-📋 **Generated Test Cases:**
-```gherkin
-{gherkin_content}
-```
-
-💡 **Usage Tips:**
-- These test cases are ready to use in TestZeus
-- They cover all visible UI elements and functionality
-- You can customize them further based on your needs
-- Use them for automated testing and documentation
-
-Would you like me to help you with anything else related to these test cases?"""
-            
+            text, reused = scenario_library.merge(result["gherkin"], seeds) if seeds else (result["gherkin"], 0)
+            # Repair locally; only broken scenarios go back to a (text) model
+            with tracer.span("gherkin.validate") as span:
+                feature = gherkin.validate(text)
+                span.set(scenarios=len(feature.scenarios), broken=len(feature.broken),
+                         regenerated=feature.regenerated, duplicates=len(feature.duplicates))
+            scenario_library.add(prompt_type, page, feature, result.get("tokens_used", 0), bool(seeds), reused)
+            return responses.payload(
+                "gherkin_generated",
+                prompt_type=prompt_type,
+                tokens_used=result.get("tokens_used", 0),
+                response_time=result.get("response_time", 0),
+                gherkin=gherkin.render(feature),
+                validation=gherkin.summary(feature),
+                feature=gherkin.as_dict(feature),
+            )
         else:
-            error_msg = f"❌ Error generating Gherkin: {result.get('error', 'Unknown error')}"
-            print(error_msg)
-            return error_msg
+            return responses.payload("tool_error", title="Error generating Gherkin", error=result.get("error", "Unknown error"))
             
     except Exception as e:
-        error_msg = f"❌ Error in Gherkin generation: {str(e)}"
-        print(error_msg)
-        return error_msg
+        return responses.payload("tool_error", title="Error in Gherkin generation", error=str(e))
 
-def tool_extract_text_from_screenshot(screenshot_path: str, custom_prompt: str = "") -> str:
+@traced("tool.extract_text_from_screenshot")
+def tool_extract_text_from_screenshot(screenshot_path: str, custom_prompt: str = "") -> dict:
     """Extract text and UI elements from a screenshot using OCR"""
     try:
-        print(f"🔍 Extracting text from screenshot: {screenshot_path}")
-        print(f"📝 Custom prompt: {custom_prompt if custom_prompt else 'Using default prompt'}")
-        
         # Initialize OCR processor
-        ocr_processor = Qwen2VLOCR()
+        ocr_processor = vision_stack().Qwen2VLOCR()
         
         # Extract text
-        result = ocr_processor.extract_text_from_image(screenshot_path, custom_prompt)
+        with tracer.span("vision.ocr") as span:
+            result = ocr_processor.extract_text_from_image(screenshot_store.local_path(screenshot_path), custom_prompt)
+            span.set(total_tokens=result.get("tokens_used", 0))
         
         if result.get("success"):
-            extracted_text = result["extracted_text"]
-            tokens_used = result.get("tokens_used", 0)
-            image_size = result.get("image_size", "Unknown")
-            
-            print(f"✅ Text extraction successful!")
-            print(f"🔢 Tokens used: {tokens_used}")
-            print(f"🖼️ Image size: {image_size}")
-            
-            return f"""✅ Text extraction completed successfully!
-
-🔍 **OCR Details:**
-- **Model**: Qwen2-VL
-- **Tokens Used**: {tokens_used}
-- **Image Size**: {image_size}
-
-📝 **Extracted Content:**
-```
-{extracted_text}
-```
-
-💡 **What This Contains:**
-- All visible text on the screenshot
-- UI element descriptions
-- Navigation elements
-- Form fields and labels
-- Error messages and notifications
-
-🚀 **Next Steps:**
-You can use this extracted text to:
-1. Understand the UI structure
-2. Generate more accurate test cases
-3. Document the application interface
-4. Analyze user experience elements
-
-Would you like me to help you analyze this content or generate test cases?"""
-            
+            # The page's UI vocabulary, for finding similar pages in the scenario library
+            scenario_library.note_screenshot(screenshot_path, ocr_text=result["extracted_text"])
+            return responses.payload(
+                "ocr_extracted",
+                tokens_used=result.get("tokens_used", 0),
+                image_size=result.get("image_size", "Unknown"),
+                text=result["extracted_text"],
+            )
         else:
-            error_msg = f"❌ Error in text extraction: {result.get('error', 'Unknown error')}"
-            print(error_msg)
-            return error_msg
+            return responses.payload("tool_error", title="Error in text extraction", error=result.get("error", "Unknown error"))
             
     except Exception as e:
-        error_msg = f"❌ Error in OCR processing: {str(e)}"
-        print(error_msg)
-        return error_msg
+        return responses.payload("tool_error", title="Error in OCR processing", error=str(e))
+
+def _site_crawler(company_name: str, company_context: str = "", max_pages: int = CRAWL_MAX_PAGES) -> SiteCrawler:
+    """A crawler whose stages are the single-page capture, OCR and Gherkin tools"""
+    async def capture(url: str) -> dict:
+        return await asyncio.to_thread(_capture_page, url, urlparse(url).netloc, company_name, CAPTURE_WAIT_MS)
+
+    async def ocr(path: str) -> str:
+        result = await asyncio.to_thread(tool_extract_text_from_screenshot, path)
+        return result["data"].get("text", "")
+
+    async def generate(path: str, prompt_type: str) -> dict:
+        result = await asyncio.to_thread(tool_generate_gherkin_from_screenshot, path, prompt_type, company_context)
+        if result["kind"] != "gherkin_generated":
+            raise RuntimeError(result["data"].get("error", "Gherkin generation failed"))
+        data = result["data"]
+        return {
+            "scenarios": len(data["feature"]["scenarios"]),
+            "validation": data["validation"],
+            "tokens_used": data["tokens_used"],
+            "gherkin": data["gherkin"],
+        }
+
+    return SiteCrawler(capture, generate, ocr, max_pages=max(1, min(max_pages, MAX_PAGES_CAP)))
+
+@traced("tool.crawl_website")
+async def tool_crawl_website(url: str, company_name: str, max_pages: int = 10, company_context: str = "") -> dict:
+    """Crawl a site from one URL and generate Gherkin for each distinct page"""
+    try:
+        is_valid, clean_url, domain, issue = await asyncio.to_thread(validate_and_extract_url_info, url, company_name)
+        if not is_valid:
+            return responses.payload("url_invalid", url=url, issue=issue)
+
+        pages, done = {}, {}
+        async for event in _site_crawler(company_name, company_context, max_pages).crawl(clean_url):
+            if event["event"] == "done":
+                done = event
+            elif event["event"] in ("captured", "generated", "failed"):
+                pages.setdefault(event["url"], {}).update(event)
+        generated = [p for p in pages.values() if p["event"] == "generated"]
+        lines = [
+            f"- **{p['prompt_type']}** {p['url']} — {p['validation']}" + (f" — [screenshot]({p['image_url']})" if p.get("image_url") else "")
+            for p in generated
+        ]
+        lines += [f"- ⚠️ {p['url']} — {p['stage']} failed: {p['error']}" for p in pages.values() if p["event"] == "failed"]
+        return responses.payload(
+            "site_crawled",
+            url=clean_url,
+            domain=domain,
+            generated=done.get("generated", 0),
+            duplicates=done.get("duplicate_dom", 0) + done.get("duplicate_visual", 0),
+            failed=done.get("failed", 0),
+            seconds=done.get("seconds", 0.0),
+            pages_per_minute=done.get("pages_per_minute", 0.0),
+            page_list="\n".join(lines) or "- No pages could be processed",
+            pages=generated,
+        )
+    except Exception as e:
+        return responses.payload("tool_error", title="Error crawling the site", error=str(e))
 
 @router.get("/accounts")
-async def list_accounts():
-    """List all created demo accounts"""
-    return {
-        "total_accounts": len(DEMO_ACCOUNTS),
-        "accounts": DEMO_ACCOUNTS
-    }
+def list_accounts(
+    limit: int = 50,
+    cursor: Optional[str] = None,
+    plan: Optional[str] = None,
+    admin_email: Optional[str] = None,
+    created_after: Optional[str] = None,
+    created_before: Optional[str] = None,
+):
+    """List created accounts, one page at a time (pass next_cursor back as cursor)"""
+    try:
+        return account_store.list(
+            limit=limit,
+            cursor=cursor,
+            plan=plan,
+            admin_email=admin_email,
+            created_after=created_after,
+            created_before=created_before,
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+class _UploadStreamingResponse(StreamingResponse):
+    """A StreamingResponse that can stream while the request body is still arriving.
+
+    Starlette's version listens for disconnects by calling receive(), which would
+    swallow the upload's body messages; here a disconnect surfaces when reading them.
+    """
+
+    async def __call__(self, scope, receive, send):
+        await self.stream_response(send)
+        if self.background is not None:
+            await self.background()
+
+@router.post("/tenants/import")
+async def import_tenants(request: Request, import_id: Optional[str] = None, format: Optional[str] = None):
+    """Provision tenants from a CSV/JSONL upload, streaming one NDJSON result per row.
+
+    Re-send the same file with the import_id from the "start" event to resume an interrupted import.
+    """
+    if import_id is not None and not valid_import_id(import_id):
+        raise HTTPException(status_code=400, detail="import_id may only contain letters, digits, '.', '_' and '-'")
+    if format not in (None, "csv", "jsonl"):
+        raise HTTPException(status_code=400, detail="format must be csv or jsonl")
+    rows = upload_rows(request.stream(), request.headers.get("content-type", ""), format)
+
+    async def stream():
+        try:
+            async for event in run_import(rows, import_id=import_id):
+                yield json.dumps(event) + "\n"
+        except ValueError as e:
+            # A malformed upload; rows before it are checkpointed
+            yield json.dumps({"event": "error", "error": str(e)}) + "\n"
+
+    return _UploadStreamingResponse(stream(), media_type="application/x-ndjson")
+
+@router.get("/llm/usage")
+def llm_usage():
+    """Per-caller OpenAI usage and per-route model cascade savings for this worker"""
+    return {"usage": llm_gateway.usage(), "routes": model_router.stats()}
+
+@router.get("/scenarios/stats")
+def scenario_library_stats():
+    """Scenario library size, reuse rate and tokens saved"""
+    return {"scenario_library": scenario_library.metrics()}
+
+@router.api_route("/screenshots/{screenshot_id}", methods=["GET", "HEAD"])
+async def get_screenshot(screenshot_id: str, request: Request, size: str = "full"):
+    """A captured screenshot: the smallest format the client accepts, with ETag and Range support"""
+    if size not in SCREENSHOT_SIZES:
+        raise HTTPException(status_code=400, detail=f"size must be one of {', '.join(SCREENSHOT_SIZES)}")
+    variant = await asyncio.to_thread(screenshot_store.variant, screenshot_id, size, request.headers.get("accept", ""))
+    if variant is None:
+        raise HTTPException(status_code=404, detail="Screenshot not found")
+    # Ids are content hashes, but the format behind one changes once transcoding is done
+    headers = {"Cache-Control": "private, max-age=3600", "Vary": "Accept"}
+    try:
+        return file_response(request, variant.path, variant.media_type, headers)
+    except FileNotFoundError:
+        raise HTTPException(status_code=404, detail="Screenshot not found")
+
+@router.post("/crawl")
+async def crawl_endpoint(request: Request):
+    """Crawl a site and stream its pipeline events as NDJSON, ending with a "done" summary"""
+    data = await request.json()
+    company_name = data.get("company_name", "")
+    is_valid, clean_url, _, issue = await asyncio.to_thread(
+        validate_and_extract_url_info, data.get("url", ""), company_name
+    )
+    if not is_valid:
+        raise HTTPException(status_code=400, detail=issue)
+    try:
+        max_pages = int(data.get("max_pages", CRAWL_MAX_PAGES))
+    except (TypeError, ValueError):
+        raise HTTPException(status_code=400, detail="max_pages must be an integer")
+    if max_pages < 1:
+        raise HTTPException(status_code=400, detail="max_pages must be at least 1")
+    tenant = _tenant_of(request, data.get("session_id"))
+    try:
+        ticket = await crawl_admission.acquire(tenant, deadline_from(request.headers))
+    except AdmissionRejected as e:
+        return JSONResponse({"error": "Too many crawls running; retry later", "retry_after": e.retry_after},
+                            status_code=429, headers={"Retry-After": str(e.retry_after)})
+    try:
+        crawler = _site_crawler(company_name, data.get("company_context", ""), max_pages)
+
+        async def stream():
+            try:
+                async for event in crawler.crawl(clean_url):
+                    yield json.dumps(event) + "\n"
+            finally:
+                ticket.release()
+
+        async def release() -> None:
+            # Async so it runs on the loop: admission pools are not thread-safe
+            ticket.release()
+
+        # The background release also covers a client that leaves before the stream starts
+        return StreamingResponse(stream(), media_type="application/x-ndjson", background=BackgroundTask(release))
+    except BaseException:
+        ticket.release()
+        raise
+
+@router.get("/cache/stats")
+def cache_stats():
+    """Response cache hit rates for this worker"""
+    return {"response_cache": response_cache.metrics()}
+
+@router.get("/debug/traces")
+def debug_traces(limit: int = 20):
+    """Most recent requests slower than TRACE_SLOW_MS, with their spans"""
+    return {"slow_ms": tracer.slow_ms, "traces": tracer.slow_traces(limit)}
+
+@router.get("/admission/stats")
+def admission_stats():
+    """Admission slots, queues and shed counts for this worker"""
+    return {"chat": chat_admission.metrics(), "vision": vision_admission.metrics(), "crawl": crawl_admission.metrics()}
+
+def _tenant_of(request: Request, session_id: Optional[str]) -> str:
+    """Admission key: X-Tenant-ID, else the chat session, else the client address"""
+    tenant = request.headers.get("x-tenant-id") or session_id
+    if not tenant:
+        tenant = request.client.host if request.client else "anonymous"
+    return tenant
+
+def _overloaded(e: AdmissionRejected, fmt: str, session_id: Optional[str], placeholder: str) -> JSONResponse:
+    return JSONResponse(
+        responses.reply(
+            responses.text("I'm getting a lot of questions right now — give me a few seconds and ask again!"),
+            fmt,
+            session_id=session_id,
+            placeholder=placeholder,
+            retry_after=e.retry_after
+        ),
+        status_code=429,
+        headers={"Retry-After": str(e.retry_after)}
+    )
+
+async def _run_vision_tool(tenant: str, deadline: float, tool, *args):
+    # Own budget, and off the event loop: these block for seconds
+    async with vision_admission.admit(tenant, deadline):
+        return await asyncio.to_thread(tool, *args)
 
 @router.post("/chat")
 async def chat_endpoint(request: Request):
     data = await request.json()
     message = data.get("message", "").strip()
     session_id = data.get("session_id")
+    # "markdown" (default) renders the reply; "json" returns the structured payload
+    fmt = data.get("format", "markdown")
     placeholder = random.choice(CONVERSATION_STARTERS)
 
     # If no message, return a starter
     if not message:
-        return {
-            "response": "Hey, I'm Hermes — I've been in the QA trenches. What's your biggest testing headache?",
-            "placeholder": placeholder
-        }
+        return responses.reply(
+            responses.text("Hey, I'm Hermes — I've been in the QA trenches. What's your biggest testing headache?"),
+            fmt,
+            placeholder=placeholder
+        )
 
-    # Check if OpenAI client is available
-    if not client:
+    # One pass over the message finds every keyword-routed intent
+    with tracer.span("intents"):
+        intents = intent_router.scan(message)
+
+    # Check if OpenAI is available
+    if not llm_gateway.available():
         # Simple fallback responses when AI is not available
-        message_lower = message.lower()
-        if any(word in message_lower for word in ["test", "testing", "qa"]):
-            return {
-                "response": "I can help with testing challenges! While my AI is offline, here are some quick tips:\n\n• Use TestZeus for automated test creation\n• Implement CI/CD pipelines for faster feedback\n• Focus on test maintenance and flakiness reduction\n\nWhat specific testing issue are you facing?",
-                "placeholder": placeholder
-            }
-        elif "email" in message_lower:
-            return {
-                "response": "I can validate emails! Just send me an email address and I'll check if it's valid.",
-                "placeholder": placeholder
-            }
-        elif any(word in message_lower for word in ["account", "signup", "onboard", "start"]):
-            return {
-                "response": "Ready to get started with TestZeus? I can help you create an account and set up your team. Just let me know your admin email and plan preference (OSS or Enterprise).",
-                "placeholder": placeholder
-            }
-        else:
-            return {
-                "response": "Hey! I'm Hermes, your QA testing buddy. While my AI is offline, I can still help with:\n\n• TestZeus knowledge and features\n• Email validation\n• Account creation and team setup\n\nWhat would you like to know?",
-                "placeholder": placeholder
-            }
+        offline = intents.top("offline")
+        return responses.reply(
+            responses.text(OFFLINE_RESPONSES[offline.intent if offline else None]),
+            fmt,
+            placeholder=placeholder
+        )
 
-    # Check if this is a Precursive/Salesforce query and handle it directly
-    if "precursive" in message.lower() and "salesforce" in message.lower():
-        response = """Perfect! Precursive is exactly the kind of platform where TestZeus shines. Let me break this down for you:
-
-**How We Generate Test Cases for You:**
-- Write tests in plain English like "Login to Salesforce, create a new project, assign team members"
-- Our AI agents automatically generate and execute complex test cases
-- No coding required - just describe your workflow and we'll test it end-to-end
-
-**For Your Salesforce Integration:**
-- TestZeus opens Salesforce in our built-in browser
-- AI understands Salesforce UI patterns (app launcher, buttons, forms, custom objects)
-- Automatically handles authentication, navigation, and data entry
-- Records video playback for debugging and documentation
-
-**Perfect for PSA Platforms:**
-- Test end-to-end workflows across Precursive and Salesforce
-- Validate data synchronization between platforms
-- Automated regression testing for Salesforce updates
-- Catch integration bugs early before they reach production
-
-**Pricing for Your Team:**
-- **Growth Plan**: $1,200/month (includes 4 users, perfect for your 3 QA engineers + 1 admin)
-- **Enterprise Plan**: Custom pricing for larger teams with dedicated support
-- Additional users: $20/month each
-- Annual billing saves 20%
-
-**Key Benefits for Your Team:**
-- Reduce manual testing time by 70%
-- Scale testing without adding more QA engineers
-- Maintain test coverage as Salesforce evolves
-- Focus on strategy, not repetitive test maintenance
-
-Would you like to see a demo of how we'd test a specific Precursive workflow, or shall we get you set up with an account?"""
-            
-        return {
-            "response": response,
-            "session_id": session_id,
-            "placeholder": "🚀 Ready to automate your Salesforce testing? Let's get started!"
-        }
+    # Known questions (Precursive/Salesforce, product overview) get canned answers
+    canned = intents.top("canned")
+    if canned:
+        return responses.reply(
+            responses.canned(canned.intent),
+            fmt,
+            session_id=session_id,
+            placeholder=CANNED_PLACEHOLDERS[canned.intent]
+        )
 
-    # Check if this is a general product overview query and handle it directly
-    if any(keyword in message.lower() for keyword in ["tell me more about your product", "how do you create test cases", "product overview", "test case creation"]):
-        response = """Great question! Let me give you a comprehensive overview of TestZeus and how we revolutionize test case creation.
-
-**What is TestZeus?**
-TestZeus is an AI-powered testing platform that automatically generates, executes, and maintains test cases using natural language descriptions. No coding required!
-
-**How We Create Test Cases:**
-- **Natural Language Input**: Write tests in plain English like "Login to the app, navigate to dashboard, verify user profile loads"
-- **AI-Powered Generation**: Our AI agents automatically convert your descriptions into executable test cases
-- **Multiple Sources**: We can work with requirements, user stories, PR descriptions, user flows, and existing documentation
-- **Smart Maintenance**: Tests automatically update when your application changes, reducing flakiness
-
-**Key Capabilities:**
-- **No-Code Testing**: Describe what you want to test, we handle the rest
-- **Cross-Platform Support**: Web, mobile, desktop, and API testing
-- **Real Browser Execution**: Tests run in actual browsers for accurate results
-- **Video Recording**: Every test execution is recorded for debugging
-- **Parallel Execution**: Run multiple tests simultaneously to speed up your pipeline
-
-**Integration & Collaboration:**
-- **CI/CD Integration**: Works with GitHub Actions, Jenkins, GitLab CI, and more
-- **Team Collaboration**: Share test cases, assign test runs, and track progress
-- **Existing Tools**: Import from Jira, TestRail, or other test management systems
-- **Version Control**: Track test changes and rollback when needed
-
-**AI Capabilities:**
-- **Smart Element Detection**: AI automatically finds and interacts with UI elements
-- **Adaptive Testing**: Tests adapt to UI changes and application updates
-- **Intelligent Assertions**: AI suggests relevant checks based on your test description
-- **Flakiness Reduction**: Built-in retry logic and smart waiting strategies
-
-**Output Formats:**
-- **BDD/Gherkin**: Generate human-readable test specifications
-- **Test Plans**: Organized test suites with dependencies and priorities
-- **Reports**: Detailed execution reports with screenshots and logs
-- **Metrics**: Track test coverage, execution time, and success rates
-
-Would you like me to show you how this works with a specific example, or do you have questions about a particular aspect of our platform?"""
-            
-        return {
-            "response": response,
-            "session_id": session_id,
-            "placeholder": "🚀 Ready to see TestZeus in action? Let's dive deeper!"
-        }
+    # Tenants with their own docs (services/tenant_knowledge) get answers from them too.
+    # Only a signed X-Tenant-Token selects them: those docs are private to the tenant.
+    knowledge_tenant = tenant_tokens.verify(request.headers.get("x-tenant-token"))
+    if not tenant_overlays.has_docs(knowledge_tenant):
+        knowledge_tenant = None
+
+    # Repeated questions are answered from the response cache, skipping the LLM
+    cache_context = os.getenv("OPENAI_MODEL", "gpt-5")
+    if knowledge_tenant:
+        # The overlay's version too, so a change to the tenant's docs retires its answers
+        overlay = await asyncio.to_thread(tenant_overlays.get, knowledge_tenant)
+        cache_context += f"|tenant:{knowledge_tenant}@{overlay.version if overlay else 'none'}"
+    with tracer.span("response_cache.get") as span:
+        cached = await response_cache.get(message, cache_context)
+        span.set(hit=cached is not None)
+    if cached is not None:
+        return responses.reply(
+            cached["payload"],
+            fmt,
+            session_id=session_id,
+            **({"tool_used": cached["tool_used"]} if "tool_used" in cached else {}),
+            placeholder=placeholder,
+            cached=True
+        )
+
+    # Only LLM-backed work is admission controlled; the paths above are cheap
+    tenant = _tenant_of(request, session_id)
+    deadline = deadline_from(request.headers)
+    try:
+        ticket = await chat_admission.acquire(tenant, deadline)
+    except AdmissionRejected as e:
+        logger.info("Chat request shed", extra={"reason": e.reason, "retry_after": e.retry_after})
+        return _overloaded(e, fmt, session_id, placeholder)
+
+    # Knowledge questions start retrieval now, overlapping the first completion
+    speculation = speculate(
+        message,
+        intents.top("knowledge") is not None,
+        lambda text: tool_testzeus_knowledge(text, knowledge_tenant)
+    )
 
     # Regular AI processing for other queries
     try:
@@ -666,7 +845,8 @@ You are Hermes, a passionate QA engineer who's been in the testing trenches. You
 - create_tenant_and_team: When users want to join TestZeus, create an account, or onboard their team
 
 **NEW AI-Powered Testing Tools:**
-- capture_website_screenshot: When users want to capture screenshots from websites for test case generation
+- capture_website_screenshot: When users want to capture a single page from a website for test case generation
+- crawl_website: When users want test cases for several pages or a whole app; it discovers the pages itself from one start URL
 - generate_gherkin_from_screenshot: When users want to generate Gherkin test cases from screenshots using AI
 - extract_text_from_screenshot: When users want to extract text and UI elements from screenshots using OCR
 
@@ -683,7 +863,7 @@ You are Hermes, a passionate QA engineer who's been in the testing trenches. You
 **When Using AI Testing Tools - AUTONOMOUS WORKFLOW:**
 🚀 **BE PROACTIVE - Don't ask multiple questions!**
 
-1. **URL Collection**: Extract URL and company name from user message
+1. **URL Collection**: Extract URL and company name from user message. For a whole app, one start URL is enough — use crawl_website instead of asking for each page
 2. **Automatic Execution**: Run the complete pipeline without asking for confirmation:
    - Validate URL accessibility
    - Capture screenshot with smart defaults
@@ -751,7 +931,9 @@ Keep responses conversational, helpful, and not too long. Build rapport and guid
 """
 
         # Call GPT-5 with standard chat completion API (supports tool calling)
-        response = client.chat.completions.create(
+        response = await llm_gateway.chat(
+            "chat",
+            Lane.INTERACTIVE,
             model=os.getenv("OPENAI_MODEL", "gpt-5"),
             messages=[
                 {"role": "system", "content": system_prompt},
@@ -761,10 +943,12 @@ Keep responses conversational, helpful, and not too long. Build rapport and guid
             tool_choice="auto"
         )
 
-        # Debug: print response structure
-        print(f"Response type: {type(response)}")
-        print(f"Response attributes: {dir(response)}")
-        print(f"Response choices: {getattr(response, 'choices', 'NO_CHOICES')}")
+        if logger.isEnabledFor(logging.DEBUG):
+            choices = getattr(response, "choices", None) or []
+            logger.debug("LLM response", extra={
+                "choices": len(choices),
+                "finish_reason": choices[0].finish_reason if choices else None,
+            })
 
         # ✅ Safely extract output - handle chat completion structure
         try:
@@ -784,131 +968,162 @@ Keep responses conversational, helpful, and not too long. Build rapport and guid
                         except json.JSONDecodeError:
                             tool_args = {}
 
+                        # Degraded answers (retrieval or rephrase failed) are not cached
+                        cacheable = True
                         if tool_name == "testzeus_knowledge":
                             query = tool_args.get("query", "")
-                            print(f"DEBUG: AI received query: '{query}'")
+                            logger.debug("Knowledge tool called", extra={"query": query})
                             
                             # Special handling for Precursive/Salesforce query
-                            if "precursive" in query.lower() and "salesforce" in query.lower():
-                                print("DEBUG: Using hardcoded Precursive response")
-                                result = """Perfect! Precursive is exactly the kind of platform where TestZeus shines. Let me break this down for you:
-
-**How We Generate Test Cases for You:**
-- Write tests in plain English like "Login to Salesforce, create a new project, assign team members"
-- Our AI agents automatically generate and execute complex test cases
-- No coding required - just describe your workflow and we'll test it end-to-end
-
-**For Your Salesforce Integration:**
-- TestZeus opens Salesforce in our built-in browser
-- AI understands Salesforce UI patterns (app launcher, buttons, forms, custom objects)
-- Automatically handles authentication, navigation, and data entry
-- Records video playback for debugging and documentation
-
-**Perfect for PSA Platforms:**
-- Test end-to-end workflows across Precursive and Salesforce
-- Validate data synchronization between platforms
-- Automated regression testing for Salesforce updates
-- Catch integration bugs early before they reach production
-
-**Pricing for Your Team:**
-- **Growth Plan**: $1,200/month (includes 4 users, perfect for your 3 QA engineers + 1 admin)
-- **Enterprise Plan**: Custom pricing for larger teams with dedicated support
-- Additional users: $20/month each
-- Annual billing saves 20%
-
-**Key Benefits for Your Team:**
-- Reduce manual testing time by 70%
-- Scale testing without adding more QA engineers
-- Maintain test coverage as Salesforce evolves
-- Focus on strategy, not repetitive test maintenance
-
-Would you like to see a demo of how we'd test a specific Precursive workflow, or shall we get you set up with an account?"""
+                            query_intents = {m.intent for m in intent_router.route(query, "canned")}
+                            if "precursive_salesforce" in query_intents:
+                                logger.debug("Using canned Precursive response")
+                                result = responses.canned("precursive_salesforce")
                             else:
-                                print(f"DEBUG: Using RAG for query: '{query}'")
-                                # Use regular RAG for other queries
-                                rag_results = tool_testzeus_knowledge(query)
+                                logger.debug("Using RAG", extra={"query": query})
+                                # Reuse the speculative retrieval if the model asked about the same thing
+                                rag_results = await speculation.result_for(query) if speculation else None
+                                speculation = None
+                                if rag_results is None:
+                                    # Use regular RAG for other queries; a tenant's first query builds its overlay
+                                    rag_results = await asyncio.to_thread(tool_testzeus_knowledge, query, knowledge_tenant)
                                 
                                 # Process RAG results to make them more conversational
-                                if rag_results and len(rag_results) > 0:
-                                    # Combine RAG results and ask AI to process them conversationally
-                                    rag_content = "\n\n".join(rag_results)
+                                if rag_results and not rag_results.startswith("ERROR:"):
+                                    # Already assembled into one budgeted context string
+                                    rag_content = rag_results
                                     
                                     # Get AI to process this information conversationally
                                     try:
-                                        processing_response = client.chat.completions.create(
-                                            model=os.getenv("OPENAI_MODEL", "gpt-5"),
+                                        # A small model rephrases; the big one only if it comes back empty
+                                        processing_response = await model_router.chat(
+                                            "rag_rephrase",
+                                            Lane.INTERACTIVE,
                                             messages=[
-                                                {"role": "system", "content": "You are Hermes, a helpful QA engineer. Process the following information about TestZeus and present it in a conversational, engaging way. Make it personal and relevant to the user's question. Keep it concise but comprehensive."},
+                                                {"role": "system", "content": "You are Hermes, a helpful QA engineer. Process the following information about TestZeus and present it in a conversational, engaging way that answers the user's question. Don't address the user by name or repeat details about them or their company: the answer is reused for anyone asking the same thing. Keep it concise but comprehensive."},
                                                 {"role": "user", "content": f"User asked: {query}\n\nHere's the information from our knowledge base:\n{rag_content}\n\nPlease provide a conversational, helpful response based on this information."}
                                             ],
-                                            max_completion_tokens=800
+                                            extra_body={"max_completion_tokens": 800},  # the pinned SDK predates it
                                         )
                                         
-                                        result = processing_response.choices[0].message.content
+                                        result = responses.text(processing_response.choices[0].message.content)
                                     except Exception as e:
-                                        print(f"Error processing RAG response: {e}")
+                                        logger.warning("Error processing RAG response", extra={"error": str(e)})
                                         # Fallback to raw content if processing fails
-                                        result = rag_content
+                                        result = responses.text(rag_content)
+                                        cacheable = False
                                 else:
-                                    result = "I don't have specific information about that, but I'd be happy to help you with TestZeus! What would you like to know?"
+                                    cacheable = False
+                                    result = responses.text("I don't have specific information about that, but I'd be happy to help you with TestZeus! What would you like to know?")
                                 
                         elif tool_name == "validate_email":
                             email = tool_args.get("email", "")
                             result = tool_validate_email(f"email: {email}")
                         elif tool_name == "create_tenant_and_team":
                             input_text = tool_args.get("input_text", "")
-                            result = tool_create_tenant_and_team(input_text)
+                            # Duplicates wait on the in-flight call; keep that off the event loop
+                            result = await asyncio.to_thread(tool_create_tenant_and_team, input_text)
                         elif tool_name == "capture_website_screenshot":
                             url = tool_args.get("url", "")
                             company_name = tool_args.get("company_name", "")
                             wait_time = tool_args.get("wait_time", 3000)
-                            result = tool_capture_website_screenshot(url, company_name, wait_time)
+                            # Vision tools move from the chat budget to the vision budget
+                            ticket.release()
+                            result = await _run_vision_tool(
+                                tenant, deadline, tool_capture_website_screenshot, url, company_name, wait_time
+                            )
+                        elif tool_name == "crawl_website":
+                            ticket.release()
+                            # One crawl slot for the whole crawl; its stages run their own workers
+                            async with crawl_admission.admit(tenant, deadline):
+                                result = await tool_crawl_website(
+                                    tool_args.get("url", ""),
+                                    tool_args.get("company_name", ""),
+                                    tool_args.get("max_pages", 10),
+                                    tool_args.get("company_context", ""),
+                                )
                         elif tool_name == "generate_gherkin_from_screenshot":
                             screenshot_path = tool_args.get("screenshot_path", "")
                             prompt_type = tool_args.get("prompt_type", "general")
                             company_context = tool_args.get("company_context", "")
-                            result = tool_generate_gherkin_from_screenshot(screenshot_path, prompt_type, company_context)
+                            ticket.release()
+                            result = await _run_vision_tool(
+                                tenant, deadline, tool_generate_gherkin_from_screenshot,
+                                screenshot_path, prompt_type, company_context
+                            )
                         elif tool_name == "extract_text_from_screenshot":
                             screenshot_path = tool_args.get("screenshot_path", "")
                             custom_prompt = tool_args.get("custom_prompt", "")
-                            result = tool_extract_text_from_screenshot(screenshot_path, custom_prompt)
+                            ticket.release()
+                            result = await _run_vision_tool(
+                                tenant, deadline, tool_extract_text_from_screenshot, screenshot_path, custom_prompt
+                            )
                         else:
-                            result = "Unknown tool"
-
-                        return {
-                            "response": result,
-                            "session_id": session_id,
-                            "tool_used": tool_name,
-                            "placeholder": placeholder
-                        }
+                            result = responses.text("Unknown tool")
+
+                        if tool_name in CACHEABLE_TOOLS and cacheable:
+                            await response_cache.put(message, {"payload": result, "tool_used": tool_name}, cache_context)
+
+                        return responses.reply(
+                            result,
+                            fmt,
+                            session_id=session_id,
+                            tool_used=tool_name,
+                            placeholder=placeholder
+                        )
                 
                 # Check if it's a text response
                 if message_obj.content:
-                    return {
-                        "response": message_obj.content,
-                        "session_id": session_id,
-                        "placeholder": placeholder
-                    }
+                    # Not cached: conversational replies can be personal to this user
+                    result = responses.text(message_obj.content)
+                    return responses.reply(
+                        result,
+                        fmt,
+                        session_id=session_id,
+                        placeholder=placeholder
+                    )
             
             # If we can't parse the response, return a helpful message
-            return {
-                "response": "I received your message but couldn't process the response properly. This might be a temporary issue. Try asking again!",
-                "session_id": session_id,
-                "placeholder": placeholder
-            }
+            return responses.reply(
+                responses.text("I received your message but couldn't process the response properly. This might be a temporary issue. Try asking again!"),
+                fmt,
+                session_id=session_id,
+                placeholder=placeholder
+            )
             
+        except AdmissionRejected:
+            raise
         except Exception as parse_error:
-            print(f"Response parsing error: {parse_error}")
-            return {
-                "response": "I'm having trouble processing the AI response. Let me try a different approach - what specific testing challenge are you facing?",
-                "session_id": session_id,
-                "placeholder": placeholder
-            }
+            logger.exception("Response parsing error")
+            return responses.reply(
+                responses.text("I'm having trouble processing the AI response. Let me try a different approach - what specific testing challenge are you facing?"),
+                fmt,
+                session_id=session_id,
+                placeholder=placeholder
+            )
+
+    except AdmissionRejected as e:
+        logger.info("Vision tool shed", extra={"reason": e.reason, "retry_after": e.retry_after})
+        return _overloaded(e, fmt, session_id, placeholder)
+
+    except LLMOverloaded as e:
+        return responses.reply(
+            responses.text("I'm getting a lot of questions right now — give me a few seconds and ask again!"),
+            fmt,
+            session_id=session_id,
+            placeholder=placeholder,
+            retry_after=round(e.retry_after, 1)
+        )
 
     except Exception as e:
-        # 🔥 Log full traceback
-        traceback.print_exc()
-        return {
-            "response": f"⚠️ AI error: {str(e)}",
-            "placeholder": placeholder
-        }
\ No newline at end of file
+        logger.exception("Chat request failed")
+        return responses.reply(
+            responses.text(f"⚠️ AI error: {str(e)}"),
+            fmt,
+            placeholder=placeholder
+        )
+
+    finally:
+        ticket.release()
+        if speculation is not None:
+            speculation.discard()
@@ -0,0 +1,218 @@
+# backend/services/account_store.py
+"""
+SQLite-backed store for accounts created through the chat agent.
+
+The database runs in WAL mode so any number of uvicorn workers can read
+while one writes. Account ids come from an AUTOINCREMENT key, so they are
+unique across workers and survive restarts. Listing uses keyset
+pagination on that key, so each page costs the same no matter how many
+accounts exist. created_at is local time in ISO 8601, so the
+created_after/created_before filters compare as strings.
+"""
+
+import json
+import os
+import sqlite3
+import threading
+import time
+from datetime import datetime
+from typing import List, Optional
+
+DEFAULT_DB_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "data", "accounts.db")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS accounts (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    admin_email TEXT NOT NULL,
+    plan TEXT NOT NULL,
+    teammates TEXT NOT NULL DEFAULT '[]',
+    status TEXT NOT NULL DEFAULT 'Active',
+    created_at TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_accounts_admin_email ON accounts(admin_email, id);
+CREATE INDEX IF NOT EXISTS idx_accounts_plan ON accounts(plan, id);
+CREATE INDEX IF NOT EXISTS idx_accounts_created_at ON accounts(created_at, id);
+-- Rows written before created_at was ISO 8601 used a space separator
+UPDATE accounts SET created_at = replace(created_at, ' ', 'T') WHERE created_at LIKE '____-__-__ %';
+
+CREATE TABLE IF NOT EXISTS idempotency_keys (
+    key TEXT PRIMARY KEY,
+    status TEXT NOT NULL,
+    result TEXT,
+    updated_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_idempotency_updated_at ON idempotency_keys(updated_at);
+"""
+
+MAX_PAGE_SIZE = 500
+
+
+def format_account_id(row_id: int) -> str:
+    return f"ACC_{row_id:04d}"
+
+
+def parse_timestamp(value: str) -> str:
+    """An ISO 8601 date or datetime as a created_at string; raises ValueError on anything else."""
+    try:
+        moment = datetime.fromisoformat(value)
+    except ValueError:
+        raise ValueError(f"Invalid timestamp: {value}") from None
+    if moment.tzinfo is not None:
+        moment = moment.astimezone().replace(tzinfo=None)
+    return moment.isoformat()
+
+
+def parse_account_id(account_id: str) -> int:
+    """Inverse of format_account_id; raises ValueError on anything else."""
+    if not account_id.startswith("ACC_"):
+        raise ValueError(f"Invalid account id: {account_id}")
+    return int(account_id[4:])
+
+
+class AccountStore:
+    def __init__(self, db_path: Optional[str] = None):
+        self.db_path = db_path or os.getenv("ACCOUNT_STORE_PATH", DEFAULT_DB_PATH)
+        self._local = threading.local()
+        self._init_lock = threading.Lock()
+        self._initialized = False
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is not None:
+            return conn
+        os.makedirs(os.path.dirname(os.path.abspath(self.db_path)), exist_ok=True)
+        conn = sqlite3.connect(self.db_path, timeout=30, isolation_level=None)
+        conn.row_factory = sqlite3.Row
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.execute("PRAGMA busy_timeout=30000")
+        with self._init_lock:
+            if not self._initialized:
+                conn.executescript(SCHEMA)
+                self._initialized = True
+        self._local.conn = conn
+        return conn
+
+    @staticmethod
+    def _to_dict(row: sqlite3.Row) -> dict:
+        return {
+            "admin_email": row["admin_email"],
+            "plan": row["plan"],
+            "teammates": json.loads(row["teammates"]),
+            "created_at": row["created_at"],
+            "status": row["status"],
+            "account_id": format_account_id(row["id"]),
+        }
+
+    def create(self, admin_email: str, plan: str, teammates: List[str], status: str = "Active") -> dict:
+        conn = self._connect()
+        cur = conn.execute(
+            "INSERT INTO accounts (admin_email, plan, teammates, status, created_at) VALUES (?, ?, ?, ?, ?)",
+            (admin_email.strip().lower(), plan.upper(), json.dumps(teammates), status, datetime.now().isoformat()),
+        )
+        row = conn.execute("SELECT * FROM accounts WHERE id = ?", (cur.lastrowid,)).fetchone()
+        return self._to_dict(row)
+
+    def get(self, account_id: str) -> Optional[dict]:
+        row = self._connect().execute(
+            "SELECT * FROM accounts WHERE id = ?", (parse_account_id(account_id),)
+        ).fetchone()
+        return self._to_dict(row) if row else None
+
+    def list(
+        self,
+        limit: int = 50,
+        cursor: Optional[str] = None,
+        plan: Optional[str] = None,
+        admin_email: Optional[str] = None,
+        created_after: Optional[str] = None,
+        created_before: Optional[str] = None,
+    ) -> dict:
+        """
+        Return one page of accounts in creation order.
+
+        `cursor` is the `next_cursor` of the previous page (the last
+        account id it returned). created_after/created_before take ISO 8601
+        dates or datetimes. Raises ValueError on a malformed cursor or
+        timestamp.
+        """
+        limit = max(1, min(limit, MAX_PAGE_SIZE))
+        clauses, params = [], []
+        if cursor:
+            clauses.append("id > ?")
+            params.append(parse_account_id(cursor))
+        if plan:
+            clauses.append("plan = ?")
+            params.append(plan.upper())
+        if admin_email:
+            clauses.append("admin_email = ?")
+            params.append(admin_email.strip().lower())
+        if created_after:
+            clauses.append("created_at >= ?")
+            params.append(parse_timestamp(created_after))
+        if created_before:
+            clauses.append("created_at < ?")
+            params.append(parse_timestamp(created_before))
+
+        where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+        rows = self._connect().execute(
+            f"SELECT * FROM accounts {where} ORDER BY id LIMIT ?", (*params, limit + 1)
+        ).fetchall()
+
+        has_more = len(rows) > limit
+        accounts = [self._to_dict(row) for row in rows[:limit]]
+        return {
+            "accounts": accounts,
+            "count": len(accounts),
+            "next_cursor": accounts[-1]["account_id"] if has_more else None,
+        }
+
+    # --- Idempotency records (see services/idempotency.py) ---
+
+    def claim_idempotency_key(self, key: str, window: float, stale_after: float) -> tuple[str, Optional[str]]:
+        """
+        Atomically look up or claim `key`. Returns one of:
+          ("done", result)  - a stored outcome younger than `window`
+          ("pending", None) - another caller is provisioning it right now
+          ("claimed", None) - the caller now owns the key and must complete or release it
+        """
+        conn = self._connect()
+        now = time.time()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            row = conn.execute(
+                "SELECT status, result, updated_at FROM idempotency_keys WHERE key = ?", (key,)
+            ).fetchone()
+            if row is not None:
+                age = now - row["updated_at"]
+                if row["status"] == "done" and age < window:
+                    conn.execute("COMMIT")
+                    return "done", row["result"]
+                if row["status"] == "pending" and age < stale_after:
+                    conn.execute("COMMIT")
+                    return "pending", None
+            conn.execute(
+                "INSERT OR REPLACE INTO idempotency_keys (key, status, result, updated_at) VALUES (?, 'pending', NULL, ?)",
+                (key, now),
+            )
+            conn.execute("COMMIT")
+            return "claimed", None
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+
+    def complete_idempotency_key(self, key: str, result: str, window: float) -> None:
+        conn = self._connect()
+        now = time.time()
+        conn.execute(
+            "UPDATE idempotency_keys SET status = 'done', result = ?, updated_at = ? WHERE key = ?",
+            (result, now, key),
+        )
+        conn.execute("DELETE FROM idempotency_keys WHERE status = 'done' AND updated_at < ?", (now - window,))
+
+    def release_idempotency_key(self, key: str) -> None:
+        self._connect().execute("DELETE FROM idempotency_keys WHERE key = ? AND status = 'pending'", (key,))
+
+
+# Global instance; the connection is opened on first use
+account_store = AccountStore()
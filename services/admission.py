@@ -0,0 +1,247 @@
+# backend/services/admission.py
+"""
+Admission control for expensive requests (LLM-backed chat, vision tools).
+
+Each AdmissionPool has a global concurrency limit, a per-tenant limit and
+a bounded FIFO wait queue. A request is shed straight away, and the caller
+returns 429 with Retry-After, when:
+
+- the queue is full, or the tenant already has too much in flight or queued;
+- the estimated wait plus the typical service time would overrun the
+  request deadline, since it would time out anyway;
+- it waited in the queue until its deadline without getting a slot.
+
+Service time is an EWMA of how long admitted requests held their slot, and
+it drives both the wait estimate and Retry-After. Vision tools get their
+own pool, so slow screenshots and OCR cannot use up the chat slots, and
+site crawls (services/site_crawler.py) a third.
+
+Limits are per worker process. Stats: GET /metrics (admission_*).
+"""
+
+import asyncio
+import math
+import os
+import time
+from collections import deque
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Deque, Dict, List, Mapping, Optional
+
+from utils.metrics import CollectedMetric, registry
+
+# Default client deadline when X-Request-Timeout (seconds) is not sent
+DEFAULT_DEADLINE = float(os.getenv("ADMISSION_DEADLINE", "30"))
+EWMA_ALPHA = 0.2
+
+
+class AdmissionRejected(Exception):
+    """The request was shed; retry after `retry_after` seconds."""
+
+    def __init__(self, pool: str, reason: str, retry_after: int):
+        super().__init__(f"{pool} admission rejected ({reason}); retry after {retry_after}s")
+        self.pool = pool
+        self.reason = reason
+        self.retry_after = retry_after
+
+
+class Ticket:
+    """A granted slot; release() is idempotent."""
+
+    __slots__ = ("_pool", "tenant", "_started", "_released")
+
+    def __init__(self, pool: "AdmissionPool", tenant: str):
+        self._pool = pool
+        self.tenant = tenant
+        self._started = time.monotonic()
+        self._released = False
+
+    def release(self) -> None:
+        if not self._released:
+            self._released = True
+            self._pool._release(self.tenant, time.monotonic() - self._started)
+
+
+class _Waiter:
+    __slots__ = ("tenant", "future")
+
+    def __init__(self, tenant: str, future: asyncio.Future):
+        self.tenant = tenant
+        self.future = future
+
+
+def deadline_from(headers: Mapping[str, str]) -> float:
+    """Monotonic deadline from the X-Request-Timeout header (seconds)."""
+    try:
+        timeout = float(headers.get("x-request-timeout") or DEFAULT_DEADLINE)
+    except ValueError:
+        timeout = DEFAULT_DEADLINE
+    return time.monotonic() + max(timeout, 0.0)
+
+
+class AdmissionPool:
+    def __init__(self, name: str, limit: int, tenant_limit: int, queue_size: int,
+                 max_wait: float, initial_service_time: float = 1.0):
+        self.name = name
+        self.limit = limit
+        self.tenant_limit = tenant_limit
+        self.queue_size = queue_size
+        self.max_wait = max_wait
+        self.service_time = initial_service_time
+        self.active = 0
+        self._active_by_tenant: Dict[str, int] = {}
+        self._queued_by_tenant: Dict[str, int] = {}
+        self._waiters: Deque[_Waiter] = deque()
+        self.stats = {"admitted": 0, "queued": 0, "shed_queue_full": 0, "shed_tenant": 0,
+                      "shed_deadline": 0, "shed_timeout": 0}
+
+    # --- bookkeeping (event-loop thread only) ---
+
+    @staticmethod
+    def _bump(counts: Dict[str, int], tenant: str, delta: int) -> None:
+        value = counts.get(tenant, 0) + delta
+        if value:
+            counts[tenant] = value
+        else:
+            counts.pop(tenant, None)
+
+    def _grant(self, tenant: str) -> Ticket:
+        self.active += 1
+        self._bump(self._active_by_tenant, tenant, 1)
+        self.stats["admitted"] += 1
+        return Ticket(self, tenant)
+
+    def _release(self, tenant: str, held: float) -> None:
+        self.active -= 1
+        self._bump(self._active_by_tenant, tenant, -1)
+        self.service_time += EWMA_ALPHA * (held - self.service_time)
+        self._dispatch()
+
+    def _dispatch(self) -> None:
+        """Hand free slots to the oldest waiters whose tenant is under its limit."""
+        if self.active >= self.limit or not self._waiters:
+            return
+        for waiter in list(self._waiters):
+            if self.active >= self.limit:
+                break
+            if self._active_by_tenant.get(waiter.tenant, 0) >= self.tenant_limit:
+                continue
+            self._waiters.remove(waiter)
+            self._bump(self._queued_by_tenant, waiter.tenant, -1)
+            waiter.future.set_result(self._grant(waiter.tenant))
+
+    def _abandon(self, waiter: _Waiter) -> None:
+        if waiter.future.done() and not waiter.future.cancelled():
+            # Granted just as the caller gave up: hand the slot on
+            waiter.future.result().release()
+            return
+        waiter.future.cancel()
+        self._waiters.remove(waiter)
+        self._bump(self._queued_by_tenant, waiter.tenant, -1)
+
+    def estimated_wait(self) -> float:
+        return (len(self._waiters) + 1) / self.limit * self.service_time
+
+    def _reject(self, reason: str) -> AdmissionRejected:
+        self.stats[f"shed_{reason}"] += 1
+        return AdmissionRejected(self.name, reason, max(1, math.ceil(self.estimated_wait())))
+
+    # --- public API ---
+
+    async def acquire(self, tenant: str, deadline: Optional[float] = None) -> Ticket:
+        """Wait for a slot, or raise AdmissionRejected; release() the ticket when done."""
+        tenant_load = self._active_by_tenant.get(tenant, 0) + self._queued_by_tenant.get(tenant, 0)
+        if tenant_load >= 2 * self.tenant_limit:
+            raise self._reject("tenant")
+        if (not self._waiters and self.active < self.limit
+                and self._active_by_tenant.get(tenant, 0) < self.tenant_limit):
+            return self._grant(tenant)
+        if len(self._waiters) >= self.queue_size:
+            raise self._reject("queue_full")
+
+        # Waiting longer than this would leave no time to actually serve the request
+        now = time.monotonic()
+        budget = self.max_wait
+        if deadline is not None:
+            budget = min(budget, deadline - now - self.service_time)
+        if self.estimated_wait() > budget:
+            raise self._reject("deadline")
+
+        waiter = _Waiter(tenant, asyncio.get_running_loop().create_future())
+        self._waiters.append(waiter)
+        self._bump(self._queued_by_tenant, tenant, 1)
+        self.stats["queued"] += 1
+        try:
+            await asyncio.wait((waiter.future,), timeout=budget)
+        except BaseException:
+            self._abandon(waiter)
+            raise
+        if not waiter.future.done():
+            self._abandon(waiter)
+            raise self._reject("timeout")
+        return waiter.future.result()
+
+    @asynccontextmanager
+    async def admit(self, tenant: str, deadline: Optional[float] = None) -> AsyncIterator[Ticket]:
+        ticket = await self.acquire(tenant, deadline)
+        try:
+            yield ticket
+        finally:
+            ticket.release()
+
+    def metrics(self) -> Dict[str, float]:
+        return {
+            **self.stats,
+            "active": self.active,
+            "waiting": len(self._waiters),
+            "limit": self.limit,
+            "service_time_s": round(self.service_time, 3),
+        }
+
+
+# Global instances: LLM-backed chat, and separate budgets for vision tools and site crawls
+chat_admission = AdmissionPool(
+    "chat",
+    limit=int(os.getenv("ADMISSION_CHAT_LIMIT", "32")),
+    tenant_limit=int(os.getenv("ADMISSION_CHAT_TENANT_LIMIT", "4")),
+    queue_size=int(os.getenv("ADMISSION_CHAT_QUEUE", "64")),
+    max_wait=float(os.getenv("ADMISSION_CHAT_MAX_WAIT", "10")),
+    initial_service_time=2.0,
+)
+vision_admission = AdmissionPool(
+    "vision",
+    limit=int(os.getenv("ADMISSION_VISION_LIMIT", "2")),
+    tenant_limit=int(os.getenv("ADMISSION_VISION_TENANT_LIMIT", "1")),
+    queue_size=int(os.getenv("ADMISSION_VISION_QUEUE", "8")),
+    max_wait=float(os.getenv("ADMISSION_VISION_MAX_WAIT", "60")),
+    initial_service_time=15.0,
+)
+# A crawl is admitted once and runs its own capture/generation workers, so it
+# holds one slot for minutes; a long service time sheds queued crawls early
+crawl_admission = AdmissionPool(
+    "crawl",
+    limit=int(os.getenv("ADMISSION_CRAWL_LIMIT", "2")),
+    tenant_limit=int(os.getenv("ADMISSION_CRAWL_TENANT_LIMIT", "1")),
+    queue_size=int(os.getenv("ADMISSION_CRAWL_QUEUE", "4")),
+    max_wait=float(os.getenv("ADMISSION_CRAWL_MAX_WAIT", "30")),
+    initial_service_time=300.0,
+)
+POOLS = (chat_admission, vision_admission, crawl_admission)
+
+
+def _collect_metrics() -> List[CollectedMetric]:
+    results = ("admitted", "shed_queue_full", "shed_tenant", "shed_deadline", "shed_timeout")
+    return [
+        CollectedMetric("admission_requests_total", "counter", "Admission decisions by pool and result", [
+            ("admission_requests_total", {"pool": pool.name, "result": result}, pool.stats[result])
+            for pool in POOLS for result in results
+        ]),
+        CollectedMetric("admission_active", "gauge", "Requests holding an admission slot",
+                        [("admission_active", {"pool": pool.name}, pool.active) for pool in POOLS]),
+        CollectedMetric("admission_waiting", "gauge", "Requests queued for an admission slot",
+                        [("admission_waiting", {"pool": pool.name}, len(pool._waiters)) for pool in POOLS]),
+        CollectedMetric("admission_service_seconds", "gauge", "EWMA of time a slot is held",
+                        [("admission_service_seconds", {"pool": pool.name}, pool.service_time) for pool in POOLS]),
+    ]
+
+
+registry.add_collector(_collect_metrics)
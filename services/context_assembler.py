@@ -0,0 +1,187 @@
+# backend/services/context_assembler.py
+"""
+Token-budgeted context assembly for knowledge-base prompts.
+
+Retrievers hand over ranked chunks; assemble() packs the most relevant,
+non-redundant ones into a token budget with maximal marginal relevance:
+each step takes the chunk with the best
+
+    lambda * relevance - (1 - lambda) * max similarity to the chunks already taken
+
+where similarity is the Jaccard overlap of content words. Near-duplicates
+are dropped, chunks that no longer fit are skipped in favour of smaller
+ones, and a single chunk larger than the whole budget is cut at a line
+boundary.
+
+Token counts are a local estimate (no tokenizer download or API call),
+deliberately on the high side so the real prompt stays under budget.
+
+    CONTEXT_TOKEN_BUDGET   tokens of retrieved context per prompt (300)
+    CONTEXT_MMR_LAMBDA     relevance vs. diversity trade-off (0.7)
+"""
+
+import math
+import os
+import re
+from collections import Counter
+from typing import Dict, FrozenSet, List, NamedTuple, Optional, Sequence
+
+from utils.metrics import histogram
+
+_TOKEN = re.compile(r"[A-Za-z]+|\d+|[^\w\s]")
+_TOKEN_EXTRA = re.compile(r"[A-Za-z]{6}|\d{3}")
+_WORD = re.compile(r"[a-z0-9]+")
+_SECTION_BREAK = re.compile(r"\n\s*\n")
+
+STOPWORDS = frozenset(
+    "a an and are as at be but by can do does for from has have how i if in is it its me my "
+    "of on or our so that the their them then there these this to up us was we what when "
+    "which who why will with you your".split()
+)
+
+DEFAULT_BUDGET = int(os.getenv("CONTEXT_TOKEN_BUDGET", "300"))
+DEFAULT_LAMBDA = float(os.getenv("CONTEXT_MMR_LAMBDA", "0.7"))
+# Chunks at least this similar to one already selected add nothing
+DUPLICATE_SIMILARITY = 0.8
+SEPARATOR = "\n\n"
+
+CONTEXT_TOKENS = histogram(
+    "rag_context_tokens", "Estimated tokens of retrieved context per prompt",
+    buckets=(50, 100, 200, 300, 400, 500, 750, 1000, 1500, 2000),
+)
+
+
+class Chunk(NamedTuple):
+    text: str
+    source: str
+    score: float
+
+
+class AssembledContext(NamedTuple):
+    text: str
+    chunks: List[Chunk]
+    tokens: int
+    budget: int
+    candidates: int
+
+
+def estimate_tokens(text: str) -> int:
+    """BPE-style estimate: a token per word, number or symbol, plus one per 6 letters / 3 digits."""
+    return len(_TOKEN.findall(text)) + len(_TOKEN_EXTRA.findall(text))
+
+
+def terms(text: str) -> FrozenSet[str]:
+    return frozenset(w for w in _WORD.findall(text.lower()) if w not in STOPWORDS)
+
+
+def term_counts(text: str) -> Counter:
+    return Counter(w for w in _WORD.findall(text.lower()) if w not in STOPWORDS)
+
+
+def jaccard(a: FrozenSet[str], b: FrozenSet[str]) -> float:
+    if not a or not b:
+        return 0.0
+    return len(a & b) / len(a | b)
+
+
+def split_sections(text: str) -> List[str]:
+    """Split on blank lines, keeping a heading-only block with the block after it."""
+    sections: List[str] = []
+    heading = ""
+    for block in _SECTION_BREAK.split(text.strip()):
+        block = block.strip()
+        if not block:
+            continue
+        if "\n" not in block and len(block) < 80 and not block.startswith(("-", "•", "*")):
+            heading = f"{heading}\n{block}" if heading else block
+            continue
+        sections.append(f"{heading}\n{block}" if heading else block)
+        heading = ""
+    if heading:
+        sections.append(heading)
+    return sections
+
+
+def lexical_scores(query: str, texts: Sequence[str]) -> List[float]:
+    """IDF-weighted share of the query's content words found in each text (0..1)."""
+    query_terms = terms(query)
+    if not query_terms or not texts:
+        return [0.0] * len(texts)
+    text_terms = [terms(t) for t in texts]
+    df: Dict[str, int] = {t: sum(1 for tt in text_terms if t in tt) for t in query_terms}
+    idf = {t: math.log(1 + len(texts) / (1 + df[t])) for t in query_terms}
+    total = sum(idf.values())
+    return [sum(idf[t] for t in query_terms & tt) / total for tt in text_terms]
+
+
+def truncate(text: str, budget: int) -> str:
+    """Longest prefix of whole lines (or words, for one long line) within budget."""
+    kept, used = [], 0
+    for line in text.splitlines():
+        cost = estimate_tokens(line) + 1
+        if used + cost > budget:
+            break
+        kept.append(line)
+        used += cost
+    if kept:
+        return "\n".join(kept)
+    words, used = [], 0
+    for word in text.split():
+        cost = estimate_tokens(word)
+        if used + cost > budget:
+            break
+        words.append(word)
+        used += cost
+    return " ".join(words)
+
+
+class ContextAssembler:
+    def __init__(self, budget: int = DEFAULT_BUDGET, mmr_lambda: float = DEFAULT_LAMBDA):
+        self.budget = budget
+        self.mmr_lambda = mmr_lambda
+
+    def assemble(self, chunks: Sequence[Chunk], budget: Optional[int] = None) -> AssembledContext:
+        budget = self.budget if budget is None else budget
+        candidates = [c for c in chunks if c.text.strip()]
+        if not candidates:
+            return AssembledContext("", [], 0, budget, 0)
+
+        top = max(c.score for c in candidates) or 1.0
+        relevance = [c.score / top for c in candidates]
+        chunk_terms = [terms(c.text) for c in candidates]
+        costs = [estimate_tokens(c.text) for c in candidates]
+        separator = estimate_tokens(SEPARATOR) + 1
+
+        selected: List[int] = []
+        texts: List[str] = []
+        used = 0
+        remaining = list(range(len(candidates)))
+        while remaining and used < budget:
+            def redundancy(i: int) -> float:
+                return max((jaccard(chunk_terms[i], chunk_terms[j]) for j in selected), default=0.0)
+
+            best = max(remaining, key=lambda i: self.mmr_lambda * relevance[i] - (1 - self.mmr_lambda) * redundancy(i))
+            remaining.remove(best)
+            if redundancy(best) >= DUPLICATE_SIMILARITY:
+                continue
+            cost = costs[best] + (separator if selected else 0)
+            text = candidates[best].text
+            if used + cost > budget:
+                if selected:
+                    continue
+                text = truncate(text, budget)
+                if not text:
+                    continue
+                cost = estimate_tokens(text)
+            selected.append(best)
+            texts.append(text)
+            used += cost
+
+        CONTEXT_TOKENS.observe(used)
+        return AssembledContext(
+            SEPARATOR.join(texts), [candidates[i] for i in selected], used, budget, len(candidates)
+        )
+
+
+# Global instance
+context_assembler = ContextAssembler()
@@ -1,9 +1,27 @@
 # services/email_validator.py
-from openai import OpenAI
-import os
 import re
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Iterable, Optional
 
-client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
+from services.llm_gateway import LLMOverloaded
+from services.model_router import Verdict, model_router
+
+# Well-known disposable providers, matched as the whole domain or a parent of it
+# (not as substrings: temple.edu and spamhaus.org are real organisations)
+DISPOSABLE_DOMAINS = {
+    "mailinator.com", "guerrillamail.com", "guerrillamail.net", "sharklasers.com", "10minutemail.com",
+    "10minutemail.net", "tempmail.com", "temp-mail.org", "tempmailo.com", "yopmail.com", "trashmail.com",
+    "throwawaymail.com", "fakeinbox.com", "getnada.com", "dispostable.com", "maildrop.cc", "burnermail.io",
+    "spamgourmet.com", "mintemail.com", "emailondeck.com", "mohmal.com",
+}
+BUSINESS_TLDS = {
+    "io", "ai", "co", "dev", "tech", "app", "cloud", "org", "net", "biz", "software", "systems",
+    "de", "fr", "uk", "nl", "se", "ch", "at", "be", "es", "it", "in", "au", "ca", "jp", "sg", "us",
+}
+
+EMAIL_FORMAT = re.compile(r'\b[A-Za-z0-9._%+-]+@[A-Za-z0-9.-]+\.[A-Z|a-z]{2,}\b')
+# Domains checked at once when validating a batch; unknown ones may each cost a model call
+BATCH_CONCURRENCY = 8
 
 class EmailValidator:
     def __init__(self):
@@ -12,13 +30,13 @@ class EmailValidator:
 
     def validate_email(self, email: str) -> dict:
         # 1. Basic format check
-        if not re.match(r'\b[A-Za-z0-9._%+-]+@[A-Za-z0-9.-]+\.[A-Z|a-z]{2,}\b', email):
+        if not EMAIL_FORMAT.match(email):
             return {"is_valid": False, "reason": "Invalid format"}
 
         domain = email.split("@")[1].lower()
 
-        # 2. Blocklist check (fast)
-        if domain in self.blocklist:
+        # 2. Blocklist and disposable-provider check (fast), before any rule that trusts a TLD
+        if domain in self.blocklist or self.is_disposable(domain):
             return {"is_valid": False, "reason": "Disposable email not allowed"}
 
         # 3. Personal domain? (warn, don't block)
@@ -31,6 +49,21 @@ class EmailValidator:
 
         return {"is_valid": True, "reason": "Valid business email"}
 
+    def validate_batch(self, emails: Iterable[str]) -> Dict[str, dict]:
+        """validate_email() for many addresses, checking each distinct domain once"""
+        results, by_domain = {}, {}
+        for email in set(emails):
+            if not EMAIL_FORMAT.match(email):
+                results[email] = {"is_valid": False, "reason": "Invalid format"}
+            else:
+                by_domain.setdefault(email.split("@")[1].lower(), []).append(email)
+        # Past the format check every rule (and the model's judgement) is about the domain
+        with ThreadPoolExecutor(BATCH_CONCURRENCY) as pool:
+            verdicts = pool.map(lambda group: self.validate_email(group[0]), by_domain.values())
+            for group, verdict in zip(by_domain.values(), verdicts):
+                results.update((email, verdict) for email in group)
+        return results
+
     def is_domain_known(self, domain: str) -> bool:
         """Check if domain is in your known list (or via WHOIS, DNS, etc.)"""
         # In prod: call DNS lookup or company DB
@@ -38,26 +71,37 @@ class EmailValidator:
         known_domains = {"acme.com", "testzeus.com", "google.com"}
         return domain in known_domains or domain.endswith(".com")
 
+    def is_disposable(self, domain: str) -> bool:
+        labels = domain.split(".")
+        return any(".".join(labels[i:]) in DISPOSABLE_DOMAINS for i in range(len(labels) - 1))
+
+    def local_validate_email(self, email: str) -> Optional[Verdict]:
+        """Obvious cases without a model call: disposable or plain company domains"""
+        domain = email.split("@")[1].lower()
+        labels = domain.split(".")
+        if self.is_disposable(domain):
+            return Verdict(False, 0.95, "local")
+        name = labels[-3] if len(labels) > 2 and labels[-2] in {"co", "com"} else labels[-2]
+        if labels[-1] in BUSINESS_TLDS and len(name) >= 3 and name.isalpha():
+            return Verdict(True, 0.9, "local")
+        return None
+
     def llm_validate_email(self, email: str) -> dict:
-        """Use GPT-5 to validate ambiguous emails"""
+        """Validate ambiguous emails: local rules, then the small model, then the large one"""
         try:
-            response = client.chat.completions.create(
-                model="gpt-5",
-                messages=[
-                    {"role": "system", "content": "You are an email validation assistant. Answer only YES or NO."},
-                    {"role": "user", "content": f"Is '{email}' a valid business/work email address? Answer only YES or NO."}
-                ],
-                max_tokens=10
+            verdict = model_router.classify(
+                "email_validator",
+                f"Is '{email}' a valid business/work email address?",
+                local=lambda: self.local_validate_email(email)
             )
-
-            # Extract YES/NO
-            content = response.choices[0].message.content.strip().lower()
-            is_valid = "yes" in content
-
-            return {
-                "is_valid": is_valid,
-                "reason": "LLM validated" if is_valid else "LLM flagged as suspicious"
-            }
+            if verdict.tier == "local":
+                reason = "Valid business email" if verdict.answer else "Disposable email not allowed"
+            else:
+                reason = "LLM validated" if verdict.answer else "LLM flagged as suspicious"
+            return {"is_valid": verdict.answer, "reason": reason}
+        except LLMOverloaded:
+            # Don't block signups while the LLM is saturated; the format and blocklist checks passed
+            return {"is_valid": True, "warning": "Could not verify this domain right now"}
         except Exception as e:
             return {"is_valid": False, "reason": f"Validation failed: {str(e)}"}
 
@@ -0,0 +1,483 @@
+# backend/services/gherkin.py
+"""
+Local Gherkin parser, validator and repairer for generated test cases.
+
+The vision model's Gherkin used to go straight into a markdown fence, so a
+malformed answer meant a whole new screenshot round trip. parse() instead
+turns the model's text into a Feature AST in one pass over the lines and:
+
+- repairs what is unambiguous: markdown around keywords (fences, headings,
+  bold, bullets, numbering), keyword case and missing colons, chat preamble
+  before the feature, a missing Feature line, And/But as a first step,
+  Scenario vs. Scenario Outline, unnamed scenarios, table cell padding;
+- flags, per scenario, what isn't: no steps, no Then, stray text between
+  steps, <placeholders> without Examples, ragged Examples tables, an
+  unclosed doc string;
+- drops near-identical scenarios (same step keywords, step words at least
+  GHERKIN_DUPLICATE_SIMILARITY alike).
+
+regenerate_broken() sends only the flagged scenarios, with their problems
+and the feature's context, back to a text model (GHERKIN_REPAIR_MODEL) and
+splices the fixed ones in; the screenshot is never resent. render() writes
+the canonical text, as_dict() the AST for JSON clients.
+"""
+
+import os
+import re
+from typing import Callable, Dict, List, NamedTuple, Optional, Tuple
+
+from services.context_assembler import jaccard, terms
+from services.llm_gateway import Lane, llm_gateway
+from utils.logger import get_logger
+from utils.metrics import counter
+
+logger = get_logger(__name__)
+
+DUPLICATE_SIMILARITY = float(os.getenv("GHERKIN_DUPLICATE_SIMILARITY", "0.9"))
+REPAIR_MODEL = os.getenv("GHERKIN_REPAIR_MODEL", "gpt-5-mini")
+# Scenarios sent back for regeneration per document; the rest stay flagged
+MAX_REGENERATIONS = int(os.getenv("GHERKIN_MAX_REGENERATIONS", "3"))
+
+GHERKIN_SCENARIOS = counter("gherkin_scenarios_total", "Generated Gherkin scenarios by outcome", ["outcome"])
+
+_MARKDOWN_PREFIX = re.compile(r"^(?:#{1,6}\s+|>\s*|(?:[-+]|\*(?=\s+\**(?:given|when|then|and|but)\b))\s+|\d+[.)]\s+)+", re.I)
+_BOLD = re.compile(r"\*\*|__")
+_FEATURE = re.compile(r"^feature\s*:\s*(.*)$", re.I)
+_BACKGROUND = re.compile(r"^background\s*:\s*(.*)$", re.I)
+_EXAMPLES = re.compile(r"^(?:examples|scenarios)\s*:\s*(.*)$", re.I)
+_SCENARIO = re.compile(r"^(scenario outline|scenario template|scenario|example)\s*:\s*(.*)$", re.I)
+_STEP = re.compile(r"^(given|when|then|and|but)\b\s*:?\s*(.*)$|^\*\s+(.*)$", re.I)
+_KEYWORD_LINES = (_FEATURE, _BACKGROUND, _EXAMPLES, _SCENARIO, _STEP)
+_SCENARIO_KEYWORDS = ("Scenario", "Scenario Outline", "Scenario Template", "Example")
+_PLACEHOLDER = re.compile(r"<([^<>]+)>")
+
+
+class Step(NamedTuple):
+    keyword: str
+    text: str
+    line: int
+    table: Tuple[Tuple[str, ...], ...] = ()
+    doc_string: Optional[str] = None
+
+
+class Examples(NamedTuple):
+    header: Tuple[str, ...]
+    rows: Tuple[Tuple[str, ...], ...]
+
+
+class Scenario(NamedTuple):
+    kind: str  # "Scenario" or "Scenario Outline"
+    name: str
+    tags: Tuple[str, ...]
+    description: str
+    steps: Tuple[Step, ...]
+    examples: Tuple[Examples, ...]
+    line: int
+    repairs: Tuple[str, ...]
+    errors: Tuple[str, ...]
+    regenerated: bool = False
+
+    @property
+    def broken(self) -> bool:
+        return bool(self.errors)
+
+
+class Feature(NamedTuple):
+    name: str
+    tags: Tuple[str, ...]
+    description: str
+    background: Tuple[Step, ...]
+    scenarios: Tuple[Scenario, ...]
+    repairs: Tuple[str, ...]
+    duplicates: Tuple[str, ...]  # names of the scenarios dropped as duplicates
+
+    @property
+    def broken(self) -> List[Scenario]:
+        return [s for s in self.scenarios if s.broken]
+
+    @property
+    def repaired(self) -> int:
+        return sum(1 for s in self.scenarios if s.repairs and not s.errors and not s.regenerated)
+
+    @property
+    def regenerated(self) -> int:
+        return sum(1 for s in self.scenarios if s.regenerated)
+
+
+class _Draft:
+    """A scenario (or the background) while its lines are being read"""
+    __slots__ = ("kind", "name", "tags", "description", "steps", "examples", "line", "repairs", "errors")
+
+    def __init__(self, kind: str, name: str, tags: List[str], line: int):
+        self.kind = kind
+        self.name = name
+        self.tags = tags
+        self.description: List[str] = []
+        self.steps: List[list] = []  # [keyword, text, line, table rows, doc string lines]
+        self.examples: List[list] = []  # [header, rows]
+        self.line = line
+        self.repairs: List[str] = []
+        self.errors: List[str] = []
+
+
+def _cells(line: str) -> Tuple[str, ...]:
+    return tuple(cell.strip() for cell in line.strip().strip("|").split("|"))
+
+
+def _clean(raw: str, repairs: List[str], lineno: int) -> str:
+    """Strip markdown around a keyword line; comments and other text are left to the parser"""
+    line = raw.strip()
+    if line.startswith(("|", '"""', "@")):
+        return line
+    cleaned = _BOLD.sub("", _MARKDOWN_PREFIX.sub("", line)).strip()
+    if cleaned == line:
+        return line
+    if any(pattern.match(cleaned) for pattern in _KEYWORD_LINES):
+        repairs.append(f"line {lineno}: removed markdown")
+        return cleaned
+    return "" if line.startswith("#") else line
+
+
+def parse(text: str) -> Feature:
+    """Parse (and repair what is unambiguous in) a model's Gherkin answer."""
+    feature_repairs: List[str] = []
+    feature_name, feature_tags, feature_description = "", [], []
+    background: Optional[_Draft] = None
+    drafts: List[_Draft] = []
+    current: Optional[_Draft] = None
+    pending_tags: List[str] = []
+    seen_feature = in_doc_string = False
+    doc_lines: List[str] = []
+    doc_start = 0
+    preamble = postamble = fences = 0
+    line_repairs: List[str] = []
+
+    for lineno, raw in enumerate(text.splitlines(), 1):
+        # The previous line's cleanup goes where that line ended up: a
+        # Scenario line's to the scenario it started, not the one before
+        (current.repairs if current is not None else feature_repairs).extend(line_repairs)
+        line_repairs = []
+        if in_doc_string:
+            if raw.strip() == '"""':
+                current.steps[-1][4] = doc_lines
+                in_doc_string, doc_lines = False, []
+            else:
+                doc_lines.append(raw.strip())
+            continue
+        if raw.strip().startswith("```"):
+            feature_repairs.append(f"line {lineno}: removed code fence")
+            fences += 1
+            continue
+        if fences >= 2:
+            # Chat text after the closing fence
+            postamble += bool(raw.strip())
+            continue
+
+        line = _clean(raw, line_repairs, lineno)
+        if not line or line.startswith("#"):
+            continue
+        if line.startswith("@"):
+            pending_tags.extend(tag for tag in line.split() if tag.startswith("@"))
+            continue
+
+        m = _FEATURE.match(line)
+        if m and not seen_feature:
+            seen_feature = True
+            feature_name, feature_tags, pending_tags = m.group(1).strip(), pending_tags, []
+            if preamble:
+                feature_repairs.append(f"dropped {preamble} line(s) of text before the feature")
+                preamble = 0
+            continue
+
+        m = _BACKGROUND.match(line)
+        if m and background is None and not drafts:
+            background = current = _Draft("Background", "", [], lineno)
+            continue
+
+        m = _EXAMPLES.match(line)
+        if m and current is not None and current is not background:
+            current.examples.append([None, []])
+            continue
+
+        m = _SCENARIO.match(line)
+        if m:
+            kind = "Scenario Outline" if m.group(1).lower() in ("scenario outline", "scenario template") else "Scenario"
+            current = _Draft(kind, m.group(2).strip(), pending_tags, lineno)
+            pending_tags = []
+            if m.group(1) not in _SCENARIO_KEYWORDS:
+                current.repairs.append(f"line {lineno}: normalized scenario keyword")
+            drafts.append(current)
+            continue
+
+        m = _STEP.match(line)
+        if m:
+            if current is None:
+                # Steps before any scenario: the model left out the Scenario line
+                current = _Draft("Scenario", "", pending_tags, lineno)
+                current.repairs.append(f"line {lineno}: added missing Scenario line")
+                pending_tags = []
+                drafts.append(current)
+            keyword = "*" if m.group(3) is not None else m.group(1).capitalize()
+            step_text = (m.group(3) if m.group(3) is not None else m.group(2)).strip()
+            if keyword != "*" and not line.startswith(keyword):
+                current.repairs.append(f"line {lineno}: normalized step keyword")
+            if current.examples:
+                current.errors.append(f"line {lineno}: step after Examples")
+            if step_text:
+                current.steps.append([keyword, step_text, lineno, [], None])
+            else:
+                current.repairs.append(f"line {lineno}: dropped empty step")
+            continue
+
+        if line.startswith("|"):
+            if current is not None and current.examples:
+                header, rows = current.examples[-1]
+                if header is None:
+                    current.examples[-1][0] = _cells(line)
+                else:
+                    rows.append(_cells(line))
+            elif current is not None and current.steps:
+                current.steps[-1][3].append(_cells(line))
+            elif current is not None:
+                current.errors.append(f"line {lineno}: table without a step")
+            continue
+
+        if line == '"""' and current is not None and current.steps:
+            in_doc_string, doc_start = True, lineno
+            continue
+
+        # Free text: descriptions are allowed before the first step
+        if current is None:
+            if seen_feature:
+                feature_description.append(line)
+            else:
+                preamble += 1
+        elif not current.steps and not current.examples:
+            current.description.append(line)
+        else:
+            current.errors.append(f"line {lineno}: unrecognised line {line[:60]!r}")
+
+    (current.repairs if current is not None else feature_repairs).extend(line_repairs)
+    if in_doc_string:
+        current.steps[-1][4] = doc_lines
+        current.errors.append(f"line {doc_start}: doc string not closed")
+    if postamble:
+        feature_repairs.append(f"dropped {postamble} line(s) of text after the closing fence")
+    if not seen_feature:
+        feature_name = "Generated test cases"
+        if preamble:
+            feature_repairs.append(f"dropped {preamble} line(s) of text before the scenarios")
+        feature_repairs.append("added missing Feature line")
+
+    scenarios = [_finish(draft, index) for index, draft in enumerate(drafts, 1)]
+    scenarios, duplicates = dedupe(scenarios)
+    return Feature(
+        name=feature_name,
+        tags=tuple(feature_tags),
+        description="\n".join(feature_description),
+        background=_finish(background, 0).steps if background else (),
+        scenarios=tuple(scenarios),
+        repairs=tuple(feature_repairs),
+        duplicates=tuple(duplicates),
+    )
+
+
+def _finish(draft: _Draft, index: int) -> Scenario:
+    """Validate a draft and build its Scenario"""
+    repairs, errors = draft.repairs, draft.errors
+    if draft.kind != "Background" and not draft.name:
+        draft.name = f"Scenario {index}"
+        repairs.append("named unnamed scenario")
+
+    steps = []
+    for i, (keyword, text, line, table, doc) in enumerate(draft.steps):
+        if i == 0 and keyword in ("And", "But"):
+            keyword = "Given"
+            repairs.append(f"line {line}: first step '{draft.steps[0][0]}' changed to 'Given'")
+        widths = {len(row) for row in table}
+        if len(widths) > 1:
+            errors.append(f"line {line}: data table rows have different widths")
+        steps.append(Step(keyword, text, line, tuple(table), "\n".join(doc) if doc is not None else None))
+
+    examples = []
+    for header, rows in draft.examples:
+        if header is None or not rows:
+            errors.append("Examples without a header and at least one row")
+            continue
+        if any(len(row) != len(header) for row in rows):
+            errors.append("Examples rows don't match the header width")
+        examples.append(Examples(header, tuple(rows)))
+
+    if draft.kind == "Background":
+        return Scenario("Background", "", (), "", tuple(steps), (), draft.line, tuple(repairs), tuple(errors))
+
+    kind = draft.kind
+    placeholders = {p for step in steps for p in _PLACEHOLDER.findall(step.text)}
+    if examples and kind == "Scenario":
+        kind = "Scenario Outline"
+        repairs.append("Scenario with Examples changed to Scenario Outline")
+    elif not draft.examples and kind == "Scenario Outline" and not placeholders:
+        kind = "Scenario"
+        repairs.append("Scenario Outline without Examples or placeholders changed to Scenario")
+    if placeholders and not examples:
+        errors.append(f"placeholders {', '.join(sorted('<' + p + '>' for p in placeholders))} without Examples")
+    elif placeholders:
+        missing = placeholders - {column for e in examples for column in e.header}
+        if missing:
+            errors.append(f"placeholders {', '.join(sorted('<' + p + '>' for p in missing))} not in Examples")
+    if not steps:
+        errors.append("no steps")
+    elif not any(step.keyword == "Then" for step in steps):
+        errors.append("no Then step (nothing is checked)")
+
+    return Scenario(kind, draft.name, tuple(draft.tags), "\n".join(draft.description), tuple(steps),
+                    tuple(examples), draft.line, tuple(repairs), tuple(errors))
+
+
+def dedupe(scenarios: List[Scenario]) -> Tuple[List[Scenario], List[str]]:
+    """Drop scenarios whose steps are near-identical to an earlier one's"""
+    kept: List[Tuple[Scenario, Tuple[str, ...], frozenset]] = []
+    dropped: List[str] = []
+    for scenario in scenarios:
+        keywords = tuple(step.keyword for step in scenario.steps)
+        words = terms(" ".join(step.text for step in scenario.steps))
+        if scenario.steps and any(
+            keywords == other_keywords and jaccard(words, other_words) >= DUPLICATE_SIMILARITY
+            for _, other_keywords, other_words in kept
+        ):
+            dropped.append(scenario.name)
+            continue
+        kept.append((scenario, keywords, words))
+    return [scenario for scenario, _, _ in kept], dropped
+
+
+# --- output ---
+
+def _render_table(rows, indent: str) -> List[str]:
+    widths = [max(len(row[i]) for row in rows if i < len(row)) for i in range(max(len(row) for row in rows))]
+    return [indent + "| " + " | ".join(cell.ljust(widths[i]) for i, cell in enumerate(row)) + " |" for row in rows]
+
+
+def _render_steps(steps, indent: str) -> List[str]:
+    lines = []
+    for step in steps:
+        lines.append(f"{indent}{step.keyword} {step.text}")
+        if step.table:
+            lines.extend(_render_table(step.table, indent + "  "))
+        if step.doc_string is not None:
+            lines.extend([indent + '  """'] + [indent + "  " + l for l in step.doc_string.split("\n")] + [indent + '  """'])
+    return lines
+
+
+def render_scenario(scenario: Scenario, indent: str = "  ") -> str:
+    lines = [indent + " ".join(scenario.tags)] if scenario.tags else []
+    lines.append(f"{indent}{scenario.kind}: {scenario.name}")
+    lines.extend(indent + "  " + l for l in scenario.description.split("\n") if l)
+    lines.extend(_render_steps(scenario.steps, indent + "  "))
+    for examples in scenario.examples:
+        lines.append("")
+        lines.append(f"{indent}  Examples:")
+        lines.extend(_render_table((examples.header,) + examples.rows, indent + "    "))
+    return "\n".join(lines)
+
+
+def render(feature: Feature) -> str:
+    lines = [" ".join(feature.tags)] if feature.tags else []
+    lines.append(f"Feature: {feature.name}")
+    lines.extend("  " + l for l in feature.description.split("\n") if l)
+    if feature.background:
+        lines += ["", "  Background:"] + _render_steps(feature.background, "    ")
+    for scenario in feature.scenarios:
+        lines += ["", render_scenario(scenario)]
+    return "\n".join(lines)
+
+
+def as_dict(feature: Feature) -> Dict:
+    def convert(value):
+        if hasattr(value, "_asdict"):
+            return {k: convert(v) for k, v in value._asdict().items()}
+        if isinstance(value, tuple):
+            return [convert(v) for v in value]
+        return value
+    return convert(feature)
+
+
+def summary(feature: Feature) -> str:
+    """One line for the response: what was checked and fixed"""
+    parts = [f"{len(feature.scenarios)} scenario(s) validated"]
+    if feature.repaired:
+        parts.append(f"{feature.repaired} auto-repaired")
+    if feature.regenerated:
+        parts.append(f"{feature.regenerated} regenerated")
+    if feature.duplicates:
+        parts.append(f"{len(feature.duplicates)} duplicate(s) removed")
+    if feature.broken:
+        parts.append(f"{len(feature.broken)} still need attention")
+    return ", ".join(parts)
+
+
+# --- targeted regeneration ---
+
+def _regenerate_with_llm(prompt: str) -> str:
+    # Part of the vision tool's work, so it uses that lane's budget
+    response = llm_gateway.chat_sync(
+        "gherkin_repair",
+        Lane.VISION,
+        model=REPAIR_MODEL,
+        messages=[
+            {"role": "system", "content": "You fix Gherkin scenarios. Reply with the corrected scenario only, "
+                                          "in plain Gherkin, no markdown and no explanation."},
+            {"role": "user", "content": prompt},
+        ],
+    )
+    return response.choices[0].message.content or ""
+
+
+def regenerate_broken(feature: Feature, regenerate: Optional[Callable[[str], str]] = None,
+                      limit: int = MAX_REGENERATIONS) -> Feature:
+    """
+    Send each broken scenario (up to limit) back to a text model with its
+    problems and splice the fixed ones in. Scenarios that still fail keep
+    their errors.
+    """
+    regenerate = regenerate or _regenerate_with_llm
+    context = [f"Feature: {feature.name}"]
+    if feature.background:
+        context += ["", "  Background:"] + _render_steps(feature.background, "    ")
+    scenarios = list(feature.scenarios)
+    for index, scenario in enumerate(scenarios):
+        if not scenario.broken or limit <= 0:
+            continue
+        limit -= 1
+        prompt = (
+            "\n".join(context) + "\n\nThis scenario from the feature above is invalid:\n\n"
+            + render_scenario(scenario) + "\n\nProblems:\n" + "\n".join(f"- {e}" for e in scenario.errors)
+            + "\n\nRewrite it so it is valid Gherkin with the same intent."
+        )
+        try:
+            reply = parse(regenerate(prompt))
+        except Exception as e:
+            logger.warning("Gherkin regeneration failed", extra={"scenario": scenario.name, "error": str(e)})
+            continue
+        if len(reply.scenarios) == 1 and not reply.scenarios[0].broken:
+            scenarios[index] = reply.scenarios[0]._replace(
+                repairs=scenario.repairs + ("regenerated: " + "; ".join(scenario.errors),), regenerated=True
+            )
+    return feature._replace(scenarios=tuple(scenarios))
+
+
+def validate(text: str, regenerate: Optional[Callable[[str], str]] = None) -> Feature:
+    """parse() + regenerate_broken(), with metrics"""
+    feature = parse(text)
+    if feature.broken:
+        feature = regenerate_broken(feature, regenerate)
+    for scenario in feature.scenarios:
+        if scenario.broken:
+            outcome = "broken"
+        elif scenario.regenerated:
+            outcome = "regenerated"
+        else:
+            outcome = "repaired" if scenario.repairs else "valid"
+        GHERKIN_SCENARIOS.labels(outcome).inc()
+    GHERKIN_SCENARIOS.labels("duplicate").inc(len(feature.duplicates))
+    return feature
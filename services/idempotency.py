@@ -0,0 +1,116 @@
+# backend/services/idempotency.py
+"""
+Idempotent account provisioning.
+
+The model may call create_tenant_and_team several times for the same user,
+and users double-submit. Every provisioning request is keyed by
+(admin email, plan, teammate set):
+
+- concurrent duplicates in this process share one in-flight call
+  (single-flight) and all get its result;
+- duplicates in other workers see the key as pending in the account store
+  and wait for the stored outcome;
+- a successful outcome is replayed for IDEMPOTENCY_WINDOW_SECONDS.
+
+Keys carry the caller's namespace: callers store different result types
+(tools/account keeps "SUCCESS: ..." strings, the chat router payload
+dicts), so one caller must never be handed another's replay.
+
+Outcomes are stored as JSON, so any JSON-serializable result can be replayed.
+"""
+
+import hashlib
+import json
+import os
+import threading
+import time
+from typing import Any, Callable, Iterable, Optional
+
+from services.account_store import account_store
+
+IDEMPOTENCY_WINDOW_SECONDS = float(os.getenv("IDEMPOTENCY_WINDOW_SECONDS", "600"))
+# A pending claim older than this is assumed to belong to a dead worker
+PENDING_STALE_SECONDS = float(os.getenv("IDEMPOTENCY_PENDING_STALE_SECONDS", "120"))
+PENDING_POLL_SECONDS = 0.2
+
+
+def idempotency_key(admin_email: str, plan: str, teammate_emails: Iterable[str], *, namespace: str) -> str:
+    """Stable key for a provisioning request; teammate order and case don't matter."""
+    teammates = sorted({e.strip().lower() for e in teammate_emails if e.strip()})
+    raw = "|".join([namespace, admin_email.strip().lower(), (plan or "").strip().lower(), ",".join(teammates)])
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+class _Call:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result: Any = None
+        self.error: Optional[BaseException] = None
+
+
+class IdempotentRunner:
+    def __init__(self, store=account_store, window: float = IDEMPOTENCY_WINDOW_SECONDS,
+                 stale_after: float = PENDING_STALE_SECONDS):
+        self.store = store
+        self.window = window
+        self.stale_after = stale_after
+        self._inflight: dict[str, _Call] = {}
+        self._lock = threading.Lock()
+        self.stats = {"executed": 0, "coalesced": 0, "replayed": 0}
+
+    def run(self, key: str, fn: Callable[[], Any], should_store: Callable[[Any], bool] = lambda r: True) -> Any:
+        """Run fn() at most once per key and window; duplicates get the same result."""
+        with self._lock:
+            call = self._inflight.get(key)
+            leader = call is None
+            if leader:
+                call = self._inflight[key] = _Call()
+
+        if not leader:
+            self.stats["coalesced"] += 1
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = self._run_persisted(key, fn, should_store)
+            return call.result
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                self._inflight.pop(key, None)
+            call.done.set()
+
+    def _run_persisted(self, key: str, fn: Callable[[], Any], should_store: Callable[[Any], bool]) -> Any:
+        waited = False
+        while True:
+            status, stored = self.store.claim_idempotency_key(key, self.window, self.stale_after)
+            if status == "done":
+                self.stats["coalesced" if waited else "replayed"] += 1
+                return json.loads(stored)
+            if status == "claimed":
+                break
+            # Another worker owns the key; wait for it to finish or go stale
+            waited = True
+            time.sleep(PENDING_POLL_SECONDS)
+
+        try:
+            result = fn()
+        except BaseException:
+            self.store.release_idempotency_key(key)
+            raise
+
+        self.stats["executed"] += 1
+        if should_store(result):
+            self.store.complete_idempotency_key(key, json.dumps(result), self.window)
+        else:
+            # Failures are not replayed so the user can retry right away
+            self.store.release_idempotency_key(key)
+        return result
+
+
+# Global instance shared by the account tools
+provisioning_runner = IdempotentRunner()
@@ -0,0 +1,548 @@
+# backend/services/ingestion.py
+"""
+Streaming, incremental ingestion of the knowledge docs (testzeus_docs).
+
+    python -m services.ingestion [--docs DIR] [--index PATH] [--full]
+
+Each file streams through generator stages, so memory stays bounded by
+one block and one chunk however large the file is:
+
+    read (64 KB blocks, hashed as they pass)
+      -> normalize (.txt as is; .md and .html stripped to plain lines)
+      -> chunk (paragraphs packed up to CHUNK_TOKENS, a new chunk per heading)
+      -> tokenize (term frequencies; token counts come from the chunker)
+      -> index (chunks and postings written to SQLite in batches)
+
+The documents table is the manifest: path, size, mtime and the SHA-256 of
+the content. A re-run skips files whose size and mtime are unchanged,
+hashes the rest and only re-indexes those whose content changed, and
+drops files that were deleted. Each file is replaced in one transaction,
+so readers never see it half-written.
+"""
+
+import argparse
+import codecs
+import hashlib
+import math
+import os
+import re
+import sqlite3
+import threading
+import time
+from collections import Counter
+from html.parser import HTMLParser
+from typing import Dict, Iterable, Iterator, List, NamedTuple, Optional, Tuple
+
+from services.context_assembler import Chunk, estimate_tokens, term_counts, terms
+from utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+# The shared base corpus; tenant corpora live under services/tenant_knowledge
+DEFAULT_DOCS_PATH = os.getenv("KNOWLEDGE_DOCS_PATH", os.path.join(BACKEND_DIR, "testzeus_docs"))
+DEFAULT_INDEX_PATH = os.path.join(BACKEND_DIR, "data", "knowledge.db")
+
+EXTENSIONS = (".txt", ".md", ".markdown", ".html", ".htm")
+BLOCK_SIZE = 64 * 1024
+# Longer lines (minified HTML, generated text) are cut, preferably at a space
+MAX_LINE = 8 * 1024
+CHUNK_TOKENS = int(os.getenv("KNOWLEDGE_CHUNK_TOKENS", "200"))
+WRITE_BATCH = 256
+BM25_K1 = 1.2
+BM25_B = 0.75
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS documents (
+    path TEXT PRIMARY KEY,
+    sha256 TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    mtime_ns INTEGER NOT NULL,
+    chunks INTEGER NOT NULL,
+    tokens INTEGER NOT NULL,
+    ingested_at REAL NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS chunks (
+    id INTEGER PRIMARY KEY,
+    path TEXT NOT NULL,
+    ord INTEGER NOT NULL,
+    text TEXT NOT NULL,
+    tokens INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_chunks_path ON chunks(path, ord);
+
+CREATE TABLE IF NOT EXISTS postings (
+    term TEXT NOT NULL,
+    chunk_id INTEGER NOT NULL,
+    tf INTEGER NOT NULL,
+    PRIMARY KEY (chunk_id, term)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS idx_postings_term ON postings(term);
+"""
+
+
+class IngestReport(NamedTuple):
+    files: int
+    ingested: int
+    unchanged: int
+    removed: int
+    bytes: int
+    chunks: int
+    seconds: float
+
+    @property
+    def mb_per_s(self) -> float:
+        return self.bytes / 1e6 / self.seconds if self.seconds else 0.0
+
+
+class TokenizedChunk(NamedTuple):
+    text: str
+    tokens: int
+    counts: Counter
+
+
+# --- stages ---
+
+def read_blocks(path: str, hasher=None, block_size: int = BLOCK_SIZE) -> Iterator[str]:
+    """Decoded text, one block at a time; feeds the raw bytes to `hasher`."""
+    decoder = codecs.getincrementaldecoder("utf-8")(errors="replace")
+    with open(path, "rb") as f:
+        while True:
+            block = f.read(block_size)
+            if not block:
+                break
+            if hasher is not None:
+                hasher.update(block)
+            yield decoder.decode(block)
+    tail = decoder.decode(b"", final=True)
+    if tail:
+        yield tail
+
+
+def _cut(line: str) -> Iterator[str]:
+    while len(line) > MAX_LINE:
+        cut = line.rfind(" ", 0, MAX_LINE)
+        cut = cut if cut > 0 else MAX_LINE
+        yield line[:cut]
+        line = line[cut:].lstrip()
+    yield line
+
+
+def split_lines(blocks: Iterable[str]) -> Iterator[str]:
+    pending = ""
+    for block in blocks:
+        pending += block
+        lines = pending.split("\n")
+        pending = lines.pop()
+        for line in lines:
+            yield from _cut(line.rstrip("\r"))
+        if len(pending) > MAX_LINE:
+            *head, pending = list(_cut(pending))
+            yield from head
+    if pending:
+        yield from _cut(pending)
+
+
+_MD_HEADING = re.compile(r"^\s{0,3}#{1,6}\s+(.*?)\s*#*\s*$")
+_MD_IMAGE = re.compile(r"!\[([^\]]*)\]\([^)]*\)")
+_MD_LINK = re.compile(r"\[([^\]]+)\]\([^)]*\)")
+_MD_EMPHASIS = re.compile(r"\*\*|__|`")
+_MD_BULLET = re.compile(r"^\s*[*+]\s+")
+_MD_QUOTE = re.compile(r"^\s*>\s?")
+_MD_RULE = re.compile(r"^\s*([-*_])(\s*\1){2,}\s*$")
+
+
+def normalize_markdown(lines: Iterable[str]) -> Iterator[str]:
+    in_code = False
+    for line in lines:
+        if line.lstrip().startswith(("```", "~~~")):
+            in_code = not in_code
+            continue
+        if in_code:
+            yield line
+            continue
+        heading = _MD_HEADING.match(line)
+        if heading:
+            # Headings stand alone so the chunker starts a new chunk at them
+            yield ""
+            yield heading.group(1)
+            yield ""
+            continue
+        if _MD_RULE.match(line):
+            yield ""
+            continue
+        line = _MD_QUOTE.sub("", line)
+        line = _MD_BULLET.sub("- ", line)
+        line = _MD_IMAGE.sub(r"\1", line)
+        line = _MD_LINK.sub(r"\1", line)
+        yield _MD_EMPHASIS.sub("", line)
+
+
+class _HTMLText(HTMLParser):
+    """Collects text lines; block-level tags end a line, headings and paragraphs a section."""
+
+    SKIP = {"script", "style", "noscript", "template", "svg", "head"}
+    BREAK = {"br", "div", "li", "tr", "dt", "dd", "pre", "blockquote", "td", "th"}
+    SECTION = {"p", "h1", "h2", "h3", "h4", "h5", "h6", "ul", "ol", "table", "section", "article", "header", "footer"}
+
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.lines: List[str] = []
+        self._text: List[str] = []
+        self._size = 0
+        self._skip = 0
+
+    def flush(self) -> None:
+        if self._text:
+            line = " ".join("".join(self._text).split())
+            self._text, self._size = [], 0
+            if line:
+                self.lines.append(line)
+
+    def handle_starttag(self, tag: str, attrs) -> None:
+        if tag in self.SKIP:
+            self._skip += 1
+        elif tag in self.SECTION:
+            self.flush()
+            self.lines.append("")
+        elif tag in self.BREAK:
+            self.flush()
+            if tag == "li":
+                self._text.append("- ")
+
+    def handle_endtag(self, tag: str) -> None:
+        if tag in self.SKIP:
+            self._skip = max(0, self._skip - 1)
+        elif tag in self.SECTION:
+            self.flush()
+            self.lines.append("")
+        elif tag in self.BREAK:
+            self.flush()
+
+    def handle_data(self, data: str) -> None:
+        if self._skip:
+            return
+        self._text.append(data)
+        self._size += len(data)
+        if self._size > MAX_LINE:
+            self.flush()
+
+
+def normalize_html(blocks: Iterable[str]) -> Iterator[str]:
+    parser = _HTMLText()
+    for block in blocks:
+        parser.feed(block)
+        yield from parser.lines
+        parser.lines.clear()
+    parser.close()
+    parser.flush()
+    yield from parser.lines
+
+
+def normalize(path: str, blocks: Iterable[str]) -> Iterator[str]:
+    ext = os.path.splitext(path)[1].lower()
+    if ext in (".html", ".htm"):
+        return normalize_html(blocks)
+    if ext in (".md", ".markdown"):
+        return normalize_markdown(split_lines(blocks))
+    return split_lines(blocks)
+
+
+def _is_heading(paragraph: List[str]) -> bool:
+    line = paragraph[0]
+    return len(paragraph) == 1 and len(line) < 80 and not line.startswith(("-", "•", "*")) \
+        and not line.endswith((".", "!", "?", ":", ","))
+
+
+def paragraphs(lines: Iterable[str], max_tokens: int = CHUNK_TOKENS) -> Iterator[Tuple[List[str], int]]:
+    """Blank-line separated paragraphs, each at most max_tokens (split by line, then by word)."""
+    current: List[str] = []
+    size = 0
+    for line in lines:
+        line = line.strip()
+        if not line:
+            if current:
+                yield current, size
+                current, size = [], 0
+            continue
+        cost = estimate_tokens(line) + 1
+        if cost > max_tokens:
+            if current:
+                yield current, size
+                current, size = [], 0
+            words: List[str] = []
+            used = 0
+            for word in line.split():
+                word_cost = estimate_tokens(word)
+                if words and used + word_cost > max_tokens:
+                    yield [" ".join(words)], used
+                    words, used = [], 0
+                words.append(word)
+                used += word_cost
+            if words:
+                current, size = [" ".join(words)], used
+            continue
+        if current and size + cost > max_tokens:
+            yield current, size
+            current, size = [], 0
+        current.append(line)
+        size += cost
+    if current:
+        yield current, size
+
+
+def chunk(lines: Iterable[str], max_tokens: int = CHUNK_TOKENS) -> Iterator[Tuple[str, int]]:
+    """Pack paragraphs into (text, tokens) chunks of at most max_tokens; a heading starts a new chunk."""
+    current: List[str] = []
+    size = 0
+    only_headings = True
+    for paragraph, cost in paragraphs(lines, max_tokens):
+        heading = _is_heading(paragraph)
+        if current and ((heading and not only_headings) or size + cost > max_tokens):
+            yield "\n\n".join(current), size
+            current, size, only_headings = [], 0, True
+        current.append("\n".join(paragraph))
+        size += cost
+        only_headings = only_headings and heading
+    if current:
+        yield "\n\n".join(current), size
+
+
+def tokenize(chunks: Iterable[Tuple[str, int]]) -> Iterator[TokenizedChunk]:
+    # Token counts were already estimated line by line while chunking
+    for text, tokens in chunks:
+        yield TokenizedChunk(text, tokens, term_counts(text))
+
+
+def pipeline(path: str, hasher=None, max_tokens: int = CHUNK_TOKENS) -> Iterator[TokenizedChunk]:
+    return tokenize(chunk(normalize(path, read_blocks(path, hasher)), max_tokens))
+
+
+def file_sha256(path: str) -> str:
+    hasher = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(BLOCK_SIZE), b""):
+            hasher.update(block)
+    return hasher.hexdigest()
+
+
+def iter_docs(docs_path: str) -> Iterator[Tuple[str, str]]:
+    """(relative path, absolute path) of every supported doc, in a stable order."""
+    for root, dirs, files in os.walk(docs_path):
+        dirs.sort()
+        for name in sorted(files):
+            if name.lower().endswith(EXTENSIONS) and not name.startswith("."):
+                full = os.path.join(root, name)
+                yield os.path.relpath(full, docs_path).replace(os.sep, "/"), full
+
+
+# --- index ---
+
+class KnowledgeIndex:
+    """Chunks, postings and the ingestion manifest, in one SQLite file (WAL mode)."""
+
+    def __init__(self, db_path: Optional[str] = None):
+        self.db_path = db_path or os.getenv("KNOWLEDGE_INDEX_PATH", DEFAULT_INDEX_PATH)
+        self._local = threading.local()
+        self._init_lock = threading.Lock()
+        self._initialized = False
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is not None:
+            return conn
+        os.makedirs(os.path.dirname(os.path.abspath(self.db_path)), exist_ok=True)
+        conn = sqlite3.connect(self.db_path, timeout=30, isolation_level=None)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.execute("PRAGMA busy_timeout=30000")
+        with self._init_lock:
+            if not self._initialized:
+                conn.executescript(SCHEMA)
+                self._initialized = True
+        self._local.conn = conn
+        return conn
+
+    def manifest(self) -> Dict[str, dict]:
+        rows = self._connect().execute(
+            "SELECT path, sha256, size, mtime_ns, chunks, tokens, ingested_at FROM documents"
+        ).fetchall()
+        return {
+            row[0]: {"sha256": row[1], "size": row[2], "mtime_ns": row[3], "chunks": row[4],
+                     "tokens": row[5], "ingested_at": row[6]}
+            for row in rows
+        }
+
+    def touch(self, path: str, size: int, mtime_ns: int) -> None:
+        self._connect().execute("UPDATE documents SET size = ?, mtime_ns = ? WHERE path = ?", (size, mtime_ns, path))
+
+    def remove(self, path: str) -> None:
+        conn = self._connect()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            self._delete(conn, path)
+            conn.execute("DELETE FROM documents WHERE path = ?", (path,))
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+
+    @staticmethod
+    def _delete(conn: sqlite3.Connection, path: str) -> None:
+        conn.execute("DELETE FROM postings WHERE chunk_id IN (SELECT id FROM chunks WHERE path = ?)", (path,))
+        conn.execute("DELETE FROM chunks WHERE path = ?", (path,))
+
+    def write_document(self, path: str, size: int, mtime_ns: int, chunks: Iterable[TokenizedChunk],
+                       hasher) -> Tuple[int, int]:
+        """
+        Replace `path` with the streamed chunks in one transaction. The
+        hasher is fed while the chunks are consumed, so its digest is read
+        only at the end. Returns (chunks, tokens).
+        """
+        conn = self._connect()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            self._delete(conn, path)
+            next_id = conn.execute("SELECT COALESCE(MAX(id), 0) + 1 FROM chunks").fetchone()[0]
+            chunk_rows: List[tuple] = []
+            posting_rows: List[tuple] = []
+            count = tokens = 0
+            for piece in chunks:
+                chunk_rows.append((next_id, path, count, piece.text, piece.tokens))
+                posting_rows.extend((term, next_id, tf) for term, tf in piece.counts.items())
+                next_id += 1
+                count += 1
+                tokens += piece.tokens
+                if len(chunk_rows) >= WRITE_BATCH:
+                    self._flush(conn, chunk_rows, posting_rows)
+            self._flush(conn, chunk_rows, posting_rows)
+            conn.execute(
+                "INSERT OR REPLACE INTO documents (path, sha256, size, mtime_ns, chunks, tokens, ingested_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (path, hasher.hexdigest(), size, mtime_ns, count, tokens, time.time()),
+            )
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        return count, tokens
+
+    @staticmethod
+    def _flush(conn: sqlite3.Connection, chunk_rows: List[tuple], posting_rows: List[tuple]) -> None:
+        if chunk_rows:
+            conn.executemany("INSERT INTO chunks (id, path, ord, text, tokens) VALUES (?, ?, ?, ?, ?)", chunk_rows)
+            conn.executemany("INSERT INTO postings (term, chunk_id, tf) VALUES (?, ?, ?)", posting_rows)
+            chunk_rows.clear()
+            posting_rows.clear()
+
+    def iter_chunks(self) -> Iterator[Tuple[int, str, str, int]]:
+        """(id, path, text, tokens) for every chunk, in document order"""
+        yield from self._connect().execute("SELECT id, path, text, tokens FROM chunks ORDER BY path, ord")
+
+    def iter_postings(self) -> Iterator[Tuple[str, int, int]]:
+        """(term, chunk id, term frequency), sorted by term"""
+        yield from self._connect().execute("SELECT term, chunk_id, tf FROM postings ORDER BY term")
+
+    def stats(self) -> Dict[str, float]:
+        conn = self._connect()
+        count, total = conn.execute("SELECT COUNT(*), COALESCE(SUM(tokens), 0) FROM chunks").fetchone()
+        return {"documents": conn.execute("SELECT COUNT(*) FROM documents").fetchone()[0],
+                "chunks": count, "avg_tokens": total / count if count else 0.0}
+
+    def search(self, query: str, limit: int = 10) -> List[Chunk]:
+        """BM25 over the chunk postings; Chunk.source is the doc path."""
+        query_terms = terms(query)
+        if not query_terms:
+            return []
+        conn = self._connect()
+        stats = self.stats()
+        if not stats["chunks"]:
+            return []
+        scores: Dict[int, float] = {}
+        for term in query_terms:
+            rows = conn.execute(
+                "SELECT p.chunk_id, p.tf, c.tokens FROM postings p JOIN chunks c ON c.id = p.chunk_id WHERE p.term = ?",
+                (term,),
+            ).fetchall()
+            if not rows:
+                continue
+            idf = math.log(1 + (stats["chunks"] - len(rows) + 0.5) / (len(rows) + 0.5))
+            for chunk_id, tf, length in rows:
+                norm = tf + BM25_K1 * (1 - BM25_B + BM25_B * length / stats["avg_tokens"])
+                scores[chunk_id] = scores.get(chunk_id, 0.0) + idf * tf * (BM25_K1 + 1) / norm
+        top = sorted(scores.items(), key=lambda item: item[1], reverse=True)[:limit]
+        if not top:
+            return []
+        placeholders = ",".join("?" * len(top))
+        texts = {row[0]: (row[1], row[2]) for row in conn.execute(
+            f"SELECT id, path, text FROM chunks WHERE id IN ({placeholders})", [chunk_id for chunk_id, _ in top]
+        )}
+        return [Chunk(texts[chunk_id][1], texts[chunk_id][0], score) for chunk_id, score in top]
+
+
+def ingest(docs_path: str, index: "KnowledgeIndex", full: bool = False,
+           max_tokens: int = CHUNK_TOKENS) -> IngestReport:
+    """Bring `index` up to date with `docs_path`; full=True re-indexes every file."""
+    start = time.perf_counter()
+    if not os.path.isdir(docs_path):
+        logger.warning("Docs path not found", extra={"docs_path": docs_path})
+        return IngestReport(0, 0, 0, 0, 0, 0, time.perf_counter() - start)
+
+    manifest = index.manifest()
+    seen = set()
+    files = ingested = unchanged = total_bytes = total_chunks = 0
+    for rel, full_path in iter_docs(docs_path):
+        files += 1
+        seen.add(rel)
+        stat = os.stat(full_path)
+        entry = manifest.get(rel)
+        if entry and not full:
+            if entry["size"] == stat.st_size and entry["mtime_ns"] == stat.st_mtime_ns:
+                unchanged += 1
+                continue
+            if file_sha256(full_path) == entry["sha256"]:
+                index.touch(rel, stat.st_size, stat.st_mtime_ns)
+                unchanged += 1
+                continue
+        hasher = hashlib.sha256()
+        chunks, _ = index.write_document(
+            rel, stat.st_size, stat.st_mtime_ns, pipeline(full_path, hasher, max_tokens), hasher
+        )
+        ingested += 1
+        total_bytes += stat.st_size
+        total_chunks += chunks
+
+    removed = 0
+    for rel in manifest.keys() - seen:
+        index.remove(rel)
+        removed += 1
+
+    report = IngestReport(files, ingested, unchanged, removed, total_bytes, total_chunks, time.perf_counter() - start)
+    logger.info("Ingested knowledge docs", extra={
+        "docs_path": docs_path, **report._asdict(), "mb_per_s": round(report.mb_per_s, 2),
+    })
+    return report
+
+
+# Global instance
+knowledge_index = KnowledgeIndex()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Ingest knowledge docs into the search index")
+    parser.add_argument("--docs", default=DEFAULT_DOCS_PATH)
+    parser.add_argument("--index", default=None)
+    parser.add_argument("--full", action="store_true", help="re-index every file, ignoring the manifest")
+    args = parser.parse_args()
+    from utils.logger import setup_logging
+
+    setup_logging()
+    report = ingest(args.docs, KnowledgeIndex(args.index) if args.index else knowledge_index, full=args.full)
+    print(f"{report.files} files: {report.ingested} ingested, {report.unchanged} unchanged, "
+          f"{report.removed} removed; {report.chunks} chunks, {report.bytes / 1e6:.2f} MB "
+          f"in {report.seconds:.2f}s ({report.mb_per_s:.1f} MB/s)")
+
+
+if __name__ == "__main__":
+    main()
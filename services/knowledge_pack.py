@@ -0,0 +1,402 @@
+# backend/services/knowledge_pack.py
+"""
+Compiled, memory-mapped knowledge pack (data/knowledge.pack).
+
+    python -m services.knowledge_pack build [--out PATH]
+    python -m services.knowledge_pack info
+
+The build step compiles every piece of product knowledge into one file:
+the curated area summaries (services/knowledge_areas/*.txt, split into
+sections) and the chunks ingested from testzeus_docs (services/ingestion).
+BM25 weights are precomputed per posting, so a query only sums floats.
+
+Layout (native byte order, sections 8-byte aligned):
+
+    header   magic "TZKP", format version, byte order, section count
+    table    (name, offset, length) per section
+    META     JSON: content hash, build time, counts, areas -> chunk range
+    STRS     UTF-8 chunk texts and source names
+    C_TXO/C_TXL/C_TOK/C_SRC/C_KND   per chunk: text offset, length,
+             tokens, source id, kind (0 doc, 1 area summary)
+    S_OFF/S_LEN                     per source: name offset, length
+    TSTR     UTF-8 terms, sorted
+    T_OFF/T_LEN/T_PST               per term: offset, length, first posting
+                                    (T_PST has one extra entry at the end)
+    P_CHK/P_WGT                     per posting: chunk id, BM25 weight
+
+Every worker maps the same file read-only, so they share its pages in the
+OS cache. Columns are used in place through memoryview casts: nothing is
+parsed per request. A build writes a temp file and os.replace()s it into
+place; readers notice the new inode within PACK_CHECK_INTERVAL and switch
+to it, while requests that already hold the old pack finish on it.
+"""
+
+import argparse
+import hashlib
+import heapq
+import itertools
+import json
+import math
+import mmap
+import os
+import struct
+import sys
+import threading
+import time
+from array import array
+from operator import itemgetter
+from typing import Dict, List, Optional, Tuple
+
+from services.context_assembler import Chunk, estimate_tokens, split_sections, term_counts, terms
+from services.ingestion import BACKEND_DIR, BM25_B, BM25_K1, DEFAULT_DOCS_PATH, KnowledgeIndex, ingest, knowledge_index
+from utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+MAGIC = b"TZKP"
+FORMAT_VERSION = 1
+_HEADER = struct.Struct("<4sHHI")
+_SECTION = struct.Struct("<8sQQ")
+MAX_SECTIONS = 24
+DATA_START = _HEADER.size + MAX_SECTIONS * _SECTION.size
+_BYTE_ORDER = 1 if sys.byteorder == "little" else 2
+
+KIND_DOC = 0
+KIND_AREA = 1
+
+DEFAULT_PACK_PATH = os.path.join(BACKEND_DIR, "data", "knowledge.pack")
+DEFAULT_AREAS_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "knowledge_areas")
+PACK_CHECK_INTERVAL = float(os.getenv("KNOWLEDGE_PACK_CHECK_INTERVAL", "5"))
+
+
+class PackFormatError(Exception):
+    pass
+
+
+# --- build ---
+
+def _area_files(areas_path: str) -> List[Tuple[str, str]]:
+    if not os.path.isdir(areas_path):
+        return []
+    return [(name[:-4], os.path.join(areas_path, name)) for name in sorted(os.listdir(areas_path)) if name.endswith(".txt")]
+
+
+def areas_fingerprint(areas_path: str = DEFAULT_AREAS_PATH) -> str:
+    hasher = hashlib.sha256()
+    for area, path in _area_files(areas_path):
+        with open(path, "rb") as f:
+            hasher.update(area.encode() + b"\0" + f.read() + b"\0")
+    return hasher.hexdigest()
+
+
+class _Writer:
+    def __init__(self, f):
+        self.f = f
+        self.sections: List[Tuple[bytes, int, int]] = []
+        f.write(b"\0" * DATA_START)
+
+    def section(self, name: str, data) -> None:
+        pad = -self.f.tell() % 8
+        self.f.write(b"\0" * pad)
+        offset = self.f.tell()
+        self.f.write(data)
+        self.sections.append((name.encode(), offset, self.f.tell() - offset))
+
+    def finish(self) -> None:
+        self.f.seek(0)
+        self.f.write(_HEADER.pack(MAGIC, FORMAT_VERSION, _BYTE_ORDER, len(self.sections)))
+        for name, offset, length in self.sections:
+            self.f.write(_SECTION.pack(name, offset, length))
+
+
+def build_pack(out_path: str = DEFAULT_PACK_PATH, index: Optional[KnowledgeIndex] = None,
+               areas_path: str = DEFAULT_AREAS_PATH) -> dict:
+    """Compile area summaries and ingested doc chunks into a pack; returns its META."""
+    start = time.perf_counter()
+    index = index or knowledge_index
+    strings = bytearray()
+    sources: Dict[str, int] = {}
+    text_off, text_len, tokens, source_ids, kinds = array("I"), array("I"), array("I"), array("H"), array("B")
+    content = hashlib.sha256()
+    areas: Dict[str, List[int]] = {}
+    area_postings: Dict[str, List[Tuple[int, int]]] = {}
+
+    def add_chunk(text: str, source: str, kind: int, token_count: int) -> int:
+        encoded = text.encode("utf-8")
+        content.update(encoded + b"\0")
+        chunk_id = len(text_off)
+        text_off.append(len(strings))
+        text_len.append(len(encoded))
+        strings.extend(encoded)
+        tokens.append(token_count)
+        source_ids.append(sources.setdefault(source, len(sources)))
+        kinds.append(kind)
+        return chunk_id
+
+    # Area summaries first, so their chunk ranges are contiguous
+    for area, path in _area_files(areas_path):
+        with open(path, "r", encoding="utf-8") as f:
+            sections = split_sections(f.read())
+        first = len(text_off)
+        for section in sections:
+            chunk_id = add_chunk(section, area, KIND_AREA, estimate_tokens(section))
+            for term, tf in term_counts(section).items():
+                area_postings.setdefault(term, []).append((chunk_id, tf))
+        areas[area] = [first, len(sections)]
+
+    pack_ids: Dict[int, int] = {}
+    for row_id, path, text, token_count in index.iter_chunks():
+        pack_ids[row_id] = add_chunk(text, path, KIND_DOC, token_count)
+
+    source_off, source_len = array("I"), array("I")
+    for name in sources:
+        encoded = name.encode("utf-8")
+        source_off.append(len(strings))
+        source_len.append(len(encoded))
+        strings.extend(encoded)
+
+    # Postings merged in term order: the doc index streams sorted, area terms are few
+    chunk_count = len(text_off)
+    avg_tokens = (sum(tokens) / chunk_count) if chunk_count else 1.0
+    term_strings = bytearray()
+    term_off, term_len, term_post = array("I"), array("I"), array("I")
+    post_chunk, post_weight = array("I"), array("f")
+    doc_terms = itertools.groupby(index.iter_postings(), key=itemgetter(0))
+    merged = heapq.merge(
+        ((term, [(pack_ids[chunk_id], tf) for _, chunk_id, tf in rows]) for term, rows in doc_terms),
+        sorted(area_postings.items()),
+        key=itemgetter(0),
+    )
+    for term, group in itertools.groupby(merged, key=itemgetter(0)):
+        postings = sorted(p for _, plist in group for p in plist)
+        df = len(postings)
+        idf = math.log(1 + (chunk_count - df + 0.5) / (df + 0.5))
+        encoded = term.encode("utf-8")
+        term_off.append(len(term_strings))
+        term_len.append(len(encoded))
+        term_strings.extend(encoded)
+        term_post.append(len(post_chunk))
+        for chunk_id, tf in postings:
+            norm = tf + BM25_K1 * (1 - BM25_B + BM25_B * tokens[chunk_id] / avg_tokens)
+            post_chunk.append(chunk_id)
+            post_weight.append(idf * tf * (BM25_K1 + 1) / norm)
+    term_post.append(len(post_chunk))
+
+    meta = {
+        "format_version": FORMAT_VERSION,
+        "content_sha256": content.hexdigest(),
+        "built_at": time.time(),
+        "chunks": chunk_count,
+        "terms": len(term_off),
+        "postings": len(post_chunk),
+        "sources": len(sources),
+        "areas": areas,
+        "areas_fingerprint": areas_fingerprint(areas_path),
+        "docs_manifest": hashlib.sha256(json.dumps(
+            {path: entry["sha256"] for path, entry in sorted(index.manifest().items())}
+        ).encode()).hexdigest(),
+    }
+    meta["version"] = meta["content_sha256"][:12]
+
+    os.makedirs(os.path.dirname(os.path.abspath(out_path)), exist_ok=True)
+    tmp_path = f"{out_path}.tmp-{os.getpid()}-{threading.get_ident()}"
+    try:
+        with open(tmp_path, "wb") as f:
+            writer = _Writer(f)
+            writer.section("META", json.dumps(meta).encode())
+            writer.section("STRS", strings)
+            for name, column in (("C_TXO", text_off), ("C_TXL", text_len), ("C_TOK", tokens),
+                                 ("C_SRC", source_ids), ("C_KND", kinds), ("S_OFF", source_off),
+                                 ("S_LEN", source_len)):
+                writer.section(name, column.tobytes())
+            writer.section("TSTR", term_strings)
+            for name, column in (("T_OFF", term_off), ("T_LEN", term_len), ("T_PST", term_post),
+                                 ("P_CHK", post_chunk), ("P_WGT", post_weight)):
+                writer.section(name, column.tobytes())
+            writer.finish()
+            f.flush()
+            os.fsync(f.fileno())
+        # Atomic swap: readers see either the old pack or the new one
+        os.replace(tmp_path, out_path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+    logger.info("Built knowledge pack", extra={
+        "path": out_path, "version": meta["version"], "chunks": chunk_count, "terms": meta["terms"],
+        "bytes": os.path.getsize(out_path), "seconds": round(time.perf_counter() - start, 3),
+    })
+    return meta
+
+
+def refresh_pack(docs_path: str, index: KnowledgeIndex, pack_path: str, areas_path: str = DEFAULT_AREAS_PATH,
+                 pack: Optional["KnowledgePack"] = None) -> bool:
+    """Ingest doc changes and rebuild the pack if it is missing or stale; True if rebuilt."""
+    report = ingest(docs_path, index)
+    if pack is None and os.path.exists(pack_path):
+        pack = KnowledgePack(pack_path)
+    stale = (
+        pack is None
+        or report.ingested or report.removed
+        or pack.meta.get("areas_fingerprint") != areas_fingerprint(areas_path)
+    )
+    if stale:
+        build_pack(pack_path, index, areas_path)
+    return bool(stale)
+
+
+# --- read ---
+
+class KnowledgePack:
+    """Read-only view over a mapped pack file."""
+
+    _COLUMNS = {"C_TXO": "I", "C_TXL": "I", "C_TOK": "I", "C_SRC": "H", "C_KND": "B", "S_OFF": "I",
+                "S_LEN": "I", "T_OFF": "I", "T_LEN": "I", "T_PST": "I", "P_CHK": "I", "P_WGT": "f"}
+
+    def __init__(self, path: str):
+        self.path = path
+        with open(path, "rb") as f:
+            stat = os.fstat(f.fileno())
+            self.identity = (stat.st_ino, stat.st_mtime_ns)
+            self._mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, byte_order, count = _HEADER.unpack_from(self._mm, 0)
+        if magic != MAGIC or version != FORMAT_VERSION or byte_order != _BYTE_ORDER:
+            raise PackFormatError(f"{path}: unsupported knowledge pack (format {version})")
+        view = memoryview(self._mm)
+        self._sections: Dict[str, Tuple[int, int]] = {}
+        for i in range(count):
+            name, offset, length = _SECTION.unpack_from(self._mm, _HEADER.size + i * _SECTION.size)
+            self._sections[name.rstrip(b"\0").decode()] = (offset, length)
+        for name, fmt in self._COLUMNS.items():
+            offset, length = self._sections[name]
+            setattr(self, name.lower(), view[offset:offset + length].cast(fmt))
+        self._strs = self._sections["STRS"][0]
+        self._tstr = self._sections["TSTR"][0]
+        offset, length = self._sections["META"]
+        self.meta = json.loads(self._mm[offset:offset + length])
+        self.version: str = self.meta["version"]
+        self.n_terms = len(self.t_off)
+
+    def __len__(self) -> int:
+        return len(self.c_txo)
+
+    def text(self, chunk_id: int) -> str:
+        start = self._strs + self.c_txo[chunk_id]
+        return self._mm[start:start + self.c_txl[chunk_id]].decode("utf-8")
+
+    def source(self, chunk_id: int) -> str:
+        source_id = self.c_src[chunk_id]
+        start = self._strs + self.s_off[source_id]
+        return self._mm[start:start + self.s_len[source_id]].decode("utf-8")
+
+    def _term_index(self, term: bytes) -> int:
+        lo, hi = 0, self.n_terms
+        mm, base, offsets, lengths = self._mm, self._tstr, self.t_off, self.t_len
+        while lo < hi:
+            mid = (lo + hi) // 2
+            start = base + offsets[mid]
+            candidate = mm[start:start + lengths[mid]]
+            if candidate < term:
+                lo = mid + 1
+            elif candidate > term:
+                hi = mid
+            else:
+                return mid
+        return -1
+
+    def area_texts(self, area: str) -> List[str]:
+        first, count = self.meta["areas"].get(area, (0, 0))
+        return [self.text(chunk_id) for chunk_id in range(first, first + count)]
+
+    def search(self, query: str, limit: int = 10, kind: Optional[int] = KIND_DOC) -> List[Chunk]:
+        """BM25 (precomputed weights) over chunks of `kind`; None searches every chunk."""
+        scores: Dict[int, float] = {}
+        chunks, weights, kinds = self.p_chk, self.p_wgt, self.c_knd
+        for term in terms(query):
+            i = self._term_index(term.encode("utf-8"))
+            if i < 0:
+                continue
+            for p in range(self.t_pst[i], self.t_pst[i + 1]):
+                chunk_id = chunks[p]
+                if kind is None or kinds[chunk_id] == kind:
+                    scores[chunk_id] = scores.get(chunk_id, 0.0) + weights[p]
+        top = heapq.nlargest(limit, scores.items(), key=itemgetter(1))
+        return [Chunk(self.text(chunk_id), self.source(chunk_id), score) for chunk_id, score in top]
+
+
+class PackHandle:
+    """The current pack for this process; picks up a rebuilt file without a restart."""
+
+    def __init__(self, path: Optional[str] = None):
+        self.path = path or os.getenv("KNOWLEDGE_PACK_PATH", DEFAULT_PACK_PATH)
+        self._pack: Optional[KnowledgePack] = None
+        self._checked = 0.0
+        self._lock = threading.Lock()
+        self._ensured = False
+
+    def get(self) -> Optional[KnowledgePack]:
+        now = time.monotonic()
+        if now - self._checked >= PACK_CHECK_INTERVAL:
+            self._checked = now
+            self._reload()
+        return self._pack
+
+    def _reload(self) -> None:
+        try:
+            stat = os.stat(self.path)
+        except FileNotFoundError:
+            return
+        current = self._pack
+        if current is not None and current.identity == (stat.st_ino, stat.st_mtime_ns):
+            return
+        with self._lock:
+            try:
+                pack = KnowledgePack(self.path)
+            except (OSError, ValueError, KeyError, PackFormatError) as e:
+                logger.error("Could not load knowledge pack", extra={"path": self.path, "error": str(e)})
+                return
+            # The old mapping is released once the last request using it finishes
+            self._pack = pack
+        logger.info("Loaded knowledge pack", extra={"path": self.path, "version": pack.version, "chunks": len(pack)})
+
+    @property
+    def version(self) -> str:
+        pack = self.get()
+        return pack.version if pack else ""
+
+    def ensure_current(self, docs_path: str = DEFAULT_DOCS_PATH, areas_path: str = DEFAULT_AREAS_PATH) -> None:
+        """Once per process: ingest doc changes and rebuild the pack if anything changed."""
+        if self._ensured:
+            return
+        with self._lock:
+            if self._ensured:
+                return
+            refresh_pack(docs_path, knowledge_index, self.path, areas_path, self._pack)
+            self._ensured = True
+        self._checked = 0.0
+        self.get()
+
+
+# Global instance
+knowledge_pack = PackHandle()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Build or inspect the knowledge pack")
+    parser.add_argument("command", choices=["build", "info"])
+    parser.add_argument("--out", default=None, help="pack path (default KNOWLEDGE_PACK_PATH or data/knowledge.pack)")
+    parser.add_argument("--docs", default=DEFAULT_DOCS_PATH)
+    args = parser.parse_args()
+    from utils.logger import setup_logging
+
+    setup_logging()
+    path = args.out or knowledge_pack.path
+    if args.command == "build":
+        ingest(args.docs, knowledge_index)
+        build_pack(path, knowledge_index)
+    meta = KnowledgePack(path).meta
+    print(json.dumps({**meta, "bytes": os.path.getsize(path)}, indent=2))
+
+
+if __name__ == "__main__":
+    main()
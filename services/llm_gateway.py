@@ -0,0 +1,397 @@
+# backend/services/llm_gateway.py
+"""
+Single gateway for every OpenAI call made by the backend.
+
+- One pooled AsyncOpenAI client, driven by a dedicated event-loop thread so
+  both async code (chat_endpoint) and sync code (validators) share it.
+- A token-bucket scheduler for the account's RPM/TPM limits. Lower-priority
+  lanes must leave headroom in the buckets, so interactive chat always gets
+  capacity before background validation and vision calls.
+- Jittered exponential backoff on 429/5xx/connection errors, honouring
+  Retry-After when the API sends it.
+- Per-caller usage accounting (requests, tokens, retries, time throttled).
+
+When a lane can't get capacity within its wait budget the call raises
+LLMOverloaded, so callers can fall back instead of piling up.
+"""
+
+import asyncio
+import json
+import os
+import random
+import threading
+import time
+from enum import IntEnum
+from typing import Any, Dict, List, Optional, Tuple
+
+from services.shared_state import enabled as shared_state_enabled, shared_state
+from utils.metrics import CollectedMetric, counter, registry
+from utils.tracing import tracer
+
+
+class Lane(IntEnum):
+    INTERACTIVE = 0
+    BACKGROUND = 1
+    VISION = 2
+
+
+# Fraction of each bucket a lane must leave untouched for higher lanes
+LANE_RESERVE = {Lane.INTERACTIVE: 0.0, Lane.BACKGROUND: 0.25, Lane.VISION: 0.35}
+# How long a call may wait for capacity before it is shed
+LANE_MAX_WAIT = {
+    Lane.INTERACTIVE: float(os.getenv("LLM_INTERACTIVE_MAX_WAIT", "30")),
+    Lane.BACKGROUND: float(os.getenv("LLM_BACKGROUND_MAX_WAIT", "5")),
+    Lane.VISION: float(os.getenv("LLM_VISION_MAX_WAIT", "60")),
+}
+
+DEFAULT_MODEL = os.getenv("OPENAI_MODEL", "gpt-5")
+RPM_LIMIT = int(os.getenv("OPENAI_RPM_LIMIT", "500"))
+TPM_LIMIT = int(os.getenv("OPENAI_TPM_LIMIT", "200000"))
+MAX_CONNECTIONS = int(os.getenv("OPENAI_MAX_CONNECTIONS", "32"))
+MAX_RETRIES = int(os.getenv("OPENAI_MAX_RETRIES", "4"))
+REQUEST_TIMEOUT = float(os.getenv("OPENAI_TIMEOUT", "120"))
+BACKOFF_BASE = 0.5
+BACKOFF_CAP = 20.0
+DEFAULT_COMPLETION_TOKENS = 512
+
+# USD per 1M (input, output) tokens, matched by longest model-name prefix.
+# Override or extend with OPENAI_PRICES='{"model": [input, output]}'.
+MODEL_PRICES: Dict[str, Tuple[float, float]] = {
+    "gpt-5": (1.25, 10.0),
+    "gpt-5-mini": (0.25, 2.0),
+    "gpt-5-nano": (0.05, 0.40),
+    "gpt-4.1": (2.0, 8.0),
+    "gpt-4.1-mini": (0.40, 1.60),
+    "gpt-4o": (2.50, 10.0),
+    "gpt-4o-mini": (0.15, 0.60),
+}
+MODEL_PRICES.update({k: tuple(v) for k, v in json.loads(os.getenv("OPENAI_PRICES", "{}")).items()})
+
+LLM_TOKENS = counter("llm_tokens_total", "OpenAI tokens by model and type", ["model", "type"])
+LLM_COST = counter("llm_cost_usd_total", "Estimated OpenAI spend in USD by model", ["model"])
+
+
+class LLMOverloaded(Exception):
+    """Raised when a call can't get rate-limit capacity within its lane's wait budget."""
+
+    def __init__(self, lane: Lane, retry_after: float):
+        super().__init__(f"LLM capacity exhausted for {lane.name.lower()} lane; retry in {retry_after:.1f}s")
+        self.lane = lane
+        self.retry_after = retry_after
+
+
+class TokenBucket:
+    def __init__(self, capacity: float, per_second: float):
+        self.capacity = capacity
+        self.per_second = per_second
+        self.level = capacity
+        self.updated = time.monotonic()
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self.level = min(self.capacity, self.level + (now - self.updated) * self.per_second)
+        self.updated = now
+
+    def wait_time(self, amount: float, reserve: float) -> float:
+        """Seconds until `amount` can be taken while leaving `reserve` (a fraction) in the bucket."""
+        self._refill()
+        needed = min(amount, self.capacity) + reserve * self.capacity
+        if self.level >= needed:
+            return 0.0
+        return (needed - self.level) / self.per_second
+
+    def take(self, amount: float) -> None:
+        self.level -= amount
+
+    def give(self, amount: float) -> None:
+        self.level = min(self.capacity, self.level + amount)
+
+
+class RateScheduler:
+    """RPM + TPM buckets. Only used from the gateway loop, so no locking is needed."""
+
+    def __init__(self, rpm: int, tpm: int):
+        self.requests = TokenBucket(rpm, rpm / 60.0)
+        self.tokens = TokenBucket(tpm, tpm / 60.0)
+
+    def try_take(self, est_tokens: int, reserve: float) -> float:
+        """Take one request and est_tokens if available (returns 0.0), else the seconds to wait."""
+        wait = max(self.requests.wait_time(1, reserve), self.tokens.wait_time(est_tokens, reserve))
+        if wait == 0.0:
+            self.requests.take(1)
+            self.tokens.take(est_tokens)
+        return wait
+
+    async def acquire(self, lane: Lane, est_tokens: int) -> float:
+        """Wait for capacity; returns seconds spent waiting or raises LLMOverloaded."""
+        reserve = LANE_RESERVE[lane]
+        deadline = time.monotonic() + LANE_MAX_WAIT[lane]
+        waited = 0.0
+        while True:
+            wait = await self._poll(est_tokens, reserve)
+            if wait == 0.0:
+                return waited
+            if time.monotonic() + wait > deadline:
+                raise LLMOverloaded(lane, wait)
+            # Short sleeps so a freshly refilled bucket is noticed promptly
+            step = min(wait, 0.25)
+            await asyncio.sleep(step)
+            waited += step
+
+    async def _poll(self, est_tokens: int, reserve: float) -> float:
+        return self.try_take(est_tokens, reserve)
+
+    def settle(self, est_tokens: int, actual_tokens: int) -> None:
+        """Correct the TPM bucket once the real usage is known."""
+        if actual_tokens < est_tokens:
+            self.tokens.give(est_tokens - actual_tokens)
+        else:
+            self.tokens.take(actual_tokens - est_tokens)
+
+    async def settle_usage(self, est_tokens: int, actual_tokens: int) -> None:
+        self.settle(est_tokens, actual_tokens)
+
+
+class SharedRateScheduler(RateScheduler):
+    """RateScheduler whose buckets live in services/shared_state, so the limits hold across workers."""
+
+    def __init__(self, rpm: int, tpm: int, state=None):
+        super().__init__(rpm, tpm)
+        self.state = state or shared_state
+        self.rpm = rpm
+        self.tpm = tpm
+
+    def try_take(self, est_tokens: int, reserve: float) -> float:
+        return self.state.take_tokens([
+            ("openai_rpm", self.rpm, self.rpm / 60.0, 1),
+            ("openai_tpm", self.tpm, self.tpm / 60.0, est_tokens),
+        ], reserve)
+
+    def settle(self, est_tokens: int, actual_tokens: int) -> None:
+        self.state.adjust_tokens("openai_tpm", self.tpm, self.tpm / 60.0, est_tokens - actual_tokens)
+
+    # BEGIN IMMEDIATE can wait on another worker's write lock (busy_timeout);
+    # waiting on the gateway loop would stall every in-flight call, so use a thread
+
+    async def _poll(self, est_tokens: int, reserve: float) -> float:
+        return await asyncio.to_thread(self.try_take, est_tokens, reserve)
+
+    async def settle_usage(self, est_tokens: int, actual_tokens: int) -> None:
+        await asyncio.to_thread(self.settle, est_tokens, actual_tokens)
+
+
+def _estimate_tokens(kwargs: Dict[str, Any]) -> int:
+    chars = 0
+    for message in kwargs.get("messages") or []:
+        content = message.get("content") if isinstance(message, dict) else None
+        if isinstance(content, str):
+            chars += len(content)
+        elif isinstance(content, list):
+            chars += sum(len(part.get("text", "")) for part in content if isinstance(part, dict))
+    if isinstance(kwargs.get("input"), str):
+        chars += len(kwargs["input"])
+    extra = kwargs.get("extra_body") or {}
+    completion = (kwargs.get("max_completion_tokens") or kwargs.get("max_tokens")
+                  or extra.get("max_completion_tokens") or DEFAULT_COMPLETION_TOKENS)
+    return chars // 4 + completion
+
+
+def usage_tokens(response: Any) -> Tuple[int, int]:
+    usage = getattr(response, "usage", None)
+    if usage is None:
+        return 0, 0
+    prompt = getattr(usage, "prompt_tokens", None) or getattr(usage, "input_tokens", 0) or 0
+    completion = getattr(usage, "completion_tokens", None) or getattr(usage, "output_tokens", 0) or 0
+    return prompt, completion
+
+
+def _price(model: str) -> Tuple[float, float]:
+    matches = [name for name in MODEL_PRICES if model.startswith(name)]
+    return MODEL_PRICES[max(matches, key=len)] if matches else (0.0, 0.0)
+
+
+def cost_usd(model: str, prompt_tokens: int, completion_tokens: int) -> float:
+    input_price, output_price = _price(model)
+    return (prompt_tokens * input_price + completion_tokens * output_price) / 1e6
+
+
+def _retry_delay(error: Exception, attempt: int) -> Optional[float]:
+    """Backoff for retryable errors, None for errors that should propagate."""
+    import openai
+
+    if isinstance(error, openai.APIStatusError):
+        if error.status_code != 429 and error.status_code < 500:
+            return None
+        retry_after = error.response.headers.get("retry-after") if error.response is not None else None
+        if retry_after:
+            try:
+                return min(float(retry_after), BACKOFF_CAP)
+            except ValueError:
+                pass
+    elif not isinstance(error, openai.APIConnectionError):
+        return None
+    # Full jitter
+    return random.uniform(0, min(BACKOFF_CAP, BACKOFF_BASE * 2 ** attempt))
+
+
+class LLMGateway:
+    def __init__(self, rpm: int = RPM_LIMIT, tpm: int = TPM_LIMIT, shared: bool = False):
+        # With several workers the account limits must be enforced pool-wide
+        self.scheduler = SharedRateScheduler(rpm, tpm) if shared else RateScheduler(rpm, tpm)
+        self._client = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._start_lock = threading.Lock()
+        self._usage: Dict[str, Dict[str, float]] = {}
+        # Written on the gateway loop, read by metrics scrapes and /v1/llm/usage
+        self._usage_lock = threading.Lock()
+
+    @staticmethod
+    def available() -> bool:
+        return bool(os.getenv("OPENAI_API_KEY"))
+
+    # --- event loop / client ---
+
+    def _ensure_loop(self) -> asyncio.AbstractEventLoop:
+        if self._loop is not None:
+            return self._loop
+        with self._start_lock:
+            if self._loop is None:
+                loop = asyncio.new_event_loop()
+                threading.Thread(target=loop.run_forever, name="llm-gateway", daemon=True).start()
+                self._loop = loop
+        return self._loop
+
+    def _get_client(self):
+        # Only called on the gateway loop
+        if self._client is None:
+            import httpx
+            from openai import AsyncOpenAI
+
+            self._client = AsyncOpenAI(
+                api_key=os.getenv("OPENAI_API_KEY"),
+                max_retries=0,  # retries are handled here, with the scheduler's view of capacity
+                timeout=REQUEST_TIMEOUT,
+                http_client=httpx.AsyncClient(
+                    limits=httpx.Limits(max_connections=MAX_CONNECTIONS, max_keepalive_connections=MAX_CONNECTIONS),
+                    timeout=REQUEST_TIMEOUT,
+                ),
+            )
+        return self._client
+
+    def warm_up(self) -> None:
+        """Start the loop and build the client ahead of the first request."""
+        if self.available():
+            asyncio.run_coroutine_threadsafe(self._warm(), self._ensure_loop()).result()
+
+    async def _warm(self) -> None:
+        self._get_client()
+
+    # --- accounting ---
+
+    def _account(self, caller: str, **deltas: float) -> None:
+        with self._usage_lock:
+            stats = self._usage.setdefault(caller, {
+                "requests": 0, "errors": 0, "retries": 0, "shed": 0,
+                "prompt_tokens": 0, "completion_tokens": 0, "throttled_seconds": 0.0,
+            })
+            for key, value in deltas.items():
+                stats[key] += value
+
+    def usage(self) -> Dict[str, Dict[str, float]]:
+        with self._usage_lock:
+            return {caller: dict(stats) for caller, stats in self._usage.items()}
+
+    # --- calls ---
+
+    async def _call(self, endpoint: str, caller: str, lane: Lane, kwargs: Dict[str, Any]) -> Any:
+        kwargs.setdefault("model", DEFAULT_MODEL)
+        est_tokens = _estimate_tokens(kwargs)
+        attempt = 0
+        while True:
+            try:
+                waited = await self.scheduler.acquire(lane, est_tokens)
+            except LLMOverloaded:
+                self._account(caller, shed=1)
+                raise
+            self._account(caller, requests=1, throttled_seconds=waited)
+
+            target = self._get_client()
+            for part in endpoint.split("."):
+                target = getattr(target, part)
+            try:
+                response = await target.create(**kwargs)
+            except Exception as e:
+                delay = _retry_delay(e, attempt)
+                if delay is None or attempt >= MAX_RETRIES:
+                    self._account(caller, errors=1)
+                    raise
+                attempt += 1
+                self._account(caller, retries=1)
+                await asyncio.sleep(delay)
+                continue
+
+            prompt_tokens, completion_tokens = usage_tokens(response)
+            if prompt_tokens or completion_tokens:
+                await self.scheduler.settle_usage(est_tokens, prompt_tokens + completion_tokens)
+            self._account(caller, prompt_tokens=prompt_tokens, completion_tokens=completion_tokens)
+            model = kwargs["model"]
+            LLM_TOKENS.labels(model, "prompt").inc(prompt_tokens)
+            LLM_TOKENS.labels(model, "completion").inc(completion_tokens)
+            LLM_COST.labels(model).inc(cost_usd(model, prompt_tokens, completion_tokens))
+            return response
+
+    # Spans are opened on the caller's side: the gateway loop thread doesn't
+    # see the request's trace context.
+
+    @staticmethod
+    def _span_attributes(endpoint: str, lane: Lane, kwargs: Dict[str, Any]) -> Dict[str, Any]:
+        return {"endpoint": endpoint, "lane": lane.name.lower(), "model": kwargs.get("model", DEFAULT_MODEL)}
+
+    @staticmethod
+    def _record_usage(span: Any, response: Any) -> None:
+        prompt_tokens, completion_tokens = usage_tokens(response)
+        span.set(prompt_tokens=prompt_tokens, completion_tokens=completion_tokens)
+
+    async def create(self, endpoint: str, caller: str, lane: Lane = Lane.INTERACTIVE, **kwargs: Any) -> Any:
+        """Await an API call from any event loop, e.g. create("chat.completions", "chat", messages=...)."""
+        with tracer.span(f"llm.{caller}", **self._span_attributes(endpoint, lane, kwargs)) as span:
+            future = asyncio.run_coroutine_threadsafe(self._call(endpoint, caller, lane, kwargs), self._ensure_loop())
+            response = await asyncio.wrap_future(future)
+            self._record_usage(span, response)
+            return response
+
+    def create_sync(self, endpoint: str, caller: str, lane: Lane = Lane.BACKGROUND, **kwargs: Any) -> Any:
+        """Blocking version of create() for sync code paths."""
+        with tracer.span(f"llm.{caller}", **self._span_attributes(endpoint, lane, kwargs)) as span:
+            future = asyncio.run_coroutine_threadsafe(self._call(endpoint, caller, lane, kwargs), self._ensure_loop())
+            response = future.result()
+            self._record_usage(span, response)
+            return response
+
+    async def chat(self, caller: str, lane: Lane = Lane.INTERACTIVE, **kwargs: Any) -> Any:
+        return await self.create("chat.completions", caller, lane, **kwargs)
+
+    def chat_sync(self, caller: str, lane: Lane = Lane.BACKGROUND, **kwargs: Any) -> Any:
+        return self.create_sync("chat.completions", caller, lane, **kwargs)
+
+
+# Global instance; nothing is started until the first call
+llm_gateway = LLMGateway(shared=shared_state_enabled())
+
+
+def _collect_metrics() -> List[CollectedMetric]:
+    usage = llm_gateway.usage()
+    families = [
+        ("llm_requests_total", "counter", "requests", "OpenAI requests sent, by caller"),
+        ("llm_retries_total", "counter", "retries", "OpenAI requests retried after 429/5xx/connection errors"),
+        ("llm_errors_total", "counter", "errors", "OpenAI calls that failed after retries"),
+        ("llm_shed_total", "counter", "shed", "Calls rejected because the lane had no capacity"),
+        ("llm_throttled_seconds_total", "counter", "throttled_seconds", "Time spent waiting for rate-limit capacity"),
+    ]
+    return [
+        CollectedMetric(name, kind, doc, [(name, {"caller": caller}, stats[key]) for caller, stats in usage.items()])
+        for name, kind, key, doc in families
+    ]
+
+
+registry.add_collector(_collect_metrics)
@@ -0,0 +1,249 @@
+# backend/services/model_router.py
+"""
+Model cascade for calls that don't need the conversation model.
+
+YES/NO classifications (email validation, the competitor check) and the
+RAG rephrase go through named routes instead of straight to OPENAI_MODEL:
+
+1. local: a deterministic classifier supplied by the caller. Its verdict is
+   used as-is when its confidence is at least MODEL_ROUTER_LOCAL_CONFIDENCE.
+2. small: the route's small model (MODEL_ROUTER_SMALL_MODEL, or per route
+   via MODEL_ROUTES='{"route": "model"}'; "" skips this tier). For
+   classifications it may answer UNSURE; for generation, an empty or
+   truncated answer counts as unsure.
+3. large: the conversation model, only when the tiers above were unsure.
+
+Each route records calls and latency per tier, plus the latency and cost
+saved against the large model's running average on that route. An
+escalation counts as a loss: the small call was spent for nothing.
+"""
+
+import json
+import os
+import threading
+import time
+from typing import Any, Callable, Dict, List, NamedTuple, Optional
+
+from services.llm_gateway import DEFAULT_MODEL, Lane, LLMOverloaded, cost_usd, llm_gateway, usage_tokens
+from utils.logger import get_logger
+from utils.metrics import CollectedMetric, counter, histogram, registry
+
+logger = get_logger(__name__)
+
+SMALL_MODEL = os.getenv("MODEL_ROUTER_SMALL_MODEL", "gpt-5-nano")
+LOCAL_CONFIDENCE = float(os.getenv("MODEL_ROUTER_LOCAL_CONFIDENCE", "0.9"))
+# Large-model latency assumed for a route until one has been observed
+LATENCY_PRIOR = float(os.getenv("MODEL_ROUTER_LATENCY_PRIOR", "1.5"))
+CLASSIFY_MAX_TOKENS = 64
+# Completion tokens assumed for a large-model YES/NO until one has been observed
+ANSWER_TOKENS = 2
+EWMA_ALPHA = 0.2
+
+ROUTE_MODELS: Dict[str, str] = {
+    "email_validator": SMALL_MODEL,
+    "competitor_check": SMALL_MODEL,
+    "rag_rephrase": os.getenv("MODEL_ROUTER_REPHRASE_MODEL", "gpt-5-mini"),
+}
+ROUTE_MODELS.update(json.loads(os.getenv("MODEL_ROUTES", "{}")))
+
+_REASONING_MODELS = ("gpt-5", "o1", "o3", "o4")
+
+ROUTE_CALLS = counter("model_route_calls_total", "Routed model calls by route and answering tier", ["route", "tier"])
+ROUTE_ESCALATIONS = counter("model_route_escalations_total", "Calls escalated past a tier", ["route", "tier"])
+ROUTE_LATENCY = histogram("model_route_latency_seconds", "Latency of routed calls by answering tier",
+                          ["route", "tier"])
+
+
+class Verdict(NamedTuple):
+    answer: bool
+    confidence: float
+    tier: str  # "local", "small" or "large"
+
+
+# A local classifier returns a Verdict(tier="local"), or None when it has no opinion
+LocalClassifier = Callable[[], Optional[Verdict]]
+
+
+def _parse(content: str) -> Optional[bool]:
+    words = content.strip().upper().split()
+    word = words[0].strip(".,!:") if words else ""
+    return {"YES": True, "NO": False}.get(word)
+
+
+def _classify_kwargs(model: str, system: str, question: str) -> Dict[str, Any]:
+    # extra_body: the pinned SDK predates these parameters
+    extra: Dict[str, Any] = {"max_completion_tokens": CLASSIFY_MAX_TOKENS}
+    if model.startswith(_REASONING_MODELS):
+        extra["reasoning_effort"] = "minimal"
+    return {
+        "model": model,
+        "messages": [{"role": "system", "content": system}, {"role": "user", "content": question}],
+        "extra_body": extra,
+    }
+
+
+class ModelRouter:
+    def __init__(self, large_model: str = DEFAULT_MODEL, routes: Optional[Dict[str, str]] = None):
+        self.large_model = large_model
+        self.routes = dict(ROUTE_MODELS if routes is None else routes)
+        self._large_latency: Dict[str, float] = {}
+        self._large_cost: Dict[str, float] = {}
+        self._stats: Dict[str, Dict[str, float]] = {}
+        self._lock = threading.Lock()
+
+    def small_model(self, route: str) -> Optional[str]:
+        model = self.routes.get(route, SMALL_MODEL)
+        return model if model and model != self.large_model else None
+
+    # --- accounting ---
+
+    def _record(self, route: str, tier: str, seconds: float, response: Any = None, model: str = "",
+                est_prompt_tokens: int = 0) -> None:
+        """Count an answered call; savings are against the large model's average on this route."""
+        ROUTE_CALLS.labels(route, tier).inc()
+        ROUTE_LATENCY.labels(route, tier).observe(seconds)
+        prompt_tokens, completion_tokens = usage_tokens(response) if response is not None else (0, 0)
+        with self._lock:
+            if tier == "large":
+                cost = cost_usd(model, prompt_tokens, completion_tokens)
+                self._large_latency[route] = self._ewma(self._large_latency.get(route), seconds)
+                self._large_cost[route] = self._ewma(self._large_cost.get(route), cost)
+                saved_seconds = saved_usd = 0.0
+            else:
+                cost = cost_usd(model, prompt_tokens, completion_tokens) if model else 0.0
+                large_cost = self._large_cost.get(route)
+                if large_cost is None:
+                    tokens = prompt_tokens or est_prompt_tokens
+                    large_cost = cost_usd(self.large_model, tokens, completion_tokens or ANSWER_TOKENS)
+                saved_seconds = self._large_latency.get(route, LATENCY_PRIOR) - seconds
+                saved_usd = large_cost - cost
+            self._account(route, tier, saved_seconds, saved_usd, cost)
+
+    def _record_escalation(self, route: str, tier: str, seconds: float, response: Any = None,
+                           model: str = "") -> None:
+        ROUTE_ESCALATIONS.labels(route, tier).inc()
+        prompt_tokens, completion_tokens = usage_tokens(response) if response is not None else (0, 0)
+        cost = cost_usd(model, prompt_tokens, completion_tokens) if model else 0.0
+        with self._lock:
+            stats = self._account(route, None, -seconds, -cost, cost)
+            stats["escalations"] += 1
+
+    def _account(self, route: str, tier: Optional[str], saved_seconds: float, saved_usd: float,
+                 cost: float) -> Dict[str, float]:
+        stats = self._stats.setdefault(route, {
+            "local": 0, "small": 0, "large": 0, "escalations": 0,
+            "latency_saved_seconds": 0.0, "cost_saved_usd": 0.0, "cost_usd": 0.0,
+        })
+        if tier:
+            stats[tier] += 1
+        stats["latency_saved_seconds"] += saved_seconds
+        stats["cost_saved_usd"] += saved_usd
+        stats["cost_usd"] += cost
+        return stats
+
+    @staticmethod
+    def _ewma(current: Optional[float], sample: float) -> float:
+        return sample if current is None else current + EWMA_ALPHA * (sample - current)
+
+    def stats(self) -> Dict[str, Dict[str, float]]:
+        with self._lock:
+            return {route: dict(stats) for route, stats in self._stats.items()}
+
+    # --- routes ---
+
+    def classify(self, route: str, question: str, local: Optional[LocalClassifier] = None,
+                 lane: Lane = Lane.BACKGROUND) -> Verdict:
+        """
+        YES/NO answer to question, from the cheapest tier that is confident.
+        LLMOverloaded and errors from the large model propagate to the caller.
+        """
+        start = time.perf_counter()
+        if local is not None:
+            verdict = local()
+            if verdict is not None and verdict.confidence >= LOCAL_CONFIDENCE:
+                self._record(route, "local", time.perf_counter() - start, est_prompt_tokens=len(question) // 4)
+                return verdict
+
+        small = self.small_model(route)
+        failed = None  # (seconds, model) of a small call that raised
+        if small:
+            start = time.perf_counter()
+            response = None
+            try:
+                response = llm_gateway.chat_sync(route, lane, **_classify_kwargs(
+                    small, "You are a precise classifier. Answer only YES, NO or UNSURE.", question
+                ))
+                answer = _parse(response.choices[0].message.content or "")
+            except LLMOverloaded:
+                raise
+            except Exception as e:
+                logger.warning("Small model call failed, escalating", extra={"route": route, "error": str(e)})
+                answer = None
+                failed = (time.perf_counter() - start, small)
+            if answer is not None:
+                self._record(route, "small", time.perf_counter() - start, response, small)
+                return Verdict(answer, 0.8, "small")
+            if failed is None:
+                self._record_escalation(route, "small", time.perf_counter() - start, response, small)
+
+        start = time.perf_counter()
+        response = llm_gateway.chat_sync(route, lane, **_classify_kwargs(
+            self.large_model, "You are a precise classifier. Answer only YES or NO.", question
+        ))
+        self._record(route, "large", time.perf_counter() - start, response, self.large_model)
+        if failed is not None:
+            # Only an escalation if the large model answered; failing on both tiers is an outage
+            self._record_escalation(route, "small", failed[0], model=failed[1])
+        return Verdict(_parse(response.choices[0].message.content or "") is True, 0.9, "large")
+
+    async def chat(self, route: str, lane: Lane = Lane.INTERACTIVE, **kwargs: Any) -> Any:
+        """
+        llm_gateway.chat() through the route's small model, escalating to the
+        large model when the answer comes back empty or cut off.
+        """
+        small = self.small_model(route)
+        failed = None  # (seconds, model) of a small call that raised
+        if small:
+            start = time.perf_counter()
+            response = None
+            try:
+                response = await llm_gateway.chat(route, lane, **{**kwargs, "model": small})
+                choice = response.choices[0]
+                if (choice.message.content or "").strip() and choice.finish_reason != "length":
+                    self._record(route, "small", time.perf_counter() - start, response, small)
+                    return response
+            except LLMOverloaded:
+                raise
+            except Exception as e:
+                logger.warning("Small model call failed, escalating", extra={"route": route, "error": str(e)})
+                failed = (time.perf_counter() - start, small)
+            if failed is None:
+                self._record_escalation(route, "small", time.perf_counter() - start, response, small)
+
+        start = time.perf_counter()
+        response = await llm_gateway.chat(route, lane, **{**kwargs, "model": self.large_model})
+        self._record(route, "large", time.perf_counter() - start, response, self.large_model)
+        if failed is not None:
+            self._record_escalation(route, "small", failed[0], model=failed[1])
+        return response
+
+
+# Global instance
+model_router = ModelRouter()
+
+
+def _collect_metrics() -> List[CollectedMetric]:
+    stats = model_router.stats()
+    return [
+        CollectedMetric("model_route_latency_saved_seconds_total", "gauge",
+                        "Latency saved vs. the large model, net of escalations",
+                        [("model_route_latency_saved_seconds_total", {"route": route}, s["latency_saved_seconds"])
+                         for route, s in stats.items()]),
+        CollectedMetric("model_route_cost_saved_usd_total", "gauge",
+                        "Estimated spend saved vs. the large model, net of escalations",
+                        [("model_route_cost_saved_usd_total", {"route": route}, s["cost_saved_usd"])
+                         for route, s in stats.items()]),
+    ]
+
+
+registry.add_collector(_collect_metrics)
@@ -0,0 +1,268 @@
+# backend/services/response_cache.py
+"""
+Response cache for /v1/chat.
+
+Most chat traffic is the same handful of questions phrased slightly
+differently, so answers are cached by normalized message plus the context
+that can change them (model and docs version):
+
+- exact lookup on the normalized text;
+- near-duplicate lookup with MinHash over character 4-grams, banded into an
+  LSH index, confirmed by the estimated Jaccard similarity. Messages must
+  also contain the same numbers ("5 users" != "50 users").
+
+Entries expire after a TTL and are evicted LRU. The whole cache is dropped
+when anything in the docs changes or a new knowledge pack is loaded.
+
+With SHARED_STATE=sqlite, exact entries are also written to the shared
+store, so one worker's answers are reused by the others; a local miss
+checks there before giving up. get() and put() are coroutines: the
+in-process LRU is used inline, while the shared store's SQLite reads and
+writes run in a worker thread so they never block the event loop.
+"""
+
+import asyncio
+import os
+import re
+import threading
+import time
+import zlib
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Tuple
+
+from services.ingestion import DEFAULT_DOCS_PATH
+from services.knowledge_pack import knowledge_pack
+from services.shared_state import enabled as shared_state_enabled, shared_state
+from utils.metrics import CollectedMetric, registry
+
+RESPONSE_CACHE_TTL = float(os.getenv("RESPONSE_CACHE_TTL", "3600"))
+RESPONSE_CACHE_SIZE = int(os.getenv("RESPONSE_CACHE_SIZE", "2048"))
+NEAR_DUPLICATE_THRESHOLD = float(os.getenv("RESPONSE_CACHE_SIMILARITY", "0.75"))
+DOCS_CHECK_INTERVAL = 5.0
+
+NUM_PERM = 64
+BANDS = 16
+ROWS = NUM_PERM // BANDS
+SHINGLE = 4
+
+_MASKS = [zlib.crc32(f"minhash-{i}".encode()) * 2654435761 & 0xFFFFFFFF for i in range(NUM_PERM)]
+_APOSTROPHE = re.compile(r"['’]")
+_PUNCT = re.compile(r"[^\w\s$%]")
+_SPACE = re.compile(r"\s+")
+_NUMBER = re.compile(r"\d+(?:[.,]\d+)*")
+# Personal data makes a message uncacheable
+_UNCACHEABLE = re.compile(r"@|https?://|www\.", re.I)
+
+
+def normalize(message: str) -> str:
+    text = _APOSTROPHE.sub("", message.lower())
+    return _SPACE.sub(" ", _PUNCT.sub(" ", text)).strip()
+
+
+def minhash(text: str) -> Tuple[int, ...]:
+    padded = f" {text} "
+    shingles = {padded[i:i + SHINGLE] for i in range(max(1, len(padded) - SHINGLE + 1))}
+    hashes = [zlib.crc32(s.encode()) for s in shingles]
+    return tuple(min(h ^ mask for h in hashes) for mask in _MASKS)
+
+
+def similarity(a: Tuple[int, ...], b: Tuple[int, ...]) -> float:
+    return sum(x == y for x, y in zip(a, b)) / NUM_PERM
+
+
+def _bands(signature: Tuple[int, ...]) -> List[Tuple[int, Tuple[int, ...]]]:
+    return [(band, signature[band * ROWS:(band + 1) * ROWS]) for band in range(BANDS)]
+
+
+def docs_fingerprint(docs_path: str) -> str:
+    """Cheap change detector: names, sizes and mtimes of the docs."""
+    try:
+        entries = sorted(os.scandir(docs_path), key=lambda e: e.name)
+    except FileNotFoundError:
+        return ""
+    parts = []
+    for entry in entries:
+        stat = entry.stat()
+        parts.append(f"{entry.name}:{stat.st_size}:{stat.st_mtime_ns}")
+    return format(zlib.crc32("|".join(parts).encode()), "08x")
+
+
+class _Entry:
+    __slots__ = ("key", "signature", "numbers", "value", "expires_at")
+
+    def __init__(self, key, signature, numbers, value, expires_at):
+        self.key = key
+        self.signature = signature
+        self.numbers = numbers
+        self.value = value
+        self.expires_at = expires_at
+
+
+class ResponseCache:
+    def __init__(self, maxsize: int = RESPONSE_CACHE_SIZE, ttl: float = RESPONSE_CACHE_TTL,
+                 threshold: float = NEAR_DUPLICATE_THRESHOLD, docs_path: str = DEFAULT_DOCS_PATH,
+                 shared=None):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.threshold = threshold
+        self.docs_path = docs_path
+        self.shared = shared
+        self._entries: "OrderedDict[Tuple[str, str], _Entry]" = OrderedDict()
+        self._lsh: Dict[Tuple[str, int, Tuple[int, ...]], set] = {}
+        self._lock = threading.Lock()
+        self._docs_version = self._current_docs_version()
+        self._docs_checked = time.monotonic()
+        self.stats = {"exact_hits": 0, "near_hits": 0, "shared_hits": 0, "misses": 0, "stores": 0,
+                      "evictions": 0, "invalidations": 0}
+
+    # --- invalidation ---
+
+    def _current_docs_version(self) -> str:
+        return f"{docs_fingerprint(self.docs_path)}-{knowledge_pack.version}"
+
+    def _check_docs(self) -> None:
+        now = time.monotonic()
+        if now - self._docs_checked < DOCS_CHECK_INTERVAL:
+            return
+        self._docs_checked = now
+        version = self._current_docs_version()
+        if version != self._docs_version:
+            self._docs_version = version
+            self.clear()
+            self.stats["invalidations"] += 1
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._lsh.clear()
+
+    def _remove(self, entry: _Entry) -> None:
+        self._entries.pop(entry.key, None)
+        context = entry.key[0]
+        for band, rows in _bands(entry.signature):
+            bucket = self._lsh.get((context, band, rows))
+            if bucket is not None:
+                bucket.discard(entry.key)
+                if not bucket:
+                    del self._lsh[(context, band, rows)]
+
+    # --- lookups ---
+
+    @staticmethod
+    def cacheable(message: str) -> bool:
+        return bool(message) and not _UNCACHEABLE.search(message)
+
+    async def get(self, message: str, context: str = "") -> Optional[Any]:
+        if not self.cacheable(message):
+            return None
+        self._check_docs()
+        text = normalize(message)
+        value = self._get_local(context, text)
+        if value is not None:
+            return value
+
+        if self.shared is not None:
+            value = await asyncio.to_thread(self.shared.get, "response_cache", self._shared_key(context, text))
+            if value is not None:
+                self._store(context, text, value)
+                self.stats["shared_hits"] += 1
+                return value
+        self.stats["misses"] += 1
+        return None
+
+    def _get_local(self, context: str, text: str) -> Optional[Any]:
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get((context, text))
+            if entry is not None:
+                if entry.expires_at > now:
+                    self._entries.move_to_end(entry.key)
+                    self.stats["exact_hits"] += 1
+                    return entry.value
+                self._remove(entry)
+
+            signature = minhash(text)
+            numbers = tuple(_NUMBER.findall(text))
+            candidates = set()
+            for band, rows in _bands(signature):
+                candidates |= self._lsh.get((context, band, rows), set())
+
+            best, best_score = None, self.threshold
+            for key in candidates:
+                candidate = self._entries.get(key)
+                if candidate is None or candidate.expires_at <= now or candidate.numbers != numbers:
+                    continue
+                score = similarity(signature, candidate.signature)
+                if score >= best_score:
+                    best, best_score = candidate, score
+
+            if best is not None:
+                self._entries.move_to_end(best.key)
+                self.stats["near_hits"] += 1
+                return best.value
+        return None
+
+    def _shared_key(self, context: str, text: str) -> str:
+        # The docs version is part of the key, so a docs change orphans old entries
+        return f"{self._docs_version}\x1f{context}\x1f{text}"
+
+    async def put(self, message: str, value: Any, context: str = "") -> None:
+        if not self.cacheable(message):
+            return
+        text = normalize(message)
+        self._store(context, text, value)
+        if self.shared is not None:
+            await asyncio.to_thread(self.shared.set, "response_cache", self._shared_key(context, text), value, self.ttl)
+
+    def _store(self, context: str, text: str, value: Any) -> None:
+        key = (context, text)
+        entry = _Entry(key, minhash(text), tuple(_NUMBER.findall(text)), value, time.monotonic() + self.ttl)
+        with self._lock:
+            existing = self._entries.get(key)
+            if existing is not None:
+                self._remove(existing)
+            self._entries[key] = entry
+            for band, rows in _bands(entry.signature):
+                self._lsh.setdefault((context, band, rows), set()).add(key)
+            self.stats["stores"] += 1
+            while len(self._entries) > self.maxsize:
+                _, oldest = next(iter(self._entries.items()))
+                self._remove(oldest)
+                self.stats["evictions"] += 1
+
+    def metrics(self) -> Dict[str, Any]:
+        hits = self.stats["exact_hits"] + self.stats["near_hits"] + self.stats["shared_hits"]
+        lookups = hits + self.stats["misses"]
+        return {
+            **self.stats,
+            "size": len(self._entries),
+            "hit_rate": (hits / lookups) if lookups else 0.0,
+            "docs_version": self._docs_version,
+        }
+
+
+# Global instance
+response_cache = ResponseCache(shared=shared_state if shared_state_enabled() else None)
+
+
+def _collect_metrics() -> List[CollectedMetric]:
+    m = response_cache.metrics()
+    return [
+        CollectedMetric("response_cache_lookups_total", "counter", "Chat response cache lookups by result", [
+            ("response_cache_lookups_total", {"result": "exact"}, m["exact_hits"]),
+            ("response_cache_lookups_total", {"result": "near"}, m["near_hits"]),
+            ("response_cache_lookups_total", {"result": "shared"}, m["shared_hits"]),
+            ("response_cache_lookups_total", {"result": "miss"}, m["misses"]),
+        ]),
+        CollectedMetric("response_cache_hit_ratio", "gauge", "Chat response cache hit ratio since start",
+                        [("response_cache_hit_ratio", {}, m["hit_rate"])]),
+        CollectedMetric("response_cache_entries", "gauge", "Chat response cache entries",
+                        [("response_cache_entries", {}, m["size"])]),
+        CollectedMetric("response_cache_evictions_total", "counter", "Entries evicted for space",
+                        [("response_cache_evictions_total", {}, m["evictions"])]),
+        CollectedMetric("response_cache_invalidations_total", "counter", "Full clears after a docs change",
+                        [("response_cache_invalidations_total", {}, m["invalidations"])]),
+    ]
+
+
+registry.add_collector(_collect_metrics)
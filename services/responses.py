@@ -0,0 +1,89 @@
+# backend/services/responses.py
+"""
+Response rendering for /v1/chat.
+
+Tools return structured payloads ({"kind": ..., "data": {...}}) instead of
+building markdown themselves. The markdown templates in services/templates
+are compiled once at import into literal/field lists, so rendering is a
+single join. Clients that render on their side ask for "format": "json" and
+get the payload as-is, which is a fraction of the size.
+
+Template fields are written {{name}} or {{name:format_spec}}.
+"""
+
+import os
+import re
+from typing import Any, Dict, List, Tuple
+
+TEMPLATES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "templates")
+_FIELD = re.compile(r"\{\{(\w+)(?::([^}]*))?\}\}")
+
+
+class Template:
+    __slots__ = ("literals", "fields")
+
+    def __init__(self, text: str):
+        self.literals: List[str] = []
+        self.fields: List[Tuple[str, str]] = []
+        pos = 0
+        for m in _FIELD.finditer(text):
+            self.literals.append(text[pos:m.start()])
+            self.fields.append((m.group(1), m.group(2) or ""))
+            pos = m.end()
+        self.literals.append(text[pos:])
+
+    def render(self, data: Dict[str, Any]) -> str:
+        parts = [self.literals[0]]
+        for (name, spec), literal in zip(self.fields, self.literals[1:]):
+            parts.append(format(data.get(name, ""), spec))
+            parts.append(literal)
+        return "".join(parts)
+
+
+def _read(path: str) -> str:
+    with open(path, "r", encoding="utf-8") as f:
+        text = f.read()
+    return text[:-1] if text.endswith("\n") else text
+
+
+def _load_templates(directory: str) -> Dict[str, Template]:
+    return {
+        name[:-3]: Template(_read(os.path.join(directory, name)))
+        for name in os.listdir(directory)
+        if name.endswith(".md")
+    }
+
+
+TEMPLATES = _load_templates(TEMPLATES_DIR)
+# Fixed answers for keyword-routed intents (see services/intents.json)
+CANNED_TEXT = {
+    name[:-3]: _read(os.path.join(TEMPLATES_DIR, "canned", name))
+    for name in os.listdir(os.path.join(TEMPLATES_DIR, "canned"))
+    if name.endswith(".md")
+}
+
+
+def payload(kind: str, **data: Any) -> Dict[str, Any]:
+    if kind not in TEMPLATES:
+        raise KeyError(f"No template for response kind '{kind}'")
+    return {"kind": kind, "data": data}
+
+
+def text(value: str) -> Dict[str, Any]:
+    return payload("text", text=value)
+
+
+def canned(intent: str) -> Dict[str, Any]:
+    return payload("canned", intent=intent, text=CANNED_TEXT[intent])
+
+
+def render(response: Dict[str, Any]) -> str:
+    """Markdown for a payload."""
+    return TEMPLATES[response["kind"]].render(response["data"])
+
+
+def reply(response: Dict[str, Any], fmt: str = "markdown", **fields: Any) -> Dict[str, Any]:
+    """Body for /v1/chat: rendered markdown by default, the raw payload for format=json."""
+    body = {"payload": response} if fmt == "json" else {"response": render(response)}
+    body.update(fields)
+    return body
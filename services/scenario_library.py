@@ -0,0 +1,313 @@
+# backend/services/scenario_library.py
+"""
+Persistent library of generated Gherkin scenarios, for seeding new pages.
+
+Login pages, checkout flows and dashboards look much the same across
+customer sites, yet every generation used to start from scratch. Each
+validated generation is stored here (SQLite, WAL mode), indexed by
+
+- prompt type (the prompt_map group: login, dashboard, ecommerce, ...),
+- domain,
+- UI vocabulary: content words from the screenshot's OCR text, plus the
+  words of the generated steps.
+
+Before a generation, seeds() looks up pages of the same prompt type whose
+vocabulary overlaps (Jaccard over an inverted term index; the same domain
+adds SCENARIO_DOMAIN_WEIGHT). Close matches replace the long prompt_map
+prompt with a short one listing their scenarios: the model names the ones
+that apply and writes only what they don't cover, so both prompt and
+output shrink. merge() puts the reused scenarios back in.
+
+Tokens saved are measured against the average unseeded generation for the
+same prompt type. Screenshot domains and OCR text are recorded when the
+capture and OCR tools run, keyed by screenshot path.
+
+    SCENARIO_LIBRARY_PATH           SQLite file (data/scenario_library.db)
+    SCENARIO_MIN_SIMILARITY         score a page needs to seed (0.4)
+    SCENARIO_SEEDS                  scenarios offered per generation (8)
+"""
+
+import hashlib
+import os
+import re
+import sqlite3
+import threading
+import time
+from collections import Counter
+from typing import Dict, FrozenSet, List, NamedTuple, Optional, Tuple
+
+from services import gherkin
+from services.context_assembler import STOPWORDS
+from utils.logger import get_logger
+from utils.metrics import CollectedMetric, registry
+
+logger = get_logger(__name__)
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DEFAULT_LIBRARY_PATH = os.path.join(BACKEND_DIR, "data", "scenario_library.db")
+MIN_SIMILARITY = float(os.getenv("SCENARIO_MIN_SIMILARITY", "0.4"))
+DOMAIN_WEIGHT = float(os.getenv("SCENARIO_DOMAIN_WEIGHT", "0.4"))
+MAX_SEEDS = int(os.getenv("SCENARIO_SEEDS", "8"))
+# Pages considered per lookup, and vocabulary kept per page
+CANDIDATE_PAGES = 3
+VOCABULARY_SIZE = 64
+
+_WORD = re.compile(r"[a-z][a-z0-9]{2,}")
+_REUSE = re.compile(r"^\W*reuse\W*:\s*(.*)$", re.I | re.M)
+# Gherkin keywords and step filler say nothing about the page
+_FILLER = STOPWORDS | frozenset(
+    "given when then and but scenario feature outline examples background should see sees page "
+    "user click clicks clicked enter enters entered into able displayed shown visible".split()
+)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS pages (
+    id INTEGER PRIMARY KEY,
+    prompt_type TEXT NOT NULL,
+    domain TEXT NOT NULL,
+    terms INTEGER NOT NULL,
+    tokens_used INTEGER NOT NULL,
+    seeded INTEGER NOT NULL,
+    created_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS pages_type ON pages(prompt_type, domain);
+CREATE TABLE IF NOT EXISTS page_terms (
+    term TEXT NOT NULL,
+    page_id INTEGER NOT NULL,
+    PRIMARY KEY (term, page_id)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS scenarios (
+    id INTEGER PRIMARY KEY,
+    page_id INTEGER NOT NULL,
+    name TEXT NOT NULL,
+    text TEXT NOT NULL,
+    fingerprint TEXT NOT NULL,
+    UNIQUE (page_id, fingerprint)
+);
+CREATE TABLE IF NOT EXISTS screenshots (
+    path TEXT PRIMARY KEY,
+    domain TEXT,
+    vocabulary TEXT,
+    updated_at REAL NOT NULL
+);
+"""
+
+SEEDED_PROMPT = """Generate Gherkin test cases for the {prompt_type} page in this screenshot.
+
+These scenarios were written for similar {prompt_type} pages:
+
+{seeds}
+
+Reply with:
+1. A first line "REUSE: <numbers>" listing the scenarios above that apply to this page exactly as written, or "REUSE: none".
+2. Then a Feature with only the scenarios this page needs that the reused ones don't cover, in the same style.
+{context}"""
+
+
+class Page(NamedTuple):
+    domain: str
+    vocabulary: FrozenSet[str]
+
+
+class Seed(NamedTuple):
+    name: str
+    text: str
+    similarity: float
+
+
+def vocabulary(text: str, limit: int = VOCABULARY_SIZE) -> FrozenSet[str]:
+    """The page's most frequent content words (UI labels, field names, actions)"""
+    counts = Counter(w for w in _WORD.findall(text.lower()) if w not in _FILLER)
+    return frozenset(word for word, _ in counts.most_common(limit))
+
+
+def _fingerprint(scenario: gherkin.Scenario) -> str:
+    steps = "\n".join(f"{s.keyword} {' '.join(s.text.lower().split())}" for s in scenario.steps)
+    return hashlib.sha256(steps.encode()).hexdigest()[:32]
+
+
+class ScenarioLibrary:
+    def __init__(self, db_path: Optional[str] = None):
+        self.db_path = db_path or os.getenv("SCENARIO_LIBRARY_PATH", DEFAULT_LIBRARY_PATH)
+        self._local = threading.local()
+        self._init_lock = threading.Lock()
+        self._initialized = False
+        self._stats_lock = threading.Lock()
+        self.stats = {"lookups": 0, "seeded": 0, "seeds_offered": 0, "scenarios_reused": 0, "tokens_saved": 0}
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is not None:
+            return conn
+        os.makedirs(os.path.dirname(os.path.abspath(self.db_path)), exist_ok=True)
+        conn = sqlite3.connect(self.db_path, timeout=30, isolation_level=None)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.execute("PRAGMA busy_timeout=30000")
+        with self._init_lock:
+            if not self._initialized:
+                conn.executescript(SCHEMA)
+                self._initialized = True
+        self._local.conn = conn
+        return conn
+
+    def _count(self, **deltas: int) -> None:
+        with self._stats_lock:
+            for key, value in deltas.items():
+                self.stats[key] += value
+
+    # --- screenshots ---
+
+    def note_screenshot(self, path: str, domain: Optional[str] = None, ocr_text: Optional[str] = None) -> None:
+        """Remember what the capture (domain) and OCR (vocabulary) tools learned about a screenshot"""
+        vocab = " ".join(sorted(vocabulary(ocr_text))) if ocr_text else None
+        self._connect().execute(
+            "INSERT INTO screenshots (path, domain, vocabulary, updated_at) VALUES (?, ?, ?, ?) "
+            "ON CONFLICT(path) DO UPDATE SET domain = COALESCE(excluded.domain, domain), "
+            "vocabulary = COALESCE(excluded.vocabulary, vocabulary), updated_at = excluded.updated_at",
+            (path, domain, vocab, time.time()),
+        )
+
+    def page(self, screenshot_path: str) -> Page:
+        row = self._connect().execute(
+            "SELECT domain, vocabulary FROM screenshots WHERE path = ?", (screenshot_path,)
+        ).fetchone()
+        if row is None:
+            return Page("", frozenset())
+        return Page(row[0] or "", frozenset((row[1] or "").split()))
+
+    # --- lookup ---
+
+    def matches(self, prompt_type: str, page: Page, limit: int = CANDIDATE_PAGES) -> List[Tuple[int, float]]:
+        """(page id, similarity) of the closest stored pages of this prompt type"""
+        conn = self._connect()
+        scores: Dict[int, float] = {}
+        if page.vocabulary:
+            terms = sorted(page.vocabulary)
+            rows = conn.execute(
+                f"SELECT p.id, p.domain, p.terms, COUNT(*) FROM page_terms t JOIN pages p ON p.id = t.page_id "
+                f"WHERE t.term IN ({','.join('?' * len(terms))}) AND p.prompt_type = ? "
+                f"GROUP BY p.id ORDER BY COUNT(*) DESC LIMIT 50",
+                (*terms, prompt_type),
+            ).fetchall()
+            for page_id, domain, page_terms, overlap in rows:
+                similarity = overlap / (len(terms) + page_terms - overlap)
+                scores[page_id] = similarity + (DOMAIN_WEIGHT if page.domain and domain == page.domain else 0.0)
+        if page.domain:
+            # Without OCR text, the same site's pages of this type are still good seeds
+            for (page_id,) in conn.execute(
+                "SELECT id FROM pages WHERE prompt_type = ? AND domain = ? ORDER BY id DESC LIMIT ?",
+                (prompt_type, page.domain, limit),
+            ):
+                scores.setdefault(page_id, DOMAIN_WEIGHT)
+        ranked = sorted(scores.items(), key=lambda item: -item[1])
+        return [(page_id, score) for page_id, score in ranked if score >= MIN_SIMILARITY][:limit]
+
+    def seeds(self, prompt_type: str, page: Page, limit: int = MAX_SEEDS) -> List[Seed]:
+        self._count(lookups=1)
+        seeds: List[Seed] = []
+        seen = set()
+        conn = self._connect()
+        for page_id, similarity in self.matches(prompt_type, page):
+            for name, text, fingerprint in conn.execute(
+                "SELECT name, text, fingerprint FROM scenarios WHERE page_id = ? ORDER BY id", (page_id,)
+            ):
+                if fingerprint not in seen and len(seeds) < limit:
+                    seen.add(fingerprint)
+                    seeds.append(Seed(name, text, similarity))
+        if seeds:
+            self._count(seeded=1, seeds_offered=len(seeds))
+        return seeds
+
+    # --- generation ---
+
+    @staticmethod
+    def seeded_prompt(prompt_type: str, seeds: List[Seed], company_context: str = "") -> str:
+        numbered = "\n\n".join(f"[{i}]\n{seed.text}" for i, seed in enumerate(seeds, 1))
+        context = f"\nCompany context: {company_context}\n" if company_context else ""
+        return SEEDED_PROMPT.format(prompt_type=prompt_type, seeds=numbered, context=context)
+
+    @staticmethod
+    def merge(reply: str, seeds: List[Seed]) -> Tuple[str, int]:
+        """The model's new scenarios plus the seeds it chose to reuse; returns (gherkin, scenarios reused)"""
+        m = _REUSE.search(reply)
+        chosen = sorted({int(n) for n in re.findall(r"\d+", m.group(1)) if 0 < int(n) <= len(seeds)}) if m else []
+        new = gherkin.parse(_REUSE.sub("", reply, count=1) if m else reply)
+        reused = []
+        for n in chosen:
+            reused.extend(gherkin.parse("Feature: seed\n" + seeds[n - 1].text).scenarios)
+        scenarios, _ = gherkin.dedupe(reused + list(new.scenarios))
+        return gherkin.render(new._replace(scenarios=tuple(scenarios))), len(chosen)
+
+    def baseline_tokens(self, prompt_type: str) -> Optional[float]:
+        """Average tokens of an unseeded generation for this prompt type"""
+        row = self._connect().execute(
+            "SELECT AVG(tokens_used) FROM pages WHERE prompt_type = ? AND seeded = 0 AND tokens_used > 0",
+            (prompt_type,),
+        ).fetchone()
+        return row[0]
+
+    def add(self, prompt_type: str, page: Page, feature: gherkin.Feature, tokens_used: int = 0,
+            seeded: bool = False, reused: int = 0) -> Optional[int]:
+        """Store a validated generation's good scenarios; returns the page id (None if nothing to store)"""
+        good = [s for s in feature.scenarios if not s.broken]
+        if seeded:
+            baseline = self.baseline_tokens(prompt_type)
+            saved = int(baseline - tokens_used) if baseline and tokens_used else 0
+            self._count(scenarios_reused=reused, tokens_saved=saved)
+            logger.info("Seeded Gherkin generation", extra={
+                "prompt_type": prompt_type, "reused": reused, "tokens_used": tokens_used, "tokens_saved": saved,
+            })
+        if not good:
+            return None
+        vocab = page.vocabulary | vocabulary(" ".join(step.text for s in good for step in s.steps))
+        conn = self._connect()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            page_id = conn.execute(
+                "INSERT INTO pages (prompt_type, domain, terms, tokens_used, seeded, created_at) VALUES (?, ?, ?, ?, ?, ?)",
+                (prompt_type, page.domain, len(vocab), tokens_used, int(seeded), time.time()),
+            ).lastrowid
+            conn.executemany("INSERT INTO page_terms (term, page_id) VALUES (?, ?)", [(t, page_id) for t in vocab])
+            conn.executemany(
+                "INSERT OR IGNORE INTO scenarios (page_id, name, text, fingerprint) VALUES (?, ?, ?, ?)",
+                [(page_id, s.name, gherkin.render_scenario(s, indent=""), _fingerprint(s)) for s in good],
+            )
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        return page_id
+
+    def metrics(self) -> Dict[str, float]:
+        conn = self._connect()
+        pages = conn.execute("SELECT COUNT(*) FROM pages").fetchone()[0]
+        scenarios = conn.execute("SELECT COUNT(*) FROM scenarios").fetchone()[0]
+        with self._stats_lock:
+            stats = dict(self.stats)
+        stats["reuse_rate"] = round(stats["seeded"] / stats["lookups"], 3) if stats["lookups"] else 0.0
+        return {**stats, "pages": pages, "scenarios": scenarios}
+
+
+# Global instance
+scenario_library = ScenarioLibrary()
+
+
+def _collect_metrics() -> List[CollectedMetric]:
+    stats = scenario_library.metrics()
+    return [
+        CollectedMetric("scenario_library_lookups_total", "counter", "Scenario library lookups by result", [
+            ("scenario_library_lookups_total", {"result": "seeded"}, stats["seeded"]),
+            ("scenario_library_lookups_total", {"result": "miss"}, stats["lookups"] - stats["seeded"]),
+        ]),
+        CollectedMetric("scenario_library_reused_total", "counter", "Library scenarios reused in generations",
+                        [("scenario_library_reused_total", {}, stats["scenarios_reused"])]),
+        CollectedMetric("scenario_library_tokens_saved_total", "gauge",
+                        "Tokens saved by seeded generations vs. the unseeded average",
+                        [("scenario_library_tokens_saved_total", {}, stats["tokens_saved"])]),
+        CollectedMetric("scenario_library_scenarios", "gauge", "Scenarios stored in the library",
+                        [("scenario_library_scenarios", {}, stats["scenarios"])]),
+    ]
+
+
+registry.add_collector(_collect_metrics)
@@ -0,0 +1,329 @@
+# backend/services/screenshot_store.py
+"""
+Screenshot store: ids for captured screenshots, compressed variants, and
+what /v1/screenshots/{id} serves.
+
+Captures are full-page PNGs written by the vision stack, and the capture
+tool used to return only their local path, which the frontend cannot
+fetch. register() gives each capture a content-hash id and queues it for
+transcoding on a small background pool, off the request path:
+
+- full:  the whole page as WebP (and AVIF when Pillow has the codec),
+- thumb: the top of the page, SCREENSHOT_THUMB_WIDTH px wide.
+
+Variants live under SCREENSHOT_STORE_PATH/<id[:2]>/<id>/<tier>.<format>.
+variant() picks the smallest format the client accepts, falling back to
+the original PNG until transcoding is done. Originals are deleted
+SCREENSHOT_KEEP_ORIGINAL_HOURS after their variants are written (a
+negative value keeps them); local_path() then points the Gherkin and OCR
+tools at the full WebP.
+
+Without Pillow, screenshots are registered and served as captured.
+
+    SCREENSHOT_STORE_PATH             variant directory (data/screenshots)
+    SCREENSHOT_INDEX_PATH             SQLite index (data/screenshots.db)
+    SCREENSHOT_WEBP_QUALITY           WebP quality (80)
+    SCREENSHOT_AVIF                   also write AVIF when supported (1)
+    SCREENSHOT_THUMB_WIDTH            thumbnail width in px (320)
+    SCREENSHOT_KEEP_ORIGINAL_HOURS    hours to keep the original PNG (24)
+    SCREENSHOT_TRANSCODE_WORKERS      background transcode threads (1)
+"""
+
+import hashlib
+import importlib.util
+import json
+import mimetypes
+import os
+import re
+import sqlite3
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, NamedTuple, Optional
+
+from utils.logger import get_logger
+from utils.metrics import CollectedMetric, counter, histogram, registry
+
+logger = get_logger(__name__)
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DEFAULT_STORE_PATH = os.path.join(BACKEND_DIR, "data", "screenshots")
+DEFAULT_INDEX_PATH = os.path.join(BACKEND_DIR, "data", "screenshots.db")
+WEBP_QUALITY = int(os.getenv("SCREENSHOT_WEBP_QUALITY", "80"))
+AVIF_QUALITY = 60
+THUMB_WIDTH = int(os.getenv("SCREENSHOT_THUMB_WIDTH", "320"))
+# Thumbnails show the first screen of a full-page capture
+THUMB_ASPECT = 10 / 16
+KEEP_ORIGINAL_HOURS = float(os.getenv("SCREENSHOT_KEEP_ORIGINAL_HOURS", "24"))
+TRANSCODE_WORKERS = int(os.getenv("SCREENSHOT_TRANSCODE_WORKERS", "1"))
+
+PILLOW_AVAILABLE = importlib.util.find_spec("PIL") is not None
+SIZES = ("full", "thumb", "original")
+# Smallest first
+FORMATS = {"avif": "image/avif", "webp": "image/webp"}
+_ID = re.compile(r"^[0-9a-f]{20}$")
+
+TRANSCODED = counter("screenshot_transcodes_total", "Screenshot transcodes by result", ["result"])
+TRANSCODE_SECONDS = histogram("screenshot_transcode_seconds", "Time to write all variants of a screenshot",
+                              buckets=[0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30])
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS screenshots (
+    id TEXT PRIMARY KEY,
+    path TEXT NOT NULL,
+    original_bytes INTEGER NOT NULL,
+    variants TEXT NOT NULL DEFAULT '{}',
+    status TEXT NOT NULL,
+    original_deleted INTEGER NOT NULL DEFAULT 0,
+    created_at REAL NOT NULL,
+    transcoded_at REAL
+);
+CREATE INDEX IF NOT EXISTS screenshots_path ON screenshots(path);
+CREATE INDEX IF NOT EXISTS screenshots_ready ON screenshots(status, original_deleted, transcoded_at);
+"""
+
+
+class Variant(NamedTuple):
+    path: str
+    media_type: str
+
+
+def _avif_supported() -> bool:
+    if not PILLOW_AVAILABLE or os.getenv("SCREENSHOT_AVIF", "1") != "1":
+        return False
+    from PIL import features
+
+    return bool(features.check("avif"))
+
+
+def _accepts(accept: str, media_type: str) -> bool:
+    return media_type in accept.lower()
+
+
+class ScreenshotStore:
+    def __init__(self, store_path: Optional[str] = None, index_path: Optional[str] = None):
+        self.store_path = store_path or os.getenv("SCREENSHOT_STORE_PATH", DEFAULT_STORE_PATH)
+        self.index_path = index_path or os.getenv("SCREENSHOT_INDEX_PATH", DEFAULT_INDEX_PATH)
+        self._local = threading.local()
+        self._init_lock = threading.Lock()
+        self._initialized = False
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._formats: Optional[List[str]] = None
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is not None:
+            return conn
+        os.makedirs(os.path.dirname(os.path.abspath(self.index_path)), exist_ok=True)
+        conn = sqlite3.connect(self.index_path, timeout=30, isolation_level=None)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.execute("PRAGMA busy_timeout=30000")
+        with self._init_lock:
+            if not self._initialized:
+                conn.executescript(SCHEMA)
+                self._initialized = True
+        self._local.conn = conn
+        return conn
+
+    @property
+    def formats(self) -> List[str]:
+        """Formats written for each tier, smallest first"""
+        if self._formats is None:
+            self._formats = (["avif"] if _avif_supported() else []) + (["webp"] if PILLOW_AVAILABLE else [])
+        return self._formats
+
+    def _submit(self, screenshot_id: str) -> None:
+        with self._init_lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(TRANSCODE_WORKERS, thread_name_prefix="screenshot-transcode")
+        self._executor.submit(self.transcode, screenshot_id)
+
+    # --- registration and lookup ---
+
+    def register(self, path: str) -> Optional[str]:
+        """Id for a captured screenshot; variants are written in the background"""
+        try:
+            digest = hashlib.sha256()
+            with open(path, "rb") as f:
+                for block in iter(lambda: f.read(1 << 20), b""):
+                    digest.update(block)
+            size = os.path.getsize(path)
+        except OSError as e:
+            logger.warning("Screenshot not registered", extra={"path": path, "error": str(e)})
+            return None
+        screenshot_id = digest.hexdigest()[:20]
+        status = "pending" if self.formats else "original"
+        conn = self._connect()
+        conn.execute(
+            "INSERT INTO screenshots (id, path, original_bytes, status, created_at) VALUES (?, ?, ?, ?, ?) "
+            "ON CONFLICT(id) DO UPDATE SET path = excluded.path, original_deleted = 0",
+            (screenshot_id, os.path.abspath(path), size, status, time.time()),
+        )
+        row = conn.execute("SELECT status FROM screenshots WHERE id = ?", (screenshot_id,)).fetchone()
+        if row[0] == "pending":
+            self._submit(screenshot_id)
+        return screenshot_id
+
+    def _row(self, screenshot_id: str) -> Optional[tuple]:
+        if not _ID.match(screenshot_id):
+            return None
+        return self._connect().execute(
+            "SELECT path, variants, original_deleted FROM screenshots WHERE id = ?", (screenshot_id,)
+        ).fetchone()
+
+    def _variant_path(self, screenshot_id: str, tier: str, fmt: str) -> str:
+        return os.path.join(self.store_path, screenshot_id[:2], screenshot_id, f"{tier}.{fmt}")
+
+    def variant(self, screenshot_id: str, size: str = "full", accept: str = "") -> Optional[Variant]:
+        """The file to serve for size ("full", "thumb" or "original"), by the client's Accept header"""
+        row = self._row(screenshot_id)
+        if row is None:
+            return None
+        path, variants, original_deleted = row[0], json.loads(row[1]), row[2]
+        original = None if original_deleted or not os.path.exists(path) else Variant(
+            path, mimetypes.guess_type(path)[0] or "application/octet-stream"
+        )
+        if size == "original":
+            return original
+        available = [fmt for fmt in FORMATS if f"{size}.{fmt}" in variants]
+        for fmt in available:
+            if _accepts(accept, FORMATS[fmt]):
+                return Variant(self._variant_path(screenshot_id, size, fmt), FORMATS[fmt])
+        # Not transcoded yet, or a client that only takes PNG/JPEG
+        if original is not None:
+            return original
+        if "webp" in available:
+            return Variant(self._variant_path(screenshot_id, size, "webp"), FORMATS["webp"])
+        return None
+
+    def local_path(self, path: str) -> str:
+        """A readable file for a screenshot path the tools were given, after its original is gone"""
+        if os.path.exists(path):
+            return path
+        row = self._connect().execute(
+            "SELECT id, variants FROM screenshots WHERE path = ? ORDER BY created_at DESC LIMIT 1",
+            (os.path.abspath(path),),
+        ).fetchone()
+        # The vision and OCR models take WebP, not AVIF
+        if row is not None and "full.webp" in json.loads(row[1]):
+            return self._variant_path(row[0], "full", "webp")
+        return path
+
+    # --- transcoding ---
+
+    def transcode(self, screenshot_id: str) -> bool:
+        """Write the full and thumb variants; claims the row so workers don't duplicate the work"""
+        conn = self._connect()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            row = conn.execute(
+                "SELECT path FROM screenshots WHERE id = ? AND status = 'pending'", (screenshot_id,)
+            ).fetchone()
+            if row is not None:
+                conn.execute("UPDATE screenshots SET status = 'transcoding' WHERE id = ?", (screenshot_id,))
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        if row is None:
+            return False
+
+        from PIL import Image
+
+        start = time.perf_counter()
+        variants: Dict[str, int] = {}
+        try:
+            directory = os.path.join(self.store_path, screenshot_id[:2], screenshot_id)
+            os.makedirs(directory, exist_ok=True)
+            with Image.open(row[0]) as image:
+                image.load()
+                if image.mode not in ("RGB", "RGBA"):
+                    image = image.convert("RGBA" if "A" in image.getbands() else "RGB")
+                thumb = image.crop((0, 0, image.width, min(image.height, int(image.width * THUMB_ASPECT))))
+                thumb.thumbnail((THUMB_WIDTH, THUMB_WIDTH))
+                for tier, tier_image in (("full", image), ("thumb", thumb)):
+                    for fmt in self.formats:
+                        target = self._variant_path(screenshot_id, tier, fmt)
+                        tmp = f"{target}.{os.getpid()}.tmp"
+                        if fmt == "webp":
+                            tier_image.save(tmp, "WEBP", quality=WEBP_QUALITY, method=4)
+                        else:
+                            tier_image.save(tmp, "AVIF", quality=AVIF_QUALITY, speed=8)
+                        os.replace(tmp, target)
+                        variants[f"{tier}.{fmt}"] = os.path.getsize(target)
+        except Exception as e:
+            TRANSCODED.labels("failed").inc()
+            logger.warning("Screenshot transcode failed", extra={"screenshot_id": screenshot_id, "error": str(e)})
+            # Served as captured
+            conn.execute("UPDATE screenshots SET status = 'failed' WHERE id = ?", (screenshot_id,))
+            return False
+        conn.execute(
+            "UPDATE screenshots SET status = 'ready', variants = ?, transcoded_at = ? WHERE id = ?",
+            (json.dumps(variants), time.time(), screenshot_id),
+        )
+        TRANSCODED.labels("ok").inc()
+        TRANSCODE_SECONDS.observe(time.perf_counter() - start)
+        self.prune()
+        return True
+
+    def prune(self) -> int:
+        """Delete originals whose variants are older than SCREENSHOT_KEEP_ORIGINAL_HOURS"""
+        if KEEP_ORIGINAL_HOURS < 0:
+            return 0
+        conn = self._connect()
+        rows = conn.execute(
+            "SELECT id, path FROM screenshots WHERE status = 'ready' AND original_deleted = 0 AND transcoded_at <= ?",
+            (time.time() - KEEP_ORIGINAL_HOURS * 3600,),
+        ).fetchall()
+        for screenshot_id, path in rows:
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            except OSError as e:
+                logger.warning("Screenshot original not deleted", extra={"path": path, "error": str(e)})
+                continue
+            conn.execute("UPDATE screenshots SET original_deleted = 1 WHERE id = ?", (screenshot_id,))
+        return len(rows)
+
+    def metrics(self) -> Dict[str, float]:
+        conn = self._connect()
+        by_status = dict(conn.execute("SELECT status, COUNT(*) FROM screenshots GROUP BY status").fetchall())
+        stored = {"original": 0}
+        for original_bytes, variants, original_deleted in conn.execute(
+            "SELECT original_bytes, variants, original_deleted FROM screenshots"
+        ):
+            if not original_deleted:
+                stored["original"] += original_bytes
+            for name, size in json.loads(variants).items():
+                stored[name] = stored.get(name, 0) + size
+        original_total = conn.execute("SELECT COALESCE(SUM(original_bytes), 0) FROM screenshots").fetchone()[0]
+        return {
+            "screenshots": sum(by_status.values()),
+            "by_status": by_status,
+            "formats": self.formats,
+            "bytes_captured": original_total,
+            "bytes_stored": stored,
+        }
+
+
+# Global instance
+screenshot_store = ScreenshotStore()
+
+
+def _collect_metrics() -> List[CollectedMetric]:
+    stats = screenshot_store.metrics()
+    return [
+        CollectedMetric("screenshots_stored", "gauge", "Registered screenshots by transcode status", [
+            ("screenshots_stored", {"status": status}, count) for status, count in stats["by_status"].items()
+        ]),
+        CollectedMetric("screenshot_bytes_captured", "gauge", "Bytes of all captured originals",
+                        [("screenshot_bytes_captured", {}, stats["bytes_captured"])]),
+        CollectedMetric("screenshot_bytes_stored", "gauge", "Bytes on disk by variant (tier.format) and original", [
+            ("screenshot_bytes_stored", {"variant": name}, size) for name, size in stats["bytes_stored"].items()
+        ]),
+    ]
+
+
+registry.add_collector(_collect_metrics)
@@ -0,0 +1,209 @@
+# backend/services/shared_state.py
+"""
+State shared by all workers on a host, kept in SQLite (WAL mode).
+
+With `uvicorn --workers N` every process has its own memory, so anything
+that must agree across workers lives here instead:
+
+- a key/value store with per-entry expiry (response cache second level,
+  the PocketBase admin session);
+- get_or_compute(): one worker computes a value while the others wait for
+  it, e.g. a single PocketBase login for the whole pool;
+- token buckets whose check-and-take is one transaction, so the OpenAI
+  RPM/TPM limits hold for the pool rather than per worker.
+
+Accounts and idempotency keys already live in services/account_store.
+Components use this store when SHARED_STATE=sqlite, which the launcher
+(python -m utils.serve) sets whenever it starts more than one worker.
+"""
+
+import json
+import os
+import sqlite3
+import threading
+import time
+from typing import Any, Callable, List, Optional, Tuple
+
+DEFAULT_DB_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "data", "shared.db")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS kv (
+    namespace TEXT NOT NULL,
+    key TEXT NOT NULL,
+    value TEXT,
+    expires_at REAL NOT NULL,
+    PRIMARY KEY (namespace, key)
+);
+CREATE INDEX IF NOT EXISTS idx_kv_expires_at ON kv(expires_at);
+
+CREATE TABLE IF NOT EXISTS token_buckets (
+    name TEXT PRIMARY KEY,
+    level REAL NOT NULL,
+    updated_at REAL NOT NULL
+);
+"""
+
+# Marks a get_or_compute() lease held by a worker that is still computing
+_PENDING = "\0pending"
+PURGE_INTERVAL = 60.0
+
+
+def enabled() -> bool:
+    return os.getenv("SHARED_STATE", "local").lower() == "sqlite"
+
+
+class SharedState:
+    def __init__(self, db_path: Optional[str] = None):
+        self.db_path = db_path or os.getenv("SHARED_STATE_PATH", DEFAULT_DB_PATH)
+        self._local = threading.local()
+        self._init_lock = threading.Lock()
+        self._initialized = False
+        self._last_purge = 0.0
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is not None:
+            return conn
+        os.makedirs(os.path.dirname(os.path.abspath(self.db_path)), exist_ok=True)
+        conn = sqlite3.connect(self.db_path, timeout=30, isolation_level=None)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.execute("PRAGMA busy_timeout=30000")
+        with self._init_lock:
+            if not self._initialized:
+                conn.executescript(SCHEMA)
+                self._initialized = True
+        self._local.conn = conn
+        return conn
+
+    def initialize(self) -> None:
+        """Create the schema up front (the launcher does this before forking workers)."""
+        self._connect()
+
+    # --- key/value ---
+
+    def get(self, namespace: str, key: str) -> Optional[Any]:
+        row = self._connect().execute(
+            "SELECT value, expires_at FROM kv WHERE namespace = ? AND key = ?", (namespace, key)
+        ).fetchone()
+        if row is None or row[1] <= time.time() or row[0] == _PENDING:
+            return None
+        return json.loads(row[0])
+
+    def set(self, namespace: str, key: str, value: Any, ttl: float) -> None:
+        now = time.time()
+        self._connect().execute(
+            "INSERT OR REPLACE INTO kv (namespace, key, value, expires_at) VALUES (?, ?, ?, ?)",
+            (namespace, key, json.dumps(value), now + ttl),
+        )
+        self._maybe_purge(now)
+
+    def delete(self, namespace: str, key: str) -> None:
+        self._connect().execute("DELETE FROM kv WHERE namespace = ? AND key = ?", (namespace, key))
+
+    def clear(self, namespace: str) -> None:
+        self._connect().execute("DELETE FROM kv WHERE namespace = ?", (namespace,))
+
+    def _maybe_purge(self, now: float) -> None:
+        if now - self._last_purge < PURGE_INTERVAL:
+            return
+        self._last_purge = now
+        self._connect().execute("DELETE FROM kv WHERE expires_at <= ?", (now,))
+
+    def get_or_compute(self, namespace: str, key: str, compute: Callable[[], Any], ttl: float,
+                       lease: float = 30.0, poll: float = 0.1) -> Any:
+        """
+        Cached value, or compute() it in exactly one worker while the others
+        wait. A lease older than `lease` seconds is taken over. None results
+        are not stored.
+        """
+        conn = self._connect()
+        while True:
+            now = time.time()
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                row = conn.execute(
+                    "SELECT value, expires_at FROM kv WHERE namespace = ? AND key = ?", (namespace, key)
+                ).fetchone()
+                if row is not None and row[1] > now:
+                    if row[0] != _PENDING:
+                        conn.execute("COMMIT")
+                        return json.loads(row[0])
+                    claimed = False
+                else:
+                    conn.execute(
+                        "INSERT OR REPLACE INTO kv (namespace, key, value, expires_at) VALUES (?, ?, ?, ?)",
+                        (namespace, key, _PENDING, now + lease),
+                    )
+                    claimed = True
+                conn.execute("COMMIT")
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+            if claimed:
+                break
+            time.sleep(poll)
+
+        try:
+            value = compute()
+        except BaseException:
+            self.delete(namespace, key)
+            raise
+        if value is None:
+            self.delete(namespace, key)
+        else:
+            self.set(namespace, key, value, ttl)
+        return value
+
+    # --- token buckets ---
+
+    def take_tokens(self, buckets: List[Tuple[str, float, float, float]], reserve: float = 0.0) -> float:
+        """
+        Atomically take `amount` from every (name, capacity, per_second, amount)
+        bucket, if each keeps `reserve` (a fraction of capacity); all or
+        nothing. Returns 0.0 when taken, otherwise the seconds until it could be.
+        """
+        conn = self._connect()
+        now = time.time()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            levels, wait = [], 0.0
+            for name, capacity, per_second, amount in buckets:
+                row = conn.execute("SELECT level, updated_at FROM token_buckets WHERE name = ?", (name,)).fetchone()
+                level = capacity if row is None else min(capacity, row[0] + (now - row[1]) * per_second)
+                needed = min(amount, capacity) + reserve * capacity
+                if level < needed:
+                    wait = max(wait, (needed - level) / per_second)
+                levels.append((name, level, amount))
+            if wait == 0.0:
+                for name, level, amount in levels:
+                    conn.execute(
+                        "INSERT OR REPLACE INTO token_buckets (name, level, updated_at) VALUES (?, ?, ?)",
+                        (name, level - amount, now),
+                    )
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        return wait
+
+    def adjust_tokens(self, name: str, capacity: float, per_second: float, delta: float) -> None:
+        """Give back (delta > 0) or charge extra (delta < 0) once real usage is known."""
+        conn = self._connect()
+        now = time.time()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            row = conn.execute("SELECT level, updated_at FROM token_buckets WHERE name = ?", (name,)).fetchone()
+            level = capacity if row is None else min(capacity, row[0] + (now - row[1]) * per_second)
+            conn.execute(
+                "INSERT OR REPLACE INTO token_buckets (name, level, updated_at) VALUES (?, ?, ?)",
+                (name, min(capacity, level + delta), now),
+            )
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+
+
+# Global instance
+shared_state = SharedState()
@@ -0,0 +1,470 @@
+# backend/services/site_crawler.py
+"""
+Crawl mode: test generation for a whole site from one start URL.
+
+The capture tool takes one URL at a time, and onboarding a real app needs
+dozens of pages. SiteCrawler discovers same-origin pages (robots.txt
+sitemaps or /sitemap.xml, then links found by a breadth-first walk). It
+sends them through three stages, each a pool of workers joined by
+asyncio queues, so page 1 can be in Gherkin generation while page 20 is
+still being fetched:
+
+    fetch (httpx, per-host politeness)  ->  capture  ->  OCR + Gherkin
+
+Politeness: at most CRAWL_PER_HOST requests in flight per host, started
+at least CRAWL_DELAY_MS apart (or the robots.txt Crawl-delay, if longer).
+Fetches and browser captures share these slots, since a capture loads
+the page and its assets again. Disallowed paths are skipped.
+
+Near-identical pages are captured once:
+
+- DOM: a 64-bit simhash over tag-structure shingles and visible words,
+  leaving out nav/header/footer chrome. Pages within CRAWL_DOM_DISTANCE
+  bits of a kept page are dropped before capture (the same page under
+  another URL, print views, pages generated from one template).
+- Visual: a 256-bit dHash of the screenshot's first screen. Pages within
+  CRAWL_VISUAL_DISTANCE bits are not sent on to OCR and Gherkin (pages
+  that differ in markup but render the same). Near-blank first screens
+  are not compared.
+
+Stages are async callables supplied by the caller: the chat router wraps
+the existing capture, OCR and Gherkin tools, and a benchmark can plug in
+stand-ins against a local static site. crawl() yields events as the
+pipeline makes progress and ends with a "done" event carrying
+pages-per-minute.
+
+    CRAWL_MAX_PAGES            pages captured per crawl (25)
+    CRAWL_MAX_DEPTH            link depth from the start URL (3)
+    CRAWL_FETCH_CONCURRENCY    fetch workers (8)
+    CRAWL_CAPTURE_CONCURRENCY  capture and generation workers each (3)
+    CRAWL_PER_HOST             fetches and captures in flight per host (2)
+    CRAWL_DELAY_MS             minimum gap between requests to a host (250)
+    CRAWL_WAIT_MS              wait after page load before each capture (3000)
+    CRAWL_DOM_DISTANCE         simhash bits for a DOM duplicate (3)
+    CRAWL_VISUAL_DISTANCE      dHash bits (of 256) for a visual duplicate (4)
+"""
+
+import asyncio
+import hashlib
+import importlib.util
+import os
+import re
+import time
+import xml.etree.ElementTree as ET
+from collections import Counter
+from html.parser import HTMLParser
+from typing import AsyncIterator, Awaitable, Callable, Dict, List, NamedTuple, Optional, Set
+from urllib.parse import urldefrag, urljoin, urlparse, urlunparse
+from urllib.robotparser import RobotFileParser
+
+import httpx
+
+from utils.logger import get_logger
+from utils.metrics import counter
+
+logger = get_logger(__name__)
+
+MAX_PAGES = int(os.getenv("CRAWL_MAX_PAGES", "25"))
+MAX_DEPTH = int(os.getenv("CRAWL_MAX_DEPTH", "3"))
+FETCH_CONCURRENCY = int(os.getenv("CRAWL_FETCH_CONCURRENCY", "8"))
+CAPTURE_CONCURRENCY = int(os.getenv("CRAWL_CAPTURE_CONCURRENCY", "3"))
+PER_HOST = int(os.getenv("CRAWL_PER_HOST", "2"))
+DELAY_MS = float(os.getenv("CRAWL_DELAY_MS", "250"))
+DOM_DISTANCE = int(os.getenv("CRAWL_DOM_DISTANCE", "3"))
+VISUAL_DISTANCE = int(os.getenv("CRAWL_VISUAL_DISTANCE", "4"))
+# 16x16 = 256 bits: at 8x8 mostly-white pages with different text hash alike
+DHASH_SIZE = 16
+# Below this many set bits the first screen is near blank and says nothing
+MIN_DHASH_BITS = DHASH_SIZE * DHASH_SIZE // 16
+# Upper bound on max_pages a caller can ask for
+MAX_PAGES_CAP = 100
+CAPTURE_WAIT_MS = int(os.getenv("CRAWL_WAIT_MS", "3000"))
+FETCH_TIMEOUT = 10.0
+# Pages fetched per page captured, at most; bounds crawls of duplicate-heavy sites
+FETCH_BUDGET = 4
+USER_AGENT = "TestZeusCrawler/1.0"
+
+PILLOW_AVAILABLE = importlib.util.find_spec("PIL") is not None
+_SKIP_EXTENSIONS = re.compile(
+    r"\.(png|jpe?g|gif|svg|webp|avif|ico|css|js|mjs|json|xml|txt|pdf|zip|gz|mp4|webm|mp3|woff2?|ttf)$", re.I
+)
+# Query parameters that never change what a page shows
+_TRACKING = re.compile(r"^(utm_\w+|gclid|fbclid|ref|mc_\w+)$", re.I)
+_WORD = re.compile(r"[a-z0-9]{3,}")
+_PROMPT_TYPES = [
+    ("login", re.compile(r"log-?in|sign-?in|auth|password|sso", re.I)),
+    ("ecommerce", re.compile(r"cart|checkout|shop|store|product|basket|order", re.I)),
+    ("dashboard", re.compile(r"dashboard|analytics|admin|reports?|overview", re.I)),
+    ("form", re.compile(r"contact|sign-?up|register|apply|survey|form|request", re.I)),
+]
+
+CRAWL_PAGES = counter("crawl_pages_total", "Crawled pages by outcome", ["result"])
+
+# Stage signatures: capture(url) -> data with at least "path"; ocr(path) -> text;
+# generate(path, prompt_type) -> data (summary of the generated feature)
+CaptureStage = Callable[[str], Awaitable[Dict]]
+OcrStage = Callable[[str], Awaitable[str]]
+GenerateStage = Callable[[str, str], Awaitable[Dict]]
+
+
+class FetchedPage(NamedTuple):
+    url: str
+    depth: int
+    title: str
+    prompt_type: str
+    dom_hash: int
+
+
+class _PageParser(HTMLParser):
+    """Links, title, simhash features and form hints from one HTML page"""
+
+    _VOID = frozenset("area base br col embed hr img input link meta source track wbr".split())
+    # Site chrome repeats on every page and would drown out what differs
+    _CHROME = frozenset(("nav", "header", "footer"))
+
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.links: List[str] = []
+        self.title = ""
+        self.features: Counter = Counter()
+        self.inputs = 0
+        self.password = False
+        self._stack: List[str] = []
+        self._skip = 0
+        self._chrome = 0
+
+    def handle_starttag(self, tag, attrs):
+        attrs = dict(attrs)
+        if tag == "a" and attrs.get("href"):
+            self.links.append(attrs["href"])
+        elif tag == "input":
+            self.inputs += 1
+            self.password = self.password or attrs.get("type") == "password"
+        if tag in self._CHROME:
+            self._chrome += 1
+        if not self._chrome:
+            classes = ".".join(sorted((attrs.get("class") or "").split()))
+            self.features[f"{'>'.join(self._stack[-2:])}>{tag}.{classes}"] += 1
+        if tag in ("script", "style"):
+            self._skip += 1
+        if tag not in self._VOID:
+            self._stack.append(tag)
+
+    def handle_endtag(self, tag):
+        if tag in ("script", "style") and self._skip:
+            self._skip -= 1
+        if tag in self._CHROME and self._chrome:
+            self._chrome -= 1
+        if tag in self._stack:
+            while self._stack and self._stack.pop() != tag:
+                pass
+
+    def handle_data(self, data):
+        if self._skip:
+            return
+        if self._stack and self._stack[-1] == "title":
+            self.title += data.strip()
+        if self._chrome:
+            return
+        for word in _WORD.findall(data.lower()):
+            self.features[word] += 1
+
+
+def simhash(features: Counter) -> int:
+    weights = [0] * 64
+    for feature, count in features.items():
+        h = int.from_bytes(hashlib.blake2b(feature.encode(), digest_size=8).digest(), "big")
+        for bit in range(64):
+            weights[bit] += count if h >> bit & 1 else -count
+    return sum(1 << bit for bit in range(64) if weights[bit] > 0)
+
+
+def dhash(path: str, size: int = DHASH_SIZE) -> Optional[int]:
+    """size*size-bit difference hash of the top of a screenshot; None without Pillow"""
+    if not PILLOW_AVAILABLE:
+        return None
+    from PIL import Image
+
+    with Image.open(path) as image:
+        # Full-page captures: compare the first screen, where layout differs most
+        top = image.crop((0, 0, image.width, min(image.height, image.width * 10 // 16)))
+        pixels = list(top.convert("L").resize((size + 1, size)).getdata())
+    return sum(
+        1 << (row * size + col)
+        for row in range(size) for col in range(size)
+        if pixels[row * (size + 1) + col] > pixels[row * (size + 1) + col + 1]
+    )
+
+
+def distance(a: int, b: int) -> int:
+    return bin(a ^ b).count("1")
+
+
+def normalize(url: str) -> str:
+    """Canonical form for dedupe: no fragment, tracking parameters or index.html"""
+    url, _ = urldefrag(url)
+    parts = urlparse(url)
+    query = "&".join(
+        pair for pair in sorted(parts.query.split("&"))
+        if pair and not _TRACKING.match(pair.split("=", 1)[0])
+    )
+    path = re.sub(r"/index\.html?$", "/", parts.path) or "/"
+    return urlunparse((parts.scheme.lower(), parts.netloc.lower(), path, "", query, ""))
+
+
+def prompt_type_for(url: str, title: str, inputs: int, password: bool) -> str:
+    """The prompt_map group that fits a page, from its URL, title and form fields"""
+    if password:
+        return "login"
+    text = f"{urlparse(url).path} {title}"
+    for prompt_type, pattern in _PROMPT_TYPES:
+        if pattern.search(text):
+            return prompt_type
+    return "form" if inputs >= 3 else "general"
+
+
+def _join(base: str, link: str) -> Optional[str]:
+    """Absolute URL for a link, or None for one urllib can't parse (e.g. "http://[oops/")"""
+    try:
+        url = urljoin(base, link)
+        urlparse(url).port  # raises for a malformed host or port
+        return url
+    except ValueError:
+        return None
+
+
+class _HostLimiter:
+    """Per-host concurrency and minimum spacing between request starts"""
+
+    def __init__(self, per_host: int, delay: float):
+        self.per_host = per_host
+        self.delay = delay
+        self._slots: Dict[str, asyncio.Semaphore] = {}
+        self._next_start: Dict[str, float] = {}
+        self._lock = asyncio.Lock()
+
+    async def acquire(self, host: str) -> asyncio.Semaphore:
+        slot = self._slots.setdefault(host, asyncio.Semaphore(self.per_host))
+        await slot.acquire()
+        async with self._lock:
+            now = time.monotonic()
+            start = max(now, self._next_start.get(host, 0.0))
+            self._next_start[host] = start + self.delay
+        if start > now:
+            await asyncio.sleep(start - now)
+        return slot
+
+
+class SiteCrawler:
+    def __init__(self, capture: CaptureStage, generate: GenerateStage, ocr: Optional[OcrStage] = None,
+                 max_pages: int = MAX_PAGES, max_depth: int = MAX_DEPTH,
+                 fetch_concurrency: int = FETCH_CONCURRENCY, capture_concurrency: int = CAPTURE_CONCURRENCY,
+                 per_host: int = PER_HOST, delay_ms: float = DELAY_MS):
+        self.capture = capture
+        self.generate = generate
+        self.ocr = ocr
+        self.max_pages = max_pages
+        self.max_depth = max_depth
+        self.fetch_concurrency = fetch_concurrency
+        self.capture_concurrency = capture_concurrency
+        self.per_host = per_host
+        self.delay_ms = delay_ms
+
+    async def _robots(self, client: httpx.AsyncClient, origin: str) -> RobotFileParser:
+        robots = RobotFileParser(f"{origin}/robots.txt")
+        try:
+            response = await client.get(f"{origin}/robots.txt")
+            robots.parse(response.text.splitlines() if response.status_code == 200 else [])
+        except httpx.HTTPError:
+            robots.parse([])
+        return robots
+
+    async def _sitemap(self, client: httpx.AsyncClient, urls: List[str], limit: int) -> List[str]:
+        """Page URLs from sitemaps (one level of sitemap index followed)"""
+        pages: List[str] = []
+        for depth in range(2):
+            nested = []
+            for url in urls:
+                try:
+                    response = await client.get(url)
+                    if response.status_code != 200:
+                        continue
+                    root = ET.fromstring(response.content)
+                except (httpx.HTTPError, httpx.InvalidURL, ET.ParseError):
+                    continue
+                locs = [el.text.strip() for el in root.iter() if el.tag.endswith("loc") and el.text]
+                (nested if root.tag.endswith("sitemapindex") else pages).extend(locs)
+            if not nested or len(pages) >= limit:
+                break
+            urls = nested
+        return pages[:limit]
+
+    async def crawl(self, start_url: str) -> AsyncIterator[Dict]:
+        """Events: page (fetched), duplicate, captured, generated, failed, then done"""
+        started = time.monotonic()
+        start_url = normalize(start_url if "://" in start_url else f"https://{start_url}")
+        origin = "{0.scheme}://{0.netloc}".format(urlparse(start_url))
+        stats = Counter()
+        events: asyncio.Queue = asyncio.Queue()
+        frontier: asyncio.Queue = asyncio.Queue()
+        to_capture: asyncio.Queue = asyncio.Queue()
+        to_generate: asyncio.Queue = asyncio.Queue()
+        seen: Set[str] = set()
+        # Same origin, plus wherever the start URL redirects (www., https)
+        hosts: Set[str] = {urlparse(start_url).netloc}
+        dom_hashes: List[int] = []
+        visual_hashes: List[int] = []
+        accepted = 0
+
+        def emit(event: str, **data) -> None:
+            if event in ("duplicate", "generated", "failed"):
+                CRAWL_PAGES.labels(data.get("reason", event) if event == "duplicate" else event).inc()
+            events.put_nowait({"event": event, **data})
+
+        def schedule(url: Optional[str], depth: int) -> None:
+            if url is None:
+                return
+            url = normalize(url)
+            if (urlparse(url).netloc not in hosts or url in seen or depth > self.max_depth
+                    or _SKIP_EXTENSIONS.search(urlparse(url).path) or not robots.can_fetch(USER_AGENT, url)
+                    or len(seen) >= self.max_pages * FETCH_BUDGET or accepted >= self.max_pages):
+                return
+            seen.add(url)
+            frontier.put_nowait((url, depth))
+
+        async def fetch_worker(client: httpx.AsyncClient, limiter: _HostLimiter) -> None:
+            nonlocal accepted
+            while True:
+                url, depth = await frontier.get()
+                try:
+                    if accepted >= self.max_pages:
+                        continue
+                    slot = await limiter.acquire(urlparse(url).netloc)
+                    try:
+                        response = await client.get(url)
+                    finally:
+                        slot.release()
+                    stats["fetched"] += 1
+                    if response.status_code >= 400 or "html" not in response.headers.get("content-type", ""):
+                        continue
+                    final_url = normalize(str(response.url))
+                    if depth == 0:
+                        hosts.add(urlparse(final_url).netloc)
+                    if final_url != url and final_url in seen:
+                        continue  # a redirect to a page we already have
+                    parser = _PageParser()
+                    parser.feed(response.text)
+                    for link in parser.links:
+                        schedule(_join(final_url, link), depth + 1)
+                    page = FetchedPage(final_url, depth, parser.title,
+                                       prompt_type_for(final_url, parser.title, parser.inputs, parser.password),
+                                       simhash(parser.features))
+                    near = next((h for h in dom_hashes if distance(h, page.dom_hash) <= DOM_DISTANCE), None)
+                    if near is not None:
+                        stats["duplicate_dom"] += 1
+                        emit("duplicate", url=page.url, reason="dom")
+                        continue
+                    if accepted >= self.max_pages:
+                        continue
+                    accepted += 1
+                    dom_hashes.append(page.dom_hash)
+                    emit("page", url=page.url, title=page.title, depth=depth, prompt_type=page.prompt_type)
+                    to_capture.put_nowait(page)
+                except httpx.HTTPError as e:
+                    stats["fetch_errors"] += 1
+                    emit("failed", url=url, stage="fetch", error=str(e))
+                except Exception as e:
+                    # A dead worker would leave its queue unjoinable and hang the crawl
+                    stats["failed"] += 1
+                    emit("failed", url=url, stage="fetch", error=str(e))
+                finally:
+                    frontier.task_done()
+
+        async def capture_worker(limiter: _HostLimiter) -> None:
+            while True:
+                page = await to_capture.get()
+                try:
+                    slot = await limiter.acquire(urlparse(page.url).netloc)
+                    try:
+                        data = await self.capture(page.url)
+                    finally:
+                        slot.release()
+                    visual = await asyncio.to_thread(dhash, data["path"])
+                    if visual is not None and bin(visual).count("1") >= MIN_DHASH_BITS:
+                        if any(distance(h, visual) <= VISUAL_DISTANCE for h in visual_hashes):
+                            stats["duplicate_visual"] += 1
+                            emit("duplicate", url=page.url, reason="visual", image_url=data.get("image_url", ""))
+                            continue
+                        visual_hashes.append(visual)
+                    stats["captured"] += 1
+                    emit("captured", url=page.url, image_url=data.get("image_url", ""))
+                    to_generate.put_nowait((page, data["path"]))
+                except Exception as e:
+                    stats["failed"] += 1
+                    emit("failed", url=page.url, stage="capture", error=str(e))
+                finally:
+                    to_capture.task_done()
+
+        async def generate_worker() -> None:
+            while True:
+                page, path = await to_generate.get()
+                try:
+                    # OCR first: its vocabulary lets the scenario library seed the generation
+                    if self.ocr is not None:
+                        await self.ocr(path)
+                    result = await self.generate(path, page.prompt_type)
+                    stats["generated"] += 1
+                    emit("generated", url=page.url, prompt_type=page.prompt_type, **result)
+                except Exception as e:
+                    stats["failed"] += 1
+                    emit("failed", url=page.url, stage="generate", error=str(e))
+                finally:
+                    to_generate.task_done()
+
+        async def run() -> None:
+            nonlocal robots
+            headers = {"User-Agent": USER_AGENT}
+            async with httpx.AsyncClient(timeout=FETCH_TIMEOUT, follow_redirects=True, headers=headers) as client:
+                robots = await self._robots(client, origin)
+                delay = max(self.delay_ms / 1000, float(robots.crawl_delay(USER_AGENT) or 0))
+                limiter = _HostLimiter(self.per_host, delay)
+                schedule(start_url, 0)
+                sitemaps = [_join(origin, url) for url in robots.site_maps() or ["/sitemap.xml"]]
+                for url in await self._sitemap(client, [url for url in sitemaps if url], self.max_pages * FETCH_BUDGET):
+                    schedule(_join(origin, url), 1)
+                workers = [asyncio.create_task(fetch_worker(client, limiter)) for _ in range(self.fetch_concurrency)]
+                workers += [asyncio.create_task(capture_worker(limiter)) for _ in range(self.capture_concurrency)]
+                workers += [asyncio.create_task(generate_worker()) for _ in range(self.capture_concurrency)]
+                try:
+                    # Each queue is fed only by the one before it, so join them in order
+                    await frontier.join()
+                    await to_capture.join()
+                    await to_generate.join()
+                finally:
+                    for worker in workers:
+                        worker.cancel()
+                    await asyncio.gather(*workers, return_exceptions=True)
+
+        robots = RobotFileParser()
+        robots.parse([])
+        runner = asyncio.create_task(run())
+        runner.add_done_callback(lambda _: events.put_nowait(None))
+        try:
+            while True:
+                event = await events.get()
+                if event is None:
+                    break
+                yield event
+            runner.result()
+        finally:
+            runner.cancel()
+        elapsed = time.monotonic() - started
+        logger.info("Site crawled", extra={"url": start_url, "seconds": round(elapsed, 1), **stats})
+        yield {
+            "event": "done",
+            "url": start_url,
+            "seconds": round(elapsed, 2),
+            "pages_per_minute": round(stats["generated"] / elapsed * 60, 1) if elapsed else 0.0,
+            **{key: stats[key] for key in ("fetched", "captured", "generated", "duplicate_dom",
+                                            "duplicate_visual", "failed", "fetch_errors")},
+        }
@@ -0,0 +1,107 @@
+# backend/services/speculation.py
+"""
+Speculative knowledge retrieval for /v1/chat.
+
+Most turns that end in a testzeus_knowledge call could have started
+retrieval as soon as the message arrived. When the intent scan finds a
+knowledge intent, chat_endpoint starts retrieval on the raw message in a
+worker thread while the first completion is in flight:
+
+- if the model then calls testzeus_knowledge with a query close enough to
+  the message, the speculative result is used. Close enough: both route to
+  the same knowledge areas (whose summaries make up most of the context),
+  and either that set is non-empty or at least SPECULATION_MIN_OVERLAP of
+  the query's content words appear in the message;
+- otherwise (different query, another tool, or a plain answer) the result
+  is dropped. Retrieval is local and takes milliseconds, so a miss costs a
+  little CPU and no LLM spend.
+
+Hits record the retrieval time taken off the critical path; misses record
+the retrieval time wasted.
+
+    SPECULATIVE_RETRIEVAL     on by default; "0" turns it off
+    SPECULATION_MIN_OVERLAP   query/message word overlap needed for reuse (0.6)
+"""
+
+import asyncio
+import os
+import time
+from typing import Callable, Optional
+
+from services.context_assembler import terms
+from services.intent_router import intent_router
+from utils.logger import get_logger
+from utils.metrics import counter
+
+logger = get_logger(__name__)
+
+ENABLED = os.getenv("SPECULATIVE_RETRIEVAL", "1") != "0"
+MIN_OVERLAP = float(os.getenv("SPECULATION_MIN_OVERLAP", "0.6"))
+
+SPECULATIONS = counter("knowledge_speculation_total", "Speculative retrievals by outcome", ["outcome"])
+SAVED_SECONDS = counter("knowledge_speculation_saved_seconds_total",
+                        "Retrieval time taken off the critical path by speculation hits")
+WASTED_SECONDS = counter("knowledge_speculation_wasted_seconds_total",
+                         "Retrieval time spent on speculations that were not used")
+
+
+def query_matches(message: str, query: str) -> bool:
+    """Would retrieval for query find what retrieval for message found?"""
+    query_terms = terms(query)
+    if not query_terms:
+        return False
+    areas = {m.intent for m in intent_router.route(query, "knowledge")}
+    if areas != {m.intent for m in intent_router.route(message, "knowledge")}:
+        return False
+    return bool(areas) or len(query_terms & terms(message)) / len(query_terms) >= MIN_OVERLAP
+
+
+class Speculation:
+    """Retrieval for one message, running in a worker thread"""
+
+    def __init__(self, message: str, retrieve: Callable[[str], str]):
+        self.message = message
+        self._retrieve = retrieve
+        self.duration: Optional[float] = None
+        self.task = asyncio.ensure_future(asyncio.to_thread(self._run))
+
+    def _run(self) -> str:
+        start = time.perf_counter()
+        try:
+            return self._retrieve(self.message)
+        finally:
+            self.duration = time.perf_counter() - start
+
+    async def result_for(self, query: str) -> Optional[str]:
+        """The speculative result if query matches the message, else None (and the speculation is dropped)"""
+        if not query_matches(self.message, query):
+            self.discard("miss")
+            return None
+        start = time.perf_counter()
+        try:
+            result = await self.task
+        except Exception as e:
+            logger.warning("Speculative retrieval failed", extra={"error": str(e)})
+            SPECULATIONS.labels("error").inc()
+            return None
+        waited = time.perf_counter() - start
+        SPECULATIONS.labels("hit").inc()
+        SAVED_SECONDS.inc(max(0.0, (self.duration or 0.0) - waited))
+        return result
+
+    def discard(self, outcome: str = "unused") -> None:
+        """Drop the result; the thread can't be interrupted, so its time is counted when it ends"""
+        SPECULATIONS.labels(outcome).inc()
+        self.task.add_done_callback(self._discarded)
+
+    def _discarded(self, task: "asyncio.Future") -> None:
+        if not task.cancelled():
+            task.exception()  # retrieved, so asyncio doesn't log it
+        WASTED_SECONDS.inc(self.duration or 0.0)
+
+
+def speculate(message: str, has_knowledge_intent: bool, retrieve: Callable[[str], str]) -> Optional[Speculation]:
+    """Start retrieval for message if it looks like a knowledge question; call from the event loop."""
+    if not ENABLED or not has_knowledge_intent:
+        return None
+    return Speculation(message, retrieve)
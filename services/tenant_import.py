@@ -0,0 +1,435 @@
+# backend/services/tenant_import.py
+"""
+Bulk tenant import from CSV or JSONL uploads (POST /v1/tenants/import).
+
+Sales pre-provisions hundreds of customer orgs from spreadsheets. Going
+through create_tenant_and_team meant one chat turn per org, in its
+"admin_email: ... / plan: ..." text format. Here the upload is read as a
+stream: multipart bodies go through python-multipart's push parser, and
+raw text/csv or application/x-ndjson bodies are read as they are. Rows
+are decoded as their bytes arrive, and the next batch is not read until
+the current one is provisioned, so memory stays bounded by a batch.
+
+Columns (CSV header or JSON keys): admin_email (or email), plan (oss or
+enterprise, default oss), teammate_emails (or teammates: a list, or
+addresses separated by commas, semicolons or spaces).
+
+Per batch of TENANT_IMPORT_BATCH_SIZE rows:
+
+1. rows already created under this import id are skipped (checkpoint);
+2. every address in the batch is validated in one validate_batch() call,
+   which checks each distinct domain once;
+3. valid rows are provisioned, at most TENANT_IMPORT_CONCURRENCY at a
+   time, through account_manager: tools/account's idempotent path, so a
+   row also sent through that tool is not created twice. Each org gets a
+   random password that is never returned, stored or logged; every user
+   created is sent PocketBase's password-reset email instead, which is
+   how they set their own (the row's detail says how many were sent);
+4. each row's outcome is checkpointed (SQLite, WAL mode) and yielded.
+
+An interrupted import is resumed by uploading the same file with the same
+import_id: created rows are replayed from the checkpoint; invalid and
+failed ones are validated and provisioned again, so rows fixed in the
+file go through. A row whose content changed is processed again.
+
+    TENANT_IMPORT_PATH          checkpoint SQLite file (data/tenant_imports.db)
+    TENANT_IMPORT_BATCH_SIZE    rows per validation/provisioning batch (50)
+    TENANT_IMPORT_CONCURRENCY   provisioning calls in flight (4)
+    TENANT_IMPORT_MAX_ROWS      rows accepted per upload (10000)
+"""
+
+import asyncio
+import codecs
+import csv
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+import uuid
+from typing import AsyncIterator, Callable, Dict, List, Optional, Tuple
+
+from multipart.multipart import MultipartParser, parse_options_header
+
+from services.email_validator import email_validator
+from services.idempotency import idempotency_key
+from tools.account import generate_temp_password, provision_tenant
+from utils.logger import get_logger
+from utils.metrics import counter
+
+logger = get_logger(__name__)
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DEFAULT_IMPORT_PATH = os.path.join(BACKEND_DIR, "data", "tenant_imports.db")
+BATCH_SIZE = int(os.getenv("TENANT_IMPORT_BATCH_SIZE", "50"))
+CONCURRENCY = int(os.getenv("TENANT_IMPORT_CONCURRENCY", "4"))
+MAX_ROWS = int(os.getenv("TENANT_IMPORT_MAX_ROWS", "10000"))
+
+PLANS = ("oss", "enterprise")
+# Only created rows are skipped on resume; invalid and failed ones are redone,
+# since the source file may have been fixed in between
+DONE = "created"
+_ID = re.compile(r"^[A-Za-z0-9_.-]{1,64}$")
+_ADDRESS_SEPARATORS = re.compile(r"[,;\s]+")
+
+IMPORT_ROWS = counter("tenant_import_rows_total", "Bulk tenant import rows by outcome", ["status"])
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS imports (
+    id TEXT PRIMARY KEY,
+    status TEXT NOT NULL,
+    rows_seen INTEGER NOT NULL DEFAULT 0,
+    created_at REAL NOT NULL,
+    updated_at REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS import_rows (
+    import_id TEXT NOT NULL,
+    row INTEGER NOT NULL,
+    key TEXT NOT NULL,
+    status TEXT NOT NULL,
+    result TEXT NOT NULL,
+    PRIMARY KEY (import_id, row)
+) WITHOUT ROWID;
+"""
+
+# provision(admin_email, plan, teammate_emails) -> "SUCCESS: ..." or "ERROR: ..."
+Provision = Callable[[str, str, List[str]], str]
+
+
+def valid_import_id(import_id: str) -> bool:
+    return bool(_ID.match(import_id))
+
+
+# --- upload decoding ---
+
+class RowDecoder:
+    """Incremental CSV/JSONL decoder: feed() bytes as they arrive, get complete rows back"""
+
+    def __init__(self, fmt: str):
+        self.fmt = fmt
+        self._decoder = codecs.getincrementaldecoder("utf-8-sig")(errors="replace")
+        self._partial = ""
+        self._record: List[str] = []
+        self._header: Optional[List[str]] = None
+
+    def feed(self, data: bytes, final: bool = False) -> List[Dict]:
+        text = self._partial + self._decoder.decode(data, final)
+        lines = text.split("\n")
+        self._partial = "" if final else lines.pop()
+        rows = []
+        for line in lines:
+            row = self._line(line.rstrip("\r"))
+            if row is not None:
+                rows.append(row)
+        if final and self._record:
+            # An unterminated quote: parse what there is
+            rows.append(self._parse_csv("\n".join(self._record)))
+            self._record = []
+        return rows
+
+    def _line(self, line: str) -> Optional[Dict]:
+        if self.fmt == "jsonl":
+            if not line.strip():
+                return None
+            try:
+                value = json.loads(line)
+            except ValueError as e:
+                return {"_error": f"invalid JSON: {e}"}
+            return value if isinstance(value, dict) else {"_error": "each line must be a JSON object"}
+        # A CSV record may span lines inside quotes; "" escapes keep the quote count even
+        self._record.append(line)
+        record = "\n".join(self._record)
+        if record.count('"') % 2:
+            return None
+        self._record = []
+        if not record.strip():
+            return None
+        return self._parse_csv(record)
+
+    def _parse_csv(self, record: str) -> Optional[Dict]:
+        values = next(csv.reader([record]), [])
+        if self._header is None:
+            self._header = [name.strip().lower() for name in values]
+            return None
+        return dict(zip(self._header, values))
+
+
+class _MultipartFile:
+    """Feeds the first file part of a multipart body to a RowDecoder"""
+
+    def __init__(self, boundary: bytes, fmt: Optional[str]):
+        self.fmt = fmt
+        self.decoder: Optional[RowDecoder] = None
+        self.rows: List[Dict] = []
+        self._headers: Dict[str, str] = {}
+        self._field = self._value = b""
+        self._state = "before"  # before -> reading -> after (the file part)
+        self.parser = MultipartParser(boundary, {
+            "on_part_begin": self._part_begin,
+            "on_header_field": lambda data, start, end: setattr(self, "_field", self._field + data[start:end]),
+            "on_header_value": lambda data, start, end: setattr(self, "_value", self._value + data[start:end]),
+            "on_header_end": self._header_end,
+            "on_headers_finished": self._headers_finished,
+            "on_part_data": self._part_data,
+            "on_part_end": self._part_end,
+        })
+
+    def _part_begin(self):
+        self._headers = {}
+
+    def _header_end(self):
+        self._headers[self._field.decode("latin-1").lower()] = self._value.decode("latin-1")
+        self._field = self._value = b""
+
+    def _headers_finished(self):
+        if self._state != "before":
+            return
+        _, params = parse_options_header(self._headers.get("content-disposition", ""))
+        filename = params.get(b"filename", b"").decode("utf-8", "replace")
+        if filename or params.get(b"name") == b"file":
+            self.fmt = self.fmt or ("jsonl" if filename.endswith((".jsonl", ".ndjson", ".json")) else "csv")
+            self.decoder = RowDecoder(self.fmt)
+            self._state = "reading"
+
+    def _part_data(self, data, start, end):
+        if self._state == "reading":
+            self.rows.extend(self.decoder.feed(data[start:end]))
+
+    def _part_end(self):
+        if self._state == "reading":
+            self.rows.extend(self.decoder.feed(b"", final=True))
+            self._state = "after"
+
+
+async def upload_rows(chunks: AsyncIterator[bytes], content_type: str, fmt: Optional[str] = None) -> AsyncIterator[Dict]:
+    """Rows of a CSV/JSONL upload, decoded as the request body streams in"""
+    mime, params = parse_options_header(content_type or "")
+    if mime == b"multipart/form-data":
+        if not params.get(b"boundary"):
+            raise ValueError("multipart upload without a boundary")
+        upload = _MultipartFile(params[b"boundary"], fmt)
+        async for chunk in chunks:
+            upload.parser.write(chunk)
+            rows, upload.rows = upload.rows, []
+            for row in rows:
+                yield row
+        upload.parser.finalize()
+        if upload.decoder is None:
+            raise ValueError("no file part in the upload")
+        for row in upload.rows:
+            yield row
+        return
+    decoder = RowDecoder(fmt or ("jsonl" if mime in (b"application/x-ndjson", b"application/jsonl") else "csv"))
+    async for chunk in chunks:
+        for row in decoder.feed(chunk):
+            yield row
+    for row in decoder.feed(b"", final=True):
+        yield row
+
+
+def normalize_row(raw: Dict) -> Tuple[Optional[Tuple[str, str, List[str]]], Optional[str]]:
+    """((admin_email, plan, teammates), None) or (None, reason)"""
+    if "_error" in raw:
+        return None, raw["_error"]
+    admin_email = str(raw.get("admin_email") or raw.get("email") or "").strip()
+    if not admin_email:
+        return None, "missing admin_email"
+    plan = str(raw.get("plan") or "oss").strip().lower()
+    if plan not in PLANS:
+        return None, f"unknown plan '{plan}' (expected {' or '.join(PLANS)})"
+    teammates = raw.get("teammate_emails", raw.get("teammates")) or []
+    if isinstance(teammates, str):
+        teammates = _ADDRESS_SEPARATORS.split(teammates)
+    teammates = [str(e).strip() for e in teammates if str(e).strip()]
+    return (admin_email, plan, teammates), None
+
+
+# --- checkpoints ---
+
+class ImportCheckpoints:
+    def __init__(self, db_path: Optional[str] = None):
+        self.db_path = db_path or os.getenv("TENANT_IMPORT_PATH", DEFAULT_IMPORT_PATH)
+        self._local = threading.local()
+        self._init_lock = threading.Lock()
+        self._initialized = False
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is not None:
+            return conn
+        os.makedirs(os.path.dirname(os.path.abspath(self.db_path)), exist_ok=True)
+        conn = sqlite3.connect(self.db_path, timeout=30, isolation_level=None)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.execute("PRAGMA busy_timeout=30000")
+        with self._init_lock:
+            if not self._initialized:
+                conn.executescript(SCHEMA)
+                self._initialized = True
+        self._local.conn = conn
+        return conn
+
+    def start(self, import_id: str) -> int:
+        """Open (or reopen) an import; returns how many rows are already finished"""
+        conn = self._connect()
+        now = time.time()
+        conn.execute(
+            "INSERT INTO imports (id, status, created_at, updated_at) VALUES (?, 'running', ?, ?) "
+            "ON CONFLICT(id) DO UPDATE SET status = 'running', updated_at = excluded.updated_at",
+            (import_id, now, now),
+        )
+        return conn.execute(
+            "SELECT COUNT(*) FROM import_rows WHERE import_id = ? AND status = ?", (import_id, DONE)
+        ).fetchone()[0]
+
+    def finished(self, import_id: str, rows: List[int]) -> Dict[int, Tuple[str, Dict]]:
+        """row -> (key, result) for rows of this batch that need no more work"""
+        placeholders = ",".join("?" * len(rows))
+        found = self._connect().execute(
+            f"SELECT row, key, result FROM import_rows WHERE import_id = ? AND row IN ({placeholders}) "
+            "AND status = ?",
+            (import_id, *rows, DONE),
+        ).fetchall()
+        return {row: (key, json.loads(result)) for row, key, result in found}
+
+    def record(self, import_id: str, results: List[Tuple[int, str, Dict]], rows_seen: int) -> None:
+        conn = self._connect()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            conn.executemany(
+                "INSERT OR REPLACE INTO import_rows (import_id, row, key, status, result) VALUES (?, ?, ?, ?, ?)",
+                [(import_id, row, key, result["status"], json.dumps(result)) for row, key, result in results],
+            )
+            conn.execute("UPDATE imports SET rows_seen = MAX(rows_seen, ?), updated_at = ? WHERE id = ?",
+                         (rows_seen, time.time(), import_id))
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+
+    def close(self, import_id: str, status: str) -> None:
+        self._connect().execute("UPDATE imports SET status = ?, updated_at = ? WHERE id = ?",
+                                (status, time.time(), import_id))
+
+
+# Global instance
+import_checkpoints = ImportCheckpoints()
+
+
+# --- the import ---
+
+def provision_with_account_manager(admin_email: str, plan: str, teammate_emails: List[str]) -> str:
+    """tools/account's idempotent provisioning: a random password per org, then password-setup emails"""
+    return provision_tenant(admin_email, plan, teammate_emails, password=generate_temp_password(), send_reset=True)
+
+
+def _provision_row(provision: Provision, admin_email: str, plan: str, teammates: List[str]) -> Dict:
+    outcome, _, message = provision(admin_email, plan, teammates).partition(": ")
+    if outcome == "SUCCESS":
+        return {"status": "created", "detail": message}
+    return {"status": "failed", "reason": message or outcome}
+
+
+async def _process_batch(import_id: str, batch: List[Tuple[int, Dict]], provision: Provision,
+                         checkpoints: ImportCheckpoints) -> List[Dict]:
+    done = await asyncio.to_thread(checkpoints.finished, import_id, [row for row, _ in batch])
+    results: Dict[int, Dict] = {}
+    pending = []  # (row, key, (admin_email, plan, teammates))
+    for row, raw in batch:
+        fields, reason = normalize_row(raw)
+        key = idempotency_key(*fields, namespace="tenant_import") if fields else f"invalid:{reason}"
+        if row in done and done[row][0] == key:
+            results[row] = {**done[row][1], "resumed": True}
+        elif fields is None:
+            results[row] = {"status": "invalid", "reason": reason, "key": key}
+        else:
+            pending.append((row, key, fields))
+
+    # One validation pass for every address in the batch
+    addresses = [email for _, _, (admin, _, team) in pending for email in (admin, *team)]
+    verdicts = await asyncio.to_thread(email_validator.validate_batch, addresses) if addresses else {}
+    semaphore = asyncio.Semaphore(CONCURRENCY)
+
+    async def provision_one(admin_email: str, plan: str, teammates: List[str]) -> Dict:
+        async with semaphore:
+            try:
+                return await asyncio.to_thread(_provision_row, provision, admin_email, plan, teammates)
+            except Exception as e:
+                return {"status": "failed", "reason": str(e)}
+
+    tasks = {}
+    for row, key, (admin_email, plan, teammates) in pending:
+        bad = [f"{email} ({verdicts[email]['reason']})" for email in (admin_email, *teammates)
+               if not verdicts[email]["is_valid"]]
+        if bad:
+            results[row] = {"status": "invalid", "reason": "invalid email: " + ", ".join(bad), "key": key}
+        else:
+            tasks[row] = (key, asyncio.create_task(provision_one(admin_email, plan, teammates)))
+    for row, (key, task) in tasks.items():
+        results[row] = {**await task, "key": key}
+
+    log, record = [], []
+    for row, raw in batch:
+        result = results[row]
+        key = result.pop("key", None)
+        if not result.pop("resumed", False):
+            record.append((row, key, result))
+            IMPORT_ROWS.labels(result["status"]).inc()
+        else:
+            result = {**result, "resumed": True}
+        email = raw.get("admin_email") or raw.get("email") or ""
+        log.append({"event": "row", "row": row, "admin_email": email, **result})
+    if record:
+        await asyncio.to_thread(checkpoints.record, import_id, record, batch[-1][0])
+    return log
+
+
+async def run_import(rows: AsyncIterator[Dict], provision: Provision = provision_with_account_manager,
+                     import_id: Optional[str] = None,
+                     checkpoints: ImportCheckpoints = import_checkpoints) -> AsyncIterator[Dict]:
+    """Per-row result events for an upload, bracketed by "start" and "done" events"""
+    import_id = import_id or uuid.uuid4().hex
+    started = time.monotonic()
+    already_done = await asyncio.to_thread(checkpoints.start, import_id)
+    yield {"event": "start", "import_id": import_id, "resumed": already_done > 0, "rows_already_done": already_done}
+
+    counts = {"created": 0, "invalid": 0, "failed": 0, "resumed": 0}
+    batch: List[Tuple[int, Dict]] = []
+    seen = 0
+    status = "interrupted"
+    try:
+        async for raw in rows:
+            seen += 1
+            if seen > MAX_ROWS:
+                yield {"event": "error", "error": f"more than {MAX_ROWS} rows; the rest were not imported"}
+                break
+            batch.append((seen, raw))
+            if len(batch) < BATCH_SIZE:
+                continue
+            for event in await _process_batch(import_id, batch, provision, checkpoints):
+                counts["resumed" if event.get("resumed") else event["status"]] += 1
+                yield event
+            batch = []
+        if batch:
+            for event in await _process_batch(import_id, batch, provision, checkpoints):
+                counts["resumed" if event.get("resumed") else event["status"]] += 1
+                yield event
+        status = "failed" if counts["failed"] else "completed"
+    finally:
+        await asyncio.to_thread(checkpoints.close, import_id, status)
+        elapsed = time.monotonic() - started
+        logger.info("Tenant import finished", extra={
+            "import_id": import_id, "status": status, "rows": seen,
+            "rows_created": counts["created"], "rows_invalid": counts["invalid"],
+            "rows_failed": counts["failed"], "rows_resumed": counts["resumed"],
+        })
+    yield {
+        "event": "done",
+        "import_id": import_id,
+        "status": status,
+        "rows": min(seen, MAX_ROWS),
+        **counts,
+        "seconds": round(elapsed, 2),
+        "rows_per_second": round(min(seen, MAX_ROWS) / elapsed, 1) if elapsed else 0.0,
+    }
@@ -0,0 +1,202 @@
+# backend/services/tenant_knowledge.py
+"""
+Per-tenant knowledge overlays on top of the shared base pack.
+
+A tenant's own docs (.txt, .md, .html) live in
+
+    TENANT_KNOWLEDGE_ROOT/<tenant_id>/docs/      (default data/tenants)
+
+and are ingested and compiled into that tenant's own index and pack
+(services/ingestion, services/knowledge_pack) next to them. search() asks
+the base pack and the tenant's overlay for passages and merges them by
+BM25 score, with TENANT_OVERLAY_BOOST applied to the tenant's own.
+The chat endpoint only uses an overlay for the tenant named in a signed
+X-Tenant-Token (services/tenant_tokens), never a client-chosen id.
+
+Overlays are loaded lazily on a tenant's first query: ingest, rebuild the
+pack if the docs changed, then map it. Mapped packs are kept in an LRU and
+the least recently used are unmapped once their total size exceeds
+TENANT_OVERLAY_MEMORY_MB. Tenants without docs are remembered as empty
+entries (no mapping, no I/O on later queries), and loaded overlays
+re-check their docs every TENANT_OVERLAY_REFRESH seconds.
+"""
+
+import heapq
+import os
+import re
+import threading
+import time
+from collections import OrderedDict
+from operator import attrgetter
+from typing import Dict, List, Optional
+
+from services.context_assembler import Chunk
+from services.ingestion import BACKEND_DIR, KnowledgeIndex
+from services.knowledge_pack import KnowledgePack, knowledge_pack, refresh_pack
+from utils.logger import get_logger
+from utils.metrics import CollectedMetric, registry
+
+logger = get_logger(__name__)
+
+DEFAULT_ROOT = os.path.join(BACKEND_DIR, "data", "tenants")
+MEMORY_CAP_MB = float(os.getenv("TENANT_OVERLAY_MEMORY_MB", "256"))
+# Empty entries cost a few hundred bytes each; bound how many are remembered
+MAX_ENTRIES = int(os.getenv("TENANT_OVERLAY_MAX_ENTRIES", "10000"))
+REFRESH_INTERVAL = float(os.getenv("TENANT_OVERLAY_REFRESH", "60"))
+OVERLAY_BOOST = float(os.getenv("TENANT_OVERLAY_BOOST", "1.0"))
+
+_TENANT_ID = re.compile(r"^[A-Za-z0-9][A-Za-z0-9_.-]{0,63}$")
+
+
+def valid_tenant_id(tenant: Optional[str]) -> bool:
+    """Tenant ids become directory names, so only plain ids are accepted."""
+    return bool(tenant) and bool(_TENANT_ID.match(tenant)) and ".." not in tenant
+
+
+class _Overlay:
+    __slots__ = ("pack", "size", "checked_at")
+
+    def __init__(self, pack: Optional[KnowledgePack], size: int):
+        self.pack = pack
+        self.size = size
+        self.checked_at = time.monotonic()
+
+
+class TenantOverlays:
+    def __init__(self, root: Optional[str] = None, memory_cap_mb: float = MEMORY_CAP_MB,
+                 max_entries: int = MAX_ENTRIES):
+        self.root = root or os.getenv("TENANT_KNOWLEDGE_ROOT", DEFAULT_ROOT)
+        self.memory_cap = int(memory_cap_mb * 1024 * 1024)
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, _Overlay]" = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self._build_locks: Dict[str, threading.Lock] = {}
+        self.stats = {"hits": 0, "loads": 0, "builds": 0, "evictions": 0}
+
+    def docs_path(self, tenant: str) -> str:
+        return os.path.join(self.root, tenant, "docs")
+
+    def has_docs(self, tenant: Optional[str]) -> bool:
+        if not valid_tenant_id(tenant):
+            return False
+        with self._lock:
+            entry = self._entries.get(tenant)
+        if entry is not None:
+            return entry.pack is not None
+        return os.path.isdir(self.docs_path(tenant))
+
+    def get(self, tenant: Optional[str]) -> Optional[KnowledgePack]:
+        """The tenant's mapped overlay, loading (and building) it on first use."""
+        if not valid_tenant_id(tenant):
+            return None
+        with self._lock:
+            entry = self._entries.get(tenant)
+            if entry is not None:
+                self._entries.move_to_end(tenant)
+                if time.monotonic() - entry.checked_at < REFRESH_INTERVAL:
+                    self.stats["hits"] += 1
+                    return entry.pack
+            build_lock = self._build_locks.setdefault(tenant, threading.Lock())
+
+        # One thread per tenant loads; others for the same tenant wait for it
+        with build_lock:
+            with self._lock:
+                entry = self._entries.get(tenant)
+                if entry is not None and time.monotonic() - entry.checked_at < REFRESH_INTERVAL:
+                    return entry.pack
+            pack = self._load(tenant, entry.pack if entry else None)
+            self._store(tenant, pack)
+        with self._lock:
+            self._build_locks.pop(tenant, None)
+        return pack
+
+    def _load(self, tenant: str, current: Optional[KnowledgePack]) -> Optional[KnowledgePack]:
+        docs = self.docs_path(tenant)
+        if not os.path.isdir(docs):
+            return None
+        tenant_dir = os.path.join(self.root, tenant)
+        pack_path = os.path.join(tenant_dir, "knowledge.pack")
+        start = time.perf_counter()
+        try:
+            rebuilt = refresh_pack(docs, KnowledgeIndex(os.path.join(tenant_dir, "knowledge.db")), pack_path,
+                                   areas_path="", pack=current)
+            if not rebuilt and current is not None:
+                return current
+            pack = KnowledgePack(pack_path)
+        except Exception:
+            logger.exception("Could not load tenant knowledge", extra={"tenant": tenant})
+            return current
+        self.stats["loads"] += 1
+        self.stats["builds"] += int(rebuilt)
+        logger.info("Loaded tenant knowledge overlay", extra={
+            "tenant": tenant, "chunks": len(pack), "rebuilt": rebuilt,
+            "ms": round((time.perf_counter() - start) * 1000, 1),
+        })
+        return pack
+
+    def _store(self, tenant: str, pack: Optional[KnowledgePack]) -> None:
+        size = os.path.getsize(pack.path) if pack is not None else 0
+        with self._lock:
+            old = self._entries.pop(tenant, None)
+            if old is not None:
+                self._bytes -= old.size
+            self._entries[tenant] = _Overlay(pack, size)
+            self._bytes += size
+            # Unmapping happens when the last in-flight search drops its reference
+            while len(self._entries) > 1 and (self._bytes > self.memory_cap or len(self._entries) > self.max_entries):
+                _, evicted = self._entries.popitem(last=False)
+                self._bytes -= evicted.size
+                self.stats["evictions"] += 1
+
+    def evict(self, tenant: str) -> None:
+        """Drop a tenant's overlay, e.g. after its docs changed, so the next query reloads it."""
+        with self._lock:
+            entry = self._entries.pop(tenant, None)
+            if entry is not None:
+                self._bytes -= entry.size
+
+    def search(self, tenant: Optional[str], query: str, limit: int = 10,
+               base: Optional[KnowledgePack] = None) -> List[Chunk]:
+        """Base pack (default: the global one) and tenant overlay passages, merged by score."""
+        results: List[Chunk] = []
+        base = base or knowledge_pack.get()
+        if base is not None:
+            results.extend(base.search(query, limit))
+        overlay = self.get(tenant)
+        if overlay is not None:
+            results.extend(
+                Chunk(c.text, f"{tenant}/{c.source}", c.score * OVERLAY_BOOST) for c in overlay.search(query, limit)
+            )
+        return heapq.nlargest(limit, results, key=attrgetter("score"))
+
+    def metrics(self) -> Dict[str, float]:
+        with self._lock:
+            loaded = sum(1 for entry in self._entries.values() if entry.pack is not None)
+            return {**self.stats, "entries": len(self._entries), "loaded": loaded,
+                    "mapped_bytes": self._bytes, "memory_cap_bytes": self.memory_cap}
+
+
+# Global instance
+tenant_overlays = TenantOverlays()
+
+
+def _collect_metrics() -> List[CollectedMetric]:
+    stats = tenant_overlays.metrics()
+    return [
+        CollectedMetric("tenant_overlay_lookups_total", "counter", "Tenant overlay lookups by result", [
+            ("tenant_overlay_lookups_total", {"result": "hit"}, stats["hits"]),
+            ("tenant_overlay_lookups_total", {"result": "load"}, stats["loads"]),
+        ]),
+        CollectedMetric("tenant_overlay_builds_total", "counter", "Tenant packs rebuilt after a docs change",
+                        [("tenant_overlay_builds_total", {}, stats["builds"])]),
+        CollectedMetric("tenant_overlay_evictions_total", "counter", "Tenant overlays evicted (LRU)",
+                        [("tenant_overlay_evictions_total", {}, stats["evictions"])]),
+        CollectedMetric("tenant_overlays_loaded", "gauge", "Tenant overlays currently mapped",
+                        [("tenant_overlays_loaded", {}, stats["loaded"])]),
+        CollectedMetric("tenant_overlay_mapped_bytes", "gauge", "Bytes of tenant packs currently mapped",
+                        [("tenant_overlay_mapped_bytes", {}, stats["mapped_bytes"])]),
+    ]
+
+
+registry.add_collector(_collect_metrics)
@@ -0,0 +1,75 @@
+# backend/services/tenant_tokens.py
+"""
+Signed tenant credentials for per-tenant features (knowledge overlays).
+
+    python -m services.tenant_tokens <tenant_id> [--days 30]
+
+The chat API has no login of its own, so a tenant is never taken from a
+header the client picks. Callers present a token minted for their tenant:
+
+    X-Tenant-Token: <tenant_id>.<expires, unix seconds>.<HMAC-SHA256 hex>
+
+signed with TENANT_TOKEN_SECRET. verify() returns the tenant for a valid,
+unexpired token and None otherwise; without a secret no token verifies,
+so tenant overlays are off.
+
+    TENANT_TOKEN_SECRET    HMAC key (unset: tenant features disabled)
+    TENANT_TOKEN_DAYS      lifetime of minted tokens (30)
+"""
+
+import argparse
+import hashlib
+import hmac
+import os
+import time
+from typing import Optional
+
+TOKEN_DAYS = float(os.getenv("TENANT_TOKEN_DAYS", "30"))
+
+
+class TenantTokens:
+    def __init__(self, secret: Optional[str] = None):
+        secret = os.getenv("TENANT_TOKEN_SECRET", "") if secret is None else secret
+        self._key = secret.encode("utf-8")
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self._key)
+
+    def _sign(self, tenant: str, expires: int) -> str:
+        return hmac.new(self._key, f"{tenant}.{expires}".encode("utf-8"), hashlib.sha256).hexdigest()
+
+    def mint(self, tenant: str, days: float = TOKEN_DAYS) -> str:
+        if not self.enabled:
+            raise ValueError("TENANT_TOKEN_SECRET is not set")
+        expires = int(time.time() + days * 86400)
+        return f"{tenant}.{expires}.{self._sign(tenant, expires)}"
+
+    def verify(self, token: Optional[str]) -> Optional[str]:
+        """The token's tenant, or None if it is missing, forged or expired"""
+        if not token or not self.enabled:
+            return None
+        # Tenant ids may contain dots; the last two fields never do
+        fields = token.rsplit(".", 2)
+        if len(fields) != 3 or not fields[1].isdigit():
+            return None
+        tenant, expires, signature = fields[0], int(fields[1]), fields[2]
+        if expires < time.time() or not hmac.compare_digest(signature, self._sign(tenant, expires)):
+            return None
+        return tenant
+
+
+# Global instance
+tenant_tokens = TenantTokens()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Mint an X-Tenant-Token for a tenant")
+    parser.add_argument("tenant")
+    parser.add_argument("--days", type=float, default=TOKEN_DAYS)
+    args = parser.parse_args()
+    print(tenant_tokens.mint(args.tenant, args.days))
+
+
+if __name__ == "__main__":
+    main()
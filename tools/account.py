@@ -11,17 +11,26 @@ Output: "SUCCESS: ..." or "ERROR: ..."
 
 from typing import Dict, List
 import re
+import secrets
+
+from services.idempotency import idempotency_key, provisioning_runner
 
 
 # Import your real account manager
 try:
-    from account_manager import create_account, user_exists
+    from account_manager import create_account, generate_temp_password, send_password_reset, user_exists
 except ImportError:
     # Mock for demo
     def create_account(org_email, user_name, user_email, user_role, password, password_confirm):
         return True, f"Mock: {user_name} created"
     def user_exists(email):
         return False
+    def generate_temp_password(length=12):
+        return secrets.token_urlsafe(length)
+    def send_password_reset(email):
+        return True
+
+DEFAULT_PASSWORD = "temp_pass_123!"
 
 
 def parse_input(input_text: str) -> Dict[str, str]:
@@ -52,33 +61,66 @@ def tool_create_tenant_and_team(input_text: str) -> str:
         if not admin_email:
             return "ERROR: Missing admin_email"
 
+        return provision_tenant(admin_email, plan, teammate_emails)
+
+    except Exception as e:
+        return f"ERROR: Failed to parse or execute: {str(e)}"
+
+
+def provision_tenant(admin_email: str, plan: str, teammate_emails: List[str],
+                     password: str = DEFAULT_PASSWORD, send_reset: bool = False) -> str:
+    """
+    Create tenant + users, once per (admin, plan, team) within the idempotency
+    window. Also used by the bulk tenant import (services/tenant_import.py).
+    With send_reset, every user created is emailed a password-setup link, for
+    passwords nobody is told.
+    Output: "SUCCESS: ..." or "ERROR: ..."
+    """
+    # Retries and double-submits replay the first outcome instead of re-provisioning
+    return provisioning_runner.run(
+        idempotency_key(admin_email, plan, teammate_emails, namespace="tools.account"),
+        lambda: _provision(admin_email, teammate_emails, password, send_reset),
+        should_store=lambda result: result.startswith("SUCCESS"),
+    )
+
+
+def _provision(admin_email: str, teammate_emails: List[str], password: str, send_reset: bool = False) -> str:
+    """Create the admin, then every teammate that doesn't exist yet"""
+    try:
         # Create admin
         success, msg = create_account(
             org_email=admin_email,
             user_name=admin_email.split("@")[0].title(),
             user_email=admin_email,
             user_role="admin",
-            password="temp_pass_123!",
-            password_confirm="temp_pass_123!"
+            password=password,
+            password_confirm=password
         )
         if not success:
             return f"ERROR: {msg}"
+        created = [admin_email]
 
         # Add teammates
         invited = 0
         for te_email in teammate_emails:
             if not user_exists(te_email):
-                _, _ = create_account(
+                te_success, _ = create_account(
                     org_email=admin_email,
                     user_name=te_email.split("@")[0].title(),
                     user_email=te_email,
                     user_role="member",
-                    password="temp_pass_123!",
-                    password_confirm="temp_pass_123!"
+                    password=password,
+                    password_confirm=password
                 )
+                if te_success:
+                    created.append(te_email)
                 invited += 1
 
+        if send_reset:
+            sent = sum(send_password_reset(email) for email in created)
+            return (f"SUCCESS: Tenant created for {admin_email}. {invited} teammates invited. "
+                    f"{sent} of {len(created)} password-setup emails sent.")
         return f"SUCCESS: Tenant created for {admin_email}. {invited} teammates invited."
 
     except Exception as e:
-        return f"ERROR: Failed to parse or execute: {str(e)}"
\ No newline at end of file
+        return f"ERROR: Failed to execute: {str(e)}"
\ No newline at end of file
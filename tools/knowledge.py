@@ -6,49 +6,34 @@ Input: Raw text question
 Output: Raw text answer (no JSON)
 """
 
-from typing import List
-import os
+from typing import List, Optional
+
+from services.context_assembler import Chunk, context_assembler
+from services.ingestion import DEFAULT_DOCS_PATH, IngestReport, KnowledgeIndex, ingest, knowledge_index
+from utils.logger import get_logger
+
+logger = get_logger(__name__)
 
 
 class RAGService:
-    def __init__(self, docs_path: str):
+    def __init__(self, docs_path: str, index: Optional[KnowledgeIndex] = None):
         self.docs_path = docs_path
-        self.documents = self._load_docs()
+        self.index = index or knowledge_index
+        self.refresh()
 
-    def _load_docs(self) -> dict:
-        """Load all .txt files from docs_path"""
-        docs = {}
-        if not os.path.exists(self.docs_path):
-            print(f"Warning: Docs path not found: {self.docs_path}")
-            return docs
-
-        for file in os.listdir(self.docs_path):
-            if file.endswith(".txt"):
-                path = os.path.join(self.docs_path, file)
-                try:
-                    with open(path, "r", encoding="utf-8") as f:
-                        content = f.read().strip()
-                        if content:
-                            docs[file] = content
-                except Exception as e:
-                    print(f"Error reading {file}: {e}")
-        print(f"Loaded {len(docs)} docs for RAG")
-        return docs
+    def refresh(self) -> IngestReport:
+        """Incrementally ingest docs_path (.txt, .md, .html) into the index"""
+        return ingest(self.docs_path, self.index)
 
     def retrieve(self, query: str) -> List[str]:
-        """Simple keyword-based retrieval"""
-        query = query.lower()
-        results = []
-
-        for title, content in self.documents.items():
-            if query in title.lower() or any(kw in query for kw in ["test", "api", "web", "pricing", "cost", "qa"]):
-                snippet = content[:500] + "..." if len(content) > 500 else content
-                results.append(f"From '{title}':\n{snippet}")
-        return results[:2]
+        """BM25 over the ingested chunks, packed into the context budget"""
+        chunks = [Chunk(f"From '{c.source}':\n{c.text}", c.source, c.score) for c in self.index.search(query)]
+        context = context_assembler.assemble(chunks)
+        return [context.text] if context.text else []
 
 
 # Global instance
-rag_service = RAGService("backend/testzeus_docs")
+rag_service = RAGService(DEFAULT_DOCS_PATH)
 
 
 def tool_testzeus_knowledge(query: str) -> str:
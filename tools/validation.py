@@ -1,17 +1,75 @@
 # tools/validation.py
 """
 GPT-5 Tool: validate_email
-Validates email format, disposable domains, and competitor emails using LLM
+Validates email format, disposable domains, and competitor emails (services/model_router)
 """
 
 import re
-from openai import OpenAI
-from utils.config import settings
+from functools import lru_cache
+from typing import Optional
+
+from services.model_router import Verdict, model_router
+from utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+
+@lru_cache(maxsize=None)
+def get_settings():
+    # Settings validate the whole .env, so load them on first use, not at import
+    from utils.config import settings
+    return settings
+
+
+COMPETITORS = {
+    "Tricentis Tosca": ("tricentis.com",),
+    "Katalon Platform": ("katalon.com",),
+    "Functionize": ("functionize.com",),
+    "TestRigor": ("testrigor.com",),
+    "CodiumAI (Qodo)": ("qodo.ai", "codium.ai"),
+    "Eggplant (Keysight)": ("keysight.com",),
+    "Applitools": ("applitools.com",),
+    "Testim": ("testim.io",),
+    "Mabl": ("mabl.com",),
+    "Copado": ("copado.com",),
+    "BrowserStack": ("browserstack.com",),
+    "Sastra Robotics": ("sastrarobotics.com",),
+    "Testsigma": ("testsigma.com",),
+    "QF-Test": ("qfs.de",),
+}
+COMPETITOR_DOMAINS = frozenset(domain for domains in COMPETITORS.values() for domain in domains)
+# Brand names that may show up in other domains (e.g. tricentis-labs.io): those go to a model
+COMPETITOR_BRANDS = frozenset(domain.split(".")[0] for domain in COMPETITOR_DOMAINS)
+
+COMPETITOR_ROWS = "\n".join(
+    f"| {name:<23} | {' or '.join('@' + d for d in domains):<34} |" for name, domains in COMPETITORS.items()
+)
+COMPETITOR_PROMPT = """
+You are an email validation expert at TestZeus. Your job is to detect if an email belongs to a competitor.
+
+Here is the list of known competitor email domains:
+
+| Tool / Platform         | Email Domain                       |
+|-------------------------|------------------------------------|
+{rows}
+
+Is '{email}' from a competitor company?
+"""
+
+
+def local_competitor_check(domain: str) -> Optional[Verdict]:
+    """Listed domains and their subdomains are competitors; domains not naming a competitor are not"""
+    if any(domain == known or domain.endswith("." + known) for known in COMPETITOR_DOMAINS):
+        return Verdict(True, 1.0, "local")
+    if any(brand in domain for brand in COMPETITOR_BRANDS):
+        return None
+    return Verdict(False, 0.95, "local")
 
-client = OpenAI(api_key=settings.OPENAI_API_KEY)
 
-# Disposable domains (still use fast blocklist for these)
-DISPOSABLE_DOMAINS = settings.blocklist
+@lru_cache(maxsize=None)
+def disposable_domains() -> frozenset:
+    # Disposable domains (still use fast blocklist for these)
+    return frozenset(d.strip().lower() for d in get_settings().domain_blocklist.split(",") if d.strip())
 
 
 def is_valid_domain(email: str) -> str:
@@ -22,56 +80,21 @@ def is_valid_domain(email: str) -> str:
     domain = email.split("@")[1].lower()
 
     # 2. Disposable check (fast)
-    if domain in DISPOSABLE_DOMAINS:
+    if domain in disposable_domains():
         return f"INVALID: Disposable domain {domain} not allowed"
 
-    # 3. Competitor check via GPT-5
+    # 3. Competitor check: the domain table, then the small model, then the large one
     try:
-        competitor_prompt = f"""
-You are an email validation expert at TestZeus. Your job is to detect if an email belongs to a competitor.
-
-Here is the list of known competitor email domains:
-
-| Tool / Platform         | Email Domain                       |
-|-------------------------|------------------------------------|
-| Tricentis Tosca         | @tricentis.com                     |
-| Katalon Platform        | @katalon.com                       |
-| Functionize             | @functionize.com                   |
-| TestRigor               | @testrigor.com                     |
-| CodiumAI (Qodo)         | @qodo.ai or @codium.ai             |
-| Eggplant (Keysight)     | @keysight.com                      |
-| Applitools              | @applitools.com                    |
-| Testim                  | @testim.io                         |
-| Mabl                    | @mabl.com                          |
-| Copado                  | @copado.com                        |
-| BrowserStack            | @browserstack.com                  |
-| Sastra Robotics         | @sastrarobotics.com                |
-| Testsigma               | @testsigma.com                     |
-| QF-Test                 | @qfs.de                            |
-
-Is '{email}' from a competitor company? Answer only YES or NO.
-"""
-
-        response = client.responses.create(
-            model=settings.OPENAI_MODEL,
-            input=competitor_prompt,
-            reasoning={"effort": "minimal"},
-            text={"verbosity": "low"}
+        verdict = model_router.classify(
+            "competitor_check",
+            COMPETITOR_PROMPT.format(rows=COMPETITOR_ROWS, email=email),
+            local=lambda: local_competitor_check(domain)
         )
-
-        # Extract YES/NO
-        content = ""
-        for item in response.output:
-            if hasattr(item, "content"):
-                for c in item.content:
-                    if hasattr(c, "text"):
-                        content += c.text
-
-        if "yes" in content.strip().lower():
+        if verdict.answer:
             return f"INVALID: Competitor email {email} not allowed"
 
     except Exception as e:
         # If LLM fails, allow but log
-        print(f"LLM competitor check failed: {e}")
+        logger.warning("LLM competitor check failed", extra={"error": str(e)})
 
     return f"VALID: {email}"
\ No newline at end of file
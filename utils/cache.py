@@ -0,0 +1,110 @@
+# backend/utils/cache.py
+"""
+Small in-process caches shared by the services.
+
+TTLCache is a thread-safe LRU map with per-entry expiry. A loader that
+returns None is cached as a negative entry with its own (shorter) TTL so
+repeated "does X exist?" lookups don't hit the backend either.
+"""
+
+import threading
+import time
+import weakref
+from collections import OrderedDict
+from typing import Any, Callable, Hashable, List, Optional
+
+from utils.metrics import CollectedMetric, registry
+
+MISSING = object()
+_caches: "weakref.WeakSet[TTLCache]" = weakref.WeakSet()
+
+
+class TTLCache:
+    def __init__(self, name: str, maxsize: int = 1024, ttl: float = 60.0, negative_ttl: Optional[float] = None):
+        self.name = name
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.negative_ttl = ttl if negative_ttl is None else negative_ttl
+        self._data: "OrderedDict[Hashable, tuple[float, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        _caches.add(self)
+
+    def get(self, key: Hashable) -> Any:
+        """Return the cached value (None for a negative entry) or MISSING."""
+        now = time.monotonic()
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                self.misses += 1
+                return MISSING
+            expires_at, value = entry
+            if expires_at <= now:
+                del self._data[key]
+                self.misses += 1
+                return MISSING
+            self._data.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def set(self, key: Hashable, value: Any, ttl: Optional[float] = None) -> None:
+        if ttl is None:
+            ttl = self.negative_ttl if value is None else self.ttl
+        if ttl <= 0:
+            return
+        with self._lock:
+            self._data[key] = (time.monotonic() + ttl, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def get_or_load(self, key: Hashable, loader: Callable[[], Any]) -> Any:
+        """Read-through lookup. Exceptions from the loader are not cached."""
+        value = self.get(key)
+        if value is MISSING:
+            value = loader()
+            self.set(key, value)
+        return value
+
+    def invalidate(self, key: Hashable) -> None:
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def stats(self) -> dict:
+        total = self.hits + self.misses
+        return {
+            "name": self.name,
+            "size": len(self._data),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": (self.hits / total) if total else 0.0,
+        }
+
+
+def all_caches() -> List[TTLCache]:
+    return sorted(_caches, key=lambda c: c.name)
+
+
+def _collect_cache_metrics() -> List[CollectedMetric]:
+    stats = [c.stats() for c in all_caches()]
+    return [
+        CollectedMetric("cache_hits_total", "counter", "TTL cache hits",
+                        [("cache_hits_total", {"cache": s["name"]}, s["hits"]) for s in stats]),
+        CollectedMetric("cache_misses_total", "counter", "TTL cache misses",
+                        [("cache_misses_total", {"cache": s["name"]}, s["misses"]) for s in stats]),
+        CollectedMetric("cache_hit_ratio", "gauge", "TTL cache hit ratio since start",
+                        [("cache_hit_ratio", {"cache": s["name"]}, s["hit_ratio"]) for s in stats]),
+        CollectedMetric("cache_entries", "gauge", "TTL cache entries",
+                        [("cache_entries", {"cache": s["name"]}, s["size"]) for s in stats]),
+    ]
+
+
+registry.add_collector(_collect_cache_metrics)
@@ -0,0 +1,131 @@
+# backend/utils/file_response.py
+"""
+File responses with conditional requests and byte ranges.
+
+Starlette's FileResponse (0.36) sets ETag and Last-Modified but always
+answers 200 with the whole file. file_response() adds:
+
+- 304 Not Modified for a matching If-None-Match, or If-Modified-Since
+  when no ETag was sent;
+- 206 Partial Content for a single "Range: bytes=..." (honouring
+  If-Range), 416 when the range is past the end. Multi-range requests
+  get the whole file, which RFC 9110 allows.
+
+Whole files go out through FileResponse, which hands the path to the
+server (http.response.pathsend, i.e. sendfile) when the server supports
+it and otherwise streams 64 KiB chunks; ranges are streamed the same way.
+The file is never read into memory as a whole.
+"""
+
+import os
+import stat
+from email.utils import formatdate, parsedate_to_datetime
+from typing import Mapping, Optional, Tuple
+
+import anyio
+from starlette.requests import Request
+from starlette.responses import FileResponse, Response
+from starlette.types import Receive, Scope, Send
+
+
+def etag_for(stat_result: os.stat_result) -> str:
+    return f'"{stat_result.st_mtime_ns:x}-{stat_result.st_size:x}"'
+
+
+def _etag_matches(header: str, etag: str) -> bool:
+    """Weak comparison, as If-None-Match requires"""
+    if header.strip() == "*":
+        return True
+    return any(tag.strip().removeprefix("W/") == etag for tag in header.split(","))
+
+
+def _not_modified(request: Request, etag: str, mtime: float) -> bool:
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match is not None:
+        return _etag_matches(if_none_match, etag)
+    if_modified_since = request.headers.get("if-modified-since")
+    if if_modified_since:
+        try:
+            return int(mtime) <= parsedate_to_datetime(if_modified_since).timestamp()
+        except (TypeError, ValueError):
+            return False
+    return False
+
+
+def parse_range(header: str, size: int) -> Optional[Tuple[int, int]]:
+    """(start, end) inclusive for a single byte range; None to send the whole file.
+
+    Raises ValueError when the range cannot be satisfied.
+    """
+    unit, _, spec = header.partition("=")
+    if unit.strip().lower() != "bytes" or "," in spec:
+        return None
+    first, sep, last = (part.strip() for part in spec.partition("-"))
+    if not sep or not (first or last) or not all(part.isdigit() for part in (first, last) if part):
+        return None  # malformed: ignore the header
+    if not first:  # suffix: the last N bytes
+        if int(last) == 0 or size == 0:
+            raise ValueError("range not satisfiable")
+        return max(size - int(last), 0), size - 1
+    start = int(first)
+    if last and int(last) < start:
+        return None
+    if start >= size:
+        raise ValueError("range not satisfiable")
+    end = int(last) if last else size - 1
+    return start, min(end, size - 1)
+
+
+class RangeFileResponse(FileResponse):
+    """206 response for bytes start..end (inclusive) of a file"""
+
+    def __init__(self, path: str, start: int, end: int, stat_result: os.stat_result, **kwargs):
+        self.start, self.end = start, end
+        super().__init__(path, status_code=206, stat_result=stat_result, **kwargs)
+        self.headers["content-length"] = str(end - start + 1)
+        self.headers["content-range"] = f"bytes {start}-{end}/{stat_result.st_size}"
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        await send({"type": "http.response.start", "status": self.status_code, "headers": self.raw_headers})
+        if scope["method"].upper() == "HEAD":
+            await send({"type": "http.response.body", "body": b"", "more_body": False})
+            return
+        remaining = self.end - self.start + 1
+        async with await anyio.open_file(self.path, mode="rb") as file:
+            await file.seek(self.start)
+            while remaining > 0:
+                chunk = await file.read(min(self.chunk_size, remaining))
+                if not chunk:
+                    break
+                remaining -= len(chunk)
+                await send({"type": "http.response.body", "body": chunk, "more_body": remaining > 0})
+        if remaining > 0:  # the file shrank underneath us; end the body
+            await send({"type": "http.response.body", "body": b"", "more_body": False})
+
+
+def file_response(request: Request, path: str, media_type: str,
+                  headers: Optional[Mapping[str, str]] = None) -> Response:
+    """Serve path for request: 200, 206, 304 or 416. Raises FileNotFoundError."""
+    stat_result = os.stat(path)
+    if not stat.S_ISREG(stat_result.st_mode):
+        raise FileNotFoundError(path)
+    etag = etag_for(stat_result)
+    headers = {
+        **(headers or {}),
+        "etag": etag,
+        "last-modified": formatdate(stat_result.st_mtime, usegmt=True),
+        "accept-ranges": "bytes",
+    }
+    if _not_modified(request, etag, stat_result.st_mtime):
+        return Response(status_code=304, headers=headers)
+
+    range_header = request.headers.get("range")
+    if_range = request.headers.get("if-range")
+    if range_header and (if_range is None or if_range.strip() in (etag, headers["last-modified"])):
+        try:
+            byte_range = parse_range(range_header, stat_result.st_size)
+        except ValueError:
+            return Response(status_code=416, headers={**headers, "content-range": f"bytes */{stat_result.st_size}"})
+        if byte_range is not None:
+            return RangeFileResponse(path, *byte_range, stat_result, headers=headers, media_type=media_type)
+    return FileResponse(path, headers=headers, media_type=media_type, stat_result=stat_result)
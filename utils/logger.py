@@ -0,0 +1,149 @@
+# backend/utils/logger.py
+"""
+Structured logging for the backend.
+
+Records are emitted as one JSON object per line. Callers only pay for
+building the record and putting it on a queue; formatting, redaction and the
+stdout write happen on a background listener thread.
+
+    from utils.logger import get_logger
+    logger = get_logger(__name__)
+    logger.info("tenant created", extra={"tenant_id": tenant_id})
+
+Fields passed through `extra` become top-level JSON keys. Values under
+secret-looking keys (password, token, api_key, ...) and secret-looking
+substrings of messages are replaced with "[REDACTED]".
+
+Configuration (env):
+    LOG_LEVEL              root level, default INFO
+    LOG_LEVELS             per-module levels, e.g. "routers.chatbot=DEBUG";
+                           default "httpx=WARNING" (no line per HTTP request)
+    LOG_DEBUG_SAMPLE_RATE  fraction of DEBUG records kept, default 1.0
+"""
+
+import atexit
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import random
+import re
+import sys
+import threading
+from datetime import datetime, timezone
+from typing import Any, Dict, Optional
+
+REDACTED = "[REDACTED]"
+# Whole key names only, so counters like "prompt_tokens" are kept
+_SECRET_KEY = re.compile(
+    r"(\w+_)?(password|passwd|secret|token|api_?key|authorization|credentials?)", re.I
+)
+_SECRET_TEXT = [
+    # key=value / key: value pairs
+    re.compile(r"(?i)\b(password|passwd|secret|token|api[_-]?key)(\s*[:=]\s*)(\S+)"),
+    # Bearer tokens and OpenAI-style keys
+    re.compile(r"(?i)\b(bearer)(\s+)([\w\-.~+/]+=*)"),
+    re.compile(r"()()\bsk-[A-Za-z0-9_\-]{8,}"),
+]
+
+# Attributes every LogRecord has; anything else came from `extra`
+_RECORD_ATTRS = set(vars(logging.LogRecord("", 0, "", 0, "", None, None))) | {"message", "asctime", "taskName"}
+
+_setup_lock = threading.Lock()
+_listener: Optional[logging.handlers.QueueListener] = None
+
+
+def redact_text(text: str) -> str:
+    for pattern in _SECRET_TEXT:
+        text = pattern.sub(lambda m: f"{m.group(1)}{m.group(2)}{REDACTED}", text)
+    return text
+
+
+def redact(value: Any, key: str = "") -> Any:
+    if key and _SECRET_KEY.fullmatch(key):
+        return REDACTED
+    if isinstance(value, str):
+        return redact_text(value)
+    if isinstance(value, dict):
+        return {k: redact(v, str(k)) for k, v in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [redact(v) for v in value]
+    return value
+
+
+class JsonFormatter(logging.Formatter):
+    def format(self, record: logging.LogRecord) -> str:
+        entry: Dict[str, Any] = {
+            "ts": datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "logger": record.name,
+            "msg": redact_text(record.getMessage()),
+        }
+        for key, value in vars(record).items():
+            if key not in _RECORD_ATTRS and not key.startswith("_"):
+                entry[key] = redact(value, key)
+        exc_text = record.exc_text or (self.formatException(record.exc_info) if record.exc_info else None)
+        if exc_text:
+            entry["exc"] = redact_text(exc_text)
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+
+class DebugSampler(logging.Filter):
+    """Keeps a fraction of DEBUG records; other levels always pass."""
+
+    def __init__(self, rate: float):
+        super().__init__()
+        self.rate = rate
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        return record.levelno > logging.DEBUG or self.rate >= 1.0 or random.random() < self.rate
+
+
+class _QueueHandler(logging.handlers.QueueHandler):
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # Skip the stdlib's eager format(); merge args only and leave the
+        # JSON formatting to the listener thread.
+        record = logging.makeLogRecord(vars(record))
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info and not record.exc_text:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+        record.exc_info = None
+        return record
+
+
+def _parse_levels(spec: str) -> Dict[str, str]:
+    levels = {}
+    for item in spec.split(","):
+        if "=" in item:
+            name, level = item.split("=", 1)
+            levels[name.strip()] = level.strip().upper()
+    return levels
+
+
+def setup_logging() -> None:
+    """Install the queue handler on the root logger. Safe to call more than once."""
+    global _listener
+    with _setup_lock:
+        if _listener is not None:
+            return
+        stream = logging.StreamHandler(sys.stdout)
+        stream.setFormatter(JsonFormatter())
+        log_queue: queue.SimpleQueue = queue.SimpleQueue()
+        handler = _QueueHandler(log_queue)
+        handler.addFilter(DebugSampler(float(os.getenv("LOG_DEBUG_SAMPLE_RATE", "1.0"))))
+
+        root = logging.getLogger()
+        root.handlers = [handler]
+        root.setLevel(os.getenv("LOG_LEVEL", "INFO").upper())
+        for name, level in _parse_levels(os.getenv("LOG_LEVELS", "httpx=WARNING")).items():
+            logging.getLogger(name).setLevel(level)
+
+        _listener = logging.handlers.QueueListener(log_queue, stream, respect_handler_level=True)
+        _listener.start()
+        atexit.register(_listener.stop)
+
+
+def get_logger(name: str) -> logging.Logger:
+    return logging.getLogger(name)
@@ -0,0 +1,252 @@
+# backend/utils/metrics.py
+"""
+Prometheus-style metrics without a client library dependency.
+
+Counters, gauges and histograms are plain Python objects; the text
+exposition format (version 0.0.4) is produced only when /metrics is
+scraped. Observations take no lock (a lost increment under a rare thread
+race is acceptable for monitoring) and bind label values once:
+
+    REQUESTS = Counter("chat_requests_total", "Chat requests", ["outcome"])
+    REQUESTS.labels("cached").inc()
+
+Values that already live elsewhere (cache stats, gateway usage) are read at
+scrape time by collectors registered with registry.add_collector().
+"""
+
+import bisect
+import math
+from typing import Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+# Seconds; covers both in-memory work and multi-second LLM calls
+DEFAULT_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+Sample = Tuple[str, Dict[str, str], float]
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(labels: Dict[str, str]) -> str:
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{k}="{_escape(v)}"' for k, v in labels.items()) + "}"
+
+
+def _format_value(value: float) -> str:
+    if math.isinf(value):
+        return "+Inf" if value > 0 else "-Inf"
+    return repr(float(value)) if not float(value).is_integer() else str(int(value))
+
+
+class _Metric:
+    kind = "untyped"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._children: Dict[Tuple[str, ...], object] = {}
+        # Raw label values -> child, so repeat lookups skip the str() conversion
+        self._lookup: Dict[tuple, object] = {}
+        if not self.labelnames:
+            self._children[()] = self._lookup[()] = self._new_child()
+
+    def _new_child(self):
+        raise NotImplementedError
+
+    def labels(self, *values: str):
+        child = self._lookup.get(values)
+        if child is None:
+            key = tuple(str(v) for v in values)
+            if len(key) != len(self.labelnames):
+                raise ValueError(f"{self.name} expects labels {self.labelnames}, got {key}")
+            child = self._lookup[values] = self._children.setdefault(key, self._new_child())
+        return child
+
+    def samples(self) -> Iterable[Sample]:
+        raise NotImplementedError
+
+
+class _Value:
+    __slots__ = ("value",)
+
+    def __init__(self):
+        self.value = 0.0
+
+    def inc(self, amount: float = 1.0) -> None:
+        self.value += amount
+
+    def dec(self, amount: float = 1.0) -> None:
+        self.value -= amount
+
+    def set(self, value: float) -> None:
+        self.value = value
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def _new_child(self):
+        return _Value()
+
+    def inc(self, amount: float = 1.0) -> None:
+        self._children[()].inc(amount)
+
+    def samples(self) -> Iterable[Sample]:
+        for key, child in list(self._children.items()):
+            yield self.name, dict(zip(self.labelnames, key)), child.value
+
+
+class Gauge(Counter):
+    kind = "gauge"
+
+    def set(self, value: float) -> None:
+        self._children[()].set(value)
+
+    def dec(self, amount: float = 1.0) -> None:
+        self._children[()].dec(amount)
+
+
+class _HistogramValue:
+    __slots__ = ("bounds", "counts", "sum")
+
+    def __init__(self, bounds: Tuple[float, ...]):
+        self.bounds = bounds
+        self.counts = [0] * (len(bounds) + 1)  # last slot is +Inf
+        self.sum = 0.0
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect.bisect_left(self.bounds, value)] += 1
+        self.sum += value
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                 buckets: Sequence[float] = DEFAULT_BUCKETS):
+        self.bounds = tuple(sorted(buckets))
+        super().__init__(name, documentation, labelnames)
+
+    def _new_child(self):
+        return _HistogramValue(self.bounds)
+
+    def observe(self, value: float) -> None:
+        self._children[()].observe(value)
+
+    def samples(self) -> Iterable[Sample]:
+        for key, child in list(self._children.items()):
+            labels = dict(zip(self.labelnames, key))
+            cumulative = 0
+            counts = list(child.counts)
+            for bound, count in zip(self.bounds + (math.inf,), counts):
+                cumulative += count
+                yield f"{self.name}_bucket", {**labels, "le": _format_value(bound)}, cumulative
+            yield f"{self.name}_sum", labels, child.sum
+            yield f"{self.name}_count", labels, cumulative
+
+
+class CollectedMetric:
+    """A metric family produced by a collector at scrape time."""
+
+    def __init__(self, name: str, kind: str, documentation: str, samples: List[Sample]):
+        self.name = name
+        self.kind = kind
+        self.documentation = documentation
+        self._samples = samples
+
+    def samples(self) -> Iterable[Sample]:
+        return self._samples
+
+
+class Registry:
+    def __init__(self):
+        self._metrics: Dict[str, _Metric] = {}
+        self._collectors: List[Callable[[], Iterable[CollectedMetric]]] = []
+
+    def register(self, metric: _Metric) -> _Metric:
+        if metric.name in self._metrics:
+            raise ValueError(f"Metric {metric.name} already registered")
+        self._metrics[metric.name] = metric
+        return metric
+
+    def add_collector(self, collector: Callable[[], Iterable[CollectedMetric]]) -> None:
+        self._collectors.append(collector)
+
+    def render(self) -> str:
+        families: List = list(self._metrics.values())
+        for collector in self._collectors:
+            families.extend(collector())
+        lines = []
+        for family in families:
+            lines.append(f"# HELP {family.name} {family.documentation}")
+            lines.append(f"# TYPE {family.name} {family.kind}")
+            for name, labels, value in family.samples():
+                lines.append(f"{name}{_format_labels(labels)} {_format_value(value)}")
+        return "\n".join(lines) + "\n"
+
+
+# Global registry served at /metrics
+registry = Registry()
+
+
+def counter(name: str, documentation: str, labelnames: Sequence[str] = ()) -> Counter:
+    return registry.register(Counter(name, documentation, labelnames))
+
+
+def gauge(name: str, documentation: str, labelnames: Sequence[str] = ()) -> Gauge:
+    return registry.register(Gauge(name, documentation, labelnames))
+
+
+def histogram(name: str, documentation: str, labelnames: Sequence[str] = (),
+              buckets: Optional[Sequence[float]] = None) -> Histogram:
+    return registry.register(Histogram(name, documentation, labelnames, buckets or DEFAULT_BUCKETS))
+
+
+# --- event loop health ---
+
+EVENT_LOOP_LAG = histogram(
+    "event_loop_lag_seconds", "How late the event loop ran a timer scheduled for now",
+    buckets=(0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0),
+)
+EVENT_LOOP_LAG_LAST = gauge("event_loop_lag_last_seconds", "Most recent event loop lag sample")
+THREADPOOL_BUSY = gauge("threadpool_busy_threads", "Worker threads running blocking calls, by pool", ["pool"])
+THREADPOOL_QUEUED = gauge("threadpool_queued_tasks", "Blocking calls waiting for a free worker thread, by pool", ["pool"])
+
+
+def _default_executor_stats(loop) -> tuple:
+    """(busy threads, queued calls) of the loop's default executor: asyncio.to_thread and run_in_executor(None)"""
+    executor = getattr(loop, "_default_executor", None)
+    if executor is None:  # created on first use
+        return 0, 0
+    threads = len(getattr(executor, "_threads", ()))
+    idle = getattr(getattr(executor, "_idle_semaphore", None), "_value", 0)
+    return max(0, threads - idle), executor._work_queue.qsize()
+
+
+async def monitor_event_loop(interval: float = 0.5) -> None:
+    """
+    Samples loop lag and both thread pools until cancelled; run as a task on
+    the server loop. pool="anyio" runs sync endpoints, dependencies and
+    background tasks; pool="default_executor" runs asyncio.to_thread calls.
+    """
+    import asyncio
+    import time
+
+    import anyio.to_thread
+
+    loop = asyncio.get_running_loop()
+    while True:
+        scheduled = time.perf_counter() + interval
+        await asyncio.sleep(interval)
+        lag = max(0.0, time.perf_counter() - scheduled)
+        EVENT_LOOP_LAG.observe(lag)
+        EVENT_LOOP_LAG_LAST.set(lag)
+        stats = anyio.to_thread.current_default_thread_limiter().statistics()
+        THREADPOOL_BUSY.labels("anyio").set(stats.borrowed_tokens)
+        THREADPOOL_QUEUED.labels("anyio").set(stats.tasks_waiting)
+        busy, queued = _default_executor_stats(loop)
+        THREADPOOL_BUSY.labels("default_executor").set(busy)
+        THREADPOOL_QUEUED.labels("default_executor").set(queued)
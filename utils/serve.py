@@ -0,0 +1,61 @@
+# backend/utils/serve.py
+"""
+Production launcher.
+
+    python -m utils.serve [--workers N] [--host 0.0.0.0] [--port 8000]
+
+or programmatically: `from utils.serve import serve; serve(workers=4)`.
+
+With more than one worker it turns on SHARED_STATE=sqlite before the
+workers start, so accounts, idempotency keys, the OpenAI rate limits, the
+response cache and the PocketBase admin session are shared through
+data/*.db instead of being per process. The SQLite schemas are created
+here, once, before any worker imports the app.
+
+--workers defaults to WEB_CONCURRENCY, then the CPU count.
+"""
+
+import argparse
+import os
+from typing import Optional
+
+import uvicorn
+from dotenv import load_dotenv
+
+
+def default_workers() -> int:
+    return int(os.getenv("WEB_CONCURRENCY", "0")) or os.cpu_count() or 1
+
+
+def prepare_shared_state() -> None:
+    """Enable the shared store and create its tables in the parent process."""
+    os.environ["SHARED_STATE"] = "sqlite"
+    from services.account_store import account_store
+    from services.shared_state import shared_state
+
+    account_store.list(limit=1)
+    shared_state.initialize()
+
+
+def serve(workers: Optional[int] = None, host: str = "0.0.0.0", port: int = 8000, log_level: str = "info") -> None:
+    # Parent and workers must agree on .env settings such as the store paths
+    load_dotenv()
+    workers = workers or default_workers()
+    if workers > 1:
+        prepare_shared_state()
+    # Workers are spawned processes, so the app is passed as an import string
+    uvicorn.run("main:app", host=host, port=port, workers=workers, log_level=log_level)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Run the backend with one or more workers")
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--host", default=os.getenv("HOST", "0.0.0.0"))
+    parser.add_argument("--port", type=int, default=int(os.getenv("PORT", "8000")))
+    parser.add_argument("--log-level", default="info")
+    args = parser.parse_args()
+    serve(args.workers, args.host, args.port, args.log_level)
+
+
+if __name__ == "__main__":
+    main()
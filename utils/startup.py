@@ -0,0 +1,100 @@
+# backend/utils/startup.py
+"""
+Startup profiling.
+
+    python -m utils.startup [--top 25] [--port 8765]
+
+1. Imports `main` in a fresh interpreter with `-X importtime` and reports
+   the slowest modules by cumulative and self import time.
+2. Starts uvicorn in another fresh process and measures the time from
+   spawn to the first successful /health response (cold start).
+"""
+
+import argparse
+import os
+import subprocess
+import sys
+import time
+import urllib.request
+from pathlib import Path
+from typing import Dict, List, Tuple
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+
+
+def profile_imports(module: str = "main") -> List[Tuple[str, int, int]]:
+    """Return (module, self_us, cumulative_us) for every module imported by `module`."""
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=BACKEND_DIR,
+        capture_output=True,
+        text=True,
+        env={**os.environ, "WARMUP_ON_STARTUP": "0"},
+    )
+    if proc.returncode != 0:
+        raise RuntimeError(f"import {module} failed:\n{proc.stderr[-2000:]}")
+
+    timings = []
+    for line in proc.stderr.splitlines():
+        if not line.startswith("import time:") or "[us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        timings.append((name.strip(), int(self_us), int(cumulative_us)))
+    return timings
+
+
+def time_to_first_health(port: int, timeout: float = 30.0) -> float:
+    """Seconds from spawning uvicorn to the first 200 from /health."""
+    start = time.perf_counter()
+    proc = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "main:app", "--port", str(port), "--log-level", "warning"],
+        cwd=BACKEND_DIR,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+    )
+    try:
+        while time.perf_counter() - start < timeout:
+            try:
+                with urllib.request.urlopen(f"http://127.0.0.1:{port}/health", timeout=1) as resp:
+                    if resp.status == 200:
+                        return time.perf_counter() - start
+            except OSError:
+                time.sleep(0.01)
+        raise TimeoutError(f"/health did not respond within {timeout}s")
+    finally:
+        proc.terminate()
+        proc.wait(timeout=10)
+
+
+def report(timings: List[Tuple[str, int, int]], top: int) -> None:
+    total_us = max((cum for _, _, cum in timings), default=0)
+    print(f"Total import time for main: {total_us / 1000:.1f} ms ({len(timings)} modules)\n")
+
+    print(f"Top {top} by cumulative time:")
+    for name, self_us, cum_us in sorted(timings, key=lambda t: t[2], reverse=True)[:top]:
+        print(f"  {cum_us / 1000:9.1f} ms  {name}")
+
+    # Group self time by top-level package to show which dependency costs the most
+    by_package: Dict[str, int] = {}
+    for name, self_us, _ in timings:
+        package = name.split(".")[0]
+        by_package[package] = by_package.get(package, 0) + self_us
+    print(f"\nTop {top} packages by self time:")
+    for package, self_us in sorted(by_package.items(), key=lambda kv: kv[1], reverse=True)[:top]:
+        print(f"  {self_us / 1000:9.1f} ms  {package}")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Profile backend startup time")
+    parser.add_argument("--top", type=int, default=25)
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--skip-health", action="store_true", help="Only profile imports")
+    args = parser.parse_args()
+
+    report(profile_imports(), args.top)
+    if not args.skip_health:
+        print(f"\nCold start to first /health: {time_to_first_health(args.port):.3f} s")
+
+
+if __name__ == "__main__":
+    main()
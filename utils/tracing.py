@@ -0,0 +1,224 @@
+# backend/utils/tracing.py
+"""
+Lightweight request tracing.
+
+A trace is started per HTTP request (see main.py) and spans are opened
+around the interesting work underneath it:
+
+    with tracer.span("pocketbase.find", collection="tenants") as span:
+        ...
+        span.set(hit=True)
+
+    @traced("tool.validate_email")
+    def tool_validate_email(...): ...
+
+The current trace/span live in contextvars, so spans nest correctly across
+awaits and in threadpool endpoints. Outside a request, span() is a no-op.
+
+Finished traces produce a Server-Timing header (durations summed per span
+name) and, when slower than TRACE_SLOW_MS, are kept in a ring buffer of
+TRACE_BUFFER_SIZE entries for /v1/debug/traces. Exported traces use
+OpenTelemetry's span field names (trace_id, span_id, parent_span_id,
+start/end_time_unix_nano, attributes, status) so they can be forwarded to
+an OTLP collector as-is.
+"""
+
+import functools
+import inspect
+import os
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Dict, Iterator, List, Optional
+
+from utils.logger import get_logger
+from utils.metrics import histogram
+
+logger = get_logger(__name__)
+
+TRACE_SLOW_MS = float(os.getenv("TRACE_SLOW_MS", "1000"))
+TRACE_BUFFER_SIZE = int(os.getenv("TRACE_BUFFER_SIZE", "100"))
+MAX_SPANS_PER_TRACE = 256
+
+SPAN_SECONDS = histogram("span_duration_seconds", "Duration of traced work (tools, LLM and outbound calls)", ["span"])
+
+
+class Span:
+    __slots__ = ("name", "span_id", "parent_id", "start_ns", "end_ns", "attributes", "error")
+
+    def __init__(self, name: str, parent_id: Optional[str], attributes: Dict[str, Any]):
+        self.name = name
+        self.span_id = os.urandom(8).hex()
+        self.parent_id = parent_id
+        self.start_ns = time.time_ns()
+        self.end_ns: Optional[int] = None
+        self.attributes = attributes
+        self.error: Optional[str] = None
+
+    def set(self, **attributes: Any) -> None:
+        self.attributes.update(attributes)
+
+    @property
+    def duration_ms(self) -> float:
+        end = self.end_ns if self.end_ns is not None else time.time_ns()
+        return (end - self.start_ns) / 1e6
+
+    def to_dict(self, trace_id: str) -> Dict[str, Any]:
+        return {
+            "trace_id": trace_id,
+            "span_id": self.span_id,
+            "parent_span_id": self.parent_id,
+            "name": self.name,
+            "start_time_unix_nano": self.start_ns,
+            "end_time_unix_nano": self.end_ns,
+            "duration_ms": round(self.duration_ms, 3),
+            "attributes": self.attributes,
+            "status": {"code": "ERROR", "message": self.error} if self.error else {"code": "OK"},
+        }
+
+
+class _NoopSpan:
+    def set(self, **attributes: Any) -> None:
+        pass
+
+
+NOOP_SPAN = _NoopSpan()
+
+
+class Trace:
+    def __init__(self, name: str, attributes: Dict[str, Any]):
+        self.trace_id = os.urandom(16).hex()
+        self.root = Span(name, None, attributes)
+        self.spans: List[Span] = []
+        self.dropped = 0
+
+    def add(self, span: Span) -> bool:
+        if len(self.spans) >= MAX_SPANS_PER_TRACE:
+            self.dropped += 1
+            return False
+        self.spans.append(span)
+        return True
+
+    def server_timing(self) -> str:
+        """Server-Timing header value: time per span name, then the total."""
+        totals: Dict[str, float] = {}
+        for span in self.spans:
+            if span.end_ns is not None:
+                totals[span.name] = totals.get(span.name, 0.0) + span.duration_ms
+        parts = [f"{name};dur={ms:.1f}" for name, ms in totals.items()]
+        parts.append(f"total;dur={self.root.duration_ms:.1f}")
+        return ", ".join(parts)
+
+    def token_usage(self) -> Dict[str, int]:
+        usage = {"prompt_tokens": 0, "completion_tokens": 0}
+        for span in self.spans:
+            for key in usage:
+                usage[key] += span.attributes.get(key, 0) or 0
+        return usage
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "trace_id": self.trace_id,
+            "name": self.root.name,
+            "duration_ms": round(self.root.duration_ms, 3),
+            **self.token_usage(),
+            "dropped_spans": self.dropped,
+            "spans": [self.root.to_dict(self.trace_id)] + [s.to_dict(self.trace_id) for s in self.spans],
+        }
+
+
+_current_trace: ContextVar[Optional[Trace]] = ContextVar("current_trace", default=None)
+_current_span: ContextVar[Optional[Span]] = ContextVar("current_span", default=None)
+
+
+class Tracer:
+    def __init__(self, slow_ms: float = TRACE_SLOW_MS, buffer_size: int = TRACE_BUFFER_SIZE):
+        self.slow_ms = slow_ms
+        self._slow: deque = deque(maxlen=buffer_size)
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def trace(self, name: str, **attributes: Any) -> Iterator[Trace]:
+        """Root of a request; everything traced underneath is attached to it."""
+        trace = Trace(name, attributes)
+        trace_token = _current_trace.set(trace)
+        span_token = _current_span.set(trace.root)
+        try:
+            yield trace
+        except BaseException as e:
+            trace.root.error = repr(e)
+            raise
+        finally:
+            trace.root.end_ns = time.time_ns()
+            _current_span.reset(span_token)
+            _current_trace.reset(trace_token)
+            self._finish(trace)
+
+    @contextmanager
+    def span(self, name: str, **attributes: Any) -> Iterator[Any]:
+        trace = _current_trace.get()
+        parent = _current_span.get()
+        if trace is None or parent is None:
+            yield NOOP_SPAN
+            return
+        span = Span(name, parent.span_id, attributes)
+        if not trace.add(span):
+            yield NOOP_SPAN
+            return
+        token = _current_span.set(span)
+        try:
+            yield span
+        except BaseException as e:
+            span.error = repr(e)
+            raise
+        finally:
+            span.end_ns = time.time_ns()
+            _current_span.reset(token)
+            SPAN_SECONDS.labels(name).observe((span.end_ns - span.start_ns) / 1e9)
+
+    def _finish(self, trace: Trace) -> None:
+        duration = trace.root.duration_ms
+        if duration < self.slow_ms:
+            return
+        with self._lock:
+            self._slow.append(trace)
+        logger.info("Slow request", extra={
+            "trace_id": trace.trace_id,
+            "route": trace.root.name,
+            "duration_ms": round(duration, 1),
+            "server_timing": trace.server_timing(),
+        })
+
+    def slow_traces(self, limit: int = 20) -> List[Dict[str, Any]]:
+        """Most recent slow traces first."""
+        with self._lock:
+            traces = list(self._slow)[-limit:] if limit > 0 else []
+        return [t.to_dict() for t in reversed(traces)]
+
+
+def current_trace() -> Optional[Trace]:
+    return _current_trace.get()
+
+
+# Global instance
+tracer = Tracer()
+
+
+def traced(name: str):
+    """Decorator form of tracer.span() for sync and async functions."""
+    def decorator(fn):
+        if inspect.iscoroutinefunction(fn):
+            @functools.wraps(fn)
+            async def async_wrapper(*args, **kwargs):
+                with tracer.span(name):
+                    return await fn(*args, **kwargs)
+            return async_wrapper
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            with tracer.span(name):
+                return fn(*args, **kwargs)
+        return wrapper
+    return decorator